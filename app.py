@@ -22,13 +22,19 @@ import xgboost as xgb
 import lightgbm as lgb
 from flask_cors import CORS 
 from threading import Thread
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
 import requests.exceptions
 import pandas as pd 
 from textblob import TextBlob
 
-from earthquake_features import extract_features
+from earthquake_features import extract_features, extract_features_many, haversine_vectorized, CITY_NEIGHBORS
+from earthquake_features import nearest_city as _feature_nearest_city
+from dataset_manager import dataset_exists, load_dataset, get_dataset_size_bytes
+import live_state
+import notification_dispatcher
+import subscriber_index
+from event_snapshot import parse_event_timestamp
+from services.data_service import current_snapshot
+from response_encoding import conditional_get, encoded_response
 
 # API istek loglama (logger önce tanımlanmalı; blueprint import'ta kullanılıyor)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -96,61 +102,19 @@ def home():
     """ Ana sayfa - Frontend dashboard (depremanaliz.onrender.com) """
     return render_template('index.html')
 
-# Kandilli verilerini çeken üçüncü taraf API (Live + Archive)
+# Kandilli verilerini çeken üçüncü taraf API (Live + Archive; event_snapshot fetcher'ı çeker)
 KANDILLI_API = 'https://api.orhanaydogdu.com.tr/deprem/kandilli/live'
-KANDILLI_ARCHIVE_API = 'https://api.orhanaydogdu.com.tr/deprem/kandilli/archive'
-ARCHIVE_LIMIT = 2000  # 7 günlük analiz için yeterli
 
-# API veri cache (son 5 dakika)
+# API veri cache (son 5 dakika; Kandilli dışı URL'ler için)
 api_cache = {'data': None, 'timestamp': 0, 'cache_duration': 300}  # 5 dakika cache
 # Türkiye/İstanbul erken uyarı cache (Render 30sn limiti için - ağır işlemler)
-turkey_warning_cache = {'data': None, 'timestamp': 0, 'cache_duration': 300}
+turkey_warning_cache = {'data': None, 'timestamp': 0, 'cache_duration': 300, 'version': None}
 istanbul_warning_cache = {'data': None, 'timestamp': 0, 'cache_duration': 300}
 
 
 def parse_eq_datetime(eq):
-    """Deprem kaydındaki tarih/saat alanlarından güvenli timestamp üretir."""
-    if not isinstance(eq, dict):
-        return None
-
-    for key in ('_parsed_timestamp', 'parsed_timestamp', 'timestamp'):
-        value = eq.get(key)
-        if value in (None, ''):
-            continue
-        try:
-            ts = float(value)
-            if ts > 1e12:
-                ts = ts / 1000.0
-            if 0 < ts < 4102444800:
-                return ts
-        except (TypeError, ValueError):
-            pass
-
-    date_str = str(eq.get('date', '') or '').strip()
-    time_str = str(eq.get('time', '') or '').strip()
-    dt_string = f"{date_str} {time_str}".strip()
-    if not dt_string:
-        return None
-
-    formats = [
-        '%Y.%m.%d %H:%M:%S',
-        '%Y-%m-%d %H:%M:%S',
-        '%d.%m.%Y %H:%M:%S',
-        '%Y.%m.%d %H:%M:%S.%f',
-        '%Y-%m-%d %H:%M:%S.%f',
-        '%d.%m.%Y %H:%M:%S.%f',
-        '%Y.%m.%d',
-        '%Y-%m-%d',
-        '%d.%m.%Y',
-    ]
-
-    for fmt in formats:
-        try:
-            return datetime.strptime(dt_string, fmt).timestamp()
-        except ValueError:
-            continue
-
-    return None
+    """Deprem kaydındaki tarih/saat alanlarından güvenli timestamp üretir (event_snapshot ile tek parse yolu)."""
+    return parse_event_timestamp(eq)
 
 
 def get_eq_timestamp(eq):
@@ -187,10 +151,6 @@ def get_recent_earthquakes(earthquakes, hours=48):
     return recent
 
 
-# Render free tier: 30 sn istek limiti. Kandilli timeout kısa tutulur.
-KANDILLI_TIMEOUT = 12  # Her istek max 12 sn (Live+Archive paralel = ~12 sn toplam)
-
-
 def _fetch_from_url(url, max_retries=2, timeout=60):
     """Tek bir URL'den veri çeker."""
     for attempt in range(max_retries):
@@ -214,57 +174,25 @@ def _fetch_from_url(url, max_retries=2, timeout=60):
     return []
 
 def fetch_earthquake_data_with_retry(url, max_retries=2, timeout=60):
-    """API'den veri çeker. Kandilli için Live + Archive paralel birleştirilir (Render 30sn limiti)."""
+    """
+    API'den veri çeker. Kandilli (Live + Archive) paylaşılan event görüntüsünden okunur:
+    istek upstream'i beklemez, ilk görüntüden önce boş liste döner.
+    """
     global api_cache
 
+    if url == KANDILLI_API:
+        return list(current_snapshot()['raw'])
+
     # Cache kontrolü (son 5 dakika içinde çekilen veriyi kullan)
     current_time = time.time()
     if api_cache['data'] and (current_time - api_cache['timestamp']) < api_cache['cache_duration']:
         print(f"[CACHE] Önbellekten veri döndürülüyor ({(current_time - api_cache['timestamp']):.0f} saniye önce)")
         return api_cache['data']
 
-    # Kandilli: Live + Archive PARALEL çek (Render 30sn limiti için)
-    if url == KANDILLI_API:
-        live_result = [None]
-        archive_result = [None]
-        def fetch_live():
-            live_result[0] = _fetch_from_url(KANDILLI_API, 1, KANDILLI_TIMEOUT)
-        def fetch_archive():
-            archive_result[0] = _fetch_from_url(f"{KANDILLI_ARCHIVE_API}?limit={ARCHIVE_LIMIT}", 1, KANDILLI_TIMEOUT)
-        t1 = Thread(target=fetch_live)
-        t2 = Thread(target=fetch_archive)
-        t1.start()
-        t2.start()
-        t1.join()
-        t2.join()
-        live_data = live_result[0] or []
-        archive_data = archive_result[0] or []
-        # Deduplicate by earthquake_id (archive ile live örtüşebilir)
-        seen_ids = set()
-        merged = []
-        for eq in live_data + archive_data:
-            eid = eq.get('earthquake_id') or eq.get('eventID')
-            if not eid and eq.get('geojson', {}).get('coordinates'):
-                coords = eq['geojson']['coordinates']
-                ts = eq.get('created_at') or eq.get('timestamp') or 0
-                eid = f"{coords[0]}_{coords[1]}_{ts}"
-            if eid and eid in seen_ids:
-                continue
-            if eid:
-                seen_ids.add(eid)
-            merged.append(eq)
-        # created_at'e göre yeniden eskiye sırala
-        merged.sort(key=lambda x: float(x.get('created_at') or x.get('timestamp') or 0), reverse=True)
-        data = merged
-        if not data and api_cache['data']:
-            print("[CACHE] API boş döndü, önbellek kullanılıyor")
-            return api_cache['data']
-        print(f"[API] Live: {len(live_data)}, Archive: {len(archive_data)}, Birleşik: {len(data)} deprem")
-    else:
-        data = _fetch_from_url(url, max_retries, timeout)
-        if not data and api_cache['data']:
-            print("[CACHE] API boş döndü, önbellek kullanılıyor")
-            return api_cache['data']
+    data = _fetch_from_url(url, max_retries, timeout)
+    if not data and api_cache['data']:
+        print("[CACHE] API boş döndü, önbellek kullanılıyor")
+        return api_cache['data']
 
     # Her deprem kaydına parse edilmiş timestamp ekle (tarih/saat alanlarından)
     for eq in data:
@@ -298,12 +226,24 @@ USE_META_WHATSAPP = bool(META_WHATSAPP_ACCESS_TOKEN and META_WHATSAPP_PHONE_NUMB
 USER_DATA_FILE = 'user_alerts.json'
 last_big_earthquake = {'mag': 0, 'time': 0}
 
+# Dosyanın en son okunan / yazılan mtime'ı: izleme döngüsü sadece dışarıdan değişirse yeniden okur
+_user_alerts_mtime = {'value': None}
+
+def _user_alerts_file_mtime():
+    try:
+        return os.stat(USER_DATA_FILE).st_mtime_ns
+    except OSError:
+        return None
+
 def load_user_alerts():
     """ Kullanıcı konum bilgilerini JSON dosyasından yükler. """
     try:
         if os.path.exists(USER_DATA_FILE):
+            mtime = _user_alerts_file_mtime()
             with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
+            _user_alerts_mtime['value'] = mtime
+            return data
     except Exception as e:
         print(f"Kullanıcı verileri yüklenirken hata: {e}")
     return {}
@@ -313,6 +253,7 @@ def save_user_alerts(user_alerts):
     try:
         with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
             json.dump(user_alerts, f, ensure_ascii=False, indent=2)
+        _user_alerts_mtime['value'] = _user_alerts_file_mtime()
     except Exception as e:
         print(f"Kullanıcı verileri kaydedilirken hata: {e}")
 
@@ -668,6 +609,21 @@ TURKEY_CITIES = {
     "Karaman": {"lat": 37.1811, "lon": 33.2150, "building_structure": {"reinforced": 0.20, "normal": 0.55, "weak": 0.25}}
 } 
 
+# Abone uzamsal indeksi (en yakın il + enlem/boylam ızgarası); set-alert uç noktaları artımlı günceller
+subscribers = subscriber_index.build_index(TURKEY_CITIES, user_alerts)
+
+
+def refresh_subscribers_if_changed():
+    """user_alerts.json dışarıdan değiştiyse (başka worker / elle düzenleme) indeksi dosyayla eşitler."""
+    global user_alerts
+    mtime = _user_alerts_file_mtime()
+    if mtime is None or mtime == _user_alerts_mtime['value']:
+        return False
+    user_alerts = load_user_alerts()
+    updated, removed = subscriber_index.sync(subscribers, user_alerts)
+    print(f"[SUBSCRIBERS] user_alerts.json değişti: {updated} güncellendi, {removed} silindi")
+    return True
+
 
 # --- YARDIMCI FONKSİYONLAR ---
 
@@ -704,8 +660,9 @@ def send_whatsapp_via_meta_api(recipient_number, body, location_url=None):
             "Content-Type": "application/json"
         }
         
-        # API çağrısı
-        response = requests.post(
+        # API çağrısı (havuzlu Session, hız limiti, 429/5xx tekrar denemesi)
+        response = notification_dispatcher.post(
+            'meta',
             META_WHATSAPP_API_URL,
             headers=headers,
             json=payload,
@@ -747,8 +704,6 @@ def send_sms_via_twilio(recipient_number, body):
         return False, "Twilio SMS ayarları yapılmamış"
     
     try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        
         # Numara formatını düzelt
         if not recipient_number.startswith('+'):
             recipient_number = '+' + recipient_number.lstrip('0')
@@ -757,12 +712,16 @@ def send_sms_via_twilio(recipient_number, body):
         # Burada Twilio'nun SMS numarasını kullanmanız gerekir (TWILIO_SMS_FROM_NUMBER)
         # Şimdilik Twilio WhatsApp numarasını kullanıyoruz (test için)
         
-        message = client.messages.create(
-            body=body,
-            from_=TWILIO_WHATSAPP_NUMBER.replace('whatsapp:', ''),  # SMS için whatsapp: prefix'i kaldır
-            to=recipient_number
+        ok, message = notification_dispatcher.twilio_send(
+            TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+            (TWILIO_WHATSAPP_NUMBER or '').replace('whatsapp:', ''),  # SMS için whatsapp: prefix'i kaldır
+            recipient_number, body
         )
-        print(f"[OK] SMS gönderildi: {recipient_number}, SID: {message.sid}")
+        if not ok:
+            error_msg = message.get('message', f"HTTP {message['status_code']}")
+            print(f"[ERROR] SMS gönderme hatası: {error_msg}")
+            return False, error_msg
+        print(f"[OK] SMS gönderildi: {recipient_number}, SID: {message.get('sid')}")
         return True, None
     except Exception as e:
         error_msg = str(e)
@@ -815,9 +774,6 @@ def send_whatsapp_notification(recipient_number, body, location_url=None):
         print(f"[INFO] Twilio WhatsApp Production modu aktif. Tüm numaralara mesaj gönderilebilir.")
     
     try:
-        # Client, Ortam Değişkenlerinden alınan SID ve Token ile başlatılır
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        
         # Numara formatını düzelt (ülke kodu ile başlamalı)
         if not recipient_number.startswith('+'):
             recipient_number = '+' + recipient_number.lstrip('0')
@@ -828,17 +784,16 @@ def send_whatsapp_notification(recipient_number, body, location_url=None):
         if location_url:
             body += f"\n\nKonum: {location_url}"
         
-        message = client.messages.create(
-            from_=TWILIO_WHATSAPP_NUMBER,
-            body=body,
-            to=whatsapp_number
+        ok, message = notification_dispatcher.twilio_send(
+            TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_NUMBER, whatsapp_number, body
         )
-        print(f"[OK] WhatsApp bildirimi gonderildi. SID: {message.sid}")
-        return True, None
-    except TwilioRestException as e:
-        error_msg = str(e)
-        error_code = e.code if hasattr(e, 'code') else None
-        status_code = e.status if hasattr(e, 'status') else None
+        if ok:
+            print(f"[OK] WhatsApp bildirimi gonderildi. SID: {message.get('sid')}")
+            return True, None
+        
+        error_msg = message.get('message', f"HTTP {message['status_code']}")
+        error_code = message.get('code')
+        status_code = message['status_code']
         
         print(f"[ERROR] Twilio hatası: {error_msg} (Code: {error_code}, Status: {status_code})")
         
@@ -1309,59 +1264,95 @@ def detect_anomalies(earthquakes, target_lat, target_lon):
     if features is None:
         return {"anomaly_detected": False, "anomaly_score": 0.0}
     
-    # Anomali skorları
-    anomaly_scores = []
-    
-    # 1. Aktivite yoğunluğu anomalisi
-    if features.get('count', 0) > 20:
-        anomaly_scores.append(0.3)
-    
-    # 2. Büyüklük anomalisi
-    if features.get('max_magnitude', 0) >= 5.0:
-        anomaly_scores.append(0.4)
-    
-    # 3. Mesafe anomalisi (çok yakın depremler)
-    if features.get('min_distance', 300) < 20:
-        anomaly_scores.append(0.5)
-    
-    # 4. Zaman aralığı anomalisi (çok sık depremler)
-    if features.get('min_interval', 3600) < 300:  # 5 dakikadan az
-        anomaly_scores.append(0.3)
-    
-    # 5. Büyüklük trendi anomalisi
-    if features.get('magnitude_trend', 0) > 0.5:
-        anomaly_scores.append(0.4)
-    
-    # 6. Isolation Forest ile anomali tespiti (30 feature ile eğitilmiş model)
-    try:
-        from train_models import build_feature_vector_for_prediction
-        feature_vector = build_feature_vector_for_prediction(features)
-    except Exception:
-        feature_vector = None
+    return detect_anomalies_many([features])[0]
 
+def detect_anomalies_many(features_list):
+    """
+    Hazır feature sözlükleri için anomali sonuçları (detect_anomalies ile aynı kurallar).
+    Isolation Forest bir kez yüklenir ve tüm hedefler için tek predict çağrısı yapılır.
+    Vektörü oluşturulamayan / tahmini başarısız olan satırlar tek tek Isolation Forest'sız
+    değerlendirilir (bir hatalı il diğer illerin bayrağını kapatmaz) ve loglanır.
+    """
+    if not features_list:
+        return []
+    
+    # Isolation Forest ile anomali tespiti (30 feature ile eğitilmiş model)
+    isolation_flags = [False] * len(features_list)
     isolation_model = load_latest_anomaly_model()
-    if isolation_model is not None and feature_vector is not None:
+    if isolation_model is not None:
+        rows, vectors, failed = [], [], []
         try:
-            anomaly_pred = isolation_model.predict(feature_vector)[0]
-            if anomaly_pred == -1:
-                anomaly_scores.append(0.6)
-        except Exception:
-            pass
-    
-    total_anomaly_score = min(1.0, sum(anomaly_scores))
-    anomaly_detected = total_anomaly_score > 0.5
+            from train_models import build_feature_vector_for_prediction
+        except Exception as e:
+            logger.warning("[ANOMALY] Feature vektörü oluşturucu yüklenemedi: %s", e)
+            build_feature_vector_for_prediction = None
+        if build_feature_vector_for_prediction is not None:
+            for i, features in enumerate(features_list):
+                try:
+                    vectors.append(np.asarray(build_feature_vector_for_prediction(features),
+                                              dtype=np.float64).reshape(1, -1))
+                    rows.append(i)
+                except Exception as e:
+                    failed.append((i, e))
+        if vectors:
+            try:
+                for i, p in zip(rows, isolation_model.predict(np.vstack(vectors))):
+                    isolation_flags[i] = p == -1
+            except Exception:
+                # Toplu tahmin başarısız: satır satır (sadece hatalı satırlar Isolation Forest'sız kalır)
+                for i, vector in zip(rows, vectors):
+                    try:
+                        isolation_flags[i] = isolation_model.predict(vector)[0] == -1
+                    except Exception as e:
+                        failed.append((i, e))
+        if failed:
+            logger.warning("[ANOMALY] %d/%d hedef Isolation Forest'sız değerlendirildi (ilk hata, satır %d: %s)",
+                           len(failed), len(features_list), failed[0][0], failed[0][1])
     
-    return {
-        "anomaly_detected": anomaly_detected,
-        "anomaly_score": round(total_anomaly_score, 2),
-        "anomaly_factors": {
-            "high_activity": features.get('count', 0) > 20,
-            "high_magnitude": features.get('max_magnitude', 0) >= 5.0,
-            "very_close": features.get('min_distance', 300) < 20,
-            "frequent": features.get('min_interval', 3600) < 300,
-            "increasing_trend": features.get('magnitude_trend', 0) > 0.5
-        }
-    }
+    results = []
+    for features, isolation_anomaly in zip(features_list, isolation_flags):
+        # Anomali skorları
+        anomaly_scores = []
+        
+        # 1. Aktivite yoğunluğu anomalisi
+        if features.get('count', 0) > 20:
+            anomaly_scores.append(0.3)
+        
+        # 2. Büyüklük anomalisi
+        if features.get('max_magnitude', 0) >= 5.0:
+            anomaly_scores.append(0.4)
+        
+        # 3. Mesafe anomalisi (çok yakın depremler)
+        if features.get('min_distance', 300) < 20:
+            anomaly_scores.append(0.5)
+        
+        # 4. Zaman aralığı anomalisi (çok sık depremler)
+        if features.get('min_interval', 3600) < 300:  # 5 dakikadan az
+            anomaly_scores.append(0.3)
+        
+        # 5. Büyüklük trendi anomalisi
+        if features.get('magnitude_trend', 0) > 0.5:
+            anomaly_scores.append(0.4)
+        
+        # 6. Isolation Forest
+        if isolation_anomaly:
+            anomaly_scores.append(0.6)
+        
+        total_anomaly_score = min(1.0, sum(anomaly_scores))
+        anomaly_detected = total_anomaly_score > 0.5
+        
+        results.append({
+            "anomaly_detected": anomaly_detected,
+            "anomaly_score": round(total_anomaly_score, 2),
+            "anomaly_factors": {
+                "high_activity": features.get('count', 0) > 20,
+                "high_magnitude": features.get('max_magnitude', 0) >= 5.0,
+                "very_close": features.get('min_distance', 300) < 20,
+                "frequent": features.get('min_interval', 3600) < 300,
+                "increasing_trend": features.get('magnitude_trend', 0) > 0.5
+            }
+        })
+    return results
 
 def istanbul_early_warning_system(earthquakes):
     """
@@ -1511,60 +1502,83 @@ def find_nearest_city(lat, lon):
     
     return nearest_city, min_distance
 
-def turkey_early_warning_system(earthquakes, target_city=None):
+def _warning_event_arrays(earthquakes):
+    """Koordinatlı depremler için (lats, lons, timestamps) dizileri; timestamp yoksa 0."""
+    lats, lons, timestamps = [], [], []
+    for eq in earthquakes or []:
+        if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
+            continue
+        lon, lat = eq['geojson']['coordinates']
+        lats.append(lat)
+        lons.append(lon)
+        timestamps.append(get_eq_timestamp(eq) or 0.0)
+    return (np.array(lats, dtype=np.float64), np.array(lons, dtype=np.float64),
+            np.array(timestamps, dtype=np.float64))
+
+def _feature_neighbor_cities(city_name):
+    """extract_features'ın neighbor_activity için saydığı iller (ilin en yakın feature ilinin komşuları)."""
+    closest, distance = _feature_nearest_city(TURKEY_CITIES[city_name]['lat'], TURKEY_CITIES[city_name]['lon'])
+    return CITY_NEIGHBORS.get(closest, []) if closest and distance < 200 else []
+
+def turkey_early_warning_system(earthquakes, target_city=None, live=None, only_cities=None, cache_key=None):
     """
     Tüm Türkiye için erken uyarı sistemi.
     M ≥ 5.0 olabilecek yıkıcı depremlerden önce bildirim gönderir.
-    Render 30sn limiti için: Sadece deprem olan illeri analiz et, max 25 il.
+    Her döngüde tüm iller analiz edilir: il × deprem mesafe matrisi bir kez kurulur, 200 km ve
+    son 7 gün / 24 saat maskeleriyle il sayıları çıkarılır; feature'lar extract_features_many ile tüm
+    iller için tek geçişte, anomali modeli tek predict çağrısıyla hesaplanır.
+    live: live_state durumu verilirse (canlı izleme döngüsü) il sayıları tamponlardan okunur ve
+    feature'lar tüm yük yerine aktif illerle komşularının tampon depremleri (300 km, 168 saat) üzerinden
+    hesaplanır; maliyet yük boyutuyla değil il aktivitesiyle ölçeklenir. Tampon, extract_features'ın
+    300 km seçimini ve komşu il sayılarını tam kapsar; tek fark, 300 km içinde hiç M≥1.0 deprem olmayan
+    ilin "penceredeki tüm depremler" yedeğinin tüm Türkiye yerine bu tamponlarla sınırlı olmasıdır.
+    only_cities: sadece bu illeri yeniden değerlendir.
+    cache_key: earthquakes değişmemiş bir snapshot listesiyse ('snapshot', sürüm); dizi önbelleği anahtarı.
     """
     warnings = {}
+    current_time = time.time()
+    day_ago = current_time - 86400
+    week_ago = current_time - 168 * 3600
     
-    # Önce hangi illerde deprem var belirle (200km içinde)
-    city_eq_counts = {}
-    for city_name, city_data in TURKEY_CITIES.items():
-        city_lat, city_lon = city_data['lat'], city_data['lon']
-        count = sum(1 for eq in earthquakes if eq.get('geojson') and eq['geojson'].get('coordinates') 
-                    and haversine(city_lat, city_lon, eq['geojson']['coordinates'][1], eq['geojson']['coordinates'][0]) <= 200)
-        if count > 0:
-            city_eq_counts[city_name] = count
+    # İl başına 200 km içindeki deprem sayısı: son 7 gün (sıralama) ve son 24 saat
+    if live is not None:
+        city_eq_counts = live_state.city_counts(live, 168)
+        city_day_counts = live_state.city_counts(live, 24)
+    else:
+        lats, lons, timestamps = _warning_event_arrays(earthquakes)
+        names = list(TURKEY_CITIES)
+        city_lats = np.array([TURKEY_CITIES[c]['lat'] for c in names], dtype=np.float64)
+        city_lons = np.array([TURKEY_CITIES[c]['lon'] for c in names], dtype=np.float64)
+        near = haversine_vectorized(city_lats[:, None], city_lons[:, None], lats, lons) <= 200
+        last_week = (timestamps > 0) & (timestamps >= week_ago)
+        last_day = (timestamps > 0) & (timestamps >= day_ago)
+        city_eq_counts = dict(zip(names, (near & last_week).sum(axis=1).tolist()))
+        city_day_counts = dict(zip(names, (near & last_day).sum(axis=1).tolist()))
     
-    # En çok deprem olan max 25 ili al (Render 30sn limiti)
+    # Tüm iller; en çok deprem olan iller önce
     cities_to_analyze = [target_city] if target_city and target_city in TURKEY_CITIES else \
-        sorted(city_eq_counts.keys(), key=lambda c: city_eq_counts[c], reverse=True)[:25]
+        sorted(TURKEY_CITIES, key=lambda c: city_eq_counts.get(c, 0), reverse=True)
+    
+    if only_cities is not None:
+        cities_to_analyze = [c for c in cities_to_analyze if c in only_cities]
     
-    # Hiç deprem yoksa büyük illeri analiz et
-    if not cities_to_analyze:
-        cities_to_analyze = ['İstanbul', 'Ankara', 'İzmir', 'Bursa', 'Kocaeli', 'Antalya', 'Adana', 'Gaziantep'][:8]
+    # Son 24 saatte 200 km içinde depremi olan iller için feature + anomali (tek toplu geçiş)
+    active = [c for c in cities_to_analyze if city_day_counts.get(c, 0) > 0]
+    feature_events, ref_time = earthquakes, None
+    if live is not None and active:
+        feature_events = live_state.city_events(
+            live, active + [n for c in active for n in _feature_neighbor_cities(c)], 168)
+        ref_time, cache_key = live['now'], None
+    features_list = extract_features_many(
+        feature_events, [TURKEY_CITIES[c]['lat'] for c in active], [TURKEY_CITIES[c]['lon'] for c in active],
+        time_window_hours=168, ref_time=ref_time, cache_key=cache_key
+    ) if active else []
+    active_features = {c: f for c, f in zip(active, features_list) if f is not None}
+    active_anomalies = dict(zip(active_features, detect_anomalies_many(list(active_features.values()))))
     
     for city_name in cities_to_analyze:
-        city_data = TURKEY_CITIES[city_name]
-        city_lat = city_data['lat']
-        city_lon = city_data['lon']
-        
-        # Şehir çevresindeki depremleri filtrele (200 km yarıçap, sadece son 24 saat)
-        current_time = time.time()
-        day_ago = current_time - 86400
-        city_earthquakes = []
-        for eq in earthquakes:
-            if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
-                continue
-            eq_ts = get_eq_timestamp(eq)
-            if not eq_ts:
-                continue
-            lon, lat = eq['geojson']['coordinates']
-            distance = haversine(city_lat, city_lon, lat, lon)
-            if distance <= 200 and eq_ts >= day_ago:
-                city_earthquakes.append({
-                    'mag': eq.get('mag', 0),
-                    'distance': distance,
-                    'depth': eq.get('depth', 10),
-                    'lat': lat,
-                    'lon': lon,
-                    'timestamp': eq_ts,
-                    'location': eq.get('location', '')
-                })
-        
-        if len(city_earthquakes) == 0:
+        recent_earthquakes = city_day_counts.get(city_name, 0)
+        if recent_earthquakes == 0:
             warnings[city_name] = {
                 "alert_level": "Normal",
                 "alert_score": 0.0,
@@ -1575,7 +1589,7 @@ def turkey_early_warning_system(earthquakes, target_city=None):
             continue
         
         # Özellik çıkarımı (son 7 gün)
-        features = extract_features(earthquakes, city_lat, city_lon, time_window_hours=168)
+        features = active_features.get(city_name)
         
         if features is None:
             warnings[city_name] = {
@@ -1638,7 +1652,7 @@ def turkey_early_warning_system(earthquakes, target_city=None):
             warning_messages.append("Çok sık deprem aktivitesi (swarm) tespit edildi")
         
         # 6. Anomali tespiti
-        anomaly_result = detect_anomalies(earthquakes, city_lat, city_lon)
+        anomaly_result = active_anomalies[city_name]
         if anomaly_result['anomaly_detected']:
             warning_scores.append(0.6)
             warning_messages.append("Olağandışı deprem aktivitesi tespit edildi")
@@ -1678,7 +1692,7 @@ def turkey_early_warning_system(earthquakes, target_city=None):
             "time_to_event": time_to_event,
             "predicted_magnitude": round(predicted_magnitude, 1) if predicted_magnitude > 0 else None,
             "features": features,
-            "recent_earthquakes": len(city_earthquakes),
+            "recent_earthquakes": recent_earthquakes,
             "anomaly_detected": anomaly_result['anomaly_detected']
         }
     
@@ -2021,7 +2035,37 @@ def predict_earthquake_risk(earthquakes, target_lat, target_lon):
 
 # --- API UÇ NOKTALARI ---
 
+def _snapshot_etag():
+    return (current_snapshot()['version'],)
+
+
+def _snapshot_ready():
+    """İlk fetch'ten önceki boş görüntü (v0) yanıtları tarayıcı / proxy'de cache'lenmez."""
+    return current_snapshot()['version'] > 0
+
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def _turkey_warning_cache_fresh(version):
+    """Cache sadece aynı görüntü sürümünde hesaplandıysa (ve süresi dolmadıysa) tazedir."""
+    cache = turkey_warning_cache
+    return (bool(cache['data']) and cache['version'] == version
+            and (time.time() - cache['timestamp']) < cache['cache_duration'])
+
+
+def _forecast_map_etag():
+    return (current_snapshot()['version'], _file_version(os.path.join(MODEL_DIR, "forecast_latest.pkl")),
+            bool(_ml_models_cache.get('models')))
+
+
 @app.route('/api/risk', methods=['GET'])
+@conditional_get(_snapshot_etag, max_age=lambda: api_cache['cache_duration'], cacheable=_snapshot_ready)
 def get_risk_analysis():
     """ Ön uçtan gelen isteklere YZ analiz sonuçlarını döndürür. """
     
@@ -2244,9 +2288,8 @@ def train_models():
         }), 400
     except ImportError:
         # Fallback: eski train_risk_prediction_model
-        if os.path.exists(EARTHQUAKE_HISTORY_FILE):
-            with open(EARTHQUAKE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
+        if dataset_exists(EARTHQUAKE_HISTORY_FILE):
+            history = load_dataset(EARTHQUAKE_HISTORY_FILE)
             models = train_risk_prediction_model(history)
             if models:
                 return jsonify({"status": "success", "message": "Modeller eğitildi.", "models_trained": list(models.keys())})
@@ -2258,7 +2301,7 @@ def train_models():
 def dataset_count():
     """ Eğitimde kullanılan veri seti sayısını döndürür. """
     try:
-        if not os.path.exists(EARTHQUAKE_HISTORY_FILE):
+        if not dataset_exists(EARTHQUAKE_HISTORY_FILE):
             return jsonify({
                 "total_records": 0,
                 "city_based_records": 0,
@@ -2266,8 +2309,7 @@ def dataset_count():
                 "message": "Henüz veri seti oluşturulmamış."
             })
         
-        with open(EARTHQUAKE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+        history = load_dataset(EARTHQUAKE_HISTORY_FILE)
         
         if not history:
             return jsonify({
@@ -2320,12 +2362,17 @@ def ml_metrics():
         logger.exception("[API] ml-metrics hatası: %s", e)
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/notification-metrics', methods=['GET'])
+def notification_metrics():
+    """ Bildirim kuyruğu ve sağlayıcı (Meta / Twilio) gönderim metrikleri. """
+    return jsonify({"status": "success", "metrics": notification_dispatcher.notification_metrics()})
+
 @app.route('/api/dataset-info', methods=['GET'])
 def dataset_info():
     """ Eğitimde kullanılan güncel veri seti bilgilerini döndürür. """
     try:
         # Veri seti dosyasını kontrol et
-        if not os.path.exists(EARTHQUAKE_HISTORY_FILE):
+        if not dataset_exists(EARTHQUAKE_HISTORY_FILE):
             return jsonify({
                 "status": "no_data",
                 "message": "Henüz veri seti oluşturulmamış.",
@@ -2337,13 +2384,12 @@ def dataset_info():
                 "statistics": {}
             })
         
-        # Dosya bilgileri
-        file_size = os.path.getsize(EARTHQUAKE_HISTORY_FILE)
-        file_size_kb = round(file_size / 1024, 2)
+        # Veri setini yükle (eski JSON varsa önce depoya aktarılır)
+        history = load_dataset(EARTHQUAKE_HISTORY_FILE)
         
-        # Veri setini yükle
-        with open(EARTHQUAKE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+        # Depo boyutu
+        file_size = get_dataset_size_bytes(EARTHQUAKE_HISTORY_FILE)
+        file_size_kb = round(file_size / 1024, 2)
         
         if not history or len(history) == 0:
             return jsonify({
@@ -2491,24 +2537,22 @@ def health_check():
     return jsonify({"status": "ok", "message": "Server is awake"}), 200
 
 @app.route('/api/turkey-early-warning', methods=['GET'])
+@conditional_get(_snapshot_etag, max_age=lambda: turkey_warning_cache['cache_duration'], cacheable=_snapshot_ready)
 def turkey_early_warning():
     """ Tüm Türkiye için erken uyarı sistemi - M ≥ 5.0 deprem riski tahmini """
     global turkey_warning_cache
     try:
-        # Cache kontrolü (Render 30sn limiti - ağır işlemler)
-        now = time.time()
-        if turkey_warning_cache['data'] and (now - turkey_warning_cache['timestamp']) < turkey_warning_cache['cache_duration']:
+        # Cache kontrolü (Render 30sn limiti - ağır işlemler): sonuç ve veri aynı görüntüden
+        snapshot = current_snapshot()
+        snapshot_version = snapshot['version']
+        if _turkey_warning_cache_fresh(snapshot_version):
             return jsonify(turkey_warning_cache['data'])
-        try:
-            earthquake_data = fetch_earthquake_data_with_retry(KANDILLI_API, max_retries=2, timeout=60)
-            if not earthquake_data:
-                earthquake_data = []
-        except Exception as e:
-            print(f"[WARNING] API'den veri çekilemedi: {e}")
-            earthquake_data = []
+        earthquake_data = list(snapshot['raw'])
         
         try:
-            warnings = turkey_early_warning_system(earthquake_data)
+            warnings = turkey_early_warning_system(
+                earthquake_data, cache_key=('snapshot', snapshot_version) if snapshot_version else None
+            )
             
             # Sadece uyarı veren şehirleri filtrele
             active_warnings = {city: data for city, data in warnings.items() 
@@ -2521,8 +2565,10 @@ def turkey_early_warning():
                 "warnings": warnings,
                 "active_warnings": active_warnings
             }
-            turkey_warning_cache['data'] = result
-            turkey_warning_cache['timestamp'] = time.time()
+            if snapshot_version > 0:  # ilk fetch'ten önceki boş görüntü (v0) cache'lenmez
+                turkey_warning_cache['data'] = result
+                turkey_warning_cache['timestamp'] = time.time()
+                turkey_warning_cache['version'] = snapshot_version
             return jsonify(result)
         except Exception as e:
             print(f"[ERROR] Türkiye erken uyarı sistemi hatası: {e}")
@@ -2546,44 +2592,15 @@ def turkey_early_warning():
 # LEGACY: yalnızca forecast endpoint başarısızsa fallback amaçlı kullanılmalı
 @app.route('/api/prediction-map', methods=['GET'])
 def prediction_map():
-    """Legacy risk haritası: son 48 saatlik aktiviteye dayalı heuristik il risk görünümü."""
+    """
+    Legacy risk haritası: son 48 saatlik aktiviteye dayalı heuristik il risk görünümü.
+    ?format=columnar|binary veya Accept ile kompakt yanıt; gövde görüntü sürümüyle cache'lenir.
+    """
     try:
-        earthquakes = fetch_earthquake_data_with_retry(KANDILLI_API)
-
-        prediction_points = []
-        for city, coords in TURKEY_CITIES.items():
-            risk, anomaly, count, features = calculate_city_risk(
-                coords["lat"],
-                coords["lon"],
-                earthquakes,
-            )
-            risk_percent = min(100, int(risk * 100))
-            level = "Normal"
-            if risk_percent >= 70:
-                level = "Yüksek"
-            elif risk_percent >= 40:
-                level = "Orta"
-
-            prediction_points.append({
-                "city": city,
-                "lat": coords["lat"],
-                "lon": coords["lon"],
-                "risk_percent": risk_percent,
-                "probability": risk_percent,  # geri uyumluluk
-                "alert_level": level,
-                "analysis_window": "Son 48 saat",
-                "recent_earthquakes": count,
-                "anomaly_detected": anomaly,
-                "max_magnitude": round(features.get("max_magnitude", 0), 2) if features else 0,
-                "min_distance": round(features.get("min_distance", 300), 1) if features else 300,
-            })
-
-        return jsonify({
-            "status": "success",
-            "model_type": "legacy_heuristic_risk",
-            "prediction_points": prediction_points,
-            "generated_at": datetime.utcnow().isoformat() + "Z",
-        })
+        snap = current_snapshot()
+        return encoded_response('prediction-map', snap['version'],
+                                lambda: _prediction_map_payload(list(snap['raw'])),
+                                table_paths=('prediction_points',))
     except Exception as e:
         logger.exception("[API] prediction-map hatası: %s", e)
         return jsonify({
@@ -2593,7 +2610,45 @@ def prediction_map():
         }), 500
 
 
+def _prediction_map_payload(earthquakes):
+    prediction_points = []
+    for city, coords in TURKEY_CITIES.items():
+        risk, anomaly, count, features = calculate_city_risk(
+            coords["lat"],
+            coords["lon"],
+            earthquakes,
+        )
+        risk_percent = min(100, int(risk * 100))
+        level = "Normal"
+        if risk_percent >= 70:
+            level = "Yüksek"
+        elif risk_percent >= 40:
+            level = "Orta"
+
+        prediction_points.append({
+            "city": city,
+            "lat": coords["lat"],
+            "lon": coords["lon"],
+            "risk_percent": risk_percent,
+            "probability": risk_percent,  # geri uyumluluk
+            "alert_level": level,
+            "analysis_window": "Son 48 saat",
+            "recent_earthquakes": count,
+            "anomaly_detected": anomaly,
+            "max_magnitude": round(features.get("max_magnitude", 0), 2) if features else 0,
+            "min_distance": round(features.get("min_distance", 300), 1) if features else 300,
+        })
+
+    return {
+        "status": "success",
+        "model_type": "legacy_heuristic_risk",
+        "prediction_points": prediction_points,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+    }
+
+
 @app.route("/api/forecast-map", methods=["GET"])
+@conditional_get(_forecast_map_etag, max_age=lambda: api_cache['cache_duration'], cacheable=_snapshot_ready)
 def forecast_map():
     """Olasılıksal forecast modeli ile il bazlı tahmin haritası (24h/72h/7g)."""
     try:
@@ -3149,15 +3204,13 @@ def chatbot():
             if special_type == 'dataset_info':
                 # Veri seti bilgilerini al
                 try:
-                    if not os.path.exists(EARTHQUAKE_HISTORY_FILE):
+                    if not dataset_exists(EARTHQUAKE_HISTORY_FILE):
                         response_text = '📊 VERİ SETİ DURUMU:\n\n❌ Henüz veri seti oluşturulmamış.\n\n💡 Sistem otomatik olarak her 30 dakikada bir veri toplamaya başladığında burada görünecek.'
                     else:
-                        file_size = os.path.getsize(EARTHQUAKE_HISTORY_FILE)
+                        history = load_dataset(EARTHQUAKE_HISTORY_FILE)
+                        file_size = get_dataset_size_bytes(EARTHQUAKE_HISTORY_FILE)
                         file_size_kb = round(file_size / 1024, 2)
                         
-                        with open(EARTHQUAKE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                            history = json.load(f)
-                        
                         if not history or len(history) == 0:
                             response_text = '📊 VERİ SETİ DURUMU:\n\n⚠️ Veri seti boş.\n\n💡 Sistem otomatik olarak veri toplamaya devam ediyor.'
                         else:
@@ -3641,6 +3694,7 @@ def set_alert_settings():
             'lon': lon,
             'registered_at': datetime.now().isoformat()
         }
+        subscriber_index.upsert(subscribers, number, user_alerts[number])
         save_user_alerts(user_alerts)
         
         print(f"Yeni WhatsApp Bildirim Ayarı Kaydedildi: {number} @ ({lat:.2f}, {lon:.2f})")
@@ -3708,6 +3762,7 @@ def set_istanbul_alert():
             'registered_at': datetime.now().isoformat(),
             'istanbul_alert': True  # İstanbul erken uyarı için özel işaret
         }
+        subscriber_index.upsert(subscribers, number, user_alerts[number])
         save_user_alerts(user_alerts)
         
         print(f"İstanbul Erken Uyarı Bildirimi Kaydedildi: {number} @ ({istanbul_lat:.2f}, {istanbul_lon:.2f})")
@@ -3826,13 +3881,33 @@ def collect_training_data_continuously():
             traceback.print_exc()
             continue
 
+# Canlı izleme: yoklama aralığı ve tüm illerin baştan değerlendirilme periyodu (saniye)
+ALERT_POLL_INTERVAL_SEC = float(os.environ.get('ALERT_POLL_INTERVAL_SEC', '30'))
+LIVE_FULL_REFRESH_SEC = float(os.environ.get('LIVE_FULL_REFRESH_SEC', '300'))
+
+
+def _alert_sent_callback(sent_times, alert_key, label, number):
+    """Dispatcher geri çağırması: sonucu loglar; başarısızsa spam kilidi kaldırılır (sonraki döngüde tekrar)."""
+    def _done(success, error):
+        if success:
+            print(f"✅ {label} bildirimi gönderildi: {number}")
+            return
+        print(f"[ERROR] {label} bildirimi gönderilemedi ({number}): {error}")
+        if sent_times is not None:
+            sent_times.pop(alert_key, None)
+    return _done
+
 def check_for_big_earthquakes():
     """ Arka planda sürekli çalışır, M >= 5.0 deprem olup olmadığını kontrol eder. """
-    global last_big_earthquake, user_alerts
+    global last_big_earthquake
     last_istanbul_alert_time = {}  # Her kullanıcı için son bildirim zamanı (spam önleme)
+    # İl bazlı artımlı durum: her yoklamada sadece yeni depremler işlenir, sadece değişen iller
+    # yeniden değerlendirilir; LIVE_FULL_REFRESH_SEC'de bir tüm iller baştan değerlendirilir.
+    live = live_state.new_state(TURKEY_CITIES)
+    last_full_eval = 0.0
     
     while True:
-        time.sleep(30)  # 30 saniyede bir kontrol et (daha hızlı tepki)
+        time.sleep(ALERT_POLL_INTERVAL_SEC)
 
         try:
             earthquakes = fetch_earthquake_data_with_retry(KANDILLI_API, max_retries=1, timeout=30)
@@ -3841,9 +3916,23 @@ def check_for_big_earthquakes():
         except Exception:
             continue
         
+        changed_cities = live_state.update_state(live, earthquakes)
+        try:
+            refresh_subscribers_if_changed()
+        except Exception as e:
+            print(f"[SUBSCRIBERS] Abone dosyası eşitleme hatası: {e}")
+        full_eval = time.time() - last_full_eval >= LIVE_FULL_REFRESH_SEC
+        if full_eval:
+            last_full_eval = time.time()
+        
         # TÜM TÜRKİYE İÇİN ERKEN UYARI KONTROLÜ (M ≥ 5.0 deprem riski)
         try:
-            turkey_warnings = turkey_early_warning_system(earthquakes)
+            if full_eval or changed_cities:
+                turkey_warnings = turkey_early_warning_system(
+                    earthquakes, live=live, only_cities=None if full_eval else changed_cities
+                )
+            else:
+                turkey_warnings = {}
             
             # Her şehir için kontrol et
             for city_name, warning_data in turkey_warnings.items():
@@ -3854,94 +3943,30 @@ def check_for_big_earthquakes():
                 if alert_level in ['KRİTİK', 'YÜKSEK', 'ORTA'] and predicted_mag >= 5.0:
                     print(f"🚨 {city_name} ERKEN UYARI: {alert_level} - Tahmini M{predicted_mag:.1f} - {warning_data.get('time_to_event', '')}")
                     
-                    # Kullanıcı verilerini tekrar yükle
-                    user_alerts = load_user_alerts()
-                    
-                    # Bu şehir için kayıtlı kullanıcılara bildirim gönder
-                    for number, coords in user_alerts.items():
-                        city, _ = find_nearest_city(coords['lat'], coords['lon'])
-                        
-                        if city == city_name:
-                            # Spam önleme
-                            alert_key = f"{number}_{city_name}_{alert_level}"
-                            current_time = time.time()
-                            
-                            if alert_key in last_istanbul_alert_time:
-                                time_since_last = current_time - last_istanbul_alert_time[alert_key]
-                                if time_since_last < 3600:  # 1 saat
-                                    continue
-                            
-                            # Bildirim gönder
-                            body = f"🚨 {city_name.upper()} ERKEN UYARI SİSTEMİ 🚨\n\n"
-                            body += f"⚠️ M ≥ 5.0 DEPREM RİSKİ TESPİT EDİLDİ ⚠️\n\n"
-                            body += f"Şehir: {city_name}\n"
-                            body += f"Uyarı Seviyesi: {alert_level}\n"
-                            body += f"Uyarı Skoru: {warning_data.get('alert_score', 0):.2f}/1.0\n"
-                            body += f"Tahmini Büyüklük: M{predicted_mag:.1f}\n"
-                            body += f"Tahmini Süre: {warning_data.get('time_to_event', 'Bilinmiyor')}\n"
-                            body += f"Mesaj: {warning_data.get('message', 'Anormal aktivite tespit edildi')}\n"
-                            
-                            body += f"\n📊 DETAYLAR:\n"
-                            body += f"• Son deprem sayısı: {warning_data.get('recent_earthquakes', 0)}\n"
-                            body += f"• Anomali tespit edildi: {'Evet' if warning_data.get('anomaly_detected') else 'Hayır'}\n"
-                            
-                            body += f"\n⚠️ LÜTFEN HAZIRLIKLI OLUN:\n"
-                            body += f"• Acil durum çantanızı hazırlayın\n"
-                            body += f"• Güvenli yerleri belirleyin\n"
-                            body += f"• Aile acil durum planınızı gözden geçirin\n"
-                            body += f"• Sakin kalın ve hazırlıklı olun"
-                            
-                            send_success, send_error = send_whatsapp_notification(number, body)
-                            if send_success:
-                                last_istanbul_alert_time[alert_key] = current_time
-                                print(f"✅ {city_name} erken uyarı bildirimi gönderildi: {number}")
-                            else:
-                                print(f"[ERROR] {city_name} bildirimi gönderilemedi ({number}): {send_error}")
-        except Exception as e:
-            print(f"[ERROR] Türkiye erken uyarı kontrolü hatası: {e}")
-        
-        # İstanbul erken uyarı kontrolü (eski sistem - geriye dönük uyumluluk)
-        try:
-            istanbul_warning = istanbul_early_warning_system(earthquakes)
-            alert_level = istanbul_warning.get('alert_level', 'Normal')
-            
-            # KRİTİK, YÜKSEK veya ORTA seviyede bildirim gönder
-            if alert_level in ['KRİTİK', 'YÜKSEK', 'ORTA']:
-                print(f"🚨 İSTANBUL ERKEN UYARI: {alert_level} - {istanbul_warning.get('message', '')}")
-                
-                # Kullanıcı verilerini tekrar yükle (güncel olması için)
-                user_alerts = load_user_alerts()
-                
-                # İstanbul için kayıtlı kullanıcılara bildirim gönder
-                for number, coords in user_alerts.items():
-                    # İstanbul erken uyarı için kayıtlı mı kontrol et
-                    is_istanbul_alert = coords.get('istanbul_alert', False)
-                    city, _ = find_nearest_city(coords['lat'], coords['lon'])
-                    
-                    # İstanbul'da veya İstanbul erken uyarı için kayıtlıysa
-                    if city == 'İstanbul' or is_istanbul_alert:
-                        # Spam önleme: Aynı seviye için 1 saat içinde tekrar bildirim gönderme
-                        alert_key = f"{number}_{alert_level}"
+                    # Bu şehir için kayıtlı kullanıcılara bildirim gönder (en yakın il indekste hazır)
+                    for number in subscriber_index.in_city(subscribers, city_name):
+                        # Spam önleme
+                        alert_key = f"{number}_{city_name}_{alert_level}"
                         current_time = time.time()
                         
                         if alert_key in last_istanbul_alert_time:
                             time_since_last = current_time - last_istanbul_alert_time[alert_key]
                             if time_since_last < 3600:  # 1 saat
-                                continue  # Bu seviye için son 1 saatte bildirim gönderildi, atla
+                                continue
                         
                         # Bildirim gönder
-                        body = f"🚨 İSTANBUL ERKEN UYARI SİSTEMİ 🚨\n\n"
-                        body += f"⚠️ DEPREM ÖNCESİ UYARI ⚠️\n\n"
+                        body = f"🚨 {city_name.upper()} ERKEN UYARI SİSTEMİ 🚨\n\n"
+                        body += f"⚠️ M ≥ 5.0 DEPREM RİSKİ TESPİT EDİLDİ ⚠️\n\n"
+                        body += f"Şehir: {city_name}\n"
                         body += f"Uyarı Seviyesi: {alert_level}\n"
-                        body += f"Uyarı Skoru: {istanbul_warning.get('alert_score', 0):.2f}/1.0\n"
-                        body += f"Mesaj: {istanbul_warning.get('message', 'Anormal aktivite tespit edildi')}\n"
-                        
-                        if istanbul_warning.get('time_to_event'):
-                            body += f"Tahmini Süre: {istanbul_warning['time_to_event']}\n"
+                        body += f"Uyarı Skoru: {warning_data.get('alert_score', 0):.2f}/1.0\n"
+                        body += f"Tahmini Büyüklük: M{predicted_mag:.1f}\n"
+                        body += f"Tahmini Süre: {warning_data.get('time_to_event', 'Bilinmiyor')}\n"
+                        body += f"Mesaj: {warning_data.get('message', 'Anormal aktivite tespit edildi')}\n"
                         
                         body += f"\n📊 DETAYLAR:\n"
-                        body += f"• Son deprem sayısı: {istanbul_warning.get('recent_earthquakes', 0)}\n"
-                        body += f"• Anomali tespit edildi: {'Evet' if istanbul_warning.get('anomaly_detected') else 'Hayır'}\n"
+                        body += f"• Son deprem sayısı: {warning_data.get('recent_earthquakes', 0)}\n"
+                        body += f"• Anomali tespit edildi: {'Evet' if warning_data.get('anomaly_detected') else 'Hayır'}\n"
                         
                         body += f"\n⚠️ LÜTFEN HAZIRLIKLI OLUN:\n"
                         body += f"• Acil durum çantanızı hazırlayın\n"
@@ -3949,12 +3974,63 @@ def check_for_big_earthquakes():
                         body += f"• Aile acil durum planınızı gözden geçirin\n"
                         body += f"• Sakin kalın ve hazırlıklı olun"
                         
-                        send_success, send_error = send_whatsapp_notification(number, body)
-                        if send_success:
-                            last_istanbul_alert_time[alert_key] = current_time
-                            print(f"✅ İstanbul erken uyarı bildirimi gönderildi: {number}")
-                        else:
-                            print(f"[ERROR] İstanbul bildirimi gönderilemedi ({number}): {send_error}")
+                        # Kuyruğa yazılınca işaretlenir (gönderim sürerken tekrar kuyruğa girmez)
+                        last_istanbul_alert_time[alert_key] = current_time
+                        notification_dispatcher.submit(
+                            send_whatsapp_notification, number, body,
+                            on_done=_alert_sent_callback(last_istanbul_alert_time, alert_key, city_name, number)
+                        )
+        except Exception as e:
+            print(f"[ERROR] Türkiye erken uyarı kontrolü hatası: {e}")
+        
+        # İstanbul erken uyarı kontrolü (eski sistem - geriye dönük uyumluluk)
+        try:
+            if full_eval or 'İstanbul' in changed_cities:
+                istanbul_warning = istanbul_early_warning_system(earthquakes)
+            else:
+                istanbul_warning = {}
+            alert_level = istanbul_warning.get('alert_level', 'Normal')
+            
+            # KRİTİK, YÜKSEK veya ORTA seviyede bildirim gönder
+            if alert_level in ['KRİTİK', 'YÜKSEK', 'ORTA']:
+                print(f"🚨 İSTANBUL ERKEN UYARI: {alert_level} - {istanbul_warning.get('message', '')}")
+                
+                # İstanbul'da veya İstanbul erken uyarı için kayıtlı kullanıcılara bildirim gönder
+                for number in subscriber_index.in_city(subscribers, 'İstanbul', flag='istanbul_alert'):
+                    # Spam önleme: Aynı seviye için 1 saat içinde tekrar bildirim gönderme
+                    alert_key = f"{number}_{alert_level}"
+                    current_time = time.time()
+                    
+                    if alert_key in last_istanbul_alert_time:
+                        time_since_last = current_time - last_istanbul_alert_time[alert_key]
+                        if time_since_last < 3600:  # 1 saat
+                            continue  # Bu seviye için son 1 saatte bildirim gönderildi, atla
+                    
+                    # Bildirim gönder
+                    body = f"🚨 İSTANBUL ERKEN UYARI SİSTEMİ 🚨\n\n"
+                    body += f"⚠️ DEPREM ÖNCESİ UYARI ⚠️\n\n"
+                    body += f"Uyarı Seviyesi: {alert_level}\n"
+                    body += f"Uyarı Skoru: {istanbul_warning.get('alert_score', 0):.2f}/1.0\n"
+                    body += f"Mesaj: {istanbul_warning.get('message', 'Anormal aktivite tespit edildi')}\n"
+                    
+                    if istanbul_warning.get('time_to_event'):
+                        body += f"Tahmini Süre: {istanbul_warning['time_to_event']}\n"
+                    
+                    body += f"\n📊 DETAYLAR:\n"
+                    body += f"• Son deprem sayısı: {istanbul_warning.get('recent_earthquakes', 0)}\n"
+                    body += f"• Anomali tespit edildi: {'Evet' if istanbul_warning.get('anomaly_detected') else 'Hayır'}\n"
+                    
+                    body += f"\n⚠️ LÜTFEN HAZIRLIKLI OLUN:\n"
+                    body += f"• Acil durum çantanızı hazırlayın\n"
+                    body += f"• Güvenli yerleri belirleyin\n"
+                    body += f"• Aile acil durum planınızı gözden geçirin\n"
+                    body += f"• Sakin kalın ve hazırlıklı olun"
+                    
+                    last_istanbul_alert_time[alert_key] = current_time
+                    notification_dispatcher.submit(
+                        send_whatsapp_notification, number, body,
+                        on_done=_alert_sent_callback(last_istanbul_alert_time, alert_key, 'İstanbul', number)
+                    )
         except Exception as e:
             print(f"[ERROR] İstanbul erken uyarı kontrolü hatası: {e}")
 
@@ -3969,42 +4045,40 @@ def check_for_big_earthquakes():
                     print(f"!!! YENİ BÜYÜK DEPREM TESPİT EDİLDİ: M{mag} @ ({lat_eq:.2f}, {lon_eq:.2f})")
                     last_big_earthquake = {'mag': mag, 'time': time.time()}
 
-                    # Kullanıcı verilerini tekrar yükle (güncel olması için)
-                    user_alerts = load_user_alerts()
-                    
-                    for number, coords in user_alerts.items():
-                        distance = haversine(coords['lat'], coords['lon'], lat_eq, lon_eq)
+                    # 150 km içindeki aboneler: indeks ızgarasından (dosya okuma / tüm abone taraması yok)
+                    numbers, distances = subscriber_index.within_radius(subscribers, lat_eq, lon_eq, 150)
+                    for number, distance in zip(numbers, distances.tolist()):
+                        coords = subscriber_index.record(subscribers, number)
+                        deprem_time_str = f"{eq.get('date')} {eq.get('time')}"
                         
-                        if distance < 150:
-                            deprem_time_str = f"{eq.get('date')} {eq.get('time')}"
-                            
-                            # Hasar tahmini yap
-                            depth = eq.get('depth', 10)
-                            damage_info = calculate_damage_estimate(mag, depth, distance)
-                            
-                            # Google Maps konum linki (deprem merkezi)
-                            eq_location_url = f"https://www.google.com/maps?q={lat_eq},{lon_eq}"
-                            
-                            # Kullanıcı konum linki
-                            user_location_url = f"https://www.google.com/maps?q={coords['lat']},{coords['lon']}"
-                            
-                            body = f"🚨 ACİL DEPREM UYARISI 🚨\n"
-                            body += f"Büyüklük: M{mag:.1f}\n"
-                            body += f"Yer: {eq.get('location', 'Bilinmiyor')}\n"
-                            body += f"Saat: {deprem_time_str}\n"
-                            body += f"Derinlik: {depth} km\n"
-                            body += f"Mesafe: {distance:.1f} km (Konumunuza yakın)\n\n"
-                            body += f"📊 HASAR TAHMİNİ:\n"
-                            body += f"Seviye: {damage_info['level']}\n"
-                            body += f"Skor: {damage_info['damage_score']}/100\n"
-                            body += f"Açıklama: {damage_info['description']}\n\n"
-                            body += f"📍 Deprem Merkezi: {eq_location_url}\n"
-                            body += f"📍 Sizin Konumunuz: {user_location_url}\n\n"
-                            body += f"⚠️ Lütfen güvende kalın ve acil durum planınızı uygulayın!"
-                            
-                            send_success, send_error = send_whatsapp_notification(number, body)
-                            if not send_success:
-                                print(f"[ERROR] Büyük deprem bildirimi gönderilemedi ({number}): {send_error}")
+                        # Hasar tahmini yap
+                        depth = eq.get('depth', 10)
+                        damage_info = calculate_damage_estimate(mag, depth, distance)
+                        
+                        # Google Maps konum linki (deprem merkezi)
+                        eq_location_url = f"https://www.google.com/maps?q={lat_eq},{lon_eq}"
+                        
+                        # Kullanıcı konum linki
+                        user_location_url = f"https://www.google.com/maps?q={coords['lat']},{coords['lon']}"
+                        
+                        body = f"🚨 ACİL DEPREM UYARISI 🚨\n"
+                        body += f"Büyüklük: M{mag:.1f}\n"
+                        body += f"Yer: {eq.get('location', 'Bilinmiyor')}\n"
+                        body += f"Saat: {deprem_time_str}\n"
+                        body += f"Derinlik: {depth} km\n"
+                        body += f"Mesafe: {distance:.1f} km (Konumunuza yakın)\n\n"
+                        body += f"📊 HASAR TAHMİNİ:\n"
+                        body += f"Seviye: {damage_info['level']}\n"
+                        body += f"Skor: {damage_info['damage_score']}/100\n"
+                        body += f"Açıklama: {damage_info['description']}\n\n"
+                        body += f"📍 Deprem Merkezi: {eq_location_url}\n"
+                        body += f"📍 Sizin Konumunuz: {user_location_url}\n\n"
+                        body += f"⚠️ Lütfen güvende kalın ve acil durum planınızı uygulayın!"
+                        
+                        notification_dispatcher.submit(
+                            send_whatsapp_notification, number, body,
+                            on_done=_alert_sent_callback(None, None, 'Büyük deprem', number)
+                        )
 
 # Arka plan servisleri - sadece __main__ veya ENABLE_BACKGROUND_THREADS ile başlat (Gunicorn/Render güvenliği)
 _background_threads_started = False
@@ -4017,6 +4091,8 @@ def start_background_services():
         return
     _background_threads_started = True
 
+    current_snapshot()  # Event görüntüsü fetcher'ı (Kandilli/USGS/AFAD tek arka plan çekimi)
+
     alert_thread = Thread(target=check_for_big_earthquakes, daemon=True)
     alert_thread.start()
 
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_dedup.py
+Spatio-temporal dedup: eski O(n·m) karşılaştırma vs uzay-zaman hash indeksi.
+200k kayıtlı deprem (Türkiye bbox, ~1 yıl) × 5k gelen deprem.
+Eski yöntem örnek üzerinden ölçülüp 5k'ya ölçeklenir (tam çalıştırma saatler sürer).
+
+Kullanım: python benchmarks/bench_dedup.py [--stored 200000] [--incoming 5000]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset_manager  # noqa: E402
+
+
+def _make_events(n: int, prefix: str, rng: random.Random, t0: float, span_sec: float):
+    out = []
+    for i in range(n):
+        out.append({
+            "earthquake_id": f"{prefix}{i}",
+            "mag": round(rng.uniform(1.5, 5.0), 1),
+            "depth": 10.0,
+            "geojson": {"type": "Point", "coordinates": [rng.uniform(25, 45), rng.uniform(34, 43)]},
+            "timestamp": t0 + rng.uniform(0, span_sec),
+            "source": "bench",
+        })
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stored", type=int, default=200000)
+    parser.add_argument("--incoming", type=int, default=5000)
+    parser.add_argument("--legacy-sample", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    t0 = 1.7e9
+    span = 365 * 86400.0
+    stored = _make_events(args.stored, "s", rng, t0, span)
+    incoming = _make_events(args.incoming, "q", rng, t0, span)
+    # Gelenlerin %20'si kayıtlı depremlerin başka kaynaktan kopyası
+    for q in incoming[: args.incoming // 5]:
+        src = stored[rng.randrange(args.stored)]
+        lon, lat = src["geojson"]["coordinates"]
+        q["geojson"] = {"type": "Point", "coordinates": [lon + 0.01, lat - 0.01]}
+        q["timestamp"] = src["timestamp"] + 5
+        q["mag"] = src["mag"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.json")
+        dataset_manager.save_dataset(stored, path)
+
+        t = time.perf_counter()
+        dataset_manager.find_spatiotemporal_duplicates(incoming[:1], path)
+        t_build = time.perf_counter() - t
+
+        t = time.perf_counter()
+        flags = dataset_manager.find_spatiotemporal_duplicates(incoming, path)
+        t_index = time.perf_counter() - t
+
+        # Örnek: yarısı kopya, yarısı yeni deprem
+        half = args.legacy_sample // 2
+        sample_idx = list(range(half)) + list(range(args.incoming - half, args.incoming))
+        t = time.perf_counter()
+        legacy = [dataset_manager.is_duplicate_spatiotemporal(incoming[i], stored) for i in sample_idx]
+        t_legacy = (time.perf_counter() - t) / len(sample_idx) * len(incoming)
+
+        assert legacy == [flags[i] for i in sample_idx], "indeks sonucu eski yöntemle uyuşmuyor"
+
+    print(f"Kayıtlı: {args.stored} | Gelen: {args.incoming} | Duplicate: {sum(flags)}")
+    print(f"İndeks kurulumu (ilk çağrı, diske yazma dahil): {t_build:.3f} s")
+    print(f"İndeks sorgusu ({args.incoming} deprem):          {t_index:.3f} s")
+    print(f"Eski O(n·m) (tahmini, {len(sample_idx)} örnekten):      {t_legacy:.1f} s")
+    print(f"Hızlanma: ~{t_legacy / max(t_index, 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_early_warning.py
+turkey_early_warning_system: eski il döngüsü (il × deprem Python haversine ön sayımı, max 25 il,
+il başına yeniden filtre + extract_features + detect_anomalies) vs vektörel hat (tek il × deprem
+mesafe matrisi, 200 km / 24 saat maskeleri, tüm iller için tek extract_features_many geçişi).
+Eski hat burada aynen kopyalanmıştır; feature çıkarımı için güncel (dizi tabanlı) extract_features'ı
+kullandığından ölçülen eski süre gerçek eski süreden kısadır (alt sınır).
+
+Kullanım: python benchmarks/bench_early_warning.py [--events 2000] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def _make_events(n: int, rng: random.Random, now: float):
+    """Kandilli kaydı biçiminde sentetik depremler: son 7 gün, yarısı son 24 saat, bir kısmı sekans."""
+    cities = list(app.TURKEY_CITIES.values())
+    out = []
+    for i in range(n):
+        c = rng.choice(cities[:12]) if i % 4 == 0 else None
+        lat = c["lat"] + rng.gauss(0, 0.2) if c else rng.uniform(36, 42)
+        lon = c["lon"] + rng.gauss(0, 0.2) if c else rng.uniform(26, 44.5)
+        ts = now - (rng.uniform(0, 86400) if i % 2 else rng.uniform(0, 7 * 86400))
+        out.append({
+            "earthquake_id": f"b{i}",
+            "mag": round(rng.uniform(1.0, 5.8), 1),
+            "depth": round(rng.uniform(2, 35), 1),
+            "geojson": {"type": "Point", "coordinates": [lon, lat]},
+            "timestamp": ts,
+            "location": "BENCH",
+        })
+    return out
+
+
+def _legacy_turkey_early_warning(earthquakes):
+    """Eski turkey_early_warning_system'in il seçimi ve il başına feature/anomali döngüsü."""
+    city_eq_counts = {}
+    for city_name, city_data in app.TURKEY_CITIES.items():
+        city_lat, city_lon = city_data['lat'], city_data['lon']
+        count = sum(1 for eq in earthquakes if eq.get('geojson') and eq['geojson'].get('coordinates')
+                    and app.haversine(city_lat, city_lon, eq['geojson']['coordinates'][1],
+                                      eq['geojson']['coordinates'][0]) <= 200)
+        if count > 0:
+            city_eq_counts[city_name] = count
+    cities_to_analyze = sorted(city_eq_counts.keys(), key=lambda c: city_eq_counts[c], reverse=True)[:25]
+    results = {}
+    for city_name in cities_to_analyze:
+        city_data = app.TURKEY_CITIES[city_name]
+        city_lat, city_lon = city_data['lat'], city_data['lon']
+        day_ago = time.time() - 86400
+        city_earthquakes = []
+        for eq in earthquakes:
+            if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
+                continue
+            eq_ts = app.get_eq_timestamp(eq)
+            if not eq_ts:
+                continue
+            lon, lat = eq['geojson']['coordinates']
+            distance = app.haversine(city_lat, city_lon, lat, lon)
+            if distance <= 200 and eq_ts >= day_ago:
+                city_earthquakes.append({'mag': eq.get('mag', 0), 'distance': distance, 'timestamp': eq_ts})
+        if not city_earthquakes:
+            continue
+        features = app.extract_features(earthquakes, city_lat, city_lon, time_window_hours=168)
+        anomaly = app.detect_anomalies(earthquakes, city_lat, city_lon)
+        results[city_name] = (features, anomaly, len(city_earthquakes))
+    return results
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = time.time()
+    earthquakes = _make_events(args.events, rng, now)
+    time.time = lambda: now  # iki hat aynı "şimdi" ile karşılaştırılır (time_since_last, ETAS)
+
+    t_legacy, legacy = _best(lambda: _legacy_turkey_early_warning(earthquakes), args.repeat)
+    t_new, warnings = _best(lambda: app.turkey_early_warning_system(earthquakes), args.repeat)
+
+    for city_name, (features, anomaly, recent) in legacy.items():
+        w = warnings[city_name]
+        assert w["recent_earthquakes"] == recent, city_name
+        assert w["anomaly_detected"] == anomaly["anomaly_detected"], city_name
+        for key, value in features.items():
+            assert abs(w["features"][key] - value) <= 1e-9 * max(1.0, abs(value)), (city_name, key)
+
+    analyzed = sum(1 for w in warnings.values() if "features" in w)
+    print(f"Deprem: {args.events} | İl: {len(app.TURKEY_CITIES)}")
+    print(f"Eski il döngüsü ({len(legacy)} il, max 25):   {t_legacy:.3f} s")
+    print(f"Vektörel hat ({len(warnings)} il, {analyzed} aktif):   {t_new:.3f} s")
+    print(f"Hızlanma: ~{t_legacy / max(t_new, 1e-9):.1f}x (il başına ~{t_legacy / max(len(legacy), 1) / max(t_new / max(analyzed, 1), 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
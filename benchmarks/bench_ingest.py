@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_ingest.py
+Büyük arşiv içe aktarma: tüm liste + add_earthquakes vs akış (generator) + ingest_earthquakes.
+Her yöntem ayrı süreçte çalışır; peak RSS (ru_maxrss) ve süre raporlanır.
+Girdi fetch_archive_full çıktısı biçiminde sentetik depremlerdir (Türkiye bbox, ~36 yıl).
+
+Kullanım: python benchmarks/bench_ingest.py [--events 500000] [--batch 5000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import tempfile
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _iter_events(n: int, seed: int = 42):
+    """fetch_archive_full / iter_archive_full kaydı biçiminde sentetik deprem akışı."""
+    rng = random.Random(seed)
+    t0 = 1.7e9 - 36 * 365 * 86400.0
+    span = 36 * 365 * 86400.0
+    for i in range(n):
+        ts = t0 + rng.uniform(0, span)
+        lon, lat = rng.uniform(25, 45), rng.uniform(34, 43)
+        eid = f"us{i:08d}"
+        yield {
+            "earthquake_id": eid,
+            "eventID": eid,
+            "mag": round(rng.uniform(2.0, 5.5), 1),
+            "depth": round(rng.uniform(1, 40), 1),
+            "geojson": {"type": "Point", "coordinates": [lon, lat]},
+            "timestamp": ts,
+            "created_at": ts,
+            "source": "usgs",
+        }
+
+
+def _max_rss_mb() -> float:
+    # Linux: KB, macOS: byte
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _run(mode: str, events: int, batch: int) -> None:
+    import dataset_manager
+    import db_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.json")
+        db_store.SQLITE_PATH = os.path.join(tmp, "earthquakes.sqlite3")  # DB aynası da ölçüme dahil
+        base_rss = _max_rss_mb()
+        t = time.perf_counter()
+        if mode == "list":
+            added, total = dataset_manager.add_earthquakes(list(_iter_events(events)), path, source="multi")
+        else:
+            added, total = dataset_manager.ingest_earthquakes(_iter_events(events), path, source="multi",
+                                                             batch_size=batch)
+        elapsed = time.perf_counter() - t
+    print(json.dumps({"mode": mode, "added": added, "total": total, "seconds": elapsed,
+                      "base_rss_mb": base_rss, "peak_rss_mb": _max_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--mode", choices=("list", "stream"))
+    args = parser.parse_args()
+
+    if args.mode:
+        _run(args.mode, args.events, args.batch)
+        return
+
+    results = {}
+    for mode in ("stream", "list"):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode,
+             "--events", str(args.events), "--batch", str(args.batch)],
+            capture_output=True, text=True, check=True,
+        )
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"Gelen: {args.events} deprem | Parti: {args.batch}")
+    for mode, label in (("list", "Liste + add_earthquakes"), ("stream", "Akış + ingest_earthquakes")):
+        r = results[mode]
+        print(f"{label:<26} peak RSS {r['peak_rss_mb']:7.1f} MB (başlangıç {r['base_rss_mb']:.1f}) | "
+              f"{r['seconds']:6.1f} s | eklenen {r['added']} | toplam {r['total']}")
+    print(f"Peak RSS oranı: {results['list']['peak_rss_mb'] / max(results['stream']['peak_rss_mb'], 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_subscriber_index.py
+Uyarı dağıtımı için abone sorguları: eski yöntem (her olayda user_alerts.json okuma + tüm aboneler için
+haversine / find_nearest_city) vs subscriber_index (en yakın il önceden hesaplı, enlem/boylam ızgarası).
+Aboneler il merkezleri çevresinde, üçte biri İstanbul'da. Eski il sorgusu örnek üzerinden ölçeklenir.
+
+Kullanım: python benchmarks/bench_subscriber_index.py [--subscribers 100000] [--repeat 20]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import subscriber_index  # noqa: E402
+
+EPICENTERS = {"İzmir": (38.42, 27.14), "Van": (38.49, 43.41), "İstanbul": (41.01, 28.98)}
+
+
+def _make_records(n: int, rng: random.Random):
+    cities = list(app.TURKEY_CITIES.values())
+    istanbul = app.TURKEY_CITIES["İstanbul"]
+    out = {}
+    for i in range(n):
+        c = istanbul if i % 3 == 0 else rng.choice(cities)
+        out[f"+90{i:010d}"] = {"lat": c["lat"] + rng.gauss(0, 0.25), "lon": c["lon"] + rng.gauss(0, 0.3),
+                               "istanbul_alert": i % 50 == 0}
+    return out
+
+
+def _avg_ms(fn, repeat):
+    fn()
+    t = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - t) / repeat * 1e3, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    records = _make_records(args.subscribers, random.Random(42))
+    with tempfile.TemporaryDirectory() as tmp:
+        app.USER_DATA_FILE = os.path.join(tmp, "user_alerts.json")
+        with open(app.USER_DATA_FILE, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+
+        t = time.perf_counter()
+        index = subscriber_index.build_index(app.TURKEY_CITIES, records)
+        print(f"Abone: {args.subscribers} | İndeks kurulumu: {time.perf_counter() - t:.2f} s")
+
+        for name, (lat, lon) in EPICENTERS.items():
+            def legacy():
+                alerts = app.load_user_alerts()
+                return [n for n, c in alerts.items() if app.haversine(c["lat"], c["lon"], lat, lon) < 150]
+            t_old, old = _avg_ms(legacy, 1)
+            t_new, (numbers, _) = _avg_ms(lambda: subscriber_index.within_radius(index, lat, lon, 150), args.repeat)
+            assert sorted(old) == sorted(numbers), name
+            print(f"150 km ({name}, {len(numbers)} abone): eski {t_old:.1f} ms | indeks {t_new:.3f} ms")
+
+        sample = list(records.values())[:5000]
+        t = time.perf_counter()
+        for c in sample:
+            app.find_nearest_city(c["lat"], c["lon"])
+        t_old = (time.perf_counter() - t) / len(sample) * args.subscribers * 1e3
+        for city in ("Van", "İstanbul"):
+            t_new, hits = _avg_ms(lambda: subscriber_index.in_city(index, city), args.repeat)
+            print(f"İl sorgusu ({city}, {len(hits)} abone): eski ~{t_old:.0f} ms (ölçekli) | indeks {t_new:.3f} ms")
+
+        t_new, _ = _avg_ms(lambda: subscriber_index.upsert(index, "+905320000000", {"lat": 39.9, "lon": 32.8}),
+                           args.repeat)
+        print(f"set-alert indeks güncellemesi: {t_new:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_training_records.py
+Tarihsel genişletmeli eğitim kaydı üretimi: sıralı vs süreç havuzu (forkserver, paylaşımlı bellek).
+Her işçi sayısı için süre, referans/sn, hızlanma ve verim (hızlanma / işçi) yazdırılır; çıktının
+sıralı çalışmayla aynı olduğu doğrulanır. Varsayılan işçi listesi: 1, 2, 4, ... atanmış CPU sayısına kadar.
+
+Kullanım: python benchmarks/bench_training_records.py [--events 3000] [--refs 64] [--workers 1,2,4]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import earthquake_features as ef  # noqa: E402
+
+
+def _make_events(n: int, rng: random.Random, t0: float, days: int):
+    cities = list(ef.TURKEY_CITIES.values())
+    out = []
+    for _ in range(n):
+        c = rng.choice(cities)
+        out.append({
+            "mag": round(rng.uniform(1.0, 5.5), 1),
+            "depth": round(rng.uniform(2.0, 30.0), 1),
+            "timestamp": t0 + rng.uniform(0, days * 86400),
+            "geojson": {"coordinates": [c["lon"] + rng.gauss(0, 0.4), c["lat"] + rng.gauss(0, 0.4)]},
+        })
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=3000)
+    parser.add_argument("--refs", type=int, default=64)
+    parser.add_argument("--workers", type=str, default=None)
+    args = parser.parse_args()
+
+    cpus = ef.available_cpus()
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts, w = [], 1
+        while w < cpus:
+            worker_counts.append(w)
+            w *= 2
+        worker_counts.append(cpus)
+    if worker_counts[0] != 1:
+        worker_counts.insert(0, 1)
+
+    t0 = 1_700_000_000.0
+    days = 60
+    eqs = _make_events(args.events, random.Random(42), t0, days)
+    step = (days - 8) * 86400 / args.refs
+    refs = [t0 + 7 * 86400 + i * step for i in range(args.refs)]
+    windows = ef.TIME_WINDOWS_HOURS
+
+    print(f"Deprem: {args.events} | Referans: {args.refs} | Pencere: {windows} | Atanmış CPU: {cpus}")
+    baseline, t_seq = None, None
+    for workers in worker_counts:
+        ef.TRAINING_WORKERS = workers
+        t = time.perf_counter()
+        records = ef._create_training_records_batch(eqs, windows, reference_times=refs)
+        elapsed = time.perf_counter() - t
+        if baseline is None:
+            baseline, t_seq = records, elapsed
+        else:
+            assert records == baseline, f"{workers} işçi: çıktı sıralıdan farklı"
+        speedup = t_seq / elapsed
+        print(f"{workers:>3} işçi: {elapsed:7.2f} s | {args.refs / elapsed:6.1f} ref/sn | "
+              f"{len(records) / elapsed:8.0f} kayıt/sn | hızlanma {speedup:4.2f}x | verim {speedup / workers:4.0%}")
+
+
+if __name__ == "__main__":
+    main()
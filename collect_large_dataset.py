@@ -4,12 +4,23 @@ collect_large_dataset.py
 Tek komutla 100k+ deprem verisi indirir (USGS 1990-2026).
 Türkiye çevresi filtre: lat 34-43, lon 25-45.
 dataset_manager ile uyumlu format + spatio-temporal dedup.
+
+Devam ettirilebilir backfill (data/usgs_backfill/):
+- Her (zaman aralığı, bbox) parçası geldiği anda kendi segment dosyasına (JSON Lines) yazılır.
+- manifest.json çekilen ve bölünen parçaları tutar; yeniden çalıştırmada sadece eksik parçalar çekilir.
+  Bitişi gelecekte olan (içinde bulunulan yılın) parça "fetched_until" tarihiyle yazılır ve bitişi
+  geçilmiş bir günde çekilene kadar her çalıştırmada yeniden çekilir (sonradan olan depremler kaçmaz).
+- USGS LIMIT_PER_YEAR sınırına ulaşan parça (sonuç kesilmiş olabilir) zaman ikiye, en küçük
+  zaman aralığında bbox dörde bölünerek yeniden çekilir.
+- Birleştirme segment segment yapılır; tüm arşiv bellekte tutulmaz.
 """
 
-import requests
+import os
+import json
 import time
 import sys
-from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime, timezone
+from typing import List, Dict, Optional, Tuple, Iterator, Any
 
 # Türkiye bbox (Ayşenisa önerisi)
 LAT_MIN = 34
@@ -23,6 +34,17 @@ END_YEAR = 2026
 USGS_BASE = "https://earthquake.usgs.gov/fdsnws/event/1/query"
 LIMIT_PER_YEAR = 10000  # USGS max 20k, 10k daha güvenli
 
+BACKFILL_DIR = os.getenv(
+    "USGS_BACKFILL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "usgs_backfill"),
+)
+BACKFILL_FORMAT = 1
+MIN_CHUNK_DAYS = 1        # Bu süreye inen parça zaman yerine bbox'tan bölünür
+MIN_CHUNK_DEG = 0.25      # bbox bu boyutun altına bölünmez (sınırda kalırsa kesik kabul edilir)
+REQUEST_INTERVAL_SEC = 0.5  # USGS'e ardışık istekler arası bekleme
+
+Chunk = Tuple[str, str, Tuple[float, float, float, float]]  # (start, end), (lat_min, lat_max, lon_min, lon_max)
+
 
 def _normalize_usgs_feature(feat: Dict) -> Optional[Dict]:
     """USGS GeoJSON feature → dataset_manager format."""
@@ -53,37 +75,237 @@ def _normalize_usgs_feature(feat: Dict) -> Optional[Dict]:
         return None
 
 
-def fetch_usgs_year(year: int) -> List[Dict]:
-    """USGS'ten tek yıl verisi çeker."""
-    url = (
+def _usgs_url(start: str, end: str, bbox: Tuple[float, float, float, float]) -> str:
+    lat_min, lat_max, lon_min, lon_max = bbox
+    return (
         f"{USGS_BASE}?format=geojson"
-        f"&starttime={year}-01-01"
-        f"&endtime={year}-12-31"
-        f"&minlatitude={LAT_MIN}"
-        f"&maxlatitude={LAT_MAX}"
-        f"&minlongitude={LON_MIN}"
-        f"&maxlongitude={LON_MAX}"
+        f"&starttime={start}"
+        f"&endtime={end}"
+        f"&minlatitude={lat_min:g}"
+        f"&maxlatitude={lat_max:g}"
+        f"&minlongitude={lon_min:g}"
+        f"&maxlongitude={lon_max:g}"
         f"&minmagnitude=2"
         f"&limit={LIMIT_PER_YEAR}"
         f"&orderby=time"
     )
+
+
+def fetch_usgs_chunk(start: str, end: str,
+                     bbox: Tuple[float, float, float, float] = (LAT_MIN, LAT_MAX, LON_MIN, LON_MAX)
+                     ) -> Optional[List[Dict]]:
+    """
+    USGS'ten tek parça ([start, end) aralığı, bbox) çeker ve normalize eder.
+    Returns: deprem listesi; istek başarısızsa None (parça tamamlanmış sayılmaz).
+    """
+    from data_collector import fetch_json_url
+    data = fetch_json_url(_usgs_url(start, end, bbox), max_retries=3, timeout=120)
+    if not isinstance(data, dict):
+        return None
+    out = []
+    for f in data.get("features", []):
+        if isinstance(f, dict) and f.get("type") == "Feature":
+            norm = _normalize_usgs_feature(f)
+            if norm:
+                out.append(norm)
+    return out
+
+
+def fetch_usgs_year(year: int) -> List[Dict]:
+    """USGS'ten tek yıl verisi çeker."""
     print(f"[USGS] {year} verisi çekiliyor...", end=" ", flush=True)
+    out = fetch_usgs_chunk(f"{year}-01-01", f"{year + 1}-01-01")
+    if out is None:
+        print("HATA")
+        return []
+    print(f"{len(out)} deprem")
+    return out
+
+
+def _chunk_key(chunk: Chunk) -> str:
+    start, end, (lat_min, lat_max, lon_min, lon_max) = chunk
+    return f"{start}_{end}_{lat_min:g}_{lat_max:g}_{lon_min:g}_{lon_max:g}"
+
+
+def _today() -> date:
+    """UTC bugünün tarihi (USGS zamanları UTC)."""
+    return datetime.now(timezone.utc).date()
+
+
+def _chunk_complete(chunk: Chunk, info: Dict[str, Any]) -> bool:
+    """Parça, bitişi geçildikten sonra çekildiyse tamamdır; eski kayıtlarda bitiş bugünle karşılaştırılır."""
+    end = date.fromisoformat(chunk[1])
+    fetched_until = info.get("fetched_until")
+    if fetched_until is None:
+        return end <= _today()
+    return end <= date.fromisoformat(fetched_until)
+
+
+def _year_chunk(year: int, bbox: Tuple[float, float, float, float]) -> Chunk:
+    return (f"{year}-01-01", f"{year + 1}-01-01", tuple(float(v) for v in bbox))
+
+
+def _split_chunk(chunk: Chunk) -> List[Chunk]:
+    """Sınıra ulaşan parçayı böler: önce zaman (ikiye), MIN_CHUNK_DAYS'e inince bbox (dörde)."""
+    start, end, bbox = chunk
+    d0, d1 = date.fromisoformat(start), date.fromisoformat(end)
+    days = (d1 - d0).days
+    if days > MIN_CHUNK_DAYS:
+        mid = date.fromordinal(d0.toordinal() + days // 2).isoformat()
+        return [(start, mid, bbox), (mid, end, bbox)]
+    lat_min, lat_max, lon_min, lon_max = bbox
+    if lat_max - lat_min <= MIN_CHUNK_DEG and lon_max - lon_min <= MIN_CHUNK_DEG:
+        return []
+    lat_mid = (lat_min + lat_max) / 2
+    lon_mid = (lon_min + lon_max) / 2
+    return [
+        (start, end, (lat_min, lat_mid, lon_min, lon_mid)),
+        (start, end, (lat_min, lat_mid, lon_mid, lon_max)),
+        (start, end, (lat_mid, lat_max, lon_min, lon_mid)),
+        (start, end, (lat_mid, lat_max, lon_mid, lon_max)),
+    ]
+
+
+def _empty_backfill_manifest() -> Dict[str, Any]:
+    return {"format": BACKFILL_FORMAT, "chunks": {}, "split": {}}
+
+
+def load_backfill_manifest(backfill_dir: str = BACKFILL_DIR) -> Dict[str, Any]:
+    """Backfill manifest'i (tamamlanan/bölünen parçalar); yoksa boş."""
+    path = os.path.join(backfill_dir, "manifest.json")
+    if not os.path.exists(path):
+        return _empty_backfill_manifest()
     try:
-        r = requests.get(url, timeout=120, headers={"User-Agent": "DepremAnaliz/1.0"})
-        r.raise_for_status()
-        data = r.json()
-        features = data.get("features", [])
-        out = []
-        for f in features:
-            if isinstance(f, dict) and f.get("type") == "Feature":
-                norm = _normalize_usgs_feature(f)
-                if norm:
-                    out.append(norm)
-        print(f"{len(out)} deprem")
-        return out
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and manifest.get("format") == BACKFILL_FORMAT:
+            return manifest
     except Exception as e:
-        print(f"HATA: {e}")
-        return []
+        print(f"[USGS] Backfill manifest okunamadı: {e}")
+    return _empty_backfill_manifest()
+
+
+def _atomic_write(path: str, write) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _save_backfill_manifest(backfill_dir: str, manifest: Dict[str, Any]) -> None:
+    _atomic_write(os.path.join(backfill_dir, "manifest.json"),
+                  lambda f: json.dump(manifest, f, ensure_ascii=False))
+
+
+def _write_chunk_segment(backfill_dir: str, key: str, events: List[Dict]) -> str:
+    """Parçanın depremlerini segment dosyasına yazar (önce segment, sonra manifest)."""
+    name = f"{key}.jsonl"
+
+    def _write(f):
+        for eq in events:
+            f.write(json.dumps(eq, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+
+    _atomic_write(os.path.join(backfill_dir, name), _write)
+    return name
+
+
+def backfill_usgs(start_year: int = START_YEAR, end_year: int = END_YEAR,
+                  bbox: Tuple[float, float, float, float] = (LAT_MIN, LAT_MAX, LON_MIN, LON_MAX),
+                  backfill_dir: str = BACKFILL_DIR) -> Dict[str, int]:
+    """
+    USGS arşivini parça parça diske çeker; manifest'te tamamlanmış parçaları atlar.
+    Başarısız parça manifest'e yazılmaz (bir sonraki çalıştırmada yeniden denenir).
+    Bitişi henüz geçilmemiş parça yazılır ama tamamlanmış sayılmaz: sonraki çalıştırmalarda yeniden
+    çekilir, segmenti yenilenir ve tekrar birleştirilmek üzere işaretlenir (dedup tekrarları eler).
+
+    Returns:
+        {'fetched', 'skipped', 'split', 'failed', 'events'} sayaçları
+    """
+    os.makedirs(backfill_dir, exist_ok=True)
+    manifest = load_backfill_manifest(backfill_dir)
+    stats = {"fetched": 0, "skipped": 0, "split": 0, "failed": 0, "events": 0}
+    # Yıllar sondan başa yığına konur: parçalar kronolojik sırayla işlenir
+    pending = [_year_chunk(y, bbox) for y in range(end_year, start_year - 1, -1)]
+    while pending:
+        chunk = pending.pop()
+        key = _chunk_key(chunk)
+        if key in manifest["chunks"] and _chunk_complete(chunk, manifest["chunks"][key]):
+            stats["skipped"] += 1
+            continue
+        if key in manifest["split"]:
+            pending.extend(reversed(_split_chunk(chunk)))
+            continue
+
+        start, end, cbox = chunk
+        print(f"[USGS] {key} çekiliyor...", end=" ", flush=True)
+        events = fetch_usgs_chunk(start, end, cbox)
+        if REQUEST_INTERVAL_SEC > 0:
+            time.sleep(REQUEST_INTERVAL_SEC)
+        if events is None:
+            print("HATA (sonraki çalıştırmada tekrar denenecek)")
+            stats["failed"] += 1
+            continue
+        if len(events) >= LIMIT_PER_YEAR:
+            children = _split_chunk(chunk)
+            if children:
+                print(f"{len(events)} deprem (sınır) → {len(children)} parçaya bölünüyor")
+                manifest["split"][key] = [_chunk_key(c) for c in children]
+                stale = manifest["chunks"].pop(key, None)  # açık parça büyüyüp sınıra ulaştıysa
+                if stale:
+                    try:
+                        os.remove(os.path.join(backfill_dir, stale["segment"]))
+                    except OSError:
+                        pass
+                _save_backfill_manifest(backfill_dir, manifest)
+                pending.extend(reversed(children))
+                stats["split"] += 1
+                continue
+            print("UYARI: en küçük parça da sınırda, sonuç kesik olabilir;", end=" ")
+
+        segment = _write_chunk_segment(backfill_dir, key, events)
+        fetched_until = min(date.fromisoformat(end), _today()).isoformat()
+        manifest["chunks"][key] = {"segment": segment, "count": len(events), "merged": False,
+                                   "fetched_until": fetched_until}
+        _save_backfill_manifest(backfill_dir, manifest)
+        stats["fetched"] += 1
+        stats["events"] += len(events)
+        print(f"{len(events)} deprem")
+    return stats
+
+
+def iter_backfill_segments(backfill_dir: str = BACKFILL_DIR,
+                           only_unmerged: bool = False) -> Iterator[Tuple[str, List[Dict]]]:
+    """Tamamlanan parçaları (anahtar, depremler) olarak tek tek okur (kronolojik anahtar sırası)."""
+    manifest = load_backfill_manifest(backfill_dir)
+    for key in sorted(manifest["chunks"]):
+        info = manifest["chunks"][key]
+        if only_unmerged and info.get("merged"):
+            continue
+        events = []
+        path = os.path.join(backfill_dir, info["segment"])
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        events.append(json.loads(line))
+        except (OSError, ValueError) as e:
+            print(f"[USGS] Segment okunamadı ({info['segment']}): {e}")
+            continue
+        yield key, events
+
+
+def _mark_merged(backfill_dir: str, keys: List[str]) -> None:
+    if not keys:
+        return
+    manifest = load_backfill_manifest(backfill_dir)
+    for key in keys:
+        if key in manifest["chunks"]:
+            manifest["chunks"][key]["merged"] = True
+    _save_backfill_manifest(backfill_dir, manifest)
 
 
 def _dedup_grid_key(eq: dict) -> Optional[Tuple[float, float, int]]:
@@ -100,82 +322,58 @@ def _dedup_grid_key(eq: dict) -> Optional[Tuple[float, float, int]]:
     return (round(lat, 1), round(lon, 1), int(ts / 60))
 
 
-def collect_and_save(use_dataset_manager: bool = True, start_year: int = START_YEAR, end_year: int = END_YEAR):
+def collect_and_save(use_dataset_manager: bool = True, start_year: int = START_YEAR, end_year: int = END_YEAR,
+                     backfill_dir: str = BACKFILL_DIR, dataset_file: Optional[str] = None):
     """
-    USGS verisini çeker ve dataset'e ekler.
-    use_dataset_manager=True: hızlı bulk merge (O(n)) - 100k+ için optimize
-    use_dataset_manager=False: add_earthquakes (küçük batch için)
+    USGS verisini parça parça diske çeker (devam ettirilebilir) ve dataset'e ekler.
+    use_dataset_manager=True: her segment add_earthquakes ile eklenir (ID + spatio-temporal dedup,
+        sadece yeni kayıtlar append edilir; bellekte tek segment tutulur)
+    use_dataset_manager=False: 10km/60s grid dedup ile hızlı bulk merge (dataset baştan yazılır)
+    Birleştirilen segmentler manifest'te işaretlenir; yeniden çalıştırmada atlanır.
     """
     from dataset_manager import (
         load_dataset,
+        load_event_columns,
         add_earthquakes,
         DEFAULT_DATASET_FILE,
         save_dataset,
     )
+    dataset_file = dataset_file or DEFAULT_DATASET_FILE
 
-    existing = load_dataset(DEFAULT_DATASET_FILE)
-    raw_count = sum(1 for r in existing if r.get("geojson") and r["geojson"].get("coordinates"))
-    print(f"Mevcut ham deprem: {raw_count}")
+    columns = load_event_columns(dataset_file)
+    print(f"Mevcut ham deprem: {len(columns)}")
     print(f"Hedef: {start_year}-{end_year} USGS (Türkiye bbox)")
     print("=" * 50)
 
-    all_new = []
-    for year in range(start_year, end_year + 1):
-        eqs = fetch_usgs_year(year)
-        all_new.extend(eqs)
-        time.sleep(0.5)
+    stats = backfill_usgs(start_year, end_year, backfill_dir=backfill_dir)
+    print(f"Backfill: {stats['fetched']} parça çekildi ({stats['events']} deprem), "
+          f"{stats['skipped']} parça hazırdı, {stats['split']} bölündü, {stats['failed']} başarısız")
 
-    if not all_new:
-        print("Veri alınamadı.")
+    if use_dataset_manager:
+        added_total, total, fetched = 0, len(columns), 0
+        for key, events in iter_backfill_segments(backfill_dir, only_unmerged=True):
+            fetched += len(events)
+            if events:
+                added, total = add_earthquakes(events, dataset_file, source="usgs")
+                added_total += added
+            _mark_merged(backfill_dir, [key])
+        if not fetched and not added_total:
+            print("Yeni segment yok.")
+        print("=" * 50)
+        print(f"Eklenen: {added_total} | Toplam kayıt: {total}")
         return
 
-    # Gelen listede dedup (USGS tek kaynak, nadiren duplicate)
-    from dataset_manager import deduplicate_earthquakes
-    unique_new = deduplicate_earthquakes(all_new)
-    print(f"Toplam çekilen: {len(all_new)} → dedup sonrası: {len(unique_new)}")
-
-    if use_dataset_manager and len(unique_new) > 1000:
-        # Hızlı bulk merge: O(n) grid-based dedup
-        existing_keys = set()
-        for r in existing:
-            if r.get("geojson") and r["geojson"].get("coordinates"):
-                k = _dedup_grid_key(r)
-                if k:
-                    existing_keys.add(k)
-        added = 0
-        for eq in unique_new:
-            k = _dedup_grid_key(eq)
-            if k and k not in existing_keys:
+    existing = load_dataset(dataset_file)
+    existing_keys = set()
+    for r in existing:
+        if r.get("geojson") and r["geojson"].get("coordinates"):
+            k = _dedup_grid_key(r)
+            if k:
                 existing_keys.add(k)
-                rec = eq.copy()
-                rec["source"] = rec.get("source", "usgs")
-                rec["collected_at"] = time.time()
-                if "timestamp" not in rec and rec.get("created_at"):
-                    rec["timestamp"] = rec["created_at"]
-                existing.append(rec)
-                added += 1
-        if added > 0:
-            try:
-                from db_store import is_db_available, add_earthquakes_db
-                if is_db_available():
-                    add_earthquakes_db([r for r in existing[-added:]])
-            except ImportError:
-                pass
-        save_dataset(existing, DEFAULT_DATASET_FILE)
-        print("=" * 50)
-        print(f"Eklenen: {added} | Toplam kayıt: {len(existing)}")
-    elif use_dataset_manager:
-        added, total = add_earthquakes(unique_new, source="usgs")
-        print("=" * 50)
-        print(f"Eklenen: {added} | Toplam kayıt: {total}")
-    else:
-        existing_keys = set()
-        for r in existing:
-            if r.get("geojson"):
-                k = _dedup_grid_key(r)
-                if k:
-                    existing_keys.add(k)
-        for eq in unique_new:
+    added, merged_keys = 0, []
+    for key, events in iter_backfill_segments(backfill_dir, only_unmerged=True):
+        merged_keys.append(key)
+        for eq in events:
             k = _dedup_grid_key(eq)
             if k and k not in existing_keys:
                 existing_keys.add(k)
@@ -185,9 +383,18 @@ def collect_and_save(use_dataset_manager: bool = True, start_year: int = START_Y
                 if "timestamp" not in rec and rec.get("created_at"):
                     rec["timestamp"] = rec["created_at"]
                 existing.append(rec)
-        save_dataset(existing, DEFAULT_DATASET_FILE)
-        print("=" * 50)
-        print(f"Toplam kayıt: {len(existing)}")
+                added += 1
+    if added > 0:
+        try:
+            from db_store import is_db_available, add_earthquakes_db
+            if is_db_available():
+                add_earthquakes_db(existing[-added:])
+        except ImportError:
+            pass
+        save_dataset(existing, dataset_file)
+    _mark_merged(backfill_dir, merged_keys)
+    print("=" * 50)
+    print(f"Eklenen: {added} | Toplam kayıt: {len(existing)}")
 
 
 if __name__ == "__main__":
@@ -12,6 +12,12 @@ KANDILLI_API = os.getenv(
     "KANDILLI_API",
     "https://api.orhanaydogdu.com.tr/deprem/kandilli/live",
 )
+KANDILLI_ARCHIVE_API = os.getenv(
+    "KANDILLI_ARCHIVE_API",
+    "https://api.orhanaydogdu.com.tr/deprem/kandilli/archive",
+)
+KANDILLI_ARCHIVE_LIMIT = 2000  # 7 günlük analiz için yeterli
+KANDILLI_TIMEOUT = 12  # Her istek max 12 sn (Live+Archive paralel)
 EARTHQUAKE_HISTORY_FILE = os.path.join(BASE_DIR, "earthquake_history.json")
 
 USGS_API = os.getenv(
@@ -24,6 +30,8 @@ FUSION_LOOKBACK_HOURS = int(os.getenv("FUSION_LOOKBACK_HOURS", "168"))
 FAULTS_DIR = os.path.join(DATA_DIR, "faults")
 FAULTS_GEOJSON = os.path.join(FAULTS_DIR, "turkey_faults.geojson")
 FAULTS_SHP = os.path.join(FAULTS_DIR, "turkey_faults.shp")
+# Fay mesafe rasterı adımı (derece; 0 = kapalı). Kapsam forecast.grid.TURKEY_BBOX'tır.
+FAULT_RASTER_STEP = float(os.getenv("FAULT_RASTER_STEP", "0.05"))
 
 GRID_STEP = 0.25
 TIME_WINDOW_HOURS = 48
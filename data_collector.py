@@ -5,10 +5,24 @@ Kandilli Rasathanesi API'lerinden deprem verisi çekme modülü.
 Live ve Archive API'lerini kullanır, sentetik veri üretimi destekler.
 """
 
+import os
+import json
+import random
+import threading
 import requests
 import time
 import numpy as np
-from typing import List, Dict, Any, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+from urllib.parse import urlsplit
+
+# Akış halinde JSON parse (opsiyonel): yoksa yanıt gövdesi bir kez okunup json ile parse edilir
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
 
 # API URL'leri - Multi-source
 KANDILLI_LIVE_API = 'https://api.orhanaydogdu.com.tr/deprem/kandilli/live'
@@ -32,10 +46,133 @@ EMSC_BASE = (
 )
 EMSC_API = EMSC_BASE + '&limit=500'
 
+# Fetch motoru: sınırlı thread havuzu + host başına eşzamanlılık limiti + bağlantı yeniden kullanımı
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', '8'))
+FETCH_HOST_CONCURRENCY = int(os.getenv('FETCH_HOST_CONCURRENCY', '4'))
+FETCH_BACKOFF_BASE = float(os.getenv('FETCH_BACKOFF_BASE', '1.0'))  # saniye; 2^deneme × jitter
+FETCH_BACKOFF_MAX = 30.0
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 DepremAnaliz/1.0',
+    'Accept': 'application/json',
+}
+
+# host -> {'session': requests.Session, 'slots': BoundedSemaphore}
+_HOSTS: Dict[str, Dict[str, Any]] = {}
+_HOSTS_LOCK = threading.Lock()
+
+
+def _host_entry(url: str) -> Dict[str, Any]:
+    """Host başına tek Session (keep-alive havuzu) ve eşzamanlılık semaforu."""
+    host = urlsplit(url).netloc
+    entry = _HOSTS.get(host)
+    if entry is None:
+        with _HOSTS_LOCK:
+            entry = _HOSTS.get(host)
+            if entry is None:
+                session = requests.Session()
+                session.headers.update(_DEFAULT_HEADERS)
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=max(1, FETCH_HOST_CONCURRENCY)
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                entry = {
+                    'session': session,
+                    'slots': threading.BoundedSemaphore(max(1, FETCH_HOST_CONCURRENCY)),
+                }
+                _HOSTS[host] = entry
+    return entry
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Üstel bekleme + tam jitter (aynı anda düşen isteklerin senkron tekrar denemesini önler)."""
+    return min(FETCH_BACKOFF_MAX, FETCH_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+def _parse_json_body(raw) -> Any:
+    """
+    Yanıt gövdesini parse eder. ijson varsa gövde parça parça okunup artımlı parse edilir (tam gövde
+    bytes/str olarak bellekte tutulmaz); yoksa gövde bir kez okunur ve json ile parse edilir.
+    """
+    if not HAS_IJSON:
+        return json.loads(raw.read())
+    try:
+        for value in ijson.items(raw, '', use_float=True):
+            return value
+    except ijson.JSONError as e:
+        raise ValueError(f"JSON parse hatası: {e}") from e
+    raise ValueError("Boş JSON yanıtı")
+
+
+def fetch_json_url(url: str, max_retries: int = 2, timeout: int = 60) -> Optional[Any]:
+    """
+    Tek URL'den JSON çeker: host Session'ı ile bağlantı yeniden kullanılır,
+    host limiti kadar eşzamanlı istek yapılır, gövde _parse_json_body ile parse edilir
+    (ijson kuruluysa artımlı). Zaman aşımı / bağlantı hatası / 429 / 5xx tekrar denenir.
+
+    Returns:
+        Parse edilmiş JSON veya tüm denemeler başarısızsa None
+    """
+    entry = _host_entry(url)
+    for attempt in range(max_retries):
+        try:
+            with entry['slots']:
+                with entry['session'].get(url, timeout=timeout, stream=True) as response:
+                    if response.status_code in _RETRY_STATUS:
+                        raise requests.exceptions.HTTPError(
+                            f"{response.status_code} {response.reason}", response=response
+                        )
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+                    return _parse_json_body(response.raw)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            retryable = status is None or status in _RETRY_STATUS
+            if retryable and attempt < max_retries - 1:
+                wait_time = _backoff_delay(attempt)
+                print(f"[DATA_COLLECTOR] API hatası: {e}, {wait_time:.1f}s bekleniyor... "
+                      f"(Deneme {attempt + 1}/{max_retries})")
+                time.sleep(wait_time)
+            else:
+                print(f"[DATA_COLLECTOR] API hatası: {e}")
+                return None
+    return None
+
+
+def iter_json_many(urls: Iterable[str], max_retries: int = 2, timeout: int = 60,
+                   workers: int = FETCH_WORKERS) -> Iterator[Optional[Any]]:
+    """
+    URL'leri sınırlı thread havuzunda paralel çeker ve sonuçları URL sırasıyla üretir.
+    En fazla `workers` istek uçuştadır: tüketici yavaşsa yeni istek açılmaz (bellek sınırlı).
+    """
+    urls = iter(urls)
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for url in urls:
+            window.append(pool.submit(fetch_json_url, url, max_retries, timeout))
+            if len(window) >= workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def fetch_json_many(urls: Iterable[str], max_retries: int = 2, timeout: int = 60,
+                    workers: int = FETCH_WORKERS) -> List[Optional[Any]]:
+    """
+    Birden çok URL'yi sınırlı thread havuzunda paralel çeker (host limiti fetch_json_url'de).
+    Sonuçlar URL sırasıyla döner; başarısız URL için None.
+    """
+    urls = list(urls)
+    if len(urls) <= 1 or workers <= 1:
+        return [fetch_json_url(u, max_retries=max_retries, timeout=timeout) for u in urls]
+    return list(iter_json_many(urls, max_retries=max_retries, timeout=timeout, workers=min(workers, len(urls))))
+
 
 def fetch_from_api(url: str, max_retries: int = 3, timeout: int = 60) -> List[Dict]:
     """
-    Belirtilen API URL'inden deprem verisi çeker.
+    Belirtilen API URL'inden deprem verisi çeker ('result' listesi).
     Retry mekanizması ile hata toleransı sağlar.
     
     Args:
@@ -46,32 +183,9 @@ def fetch_from_api(url: str, max_retries: int = 3, timeout: int = 60) -> List[Di
     Returns:
         Deprem verileri listesi
     """
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=timeout, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json'
-            })
-            response.raise_for_status()
-            data = response.json().get('result', [])
-            return data if isinstance(data, list) else []
-        except requests.exceptions.Timeout:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 2
-                print(f"[DATA_COLLECTOR] API timeout, {wait_time}s bekleniyor... (Deneme {attempt + 1}/{max_retries})")
-                time.sleep(wait_time)
-            else:
-                print("[DATA_COLLECTOR] API timeout: Tüm denemeler başarısız")
-                return []
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 2
-                print(f"[DATA_COLLECTOR] API hatası: {e}, {wait_time}s bekleniyor...")
-                time.sleep(wait_time)
-            else:
-                print(f"[DATA_COLLECTOR] API hatası: {e}")
-                return []
-    return []
+    raw = fetch_json_url(url, max_retries=max_retries, timeout=timeout)
+    data = raw.get('result', []) if isinstance(raw, dict) else []
+    return data if isinstance(data, list) else []
 
 
 def fetch_live_data() -> List[Dict]:
@@ -169,21 +283,7 @@ def _normalize_emsc_feature(feat: Dict) -> Optional[Dict]:
 
 def _fetch_json(url: str, max_retries: int = 2, timeout: int = 60) -> Optional[Dict]:
     """Genel JSON API çağrısı (result key beklemez)."""
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=timeout, headers={
-                'User-Agent': 'Mozilla/5.0 DepremAnaliz/1.0',
-                'Accept': 'application/json'
-            })
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep((attempt + 1) * 2)
-            else:
-                print(f"[DATA_COLLECTOR] API hatası: {e}")
-                return None
-    return None
+    return fetch_json_url(url, max_retries=max_retries, timeout=timeout)
 
 
 def fetch_usgs_data(limit: int = 500) -> List[Dict]:
@@ -218,36 +318,68 @@ def fetch_emsc_data(limit: int = 500) -> List[Dict]:
     return earthquakes
 
 
-def fetch_usgs_archive_full(years_back: int = ARCHIVE_FULL_YEARS_BACK) -> List[Dict]:
+def iter_usgs_archive_full(years_back: int = ARCHIVE_FULL_YEARS_BACK) -> Iterator[Dict]:
     """
-    USGS'ten yıllara bölerek tam arşiv çeker (10k+ deprem).
-    starttime/endtime ile chunked istek.
+    USGS tam arşivini yıl yıl normalize deprem olarak üretir (en yeni yıl önce).
+    Yıllar paralel çekilir (host limiti: FETCH_HOST_CONCURRENCY) ama bellekte en fazla
+    FETCH_WORKERS yıllık yanıt bulunur. ID dedup yapılmaz (tüketici yapar).
     """
     from datetime import datetime, timedelta
     now = datetime.utcnow()
-    all_eq = []
-    seen = set()
+    ranges = []
     for y in range(years_back):
         start = (now - timedelta(days=365 * (y + 1))).strftime('%Y-%m-%d')
         end = (now - timedelta(days=365 * y)).strftime('%Y-%m-%d')
-        url = f"{USGS_BASE}&starttime={start}&endtime={end}&limit=10000&orderby=time"
-        raw = _fetch_json(url, timeout=90)
+        ranges.append((start, end))
+    urls = [f"{USGS_BASE}&starttime={s}&endtime={e}&limit=10000&orderby=time" for s, e in ranges]
+    for (start, end), raw in zip(ranges, iter_json_many(urls, timeout=90)):
         data = raw.get('features', []) if isinstance(raw, dict) else []
+        print(f"[DATA_COLLECTOR] USGS arşiv {start}–{end}: +{len(data)}")
         for feat in data:
             if isinstance(feat, dict) and feat.get('type') == 'Feature':
                 norm = _normalize_usgs_feature(feat)
-                if norm and norm.get('earthquake_id') not in seen:
-                    seen.add(norm['earthquake_id'])
-                    all_eq.append(norm)
-        print(f"[DATA_COLLECTOR] USGS arşiv {start}–{end}: +{len(data)} (toplam {len(all_eq)})")
-        time.sleep(0.5)
+                if norm:
+                    yield norm
+
+
+def fetch_usgs_archive_full(years_back: int = ARCHIVE_FULL_YEARS_BACK) -> List[Dict]:
+    """
+    USGS'ten yıllara bölerek tam arşiv çeker (10k+ deprem).
+    starttime/endtime ile chunked istek; yıllar paralel çekilir (host limiti: FETCH_HOST_CONCURRENCY),
+    birleştirme yıl sırasıyla yapılır (çıktı sırası deterministik).
+    """
+    all_eq = []
+    seen = set()
+    for norm in iter_usgs_archive_full(years_back):
+        if norm.get('earthquake_id') not in seen:
+            seen.add(norm['earthquake_id'])
+            all_eq.append(norm)
+    print(f"[DATA_COLLECTOR] USGS arşiv toplam: {len(all_eq)}")
     return all_eq
 
 
+def iter_archive_full() -> Iterator[Dict]:
+    """
+    Tam arşiv akışı: Kandilli archive, sonra USGS yıllık chunk'lar (koordinatsız kayıtlar atlanır,
+    source eklenir). Liste oluşturmaz; dataset_manager.ingest_earthquakes ile sınırlı bellekte
+    içe aktarmak için. ID / spatio-temporal dedup içe aktarma aşamasında yapılır.
+    """
+    for default_source, stream in (('kandilli', fetch_archive_data(limit=ARCHIVE_LIMIT)),
+                                   ('usgs', iter_usgs_archive_full())):
+        for eq in stream:
+            if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
+                continue
+            if 'source' not in eq:
+                eq = eq.copy()
+                eq['source'] = default_source
+            yield eq
+
+
 def fetch_archive_full() -> List[Dict]:
     """
     Tam arşiv: Kandilli archive (limit artırılmış) + USGS yıllık chunk.
-    10k–50k+ deprem potansiyeli.
+    İki kaynak farklı host'larda olduğundan paralel çekilir.
+    10k–50k+ deprem potansiyeli (çok büyük içe aktarmalar için iter_archive_full).
     """
     all_eq = []
     seen = set()
@@ -263,22 +395,29 @@ def fetch_archive_full() -> List[Dict]:
                 eq.setdefault('source', default_source)
                 all_eq.append(eq)
 
-    # Kandilli archive (maksimum limit)
-    archive = fetch_archive_data(limit=ARCHIVE_LIMIT)
-    _add(archive, 'kandilli')
-    time.sleep(1)
-
-    # USGS tam arşiv (yıllara bölünmüş)
-    usgs_full = fetch_usgs_archive_full()
-    _add(usgs_full, 'usgs')
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        # Kandilli archive (maksimum limit) + USGS tam arşiv (yıllara bölünmüş)
+        archive_future = pool.submit(fetch_archive_data, ARCHIVE_LIMIT)
+        usgs_future = pool.submit(fetch_usgs_archive_full)
+        _add(archive_future.result(), 'kandilli')
+        _add(usgs_future.result(), 'usgs')
 
     print(f"[DATA_COLLECTOR] Tam arşiv toplam: {len(all_eq)} deprem")
     return all_eq
 
 
+def _fetch_kandilli_pair() -> List[Dict]:
+    """Kandilli live + archive (aynı host; paralel, host limiti içinde)."""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        live = pool.submit(fetch_live_data)
+        archive = pool.submit(fetch_archive_data)
+        return live.result() + archive.result()
+
+
 def fetch_all_multi_source() -> List[Dict]:
     """
     Tüm kaynaklardan veri çeker: Kandilli+AFAD (orhanaydogdu), USGS, EMSC.
+    Kaynaklar paralel çekilir; birleştirme sabit sırayla (Kandilli/AFAD → USGS → EMSC) yapılır.
     Duplicate eventID ile birleştirilir.
     
     Returns:
@@ -300,36 +439,27 @@ def fetch_all_multi_source() -> List[Dict]:
                     eq['timestamp'] = eq['created_at']
                 all_earthquakes.append(eq)
 
-    # 1. orhanaydogdu (Kandilli + AFAD birleşik)
-    try:
-        resp = _fetch_json(ORHANAYDOGDU_ALL_API)
-        if resp and resp.get('result'):
-            _merge(resp['result'], 'kandilli_afad')
-        else:
-            live = fetch_live_data()
-            archive = fetch_archive_data()
-            _merge(live + archive, 'kandilli')
-    except Exception as e:
-        print(f"[DATA_COLLECTOR] orhanaydogdu hatası: {e}")
-        live = fetch_live_data()
-        archive = fetch_archive_data()
-        _merge(live + archive, 'kandilli')
-
-    time.sleep(1)
-    # 2. USGS
-    try:
-        usgs = fetch_usgs_data()
-        _merge(usgs, 'usgs')
-    except Exception as e:
-        print(f"[DATA_COLLECTOR] USGS hatası: {e}")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        # 1. orhanaydogdu (Kandilli + AFAD birleşik), 2. USGS, 3. EMSC — aynı anda
+        combined_future = pool.submit(_fetch_json, ORHANAYDOGDU_ALL_API)
+        usgs_future = pool.submit(fetch_usgs_data)
+        emsc_future = pool.submit(fetch_emsc_data)
 
-    time.sleep(1)
-    # 3. EMSC
-    try:
-        emsc = fetch_emsc_data()
-        _merge(emsc, 'emsc')
-    except Exception as e:
-        print(f"[DATA_COLLECTOR] EMSC hatası: {e}")
+        try:
+            resp = combined_future.result()
+            if isinstance(resp, dict) and resp.get('result'):
+                _merge(resp['result'], 'kandilli_afad')
+            else:
+                _merge(_fetch_kandilli_pair(), 'kandilli')
+        except Exception as e:
+            print(f"[DATA_COLLECTOR] orhanaydogdu hatası: {e}")
+            _merge(_fetch_kandilli_pair(), 'kandilli')
+
+        for label, tag, future in (('USGS', 'usgs', usgs_future), ('EMSC', 'emsc', emsc_future)):
+            try:
+                _merge(future.result(), tag)
+            except Exception as e:
+                print(f"[DATA_COLLECTOR] {label} hatası: {e}")
 
     print(f"[DATA_COLLECTOR] Multi-source toplam: {len(all_earthquakes)} benzersiz deprem")
     return all_earthquakes
@@ -343,9 +473,12 @@ def fetch_all_kandilli_data() -> List[Dict]:
     Returns:
         Birleştirilmiş deprem verileri listesi
     """
-    live_data = fetch_live_data()
-    time.sleep(1)  # API'ye yük bindirmemek için
-    archive_data = fetch_archive_data()
+    # Aynı host: eşzamanlılık FETCH_HOST_CONCURRENCY ile sınırlı, bağlantı paylaşılır
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        live_future = pool.submit(fetch_live_data)
+        archive_future = pool.submit(fetch_archive_data)
+        live_data = live_future.result()
+        archive_data = archive_future.result()
     
     # Geçici ID seti ile duplicate'leri burada da filtreleyebiliriz
     all_earthquakes = []
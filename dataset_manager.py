@@ -1,20 +1,28 @@
 #!/usr/bin/env python3
 """
 dataset_manager.py
-earthquake_history.json dosyasının yönetimi.
+earthquake_history veri setinin yönetimi.
 Veri ekleme, duplicate kontrolü (eventID, timestamp, lat/lon), veri yükleme.
 Multi-source spatio-temporal dedup: distance<10km, time<60s, mag<0.2
+Depolama: event_store (sütunlu segment deposu, earthquake_history.store/).
+Eski earthquake_history.json varsa ilk erişimde (ve dosya değiştikçe) içe aktarılır.
 """
 
 import os
 import json
 import time
 import math
-from typing import List, Dict, Any, Set, Tuple, Optional
+from typing import List, Dict, Any, Set, Tuple, Optional, Iterable, Iterator
+
+import numpy as np
+
+import event_store
+import dedup_index
 
 # Varsayılan veri seti dosyası
 DEFAULT_DATASET_FILE = 'earthquake_history.json'
 MAX_RECORDS = 200000  # 100k+ archive için (collect_large_dataset.py)
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '5000'))  # ingest_earthquakes parti boyutu
 
 # Multi-source dedup eşikleri (aynı deprem = tek event)
 DEDUP_DISTANCE_KM = 10.0
@@ -64,23 +72,35 @@ def deduplicate_earthquakes(earthquakes: List[Dict]) -> List[Dict]:
     """
     Multi-source listesinden duplicate'leri kaldırır.
     Aynı event (distance<10km, time<60s, mag_diff<0.2) tek kayıt olarak tutulur.
+    Her deprem sadece komşu uzay-zaman hücrelerindeki tekil kayıtlarla karşılaştırılır
+    (dedup_index); ilk eşleşen tekil kayda birleştirilir.
     """
     if not earthquakes:
         return []
     unique = []
+    buckets: Dict[Tuple[int, int, int], List[int]] = {}
     for eq in earthquakes:
+        lat, lon, ts, _ = _get_eq_coords_ts_mag(eq)
         merged = False
-        for u in unique:
-            if _is_same_event(eq, u):
-                # Kaynakları birleştir
-                if 'sources' not in u:
-                    u['sources'] = [u.get('source', 'unknown')]
-                u['sources'] = list(set(u['sources'] + [eq.get('source', 'unknown')]))
-                merged = True
-                break
+        if lat is not None and ts:
+            candidates = []
+            for key in dedup_index.bucket_neighbors(lat, lon, ts, DEDUP_DISTANCE_KM, DEDUP_TIME_SEC):
+                candidates.extend(buckets.get(key, ()))
+            for ui in sorted(candidates):
+                u = unique[ui]
+                if _is_same_event(eq, u):
+                    # Kaynakları birleştir
+                    if 'sources' not in u:
+                        u['sources'] = [u.get('source', 'unknown')]
+                    u['sources'] = list(set(u['sources'] + [eq.get('source', 'unknown')]))
+                    merged = True
+                    break
         if not merged:
             eq = eq.copy()
             eq.setdefault('sources', [eq.get('source', 'unknown')])
+            if lat is not None and ts:
+                key = dedup_index.bucket_key(lat, lon, ts, DEDUP_DISTANCE_KM, DEDUP_TIME_SEC)
+                buckets.setdefault(key, []).append(len(unique))
             unique.append(eq)
     return unique
 
@@ -121,28 +141,131 @@ def _get_record_id(record: Dict) -> str:
     return str(id(record))
 
 
+def _split_records(data: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Kayıtları (ham depremler, diğer kayıtlar) olarak ayırır."""
+    events, others = [], []
+    for r in data:
+        if isinstance(r, dict) and r.get('geojson') and r['geojson'].get('coordinates'):
+            events.append(r)
+        elif isinstance(r, dict):
+            others.append(r)
+    return events, others
+
+
+def _record_kind(record: Dict) -> str:
+    """records.idx için kayıt türü (istatistikler parse etmeden hesaplanır)."""
+    if record.get('source') == 'synthetic':
+        return 'synthetic'
+    if 'y_m4_24h' in record:
+        return 'forecast'
+    if 'features' in record:
+        return 'training'
+    return 'other'
+
+
+def _record_key(record: Dict) -> str:
+    return f"{_record_kind(record)}\t{_get_record_id(record)}"
+
+
+def _append_event_records(store_dir: str, records: List[Dict]) -> int:
+    rows, kept = [], []
+    for rec in records:
+        row = event_store.event_row(rec, _get_earthquake_id(rec))
+        if row is not None:
+            rows.append(row)
+            kept.append(rec)
+    return event_store.append_events(store_dir, rows, kept, max_rows=MAX_RECORDS)
+
+
+def _import_legacy_json(filepath: str, store_dir: str) -> None:
+    """
+    Eski earthquake_history.json'ı depoya aktarır (ID bazlı, sadece eksik kayıtlar).
+    JSON dosyası yerinde bırakılır; başka bir script yeniden yazarsa tekrar içe aktarılır.
+    """
+    try:
+        mtime = os.path.getmtime(filepath)
+    except OSError:
+        return
+    if mtime == event_store.get_json_import_mtime(store_dir):
+        return
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"[DATASET_MANAGER] JSON içe aktarma hatası: {e}")
+        return
+    if not isinstance(data, list):
+        data = []
+    events, others = _split_records(data)
+    existing_ids = set(event_store.load_columns(store_dir)['id'].tolist())
+    new_events = []
+    for eq in events:
+        key = _id_key(_get_earthquake_id(eq))
+        if key not in existing_ids:
+            existing_ids.add(key)
+            new_events.append(eq)
+    existing_keys = set(event_store.load_record_keys(store_dir))
+    new_records, new_keys = [], []
+    for rec in others:
+        key = _record_key(rec)
+        if key not in existing_keys:
+            existing_keys.add(key)
+            new_records.append(rec)
+            new_keys.append(key)
+    if new_events:
+        _append_event_records(store_dir, new_events)
+    if new_records:
+        event_store.append_records(store_dir, new_records, new_keys, max_rows=MAX_RECORDS)
+    event_store.set_json_import_mtime(store_dir, mtime)
+    print(f"[DATASET_MANAGER] {filepath} içe aktarıldı: {len(new_events)} deprem, {len(new_records)} kayıt")
+
+
+def _open_store(filepath: str) -> str:
+    """Veri seti dosya yolu → depo klasörü (gerekirse eski JSON içe aktarılır)."""
+    store_dir = event_store.store_dir_for(filepath)
+    if os.path.exists(filepath):
+        _import_legacy_json(filepath, store_dir)
+    return store_dir
+
+
+def _id_key(rid: str) -> bytes:
+    """Kayıt ID → depodaki id sütunu biçimi (utf-8, EVENT_ID_LEN byte)."""
+    return str(rid).encode('utf-8')[:event_store.EVENT_ID_LEN]
+
+
+def dataset_exists(filepath: str = DEFAULT_DATASET_FILE) -> bool:
+    """Veri seti (depo veya eski JSON) var mı?"""
+    return os.path.exists(filepath) or event_store.store_exists(event_store.store_dir_for(filepath))
+
+
+def load_event_columns(filepath: str = DEFAULT_DATASET_FILE) -> np.ndarray:
+    """
+    Ham depremleri sütunlu olarak döndürür (memory-map, dict üretmeden).
+    Alanlar: id, lat, lon, depth, mag, timestamp (event_store.EVENT_DTYPE).
+    """
+    return event_store.load_columns(_open_store(filepath), max_rows=MAX_RECORDS)
+
+
 def load_dataset(filepath: str = DEFAULT_DATASET_FILE) -> List[Dict]:
     """
-    Veri seti dosyasını yükler.
+    Veri setini yükler (ham depremler + eğitim kayıtları).
     
     Args:
-        filepath: JSON dosya yolu
+        filepath: Veri seti yolu (earthquake_history.json; depo yanındaki .store klasörü)
     
     Returns:
-        Veri seti listesi (dosya yoksa boş liste)
+        Veri seti listesi (veri yoksa boş liste)
     """
-    if not os.path.exists(filepath):
+    if not dataset_exists(filepath):
         print(f"[DATASET_MANAGER] Dosya bulunamadı: {filepath}")
         return []
     
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if isinstance(data, list):
-            print(f"[DATASET_MANAGER] {len(data)} kayıt yüklendi")
-            return data
-        print("[DATASET_MANAGER] Geçersiz veri formatı")
-        return []
+        store_dir = _open_store(filepath)
+        data = list(event_store.iter_event_records(store_dir, max_rows=MAX_RECORDS))
+        data.extend(event_store.load_records(store_dir, max_rows=MAX_RECORDS))
+        print(f"[DATASET_MANAGER] {len(data)} kayıt yüklendi")
+        return data
     except Exception as e:
         print(f"[DATASET_MANAGER] Yükleme hatası: {e}")
         return []
@@ -180,49 +303,72 @@ def is_duplicate_spatiotemporal(record: Dict, existing_data: List[Dict]) -> bool
     return False
 
 
-def add_earthquakes(
-    earthquakes: List[Dict],
-    filepath: str = DEFAULT_DATASET_FILE,
-    source: str = 'kandilli'
-) -> Tuple[int, int]:
+def _load_dedup_index(store_dir: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Depo sütunları + kalıcı uzay-zaman indeksi (yeni segmentler artımlı eklenir)."""
+    columns = event_store.load_columns(store_dir)
+    manifest = event_store.load_manifest(store_dir)
+    index = dedup_index.load_store_index(store_dir, manifest, columns, DEDUP_DISTANCE_KM, DEDUP_TIME_SEC)
+    return columns, index
+
+
+def find_spatiotemporal_duplicates(earthquakes: List[Dict],
+                                   filepath: str = DEFAULT_DATASET_FILE) -> List[bool]:
     """
-    Yeni deprem verilerini veri setine ekler.
-    Duplicate: eventID + spatio-temporal (distance<10km, time<60s, mag<0.2)
-    
-    Returns:
-        (eklenen_sayisi, toplam_kayit)
+    Toplu spatio-temporal duplicate kontrolü (distance<10km, time<60s, mag_diff<0.2):
+    her deprem için veri setinde aynı event var mı? Sadece komşu hücre adayları kontrol edilir.
+    """
+    columns, index = _load_dedup_index(_open_store(filepath))
+    return _find_duplicates(earthquakes, columns, index).tolist()
+
+
+def _find_duplicates(earthquakes: List[Dict], columns: np.ndarray,
+                     index: Dict[str, np.ndarray]) -> np.ndarray:
+    q = [_get_eq_coords_ts_mag(eq) for eq in earthquakes]
+    has_coords = np.array([lat is not None for lat, _, _, _ in q], dtype=bool)
+    lats = np.array([lat if lat is not None else 0.0 for lat, _, _, _ in q], dtype=np.float64)
+    lons = np.array([lon if lon is not None else 0.0 for _, lon, _, _ in q], dtype=np.float64)
+    ts = np.array([t for _, _, t, _ in q], dtype=np.float64)
+    mags = np.array([m for _, _, _, m in q], dtype=np.float64)
+    ts[~has_coords] = 0.0  # koordinatsız kayıt hiçbir zaman duplicate sayılmaz
+    return dedup_index.find_duplicates(index, columns, lats, lons, ts, mags,
+                                       DEDUP_DISTANCE_KM, DEDUP_TIME_SEC, DEDUP_MAG_DIFF)
+
+
+def _add_batch(store_dir: str, earthquakes: List[Dict], source: str,
+               existing_ids: Set[bytes]) -> List[Dict]:
+    """
+    Tek parti: gelen listede multi-source dedup, depoya karşı ID + spatio-temporal kontrol,
+    yeni kayıtları tek segment olarak ekleme. existing_ids yerinde güncellenir.
+    Returns: eklenen kayıtlar
     """
     # Önce gelen listeyi multi-source dedup ile temizle
     earthquakes = deduplicate_earthquakes(earthquakes)
-    
-    existing_data = load_dataset(filepath)
-    existing_ids = get_existing_ids(existing_data)
-    
-    added = 0
+
+    columns, index = _load_dedup_index(store_dir)
+    earthquakes = [eq for eq in earthquakes if eq.get('geojson') and eq['geojson'].get('coordinates')]
+    # Gelen liste kendi içinde tekil (deduplicate_earthquakes); sadece depoya karşı kontrol yeterli
+    spatiotemporal_dup = _find_duplicates(earthquakes, columns, index)
+    del columns, index
+
     newly_added = []
-    for eq in earthquakes:
-        if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
-            continue
-        
+    for eq, st_dup in zip(earthquakes, spatiotemporal_dup):
         # Duplicate: ID veya spatio-temporal
-        if is_duplicate(eq, existing_ids):
+        if _id_key(_get_record_id(eq)) in existing_ids:
             continue
-        if is_duplicate_spatiotemporal(eq, existing_data):
+        if st_dup:
             continue
-        
+
         record = eq.copy()
         record['source'] = eq.get('source', source) if source == 'multi' else source
         record['collected_at'] = time.time()
         if 'timestamp' not in record and 'created_at' in record:
             record['timestamp'] = record['created_at']
-        
-        existing_data.append(record)
-        existing_ids.add(_get_record_id(record))
+
+        existing_ids.add(_id_key(_get_record_id(record)))
         newly_added.append(record)
-        added += 1
-    
-    if added > 0:
-        # Opsiyonel: PostgreSQL'e de yaz (DATABASE_URL varsa)
+
+    if newly_added:
+        # Veritabanına da yaz (DATABASE_URL varsa PostgreSQL, yoksa SQLite; DB_BACKEND=none ile kapalı)
         try:
             from db_store import is_db_available, add_earthquakes_db
             if is_db_available():
@@ -230,15 +376,154 @@ def add_earthquakes(
         except ImportError:
             pass
 
-        # Maksimum kayıt limiti
-        if len(existing_data) > MAX_RECORDS:
-            existing_data = existing_data[-MAX_RECORDS:]
-            print(f"[DATASET_MANAGER] Veri seti {MAX_RECORDS} kayıtla sınırlandırıldı")
-        
-        save_dataset(existing_data, filepath)
-        print(f"[DATASET_MANAGER] {added} yeni deprem verisi eklendi. Toplam: {len(existing_data)}")
+        _append_event_records(store_dir, newly_added)
+        _load_dedup_index(store_dir)  # yeni segmenti indekse ekle ve diske yaz
+    return newly_added
+
+
+def add_earthquakes(
+    earthquakes: List[Dict],
+    filepath: str = DEFAULT_DATASET_FILE,
+    source: str = 'kandilli'
+) -> Tuple[int, int]:
+    """
+    Yeni deprem verilerini veri setine ekler.
+    Duplicate: eventID + spatio-temporal (distance<10km, time<60s, mag<0.2)
+    Sadece yeni kayıtlar yeni bir segment olarak yazılır (tüm dosya yeniden yazılmaz).
+    Çok büyük / akış halindeki girdiler için ingest_earthquakes.
     
-    return added, len(existing_data)
+    Returns:
+        (eklenen_sayisi, toplam_kayit)
+    """
+    store_dir = _open_store(filepath)
+    existing_ids = set(event_store.load_columns(store_dir)['id'].tolist())
+    added = len(_add_batch(store_dir, earthquakes, source, existing_ids))
+    total = _total_records(store_dir)
+    if added > 0:
+        print(f"[DATASET_MANAGER] {added} yeni deprem verisi eklendi. Toplam: {total}")
+    return added, total
+
+
+def _iter_batches(items: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_earthquakes(
+    earthquakes: Iterable[Dict],
+    filepath: str = DEFAULT_DATASET_FILE,
+    source: str = 'multi',
+    batch_size: int = INGEST_BATCH_SIZE
+) -> Tuple[int, int]:
+    """
+    Akış (generator) halindeki depremleri sabit boyutlu partilerle içe aktarır:
+    fetch (generator) → normalize/dedup (parti içi) → depoya karşı dedup → segment append.
+    Bellekte aynı anda tek parti + depo sütunları (memory-map) + depo ID seti bulunur;
+    girdi boyutundan bağımsızdır (500k+ arşiv). Sonuç add_earthquakes ile partiler sırayla
+    çağrılmış gibidir (önceki partide eklenen kayıt sonraki partide duplicate sayılır).
+    
+    Returns:
+        (eklenen_sayisi, toplam_kayit)
+    """
+    store_dir = _open_store(filepath)
+    existing_ids = set(event_store.load_columns(store_dir)['id'].tolist())
+    added = seen = 0
+    id_limit = int(MAX_RECORDS * (1 + event_store.TRIM_SLACK_RATIO)) + int(batch_size)
+    for batch in _iter_batches(earthquakes, max(1, int(batch_size))):
+        seen += len(batch)
+        added += len(_add_batch(store_dir, batch, source, existing_ids))
+        del batch
+        if len(existing_ids) > id_limit:
+            # Depo MAX_RECORDS'a kırpıldı: ID seti depodakilerle sınırlanır
+            existing_ids = set(event_store.load_columns(store_dir)['id'].tolist())
+    total = _total_records(store_dir)
+    print(f"[DATASET_MANAGER] Akış içe aktarma: {seen} deprem işlendi, {added} eklendi. Toplam: {total}")
+    return added, total
+
+
+def _db_covers_store(store_dir: str) -> bool:
+    """Aktif DB backend'i depodaki tüm ham depremleri içeriyor mu (satır sayısıyla)?"""
+    try:
+        from db_store import count_events_db
+    except ImportError:
+        return False
+    events = event_store.get_counts(store_dir)['events']
+    db_count = count_events_db()
+    return events > 0 and db_count is not None and db_count >= events
+
+
+def sync_db_from_store(filepath: str = DEFAULT_DATASET_FILE, chunk_size: int = 50000) -> int:
+    """
+    DB depodan geride kalmışsa (sonradan açılan backend) depodaki ham depremleri parça parça DB'ye
+    yazar (event_id çakışanlar atlanır). Returns: eklenen satır.
+    """
+    try:
+        from db_store import is_db_available, add_earthquakes_db
+    except ImportError:
+        return 0
+    if not is_db_available() or not dataset_exists(filepath):
+        return 0
+    store_dir = _open_store(filepath)
+    if _db_covers_store(store_dir):
+        return 0
+    columns = load_event_columns(filepath)
+    added = 0
+    for start in range(0, len(columns), chunk_size):
+        batch = [
+            {
+                'earthquake_id': row['id'].decode('utf-8', 'ignore'),
+                'mag': float(row['mag']), 'depth': float(row['depth']), 'timestamp': float(row['timestamp']),
+                'geojson': {'type': 'Point', 'coordinates': [float(row['lon']), float(row['lat'])]},
+            }
+            for row in columns[start:start + chunk_size]
+        ]
+        added += add_earthquakes_db(batch)[0]
+    print(f"[DATASET_MANAGER] DB depodan eşitlendi: {added} deprem eklendi")
+    return added
+
+
+def load_recent_earthquakes(filepath: str = DEFAULT_DATASET_FILE, limit: int = 50000) -> List[Dict]:
+    """
+    Depodaki en yeni `limit` depremi (zaman sırasıyla) hafif dict olarak döndürür
+    (mag, depth, timestamp, geojson; depodan okunursa earthquake_id). DB backend'i depoyu kapsıyorsa
+    idx_eq_timestamp ile DB'den (query_events_db), değilse depo sütunlarından okunur.
+    """
+    if dataset_exists(filepath) and _db_covers_store(_open_store(filepath)):
+        from db_store import query_events_db
+        cols = query_events_db(limit=limit)
+        if len(cols['timestamp']):
+            return [
+                {'mag': m, 'depth': d, 'timestamp': t, 'geojson': {'type': 'Point', 'coordinates': [lo, la]}}
+                for la, lo, m, d, t in zip(cols['lat'].tolist(), cols['lon'].tolist(), cols['mag'].tolist(),
+                                           cols['depth'].tolist(), cols['timestamp'].tolist())
+            ]
+    columns = load_event_columns(filepath)
+    if len(columns) == 0:
+        return []
+    ts = np.asarray(columns['timestamp'])
+    order = np.argsort(ts, kind='stable')[-int(limit):] if limit else np.argsort(ts, kind='stable')
+    out = []
+    for i in order:
+        row = columns[i]
+        out.append({
+            'earthquake_id': row['id'].decode('utf-8', 'ignore'),
+            'mag': float(row['mag']),
+            'depth': float(row['depth']),
+            'timestamp': float(row['timestamp']),
+            'geojson': {'type': 'Point', 'coordinates': [float(row['lon']), float(row['lat'])]},
+        })
+    return out
+
+
+def _total_records(store_dir: str) -> int:
+    counts = event_store.get_counts(store_dir)
+    return min(counts['events'], MAX_RECORDS) + min(counts['records'], MAX_RECORDS)
 
 
 def add_training_records(
@@ -255,10 +540,11 @@ def add_training_records(
     Returns:
         (eklenen_sayisi, toplam_kayit)
     """
-    existing_data = load_dataset(filepath)
-    existing_ids = get_existing_ids(existing_data)
+    store_dir = _open_store(filepath)
+    existing_ids = {k.split('\t', 1)[-1] for k in event_store.load_record_keys(store_dir, max_rows=MAX_RECORDS)}
     
     added = 0
+    new_records, new_keys = [], []
     for rec in records:
         if 'features' not in rec or 'risk_score' not in rec:
             continue
@@ -266,29 +552,39 @@ def add_training_records(
             continue
         
         rec['timestamp'] = rec.get('timestamp', time.time())
-        existing_data.append(rec)
         existing_ids.add(_get_record_id(rec))
+        new_records.append(rec)
+        new_keys.append(_record_key(rec))
         added += 1
     
     if added > 0:
-        if len(existing_data) > MAX_RECORDS:
-            existing_data = existing_data[-MAX_RECORDS:]
-        save_dataset(existing_data, filepath)
-        print(f"[DATASET_MANAGER] {added} eğitim kaydı eklendi. Toplam: {len(existing_data)}")
+        event_store.append_records(store_dir, new_records, new_keys, max_rows=MAX_RECORDS)
+        total = _total_records(store_dir)
+        print(f"[DATASET_MANAGER] {added} eğitim kaydı eklendi. Toplam: {total}")
+        return added, total
     
-    return added, len(existing_data)
+    return added, _total_records(store_dir)
 
 
 def save_dataset(data: List[Dict], filepath: str = DEFAULT_DATASET_FILE) -> bool:
     """
-    Veri setini dosyaya kaydeder.
+    Veri setini baştan yazar (tüm içerik verilen liste olur).
     
     Returns:
         Başarılı ise True
     """
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        store_dir = _open_store(filepath)
+        events, others = _split_records(data)
+        events = events[-MAX_RECORDS:]
+        others = others[-MAX_RECORDS:]
+        rows, kept = [], []
+        for eq in events:
+            row = event_store.event_row(eq, _get_earthquake_id(eq))
+            if row is not None:
+                rows.append(row)
+                kept.append(eq)
+        event_store.rewrite_store(store_dir, rows, kept, others, [_record_key(r) for r in others])
         return True
     except Exception as e:
         print(f"[DATASET_MANAGER] Kaydetme hatası: {e}")
@@ -307,11 +603,15 @@ def get_training_records(filepath: str = DEFAULT_DATASET_FILE,
     - features + risk_score içeren kayıtlar
     - expand_raw_to_training: Ham deprem verisinden şehir bazlı eğitim kaydı üret
     """
-    data = load_dataset(filepath)
-    training = [r for r in data if 'features' in r and 'risk_score' in r]
+    if not dataset_exists(filepath):
+        print(f"[DATASET_MANAGER] Dosya bulunamadı: {filepath}")
+        return []
+    store_dir = _open_store(filepath)
+    records = event_store.load_records(store_dir, max_rows=MAX_RECORDS)
+    training = [r for r in records if 'features' in r and 'risk_score' in r]
 
     # Ham deprem verisinden ek eğitim kaydı oluştur - TÜM VERİYİ KULLAN (zaman pencereli)
-    raw_eqs = get_raw_earthquakes(data)
+    raw_eqs = list(event_store.iter_event_records(store_dir, max_rows=MAX_RECORDS))
     if expand_raw_to_training and raw_eqs:
         try:
             from earthquake_features import create_training_records_from_earthquakes
@@ -328,29 +628,34 @@ def get_training_records(filepath: str = DEFAULT_DATASET_FILE,
 
 def get_forecast_records_from_dataset(filepath: str = DEFAULT_DATASET_FILE) -> List[Dict]:
     """Forecast eğitimi için y_m4_24h, y_m5_72h vb. hedefleri içeren kayıtları döndürür."""
-    if not os.path.exists(filepath):
+    if not dataset_exists(filepath):
         return []
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        records = event_store.load_records(_open_store(filepath), max_rows=MAX_RECORDS)
     except Exception:
         return []
-    return [r for r in data if isinstance(r, dict) and "features" in r and "y_m4_24h" in r]
+    return [r for r in records if isinstance(r, dict) and "features" in r and "y_m4_24h" in r]
+
+
+def get_dataset_size_bytes(filepath: str = DEFAULT_DATASET_FILE) -> int:
+    """Depo klasörünün disk boyutu (byte)."""
+    return event_store.get_store_size_bytes(event_store.store_dir_for(filepath))
 
 
 def get_dataset_stats(filepath: str = DEFAULT_DATASET_FILE) -> Dict[str, Any]:
-    """Veri seti istatistiklerini döndürür."""
-    data = load_dataset(filepath)
-    training_count = sum(1 for r in data if 'features' in r)
-    earthquake_count = sum(1 for r in data if 'geojson' in r or r.get('source') == 'kandilli')
-    synthetic_count = sum(1 for r in data if r.get('source') == 'synthetic')
+    """Veri seti istatistiklerini döndürür (manifest + records.idx; kayıtlar parse edilmez)."""
+    store_dir = _open_store(filepath)
+    counts = event_store.get_counts(store_dir)
+    keys = event_store.load_record_keys(store_dir, max_rows=MAX_RECORDS)
+    kinds = [k.split('\t', 1)[0] for k in keys]
+    earthquake_count = min(counts['events'], MAX_RECORDS)
+    training_count = sum(1 for k in kinds if k in ('training', 'forecast', 'synthetic'))
+    synthetic_count = sum(1 for k in kinds if k == 'synthetic')
     
-    file_size = 0
-    if os.path.exists(filepath):
-        file_size = os.path.getsize(filepath) / 1024  # KB
+    file_size = get_dataset_size_bytes(filepath) / 1024  # KB
     
     return {
-        'total_records': len(data),
+        'total_records': earthquake_count + len(keys),
         'training_records': training_count,
         'earthquake_raw': earthquake_count,
         'synthetic': synthetic_count,
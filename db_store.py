@@ -1,133 +1,408 @@
 #!/usr/bin/env python3
 """
 db_store.py
-PostgreSQL opsiyonel desteği - veri büyüyünce JSON yerine DB.
-Tablo: earthquakes (id, timestamp, lat, lon, depth, mag, source)
-Kullanım: DATABASE_URL env varsa DB, yoksa JSON (dataset_manager).
+Deprem veritabanı katmanı: PostgreSQL veya SQLite (kurulumsuz, tek dosya).
+Tablo: earthquakes (id, timestamp, lat, lon, depth, mag, source, event_id UNIQUE)
+Backend seçimi: DB_BACKEND env (postgres | sqlite | none); verilmezse DATABASE_URL varsa
+PostgreSQL, yoksa SQLite (SQLITE_PATH, kurulum gerektirmez). DB_BACKEND=none ile kapatılır.
+dataset_manager yeni depremleri aktif backend'e de yazar; DB depoyu kapsıyorsa en yeni N deprem
+(load_recent_earthquakes) indeksli sorguyla DB'den okunur.
+- PostgreSQL: süreç başına tek bağlantı havuzu (ThreadedConnectionPool); toplu yazım COPY ile
+  geçici tabloya, oradan tek INSERT ... ON CONFLICT ile asıl tabloya.
+- SQLite: thread başına bağlantı, WAL modu; toplu yazım executemany + INSERT OR IGNORE; toplam satır
+  sayısı dosya başına bir kez sayılıp eklenenlerle güncellenir (parti başına COUNT(*) yok).
+Okuma (query_events_db) iki backend'de aynı: filtreler SQL'e itilir, sonuç sütunlu NumPy dizileri.
 """
 
 import os
-from typing import List, Dict, Any, Optional, Tuple
+import io
+import csv
+import math
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+import numpy as np
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 USE_DB = bool(DATABASE_URL)
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '5'))
+DB_COPY_CHUNK = 50000  # Tek COPY / executemany partisindeki satır (bellek sınırı)
+DB_BACKEND = os.environ.get('DB_BACKEND', '').strip().lower() or None
+SQLITE_PATH = os.environ.get(
+    'SQLITE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'earthquakes.sqlite3'),
+)
 
 # psycopg2 veya sqlalchemy
 try:
     import psycopg2
+    import psycopg2.pool
     HAS_PG = True
 except ImportError:
     HAS_PG = False
 
+_EVENT_FIELDS = ('timestamp', 'lat', 'lon', 'depth', 'mag', 'source', 'event_id')
+# Sorgu sonucu sütunları (query_events_db); dizi çıktısı forecast.features.EVENT_COLUMNS sırasında
+QUERY_COLUMNS = ('timestamp', 'lat', 'lon', 'depth', 'mag')
+ARRAY_COLUMNS = ('lat', 'lon', 'mag', 'depth', 'timestamp')
+KM_PER_DEG_LAT = 111.19  # R=6371 km
+
+# Süreç başına bağlantı havuzu + şema durumu
+_POOL: Dict[str, Any] = {'pool': None, 'url': None, 'schema_ready': False, 'lock': threading.Lock()}
+# Thread başına SQLite bağlantısı (sqlite3 bağlantıları thread'ler arası paylaşılmaz)
+_SQLITE_LOCAL = threading.local()
+# SQLite dosyası -> satır sayısı (ilk yazımda bir kez COUNT(*), sonra eklenenlerle; diğer süreçlerin
+# yazımları sayılmaz, PostgreSQL'deki pg_class tahmini gibi yaklaşık)
+_SQLITE_ROWS: Dict[str, Any] = {'lock': threading.Lock(), 'counts': {}}
+
+_SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS earthquakes (
+        id INTEGER PRIMARY KEY,
+        timestamp REAL NOT NULL,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL,
+        depth REAL DEFAULT 10,
+        mag REAL DEFAULT 0,
+        source TEXT,
+        event_id TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_eq_event_id ON earthquakes(event_id);
+    CREATE INDEX IF NOT EXISTS idx_eq_timestamp ON earthquakes(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_eq_lat_lon ON earthquakes(lat, lon);
+"""
+
+
+def get_backend() -> str:
+    """Aktif backend: 'postgres', 'sqlite' veya 'none'."""
+    if DB_BACKEND:
+        return DB_BACKEND
+    return 'postgres' if DATABASE_URL else 'sqlite'
 
-def _get_conn():
-    """PostgreSQL bağlantısı."""
+
+def _get_pool():
+    """ThreadedConnectionPool (ilk çağrıda kurulur; DATABASE_URL değişirse yeniden)."""
     if not HAS_PG or not DATABASE_URL:
         return None
+    pool = _POOL['pool']
+    if pool is not None and _POOL['url'] == DATABASE_URL:
+        return pool
+    with _POOL['lock']:
+        if _POOL['pool'] is not None and _POOL['url'] != DATABASE_URL:
+            close_pool()
+        if _POOL['pool'] is None:
+            try:
+                _POOL['pool'] = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, max(DB_POOL_MIN, DB_POOL_MAX), DATABASE_URL
+                )
+                _POOL['url'] = DATABASE_URL
+            except Exception as e:
+                print(f"[DB] Bağlantı hatası: {e}")
+                return None
+        return _POOL['pool']
+
+
+def close_pool() -> None:
+    """Havuzdaki tüm bağlantıları ve bu thread'in SQLite bağlantısını kapatır (testler ve kapanış için)."""
+    conn = getattr(_SQLITE_LOCAL, 'conn', None)
+    _SQLITE_LOCAL.conn = None
+    _SQLITE_LOCAL.path = None
+    if conn is not None:
+        conn.close()
+    with _SQLITE_ROWS['lock']:
+        _SQLITE_ROWS['counts'].clear()
+    pool = _POOL['pool']
+    _POOL['pool'] = None
+    _POOL['url'] = None
+    _POOL['schema_ready'] = False
+    if pool is not None:
+        try:
+            pool.closeall()
+        except Exception:
+            pass
+
+
+@contextmanager
+def _connection() -> Iterator[Any]:
+    """
+    Havuzdan bağlantı: başarıda commit, hatada rollback; bağlantı her durumda havuza döner.
+    DB yoksa None verir.
+    """
+    pool = _get_pool()
+    if pool is None:
+        yield None
+        return
+    conn = pool.getconn()
+    broken = False
     try:
-        return psycopg2.connect(DATABASE_URL)
-    except Exception as e:
-        print(f"[DB] Bağlantı hatası: {e}")
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(getattr(conn, 'closed', 0)))
+
+
+@contextmanager
+def _sqlite_connection() -> Iterator[sqlite3.Connection]:
+    """
+    Bu thread'in SQLite bağlantısı (ilk kullanımda açılır: WAL, şema); başarıda commit, hatada rollback.
+    SQLITE_PATH değişirse yeniden açılır.
+    """
+    conn = getattr(_SQLITE_LOCAL, 'conn', None)
+    if conn is None or getattr(_SQLITE_LOCAL, 'path', None) != SQLITE_PATH:
+        if conn is not None:
+            conn.close()
+        folder = os.path.dirname(SQLITE_PATH)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SQLITE_SCHEMA)
+        _SQLITE_LOCAL.conn = conn
+        _SQLITE_LOCAL.path = SQLITE_PATH
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _fetchall(sql: str, params: List[Any]) -> Optional[List[tuple]]:
+    """Aktif backend'de SELECT (SQL '%s' yer tutucularıyla yazılır); DB yoksa None."""
+    backend = get_backend()
+    if backend == 'sqlite':
+        with _sqlite_connection() as conn:
+            return conn.execute(sql.replace('%s', '?'), params).fetchall()
+    if backend != 'postgres':
         return None
+    with _connection() as conn:
+        if conn is None:
+            return None
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+
+def _create_schema(cur) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS earthquakes (
+            id SERIAL PRIMARY KEY,
+            timestamp DOUBLE PRECISION NOT NULL,
+            lat DOUBLE PRECISION NOT NULL,
+            lon DOUBLE PRECISION NOT NULL,
+            depth DOUBLE PRECISION DEFAULT 10,
+            mag DOUBLE PRECISION DEFAULT 0,
+            source VARCHAR(50),
+            event_id VARCHAR(255) UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_eq_timestamp ON earthquakes(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_eq_lat_lon ON earthquakes(lat, lon);
+    """)
 
 
 def init_schema(conn=None) -> bool:
-    """earthquakes tablosunu oluşturur."""
+    """earthquakes tablosunu oluşturur (süreç başına bir kez; verilen bağlantı kapatılmaz)."""
+    if get_backend() == 'sqlite' and conn is None:
+        try:
+            with _sqlite_connection():
+                return True
+        except Exception as e:
+            print(f"[DB] Schema hatası: {e}")
+            return False
     if not HAS_PG:
         return False
-    conn = conn or _get_conn()
-    if not conn:
-        return False
+    if _POOL['schema_ready'] and _POOL['url'] == DATABASE_URL:
+        return True
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS earthquakes (
-                    id SERIAL PRIMARY KEY,
-                    timestamp DOUBLE PRECISION NOT NULL,
-                    lat DOUBLE PRECISION NOT NULL,
-                    lon DOUBLE PRECISION NOT NULL,
-                    depth DOUBLE PRECISION DEFAULT 10,
-                    mag DOUBLE PRECISION DEFAULT 0,
-                    source VARCHAR(50),
-                    event_id VARCHAR(255) UNIQUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                CREATE INDEX IF NOT EXISTS idx_eq_timestamp ON earthquakes(timestamp);
-                CREATE INDEX IF NOT EXISTS idx_eq_lat_lon ON earthquakes(lat, lon);
-            """)
-        conn.commit()
+        if conn is not None:
+            with conn.cursor() as cur:
+                _create_schema(cur)
+            conn.commit()
+        else:
+            with _connection() as pooled:
+                if pooled is None:
+                    return False
+                with pooled.cursor() as cur:
+                    _create_schema(cur)
+        _POOL['schema_ready'] = True
         return True
     except Exception as e:
         print(f"[DB] Schema hatası: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
+
+
+def _event_rows(earthquakes: List[Dict]) -> List[tuple]:
+    """Deprem kayıtları → (timestamp, lat, lon, depth, mag, source, event_id); koordinatsız atlanır."""
+    rows = []
+    for eq in earthquakes:
+        if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
+            continue
+        lon, lat = eq['geojson']['coordinates'][:2]
+        ts = eq.get('timestamp') or eq.get('created_at') or 0
+        try:
+            ts = float(ts)
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            continue
+        if ts > 1e12:
+            ts = ts / 1000.0
+        depth = float(eq.get('depth', 10) or 10)
+        mag = float(eq.get('mag', 0) or 0)
+        source = str(eq.get('source', 'unknown'))[:50]
+        eid = eq.get('earthquake_id') or eq.get('eventID') or f"{lat:.4f}_{lon:.4f}_{ts}"
+        rows.append((ts, lat, lon, depth, mag, source, str(eid)[:255]))
+    return rows
+
+
+def _copy_buffer(rows: List[tuple]) -> io.StringIO:
+    """COPY ... FROM STDIN (FORMAT csv) girdisi; virgül/tırnak içeren alanlar csv ile kaçırılır."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    for r in rows:
+        writer.writerow((repr(r[0]), repr(r[1]), repr(r[2]), repr(r[3]), repr(r[4]), r[5], r[6]))
+    buf.seek(0)
+    return buf
+
+
+def _estimated_total(cur) -> int:
+    """Tablo satır sayısı: planner istatistiği (tam COUNT(*) taraması yapmaz); istatistik yoksa COUNT."""
+    cur.execute("SELECT reltuples::BIGINT FROM pg_class WHERE oid = 'earthquakes'::regclass")
+    row = cur.fetchone()
+    if row and row[0] is not None and row[0] >= 0:
+        return int(row[0])
+    cur.execute("SELECT COUNT(*) FROM earthquakes")
+    return int(cur.fetchone()[0])
 
 
 def add_earthquakes_db(earthquakes: List[Dict]) -> Tuple[int, int]:
     """
-    Depremleri DB'ye ekler. Duplicate event_id atlanır.
+    Depremleri aktif backend'e toplu ekler. Duplicate event_id atlanır.
     Returns: (eklenen, toplam)
     """
-    if not HAS_PG or not DATABASE_URL:
+    if not is_db_available():
         return 0, 0
-    conn = _get_conn()
-    if not conn:
+    rows = _event_rows(earthquakes)
+    if not rows:
         return 0, 0
+    if get_backend() == 'sqlite':
+        return _add_rows_sqlite(rows)
+    return _add_rows_pg(rows)
+
+
+def _sqlite_total(conn: sqlite3.Connection, path: str) -> int:
+    """Dosyanın bilinen satır sayısı; bu süreçte ilk kez soruluyorsa bir kez COUNT(*)."""
+    with _SQLITE_ROWS['lock']:
+        if path in _SQLITE_ROWS['counts']:
+            return _SQLITE_ROWS['counts'][path]
+    total = int(conn.execute("SELECT COUNT(*) FROM earthquakes").fetchone()[0])
+    with _SQLITE_ROWS['lock']:
+        return _SQLITE_ROWS['counts'].setdefault(path, total)
+
+
+def count_events_db() -> Optional[int]:
+    """
+    Aktif backend'deki deprem sayısı (SQLite: süreç içi sayaç, PostgreSQL: pg_class tahmini);
+    DB yoksa / hata olursa None.
+    """
+    if not is_db_available():
+        return None
     try:
-        init_schema(conn)
-        rows = []
-        for eq in earthquakes:
-            if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
-                continue
-            lon, lat = eq['geojson']['coordinates']
-            ts = eq.get('timestamp') or eq.get('created_at') or 0
-            depth = float(eq.get('depth', 10) or 10)
-            mag = float(eq.get('mag', 0) or 0)
-            source = eq.get('source', 'unknown')
-            eid = eq.get('earthquake_id') or eq.get('eventID') or f"{lat:.4f}_{lon:.4f}_{ts}"
-            rows.append((ts, lat, lon, depth, mag, source, eid))
-        if not rows:
-            return 0, 0
-        added = 0
-        with conn.cursor() as cur:
-            for r in rows:
-                try:
-                    cur.execute("""
-                        INSERT INTO earthquakes (timestamp, lat, lon, depth, mag, source, event_id)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (event_id) DO NOTHING
-                    """, r)
-                    added += cur.rowcount
-                except Exception:
-                    pass
-        conn.commit()
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM earthquakes")
-            total = cur.fetchone()[0]
-        return added, total
+        if get_backend() == 'sqlite':
+            with _sqlite_connection() as conn:
+                return _sqlite_total(conn, SQLITE_PATH)
+        with _connection() as conn:
+            if conn is None:
+                return None
+            init_schema(conn)
+            with conn.cursor() as cur:
+                return _estimated_total(cur)
+    except Exception as e:
+        print(f"[DB] Sayım hatası: {e}")
+        return None
+
+
+def _add_rows_sqlite(rows: List[tuple]) -> Tuple[int, int]:
+    """executemany + INSERT OR IGNORE (UNIQUE event_id); tek işlemde, DB_COPY_CHUNK'lık partiler."""
+    columns = ', '.join(_EVENT_FIELDS)
+    sql = f"INSERT OR IGNORE INTO earthquakes ({columns}) VALUES ({', '.join('?' * len(_EVENT_FIELDS))})"
+    try:
+        with _sqlite_connection() as conn:
+            path = SQLITE_PATH
+            base = _sqlite_total(conn, path)
+            before = conn.total_changes
+            for i in range(0, len(rows), DB_COPY_CHUNK):
+                conn.executemany(sql, rows[i:i + DB_COPY_CHUNK])
+            added = conn.total_changes - before
+        with _SQLITE_ROWS['lock']:
+            counts = _SQLITE_ROWS['counts']
+            counts[path] = counts.get(path, base) + added
+            total = counts[path]
+        return added, int(total)
+    except Exception as e:
+        print(f"[DB] Insert hatası: {e}")
+        return 0, 0
+
+
+def _add_rows_pg(rows: List[tuple]) -> Tuple[int, int]:
+    """
+    Satırlar COPY ile geçici tabloya yüklenir, tek INSERT ... SELECT ... ON CONFLICT DO NOTHING
+    ile birleştirilir; eklenen sayı birleştirmenin rowcount'u.
+    Toplam pg_class istatistiğinden (yaklaşık).
+    """
+    columns = ', '.join(_EVENT_FIELDS)
+    try:
+        with _connection() as conn:
+            if conn is None:
+                return 0, 0
+            init_schema(conn)
+            with conn.cursor() as cur:
+                # Havuzdaki bağlantıda kalıcı geçici tablo; her commit'te boşalır
+                cur.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS earthquakes_stage (
+                        timestamp DOUBLE PRECISION, lat DOUBLE PRECISION, lon DOUBLE PRECISION,
+                        depth DOUBLE PRECISION, mag DOUBLE PRECISION,
+                        source VARCHAR(50), event_id VARCHAR(255)
+                    ) ON COMMIT DELETE ROWS
+                """)
+                for i in range(0, len(rows), DB_COPY_CHUNK):
+                    cur.copy_expert(
+                        f"COPY earthquakes_stage ({columns}) FROM STDIN WITH (FORMAT csv)",
+                        _copy_buffer(rows[i:i + DB_COPY_CHUNK]),
+                    )
+                cur.execute(f"""
+                    INSERT INTO earthquakes ({columns})
+                    SELECT DISTINCT ON (event_id) {columns} FROM earthquakes_stage
+                    ORDER BY event_id
+                    ON CONFLICT (event_id) DO NOTHING
+                """)
+                added = max(cur.rowcount, 0)
+                total = _estimated_total(cur)
+            return added, max(total, added)
     except Exception as e:
         print(f"[DB] Insert hatası: {e}")
         return 0, 0
-    finally:
-        conn.close()
 
 
 def get_raw_earthquakes_db(limit: int = 50000) -> List[Dict]:
     """DB'den ham deprem listesi (geojson formatında)."""
-    if not HAS_PG or not DATABASE_URL:
-        return []
-    conn = _get_conn()
-    if not conn:
+    if not is_db_available():
         return []
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT timestamp, lat, lon, depth, mag, source, event_id
-                FROM earthquakes ORDER BY timestamp DESC LIMIT %s
-            """, (limit,))
-            rows = cur.fetchall()
+        rows = _fetchall("""
+            SELECT timestamp, lat, lon, depth, mag, source, event_id
+            FROM earthquakes ORDER BY timestamp DESC LIMIT %s
+        """, [limit]) or []
         return [
             {
                 'timestamp': r[0], 'created_at': r[0],
@@ -140,10 +415,112 @@ def get_raw_earthquakes_db(limit: int = 50000) -> List[Dict]:
     except Exception as e:
         print(f"[DB] Select hatası: {e}")
         return []
-    finally:
-        conn.close()
+
+
+def _radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Merkez + yarıçapı kapsayan bbox (lat_min, lat_max, lon_min, lon_max); indeks ön filtresi."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    cos_lat = math.cos(math.radians(min(89.0, abs(lat) + dlat)))
+    dlon = 180.0 if cos_lat <= 1e-6 else min(180.0, radius_km / (KM_PER_DEG_LAT * cos_lat))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def _build_event_query(bbox: Optional[Tuple[float, float, float, float]] = None,
+                       start_ts: Optional[float] = None, end_ts: Optional[float] = None,
+                       min_mag: Optional[float] = None, limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """
+    Filtreli SELECT (parametreli). Zaman aralığı [start_ts, end_ts) idx_eq_timestamp ile,
+    bbox idx_eq_lat_lon ile daraltılır; sonuç zaman sırasında (limit: en yeni N).
+    """
+    where, params = [], []
+    if start_ts is not None:
+        where.append("timestamp >= %s")
+        params.append(float(start_ts))
+    if end_ts is not None:
+        where.append("timestamp < %s")
+        params.append(float(end_ts))
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = (float(v) for v in bbox)
+        where.append("lat BETWEEN %s AND %s AND lon BETWEEN %s AND %s")
+        params.extend([lat_min, lat_max, lon_min, lon_max])
+    if min_mag is not None:
+        where.append("mag >= %s")
+        params.append(float(min_mag))
+    sql = f"SELECT {', '.join(QUERY_COLUMNS)} FROM earthquakes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if limit:
+        sql = f"SELECT * FROM ({sql} ORDER BY timestamp DESC LIMIT %s) AS recent"
+        params.append(int(limit))
+    return sql + " ORDER BY timestamp", params
+
+
+def _rows_to_columns(rows: List[tuple], center: Optional[Tuple[float, float]] = None,
+                     radius_km: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Cursor satırları → sütun dizileri (QUERY_COLUMNS); merkez verilirse kesin haversine süzgeci."""
+    arr = np.array(rows, dtype=np.float64).reshape(len(rows), len(QUERY_COLUMNS))
+    if center is not None and radius_km is not None and len(arr):
+        lat1, lon1 = np.radians(center[0]), np.radians(center[1])
+        lat2, lon2 = np.radians(arr[:, 1]), np.radians(arr[:, 2])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        dist = 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        arr = arr[dist <= radius_km]
+    return {name: np.ascontiguousarray(arr[:, i]) for i, name in enumerate(QUERY_COLUMNS)}
+
+
+def query_events_db(bbox: Optional[Tuple[float, float, float, float]] = None,
+                    center: Optional[Tuple[float, float]] = None, radius_km: Optional[float] = None,
+                    start_ts: Optional[float] = None, end_ts: Optional[float] = None,
+                    min_mag: Optional[float] = None, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Uzay × zaman × büyüklük filtreli deprem sorgusu; filtreler SQL'e itilir.
+    bbox: (lat_min, lat_max, lon_min, lon_max) veya center=(lat, lon) + radius_km
+    (yarıçap bbox'ı ile indeksten okunur, kesin mesafe NumPy'da süzülür).
+    limit: en yeni N; yarıçapla birlikte verilirse kesin süzgeçten sonra uygulanır (bbox köşelerindeki
+    depremler yer kaplamasın diye SQL limiti daire içinde N deprem kalana kadar büyütülür).
+    Returns: {'timestamp', 'lat', 'lon', 'depth', 'mag'} float64 dizileri (zaman sırasıyla);
+    DB yoksa / hata olursa boş diziler. Satır başına dict üretilmez.
+    """
+    empty = {name: np.empty(0, dtype=np.float64) for name in QUERY_COLUMNS}
+    if not is_db_available():
+        return empty
+    if center is not None and radius_km is not None:
+        circle = _radius_bbox(center[0], center[1], radius_km)
+        if bbox is not None:
+            circle = (max(bbox[0], circle[0]), min(bbox[1], circle[1]),
+                      max(bbox[2], circle[2]), min(bbox[3], circle[3]))
+        bbox = circle
+    circle = center is not None and radius_km is not None
+    fetch = int(limit) * 2 if circle and limit else limit
+    try:
+        while True:
+            sql, params = _build_event_query(bbox, start_ts, end_ts, min_mag, fetch)
+            rows = _fetchall(sql, params)
+            if rows is None:
+                return empty
+            cols = _rows_to_columns(rows, center, radius_km)
+            if not (circle and limit):
+                return cols
+            if len(cols['timestamp']) >= limit or len(rows) < fetch:
+                return {name: values[-int(limit):] for name, values in cols.items()}
+            fetch *= 4
+    except Exception as e:
+        print(f"[DB] Sorgu hatası: {e}")
+        return empty
+
+
+def query_event_array_db(**filters) -> np.ndarray:
+    """query_events_db ile aynı filtreler; (M, 5) dizi (lat, lon, mag, depth, timestamp) — forecast girdisi."""
+    cols = query_events_db(**filters)
+    if not len(cols['timestamp']):
+        return np.empty((0, len(ARRAY_COLUMNS)), dtype=np.float64)
+    return np.column_stack([cols[name] for name in ARRAY_COLUMNS])
 
 
 def is_db_available() -> bool:
-    """PostgreSQL kullanılabilir mi?"""
-    return bool(HAS_PG and DATABASE_URL)
+    """Aktif backend kullanılabilir mi? (PostgreSQL: psycopg2 + DATABASE_URL; SQLite: her zaman)"""
+    backend = get_backend()
+    if backend == 'postgres':
+        return bool(HAS_PG and DATABASE_URL)
+    return backend == 'sqlite'
+
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+dedup_index.py
+Multi-source dedup için uzay-zaman hash indeksi.
+Anahtar: (lat hücresi, lon hücresi, zaman kovası). Hücre ≈ DEDUP_DISTANCE_KM, kova = DEDUP_TIME_SEC.
+Bir deprem sadece komşu hücrelerdeki (±1 lat, ±k lon, ±1 kova) adaylarla karşılaştırılır;
+O(n·m) haversine yerine O(m · aday).
+İndeks depo klasöründe (dedup_index.npz) tutulur ve yeni segmentlerle artımlı güncellenir.
+"""
+
+import os
+import math
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+INDEX_FILE = 'dedup_index.npz'
+KM_PER_DEG = 111.0  # haversine R=6371 → 1° ≈ 111.19 km; 111.0 hücreyi biraz büyük tutar
+
+# Anahtar paketleme: kova << 27 | (lat hücre + 4096) << 14 | (lon hücre + 8192)
+_LAT_BITS = 13
+_LON_BITS = 14
+_LAT_OFFSET = 1 << (_LAT_BITS - 1)
+_LON_OFFSET = 1 << (_LON_BITS - 1)
+
+# store_dir -> {'generation', 'index'}
+_INDEX_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
+def _cell_deg(distance_km: float) -> float:
+    return distance_km / KM_PER_DEG
+
+
+def _pack(bucket: np.ndarray, ilat: np.ndarray, ilon: np.ndarray) -> np.ndarray:
+    return (
+        (bucket.astype(np.int64) << (_LAT_BITS + _LON_BITS))
+        | ((ilat.astype(np.int64) + _LAT_OFFSET) << _LON_BITS)
+        | (ilon.astype(np.int64) + _LON_OFFSET)
+    )
+
+
+def _cells(lats: np.ndarray, lons: np.ndarray, ts: np.ndarray,
+           distance_km: float, time_sec: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    c = _cell_deg(distance_km)
+    ilat = np.floor(np.asarray(lats, dtype=np.float64) / c).astype(np.int64)
+    ilon = np.floor(np.asarray(lons, dtype=np.float64) / c).astype(np.int64)
+    bucket = np.floor(np.asarray(ts, dtype=np.float64) / time_sec).astype(np.int64)
+    return bucket, ilat, ilon
+
+
+def _lon_reach(lats: np.ndarray, distance_km: float) -> np.ndarray:
+    """Her enlem için kontrol edilmesi gereken lon hücre sayısı (±k)."""
+    c = _cell_deg(distance_km)
+    phi = np.radians(np.minimum(np.abs(lats) + c, 89.0))
+    dlon = distance_km / (KM_PER_DEG * np.cos(phi))
+    return np.ceil(dlon / c).astype(np.int64)
+
+
+def build_index(lats: np.ndarray, lons: np.ndarray, ts: np.ndarray,
+                distance_km: float, time_sec: float, row_offset: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Satırlar için sıralı (anahtar, satır) dizileri. timestamp=0 satırlar dahil edilmez
+    (_is_same_event: timestamp yoksa hiçbir zaman aynı deprem sayılmaz).
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    valid = np.flatnonzero(ts != 0)
+    bucket, ilat, ilon = _cells(np.asarray(lats)[valid], np.asarray(lons)[valid], ts[valid],
+                                distance_km, time_sec)
+    keys = _pack(bucket, ilat, ilon)
+    order = np.argsort(keys, kind='stable')
+    return {'keys': keys[order], 'rows': (valid[order] + row_offset).astype(np.int64)}
+
+
+def merge_index(index: Dict[str, np.ndarray], extra: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    keys = np.concatenate([index['keys'], extra['keys']])
+    rows = np.concatenate([index['rows'], extra['rows']])
+    order = np.argsort(keys, kind='stable')
+    return {'keys': keys[order], 'rows': rows[order]}
+
+
+def _haversine_km(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def find_duplicates(index: Dict[str, np.ndarray], columns: np.ndarray,
+                    q_lats: np.ndarray, q_lons: np.ndarray, q_ts: np.ndarray, q_mags: np.ndarray,
+                    distance_km: float, time_sec: float, mag_diff: float) -> np.ndarray:
+    """
+    Sorgu depremlerinden hangileri depodaki bir kayıtla aynı event?
+    (distance < distance_km, |Δt| < time_sec, |Δmag| < mag_diff)
+    Tek vektörel geçiş: komşu hücre anahtarları → searchsorted → aday satırlar → kesin kontrol.
+    Returns: bool dizi (len = sorgu sayısı)
+    """
+    q_lats = np.asarray(q_lats, dtype=np.float64)
+    q_lons = np.asarray(q_lons, dtype=np.float64)
+    q_ts = np.asarray(q_ts, dtype=np.float64)
+    q_mags = np.asarray(q_mags, dtype=np.float64)
+    m = len(q_lats)
+    dup = np.zeros(m, dtype=bool)
+    if m == 0 or len(index['keys']) == 0:
+        return dup
+    queries = np.flatnonzero(q_ts != 0)
+    if len(queries) == 0:
+        return dup
+
+    bucket, ilat, ilon = _cells(q_lats[queries], q_lons[queries], q_ts[queries], distance_km, time_sec)
+    reach = _lon_reach(q_lats[queries], distance_km)
+    kmax = int(reach.max())
+    d_b, d_lat, d_lon = np.meshgrid(
+        np.arange(-1, 2), np.arange(-1, 2), np.arange(-kmax, kmax + 1), indexing='ij'
+    )
+    d_b, d_lat, d_lon = d_b.ravel(), d_lat.ravel(), d_lon.ravel()
+    keys = _pack(bucket[:, None] + d_b, ilat[:, None] + d_lat, ilon[:, None] + d_lon)
+    keep = np.abs(d_lon)[None, :] <= reach[:, None]
+    q_of_key = np.broadcast_to(queries[:, None], keys.shape)[keep]
+    keys = keys[keep]
+
+    lo = np.searchsorted(index['keys'], keys, side='left')
+    hi = np.searchsorted(index['keys'], keys, side='right')
+    counts = hi - lo
+    total = int(counts.sum())
+    if total == 0:
+        return dup
+    cand_q = np.repeat(q_of_key, counts)
+    starts = np.repeat(lo - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    cand_rows = index['rows'][starts + np.arange(total)]
+
+    c_ts = columns['timestamp'][cand_rows]
+    ok = (np.abs(c_ts - q_ts[cand_q]) < time_sec) & (np.abs(columns['mag'][cand_rows] - q_mags[cand_q]) < mag_diff)
+    if ok.any():
+        cand_q, cand_rows = cand_q[ok], cand_rows[ok]
+        dist = _haversine_km(q_lats[cand_q], q_lons[cand_q], columns['lat'][cand_rows], columns['lon'][cand_rows])
+        dup[cand_q[dist < distance_km]] = True
+    return dup
+
+
+def _index_path(store_dir: str) -> str:
+    return os.path.join(store_dir, INDEX_FILE)
+
+
+def _save(store_dir: str, index: Dict[str, np.ndarray], segments: List[str],
+          distance_km: float, time_sec: float) -> None:
+    path = _index_path(store_dir)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, keys=index['keys'], rows=index['rows'],
+             segments=np.array(segments, dtype=str),
+             params=np.array([distance_km, time_sec], dtype=np.float64))
+    os.replace(tmp, path)
+
+
+def _load(store_dir: str) -> Optional[Dict[str, Any]]:
+    path = _index_path(store_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as z:
+            return {
+                'keys': z['keys'], 'rows': z['rows'],
+                'segments': [str(s) for s in z['segments']],
+                'params': tuple(float(p) for p in z['params']),
+            }
+    except Exception as e:
+        print(f"[DEDUP_INDEX] İndeks okunamadı, yeniden kurulacak: {e}")
+        return None
+
+
+def load_store_index(store_dir: str, manifest: Dict[str, Any], columns: np.ndarray,
+                     distance_km: float, time_sec: float) -> Dict[str, np.ndarray]:
+    """
+    Depo için indeksi döndürür. columns: event_store.load_columns(store_dir) (tam, kırpılmamış).
+    Segment listesi kayıtlı indeksin devamıysa sadece yeni segmentler indekslenir;
+    birleştirme/yeniden yazma olduysa indeks baştan kurulur. Sonuç diske yazılır.
+    """
+    generation = manifest.get('generation', 0)
+    cached = _INDEX_CACHE.get(store_dir)
+    if cached is not None and cached['generation'] == generation:
+        return cached['index']
+
+    segments = [s['name'] for s in manifest['segments']]
+    rows_per_seg = [s['rows'] for s in manifest['segments']]
+    saved = cached['saved'] if cached is not None else _load(store_dir)
+    params = (float(distance_km), float(time_sec))
+
+    if (saved is not None and saved['params'] == params
+            and segments[:len(saved['segments'])] == saved['segments']):
+        done = len(saved['segments'])
+        offset = int(sum(rows_per_seg[:done]))
+        index = {'keys': saved['keys'], 'rows': saved['rows']}
+        if done < len(segments):
+            new = slice(offset, len(columns))
+            extra = build_index(columns['lat'][new], columns['lon'][new], columns['timestamp'][new],
+                                distance_km, time_sec, row_offset=offset)
+            index = merge_index(index, extra)
+    else:
+        index = build_index(columns['lat'], columns['lon'], columns['timestamp'], distance_km, time_sec)
+
+    if saved is None or saved['segments'] != segments or saved['params'] != params:
+        if os.path.isdir(store_dir):
+            _save(store_dir, index, segments, distance_km, time_sec)
+    _INDEX_CACHE[store_dir] = {
+        'generation': generation,
+        'index': index,
+        'saved': {'keys': index['keys'], 'rows': index['rows'], 'segments': segments, 'params': params},
+    }
+    return index
+
+
+def bucket_neighbors(lat: float, lon: float, ts: float,
+                     distance_km: float, time_sec: float) -> List[Tuple[int, int, int]]:
+    """Tek deprem için kontrol edilecek (kova, lat hücre, lon hücre) anahtarları (dict indeksleri için)."""
+    c = _cell_deg(distance_km)
+    b = math.floor(ts / time_sec)
+    ilat = math.floor(lat / c)
+    ilon = math.floor(lon / c)
+    k = int(_lon_reach(np.array([lat]), distance_km)[0])
+    return [
+        (b + db, ilat + dl, ilon + dn)
+        for db in (-1, 0, 1) for dl in (-1, 0, 1) for dn in range(-k, k + 1)
+    ]
+
+
+def bucket_key(lat: float, lon: float, ts: float, distance_km: float, time_sec: float) -> Tuple[int, int, int]:
+    c = _cell_deg(distance_km)
+    return (math.floor(ts / time_sec), math.floor(lat / c), math.floor(lon / c))
@@ -5,6 +5,7 @@ App'ten bağımsız feature engineering modülü.
 Scheduler standalone çalıştığında da şehir bazlı eğitim verisi oluşturur.
 """
 
+import os
 import time
 import numpy as np
 from datetime import datetime, timedelta
@@ -12,6 +13,8 @@ from typing import Dict, List, Any, Optional, Tuple
 
 try:
     from sklearn.cluster import DBSCAN
+    from sklearn.neighbors import radius_neighbors_graph
+    from scipy.sparse.csgraph import connected_components
     HAS_DBSCAN = True
 except ImportError:
     HAS_DBSCAN = False
@@ -186,19 +189,22 @@ def detect_seismic_clusters(recent_eqs: List[Dict]) -> List[Dict]:
     return clusters
 
 
+_EMPTY_CLUSTER_FEATURES = {
+    'cluster_count': 0,
+    'in_cluster': 0,
+    'nearest_cluster_distance': 300,
+    'cluster_density': 0,
+    'max_cluster_size': 0,
+    'nearest_cluster_max_mag': 0
+}
+
+
 def get_cluster_features(clusters: List[Dict], target_lat: float, target_lon: float) -> Dict:
     """
     Hedef nokta için küme feature'ları.
     """
     if not clusters:
-        return {
-            'cluster_count': 0,
-            'in_cluster': 0,
-            'nearest_cluster_distance': 300,
-            'cluster_density': 0,
-            'max_cluster_size': 0,
-            'nearest_cluster_max_mag': 0
-        }
+        return dict(_EMPTY_CLUSTER_FEATURES)
     distances = [haversine(target_lat, target_lon, c['centroid_lat'], c['centroid_lon']) for c in clusters]
     nearest_idx = int(np.argmin(distances))
     nearest_dist = distances[nearest_idx]
@@ -219,6 +225,86 @@ def get_cluster_features(clusters: List[Dict], target_lat: float, target_lon: fl
     }
 
 
+def cluster_neighbor_graph(lats: np.ndarray, lons: np.ndarray):
+    """
+    DBSCAN'in eps komşuluk grafı (detect_seismic_clusters ile aynı metrik ve eps); seyrek (k, k) veya None.
+    min_samples=2'de komşusu olan her nokta çekirdektir: kümeler bu grafın (en az 2 düğümlü)
+    bağlı bileşenleridir. Graf bir kez kurulur, her alt kümenin kümeleri alt graftan okunur.
+    """
+    if len(lats) < 2 or not HAS_DBSCAN:
+        return None
+    points = np.column_stack([lats, lons])
+    return radius_neighbors_graph(points, CLUSTER_EPS_KM / 111.0, mode='connectivity', include_self=False).tocsr()
+
+
+def cluster_features_many(dists: np.ndarray, lats: np.ndarray, lons: np.ndarray, mags: np.ndarray,
+                          graph, target_lats: np.ndarray, target_lons: np.ndarray,
+                          radius_km: float = 300) -> List[Dict]:
+    """
+    N hedef için get_cluster_features(detect_seismic_clusters(hedefin radius_km alt kümesi)) sonucu.
+    dists: (N, k) hedef → event mesafeleri, graph: cluster_neighbor_graph. Hedef başına sadece alt grafın
+    bağlı bileşenleri bulunur (DBSCAN yok); küme istatistikleri ve feature'lar tüm hedefler için tek geçişte.
+    Hedef bazlı yolla fark: toplama sırasından gelen float farkı (~1e-12 göreli) ve eşit uzaklıktaki
+    kümeler arasında en yakının seçimi.
+    """
+    n = len(target_lats)
+    if graph is None or n == 0:
+        return [dict(_EMPTY_CLUSTER_FEATURES) for _ in range(n)]
+    has_neighbor = np.diff(graph.indptr) > 0
+    node_target, node_gid, node_idx = [], [], []
+    n_groups = 0
+    for i in range(n):
+        idx = np.flatnonzero((dists[i] < radius_km) & has_neighbor)
+        if len(idx) < CLUSTER_MIN_SAMPLES:
+            continue
+        _, comp = connected_components(graph[idx][:, idx], directed=False)
+        keep = np.bincount(comp)[comp] >= CLUSTER_MIN_SAMPLES
+        if not np.any(keep):
+            continue
+        _, local = np.unique(comp[keep], return_inverse=True)
+        node_target.append(np.full(int(keep.sum()), i))
+        node_gid.append(local + n_groups)
+        node_idx.append(idx[keep])
+        n_groups += int(local.max()) + 1
+    if n_groups == 0:
+        return [dict(_EMPTY_CLUSTER_FEATURES) for _ in range(n)]
+
+    node_target, node_gid, node_idx = np.concatenate(node_target), np.concatenate(node_gid), np.concatenate(node_idx)
+    size = np.bincount(node_gid, minlength=n_groups).astype(np.float64)
+    c_lat = np.bincount(node_gid, weights=lats[node_idx], minlength=n_groups) / size
+    c_lon = np.bincount(node_gid, weights=lons[node_idx], minlength=n_groups) / size
+    max_mag = np.full(n_groups, -np.inf)
+    np.maximum.at(max_mag, node_gid, mags[node_idx])
+    group_target = np.zeros(n_groups, dtype=np.int64)
+    group_target[node_gid] = node_target
+
+    t_lat, t_lon = np.radians(target_lats[group_target]), np.radians(target_lons[group_target])
+    g_lat, g_lon = np.radians(c_lat), np.radians(c_lon)
+    a = np.sin((g_lat - t_lat) / 2) ** 2 + np.cos(t_lat) * np.cos(g_lat) * np.sin((g_lon - t_lon) / 2) ** 2
+    d = 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    near150 = d < 150
+    count150 = np.bincount(group_target, weights=near150, minlength=n)
+    density = np.bincount(group_target, weights=np.where(near150, size, 0.0), minlength=n) / (count150 + 1)
+    max_size = np.zeros(n)
+    np.maximum.at(max_size, group_target, size)
+    order = np.lexsort((d, group_target))  # hedef içinde mesafeye göre
+    first = order[np.r_[True, group_target[order][1:] != group_target[order][:-1]]]
+
+    out = [dict(_EMPTY_CLUSTER_FEATURES) for _ in range(n)]
+    for g in first:
+        i = int(group_target[g])
+        out[i] = {
+            'cluster_count': int(count150[i]),
+            'in_cluster': 1 if d[g] < 50 else 0,
+            'nearest_cluster_distance': float(d[g]),
+            'cluster_density': float(density[i]),
+            'max_cluster_size': int(max_size[i]),
+            'nearest_cluster_max_mag': float(max_mag[g])
+        }
+    return out
+
+
 # ETAS (Epidemic Type Aftershock Sequence) parametreleri
 ETAS_ALPHA = 1.0   # Magnitude etkisi: exp(α(M-M0))
 ETAS_M0 = 2.5      # Referans büyüklük
@@ -226,6 +312,60 @@ ETAS_C = 0.01      # Zaman offset (saat) - sıfıra bölmeyi önler
 ETAS_P = 1.1      # Omori decay üssü: 1/(t+c)^p
 
 
+def etas_mag_effect(mags: np.ndarray) -> np.ndarray:
+    """Büyüklük terimi exp(α(M-M0)); event başına bir kez hesaplanıp tekrar kullanılabilir."""
+    return np.exp(ETAS_ALPHA * (np.asarray(mags, dtype=np.float64) - ETAS_M0))
+
+
+def etas_influence(dists: np.ndarray, timestamps: np.ndarray, reference_time: float,
+                   mags: Optional[np.ndarray] = None, mag_effect: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Event başına etki = mag_effect × Omori 1/(t+c)^p × 1/(d+1). Diziler yayınlanır (broadcast):
+    dists (N, k) + timestamps/mag_effect (k,) → (N, k) hedef × event matrisi.
+    mag_effect verilmezse mags'tan hesaplanır.
+    """
+    if mag_effect is None:
+        mag_effect = etas_mag_effect(mags)
+    dt_hours = np.maximum(0.0, reference_time - np.asarray(timestamps, dtype=np.float64)) / 3600.0
+    time_decay = 1.0 / ((dt_hours + ETAS_C) ** ETAS_P)
+    distance_decay = 1.0 / (np.asarray(dists, dtype=np.float64) + 1.0)
+    return mag_effect * time_decay * distance_decay
+
+
+def etas_features_from_arrays(dists: np.ndarray, timestamps: np.ndarray, reference_time: float,
+                              mags: Optional[np.ndarray] = None,
+                              mag_effect: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """compute_etas_features'ın dizi sürümü (tek hedef, maskelenmiş event dizileri)."""
+    if len(dists) == 0:
+        return {'etas_score': 0.0, 'etas_max_influence': 0.0, 'etas_event_count': 0}
+    influences = etas_influence(dists, timestamps, reference_time, mags=mags, mag_effect=mag_effect)
+    return {
+        'etas_score': float(np.sum(influences)),
+        'etas_max_influence': float(np.max(influences)),
+        'etas_event_count': len(influences)
+    }
+
+
+def etas_features_matrix(dists: np.ndarray, timestamps: np.ndarray, reference_time: float,
+                         mask: Optional[np.ndarray] = None, mags: Optional[np.ndarray] = None,
+                         mag_effect: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    N hedef için ETAS feature dizileri: dists (N, k), mask (N, k) hedefin saydığı event'ler
+    (örn. pencere + 300 km). Returns: etas_score, etas_max_influence, etas_event_count (N,) dizileri.
+    """
+    influences = etas_influence(dists, timestamps, reference_time, mags=mags, mag_effect=mag_effect)
+    if mask is not None:
+        influences = np.where(mask, influences, 0.0)
+        counts = mask.sum(axis=1)
+    else:
+        counts = np.full(influences.shape[0], influences.shape[1])
+    return {
+        'etas_score': influences.sum(axis=1),
+        'etas_max_influence': influences.max(axis=1) if influences.shape[1] else np.zeros(influences.shape[0]),
+        'etas_event_count': counts
+    }
+
+
 def compute_etas_features(recent_eqs: List[Dict], target_lat: float, target_lon: float,
                           reference_time: float) -> Dict[str, float]:
     """
@@ -234,26 +374,10 @@ def compute_etas_features(recent_eqs: List[Dict], target_lat: float, target_lon:
     """
     if not recent_eqs:
         return {'etas_score': 0.0, 'etas_max_influence': 0.0, 'etas_event_count': 0}
-    influences = []
-    for eq in recent_eqs:
-        mag = float(eq.get('mag', 0) or 0)
-        dist_km = float(eq.get('distance', 300) or 300)
-        eq_ts = float(eq.get('timestamp', 0) or 0)
-        dt_sec = max(0, reference_time - eq_ts)
-        dt_hours = dt_sec / 3600.0
-        # Omori: 1/(t+c)^p
-        time_decay = 1.0 / ((dt_hours + ETAS_C) ** ETAS_P)
-        # Büyük deprem daha çok artçı üretir
-        mag_effect = np.exp(ETAS_ALPHA * (mag - ETAS_M0))
-        # Yakın deprem daha önemli
-        distance_decay = 1.0 / (dist_km + 1.0)
-        influence = mag_effect * time_decay * distance_decay
-        influences.append(influence)
-    return {
-        'etas_score': float(np.sum(influences)),
-        'etas_max_influence': float(np.max(influences)) if influences else 0.0,
-        'etas_event_count': len(recent_eqs)
-    }
+    mags = np.array([float(eq.get('mag', 0) or 0) for eq in recent_eqs], dtype=np.float64)
+    dists = np.array([float(eq.get('distance', 300) or 300) for eq in recent_eqs], dtype=np.float64)
+    timestamps = np.array([float(eq.get('timestamp', 0) or 0) for eq in recent_eqs], dtype=np.float64)
+    return etas_features_from_arrays(dists, timestamps, reference_time, mags=mags)
 
 
 def _get_eq_timestamp(eq: Dict) -> float:
@@ -292,188 +416,206 @@ def _get_eq_timestamp(eq: Dict) -> float:
     return 0.0
 
 
-def extract_features(earthquakes: List[Dict], target_lat: float, target_lon: float,
-                    time_window_hours: int = 168, ref_time: Optional[float] = None) -> Optional[Dict]:
-    """
-    Deprem verilerinden özellik çıkarır.
-    ref_time verilirse "şimdi" yerine o timestamp kullanılır (forecast eğitimi için).
-    """
-    if not earthquakes:
-        return None
+# Canlı yol: aynı görüntü (aynı snapshot sürümü) için diziler ve ETAS büyüklük terimi bir kez
+_EVENT_ARRAYS_CACHE: Dict[str, Any] = {'entry': None}
 
-    current_time = float(ref_time) if ref_time is not None else time.time()
-    window_start = current_time - (time_window_hours * 3600)
 
-    recent_eqs = []
+def event_arrays(earthquakes: List[Dict], cache_key: Optional[Any] = None) -> Dict[str, np.ndarray]:
+    """
+    Geçerli (koordinatlı, timestamp > 0) depremlerin dizileri: lat, lon, mag, depth, timestamp, mag_effect.
+    cache_key (ör. ('snapshot', sürüm)) verilirse son sonuç bu anahtarla önbellekte tutulur; aynı anahtar
+    aynı listeyi garanti etmelidir. Anahtarsız çağrılar her zaman yeniden hesaplanır.
+    """
+    entry = _EVENT_ARRAYS_CACHE['entry']
+    if cache_key is not None and entry is not None and entry[0] == cache_key:
+        return entry[1]
+    lats, lons, mags, depths, timestamps = [], [], [], [], []
     for eq in earthquakes:
         if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
             continue
-        lon, lat = eq['geojson']['coordinates']
-        mag = eq.get('mag', 0)
-        depth = eq.get('depth', 10)
         ts = _get_eq_timestamp(eq)
         if ts <= 0:
             continue
-        # Zaman penceresi filtresi (time_window_hours kullanılır)
-        if ts < window_start or ts > current_time:
-            continue
-        distance = haversine(target_lat, target_lon, lat, lon)
+        lon, lat = eq['geojson']['coordinates']
+        depth = eq.get('depth', 10)
+        lats.append(lat)
+        lons.append(lon)
+        mags.append(float(eq.get('mag', 0) or 0))
+        depths.append(float(depth) if depth is not None else 10.0)
+        timestamps.append(ts)
+    data = {
+        'lat': np.array(lats, dtype=np.float64), 'lon': np.array(lons, dtype=np.float64),
+        'mag': np.array(mags, dtype=np.float64), 'depth': np.array(depths, dtype=np.float64),
+        'timestamp': np.array(timestamps, dtype=np.float64),
+    }
+    data['mag_effect'] = etas_mag_effect(data['mag'])
+    if cache_key is not None:
+        _EVENT_ARRAYS_CACHE['entry'] = (cache_key, data)
+    return data
 
-        if distance < 300 and mag >= 1.5:
-            recent_eqs.append({
-                'mag': mag, 'distance': distance, 'depth': depth,
-                'lat': lat, 'lon': lon, 'timestamp': ts
-            })
-        elif distance < 300 and mag >= 1.0:
-            recent_eqs.append({
-                'mag': mag, 'distance': distance, 'depth': depth,
-                'lat': lat, 'lon': lon, 'timestamp': ts
-            })
 
-    if not recent_eqs:
-        all_eqs = []
-        for eq in earthquakes:
-            if not eq.get('geojson') or not eq['geojson'].get('coordinates'):
-                continue
-            lon, lat = eq['geojson']['coordinates']
-            mag = eq.get('mag', 0)
-            depth = eq.get('depth', 10)
-            ts = _get_eq_timestamp(eq)
-            if ts < window_start or ts > current_time:
-                continue
-            distance = haversine(target_lat, target_lon, lat, lon)
-            if mag >= 1.0:
-                all_eqs.append({'mag': mag, 'distance': distance, 'depth': depth,
-                               'lat': lat, 'lon': lon, 'timestamp': ts})
-        recent_eqs = all_eqs if all_eqs else []
+_FAULT_LATS = np.array([c[0] for f in TURKEY_FAULT_LINES for c in f['coords']], dtype=np.float64)
+_FAULT_LONS = np.array([c[1] for f in TURKEY_FAULT_LINES for c in f['coords']], dtype=np.float64)
 
-    nearest_fault = float('inf')
-    for fault in TURKEY_FAULT_LINES:
-        for coord in fault['coords']:
-            fault_lat, fault_lon = coord
-            dist = haversine(target_lat, target_lon, fault_lat, fault_lon)
-            nearest_fault = min(nearest_fault, dist)
 
-    if not recent_eqs:
-        empty = {
-            'count': 0, 'max_magnitude': 0, 'mean_magnitude': 0, 'std_magnitude': 0,
-            'min_distance': 300, 'mean_distance': 300, 'mean_depth': 10,
-            'mean_interval': 3600, 'min_interval': 3600,
-            'mag_above_4': 0, 'mag_above_5': 0, 'mag_above_6': 0,
-            'within_50km': 0, 'within_100km': 0, 'within_150km': 0,
-            'nearest_fault_distance': nearest_fault, 'activity_density': 0,
-            'magnitude_distance_ratio': 0, 'magnitude_trend': 0,
-            'shallow_quakes': 0, 'deep_quakes': 0,
-            'time_since_last': 86400, 'regional_frequency': 0,
-            'cluster_count': 0, 'in_cluster': 0, 'nearest_cluster_distance': 300,
-            'cluster_density': 0, 'max_cluster_size': 0, 'nearest_cluster_max_mag': 0,
-            'etas_score': 0.0, 'etas_max_influence': 0.0, 'etas_event_count': 0,
-            'recency_weighted_energy': 0.0, 'b_value_proxy': 1.0, 'swarm_intensity': 0.0
-        }
-        return empty
-
-    magnitudes = [e['mag'] for e in recent_eqs]
-    distances = [e['distance'] for e in recent_eqs]
-    depths = [e['depth'] for e in recent_eqs]
-
-    features = {
-        'count': len(recent_eqs),
-        'max_magnitude': float(np.max(magnitudes)),
-        'mean_magnitude': float(np.mean(magnitudes)),
-        'std_magnitude': float(np.std(magnitudes)) if len(magnitudes) > 1 else 0,
-        'min_distance': float(np.min(distances)),
-        'mean_distance': float(np.mean(distances)),
-        'mean_depth': float(np.mean(depths)),
-        'mag_above_4': sum(1 for m in magnitudes if m >= 4.0),
-        'mag_above_5': sum(1 for m in magnitudes if m >= 5.0),
-        'mag_above_6': sum(1 for m in magnitudes if m >= 6.0),
-        'within_50km': sum(1 for d in distances if d <= 50),
-        'within_100km': sum(1 for d in distances if d <= 100),
-        'within_150km': sum(1 for d in distances if d <= 150),
-        'nearest_fault_distance': nearest_fault,
-        'shallow_quakes': sum(1 for d in depths if d <= 10),
-        'deep_quakes': sum(1 for d in depths if d > 30),
+def _empty_features(nearest_fault: float) -> Dict:
+    return {
+        'count': 0, 'max_magnitude': 0, 'mean_magnitude': 0, 'std_magnitude': 0,
+        'min_distance': 300, 'mean_distance': 300, 'mean_depth': 10,
+        'mean_interval': 3600, 'min_interval': 3600,
+        'mag_above_4': 0, 'mag_above_5': 0, 'mag_above_6': 0,
+        'within_50km': 0, 'within_100km': 0, 'within_150km': 0,
+        'nearest_fault_distance': nearest_fault, 'activity_density': 0,
+        'magnitude_distance_ratio': 0, 'magnitude_trend': 0,
+        'shallow_quakes': 0, 'deep_quakes': 0,
+        'time_since_last': 86400, 'regional_frequency': 0,
+        'cluster_count': 0, 'in_cluster': 0, 'nearest_cluster_distance': 300,
+        'cluster_density': 0, 'max_cluster_size': 0, 'nearest_cluster_max_mag': 0,
+        'etas_score': 0.0, 'etas_max_influence': 0.0, 'etas_event_count': 0,
+        'recency_weighted_energy': 0.0, 'b_value_proxy': 1.0, 'swarm_intensity': 0.0
     }
 
-    if len(recent_eqs) > 1:
-        timestamps = sorted([e['timestamp'] for e in recent_eqs])
-        intervals = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
-        features['mean_interval'] = float(np.mean(intervals))
-        features['min_interval'] = float(np.min(intervals))
-        features['time_since_last'] = current_time - timestamps[-1]
-    else:
-        features['mean_interval'] = 3600
-        features['min_interval'] = 3600
-        features['time_since_last'] = current_time - recent_eqs[0]['timestamp'] if recent_eqs else 86400
-
-    features['activity_density'] = features['count'] / (np.pi * (features['mean_distance'] ** 2) + 1)
-    features['magnitude_distance_ratio'] = features['max_magnitude'] / (features['min_distance'] + 1)
-    features['regional_frequency'] = features['count'] / (time_window_hours / 24) if time_window_hours > 0 else 0
 
-    # Seismic cluster detection - deprem kümelenmesi sinyali
-    clusters = detect_seismic_clusters(recent_eqs)
-    features.update(get_cluster_features(clusters, target_lat, target_lon))
+def extract_features(earthquakes: List[Dict], target_lat: float, target_lon: float,
+                    time_window_hours: int = 168, ref_time: Optional[float] = None) -> Optional[Dict]:
+    """
+    Deprem verilerinden özellik çıkarır.
+    ref_time verilirse "şimdi" yerine o timestamp kullanılır (forecast eğitimi için).
+    """
+    if not earthquakes:
+        return None
+    return extract_features_many(earthquakes, [target_lat], [target_lon], time_window_hours, ref_time)[0]
 
-    # ETAS (Epidemic Type Aftershock Sequence) - her deprem başka depremler doğurabilir
-    etas = compute_etas_features(recent_eqs, target_lat, target_lon, current_time)
-    features.update(etas)
 
-    # Komşu aktivite: en yakın şehri bul, onun komşularının aktivitesi
-    try:
-        min_d = float('inf')
-        closest_city = None
-        for cname, cdata in TURKEY_CITIES.items():
-            d = haversine(target_lat, target_lon, cdata['lat'], cdata['lon'])
-            if d < min_d:
-                min_d, closest_city = d, cname
-        if closest_city and min_d < 200:
-            features['neighbor_activity'] = _get_neighbor_activity(earthquakes, closest_city, 168)  # 7 gün
-        else:
-            features['neighbor_activity'] = 0.0
-    except Exception:
-        features['neighbor_activity'] = 0.0
-
-    if len(recent_eqs) >= 3:
-        sorted_by_time = sorted(recent_eqs, key=lambda x: x['timestamp'])
-        mid = len(sorted_by_time) // 2
-        first_avg = np.mean([e['mag'] for e in sorted_by_time[:mid]])
-        second_avg = np.mean([e['mag'] for e in sorted_by_time[mid:]])
-        features['magnitude_trend'] = float(second_avg - first_avg)
-    else:
-        features['magnitude_trend'] = 0
-
-    # Recency-weighted energy (yakın zamandaki depremler daha ağır)
-    if recent_eqs:
-        weighted_energy = 0.0
-        for e in recent_eqs:
-            dt_hours = max((current_time - e["timestamp"]) / 3600.0, 1e-6)
-            energy = 10 ** (1.5 * e["mag"])
-            weighted_energy += energy / (1.0 + dt_hours)
-        features["recency_weighted_energy"] = float(np.log10(weighted_energy + 1.0))
-    else:
-        features["recency_weighted_energy"] = 0.0
-
-    # b-value proxy (büyüklük dağılımı)
-    if len(magnitudes) >= 5:
-        mmin = max(1.0, float(np.min(magnitudes)))
-        mean_mag = float(np.mean(magnitudes))
-        if mean_mag > mmin:
-            b_value = np.log10(np.e) / max(mean_mag - mmin, 1e-6)
+def extract_features_many(earthquakes: List[Dict], target_lats, target_lons,
+                          time_window_hours: int = 168, ref_time: Optional[float] = None,
+                          cache_key: Optional[Any] = None) -> List[Optional[Dict]]:
+    """
+    N hedef için extract_features: tek hedef × event mesafe matrisi, boolean maskeler ve satır bazlı
+    indirgemeler (hedef başına Python döngüsü yok). Hedef başına seçim: pencere içinde, M≥1.0 ve 300 km;
+    300 km içinde deprem yoksa penceredeki tüm M≥1.0 depremler. Zaman sırasına bağlı feature'lar
+    (aralıklar, büyüklük trendi) event'ler bir kez zamana göre sıralanarak maskeyle okunur.
+    cache_key: event_arrays önbellek anahtarı (değişmeyen snapshot listesi için sürüm).
+    """
+    n = len(target_lats)
+    if not earthquakes:
+        return [None] * n
+    current_time = float(ref_time) if ref_time is not None else time.time()
+    window_start = current_time - (time_window_hours * 3600)
+    t_lats = np.asarray(target_lats, dtype=np.float64)
+    t_lons = np.asarray(target_lons, dtype=np.float64)
+    nearest_fault = haversine_vectorized(t_lats[:, None], t_lons[:, None], _FAULT_LATS, _FAULT_LONS).min(axis=1)
+
+    ev = event_arrays(earthquakes, cache_key)
+    all_lats, all_lons, all_mags, all_ts = ev['lat'], ev['lon'], ev['mag'], ev['timestamp']
+    # Penceredeki M≥1.0 depremler, zamana göre (eşitlikte liste sırası) sıralı
+    idx = np.flatnonzero((all_ts >= window_start) & (all_ts <= current_time) & (all_mags >= 1.0))
+    idx = idx[np.argsort(all_ts[idx], kind='stable')]
+    if len(idx) == 0:
+        return [_empty_features(float(nf)) for nf in nearest_fault]
+    lats, lons, mags = all_lats[idx], all_lons[idx], all_mags[idx]
+    depths, ts = ev['depth'][idx], all_ts[idx]
+
+    dists = haversine_vectorized(t_lats[:, None], t_lons[:, None], lats, lons)  # (N, k)
+    mask = dists < 300
+    mask[~mask.any(axis=1)] = True
+    count = mask.sum(axis=1)
+    fmask = mask.astype(np.float64)
+
+    max_mag = np.where(mask, mags, -np.inf).max(axis=1)
+    mean_mag = (fmask * mags).sum(axis=1) / count
+    std_mag = np.sqrt((fmask * (mags - mean_mag[:, None]) ** 2).sum(axis=1) / count)
+    min_dist = np.where(mask, dists, np.inf).min(axis=1)
+    mean_dist = (fmask * dists).sum(axis=1) / count
+    mean_depth = (fmask * depths).sum(axis=1) / count
+    age = current_time - ts
+
+    # Sıralı seçimde bir önceki seçili event → aralıklar; sıra numarası → trend yarıları
+    pos = np.arange(len(ts))
+    last_sel = np.maximum.accumulate(np.where(mask, pos, -1), axis=1)
+    prev_sel = np.hstack([np.full((n, 1), -1), last_sel[:, :-1]])
+    has_prev = mask & (prev_sel >= 0)
+    gaps = np.where(has_prev, ts - ts[np.maximum(prev_sel, 0)], 0.0)
+    min_gap = np.where(has_prev, gaps, np.inf).min(axis=1)
+    mean_gap = gaps.sum(axis=1) / np.maximum(count - 1, 1)
+    last_ts = ts[last_sel[:, -1]]
+    rank = np.cumsum(mask, axis=1) - 1
+    late = mask & (rank >= (count // 2)[:, None])
+    early = mask & ~late
+    trend = ((late * mags).sum(axis=1) / np.maximum(late.sum(axis=1), 1)
+             - (early * mags).sum(axis=1) / np.maximum(early.sum(axis=1), 1))
+
+    energy = (fmask * (10 ** (1.5 * mags) / (1.0 + np.maximum(age / 3600.0, 1e-6)))).sum(axis=1)
+    recent_24h = (mask & (age <= 24 * 3600)).sum(axis=1)
+    recent_6h = (mask & (age <= 6 * 3600)).sum(axis=1)
+    etas = etas_features_matrix(dists, ts, current_time, mask=mask, mag_effect=ev['mag_effect'][idx])
+
+    # Kümeler: seçilen event'lerin tek komşuluk grafı, hedef başına alt graf (maske dışı = inf mesafe)
+    used = mask.any(axis=0)
+    clusters = cluster_features_many(np.where(mask, dists, np.inf)[:, used], lats[used], lons[used], mags[used],
+                                     cluster_neighbor_graph(lats[used], lons[used]), t_lats, t_lons,
+                                     radius_km=np.inf)
+
+    # Komşu aktivite: en yakın ilin komşularının 7 günlük sayısı (gereken iller için bir kez)
+    neighbor_idx = []
+    for la, lo in zip(t_lats.tolist(), t_lons.tolist()):
+        closest_city, min_d = nearest_city(la, lo)
+        neighbor_idx.append(_CITY_NEIGHBOR_IDX.get(closest_city) if closest_city and min_d < 200 else None)
+    needed = np.unique(np.concatenate([nb for nb in neighbor_idx if nb is not None] or [np.zeros(0, np.int64)]))
+    city_counts = np.zeros(len(CITY_NAMES))
+    city_counts[needed] = _city_counts_from_arrays(needed, all_lats, all_lons, all_mags, all_ts,
+                                                   current_time - 168 * 3600, current_time)
+
+    out = []
+    for i in range(n):
+        c = int(count[i])
+        features = {
+            'count': c,
+            'max_magnitude': float(max_mag[i]),
+            'mean_magnitude': float(mean_mag[i]),
+            'std_magnitude': float(std_mag[i]) if c > 1 else 0,
+            'min_distance': float(min_dist[i]),
+            'mean_distance': float(mean_dist[i]),
+            'mean_depth': float(mean_depth[i]),
+            'mag_above_4': int(np.count_nonzero(mask[i] & (mags >= 4.0))),
+            'mag_above_5': int(np.count_nonzero(mask[i] & (mags >= 5.0))),
+            'mag_above_6': int(np.count_nonzero(mask[i] & (mags >= 6.0))),
+            'within_50km': int(np.count_nonzero(mask[i] & (dists[i] <= 50))),
+            'within_100km': int(np.count_nonzero(mask[i] & (dists[i] <= 100))),
+            'within_150km': int(np.count_nonzero(mask[i] & (dists[i] <= 150))),
+            'nearest_fault_distance': float(nearest_fault[i]),
+            'shallow_quakes': int(np.count_nonzero(mask[i] & (depths <= 10))),
+            'deep_quakes': int(np.count_nonzero(mask[i] & (depths > 30))),
+        }
+        if c > 1:
+            features['mean_interval'] = float(mean_gap[i])
+            features['min_interval'] = float(min_gap[i])
         else:
-            b_value = 1.0
-        features["b_value_proxy"] = float(b_value)
-    else:
-        features["b_value_proxy"] = 1.0
-
-    # Swarm intensity (son 6h / son 24h oranı)
-    if len(recent_eqs) >= 2:
-        recent_24h = sum(1 for e in recent_eqs if (current_time - e["timestamp"]) <= 24 * 3600)
-        recent_6h = sum(1 for e in recent_eqs if (current_time - e["timestamp"]) <= 6 * 3600)
-        features["swarm_intensity"] = float(recent_6h / max(recent_24h, 1))
-    else:
-        features["swarm_intensity"] = 0.0
-
-    return features
+            features['mean_interval'] = 3600
+            features['min_interval'] = 3600
+        features['time_since_last'] = float(current_time - last_ts[i])
+        features['activity_density'] = c / (np.pi * (features['mean_distance'] ** 2) + 1)
+        features['magnitude_distance_ratio'] = features['max_magnitude'] / (features['min_distance'] + 1)
+        features['regional_frequency'] = c / (time_window_hours / 24) if time_window_hours > 0 else 0
+        features.update(clusters[i])
+        features['etas_score'] = float(etas['etas_score'][i])
+        features['etas_max_influence'] = float(etas['etas_max_influence'][i])
+        features['etas_event_count'] = c
+        nb = neighbor_idx[i]
+        features['neighbor_activity'] = float(np.mean(city_counts[nb])) if nb is not None and len(nb) else 0.0
+        features['magnitude_trend'] = float(trend[i]) if c >= 3 else 0
+        features['recency_weighted_energy'] = float(np.log10(energy[i] + 1.0))
+        # b-value proxy (büyüklük dağılımı)
+        b_value = 1.0
+        if c >= 5:
+            mmin = max(1.0, float(np.min(mags[mask[i]])))
+            if features['mean_magnitude'] > mmin:
+                b_value = np.log10(np.e) / max(features['mean_magnitude'] - mmin, 1e-6)
+        features['b_value_proxy'] = float(b_value)
+        # Swarm intensity (son 6h / son 24h oranı)
+        features['swarm_intensity'] = float(recent_6h[i] / max(int(recent_24h[i]), 1)) if c >= 2 else 0.0
+        out.append(features)
+    return out
 
 
 def predict_earthquake_risk(earthquakes: List[Dict], target_lat: float, target_lon: float) -> Dict:
@@ -571,43 +713,84 @@ TIME_WINDOWS_HOURS = [1, 6, 24, 168, 720]  # 1h, 6h, 24h, 7d, 30d
 NEIGHBOR_DISTANCE_KM = 120
 
 
+# Şehir × şehir mesafe matrisi ve en yakın şehir indeksi (import anında bir kez)
+CITY_NAMES = list(TURKEY_CITIES.keys())
+_CITY_INDEX = {name: i for i, name in enumerate(CITY_NAMES)}
+_CITY_LATS = np.array([TURKEY_CITIES[c]['lat'] for c in CITY_NAMES], dtype=np.float64)
+_CITY_LONS = np.array([TURKEY_CITIES[c]['lon'] for c in CITY_NAMES], dtype=np.float64)
+
+
+def _city_distance_matrix() -> np.ndarray:
+    """(şehir, şehir) mesafe matrisi (km); haversine ile aynı formül."""
+    return np.vstack([haversine_vectorized(la, lo, _CITY_LATS, _CITY_LONS)
+                      for la, lo in zip(_CITY_LATS, _CITY_LONS)])
+
+
+CITY_DISTANCE_MATRIX = _city_distance_matrix()
+
+
+def nearest_city(lat: float, lon: float) -> Tuple[Optional[str], float]:
+    """En yakın il ve mesafesi (km); tek vektörel geçiş, eşitlikte ilk il (dict sırası)."""
+    if not CITY_NAMES:
+        return None, float('inf')
+    d = haversine_vectorized(lat, lon, _CITY_LATS, _CITY_LONS)
+    i = int(np.argmin(d))
+    return CITY_NAMES[i], float(d[i])
+
+
 def _build_city_neighbors() -> Dict[str, List[str]]:
     """Her şehir için 120km içindeki komşu illeri döndürür."""
     neighbors = {}
-    cities = list(TURKEY_CITIES.items())
-    for i, (c1, d1) in enumerate(cities):
-        nb = []
-        for j, (c2, d2) in enumerate(cities):
-            if i == j:
-                continue
-            dist = haversine(d1['lat'], d1['lon'], d2['lat'], d2['lon'])
-            if dist < NEIGHBOR_DISTANCE_KM:
-                nb.append(c2)
-        neighbors[c1] = nb
+    for i, c1 in enumerate(CITY_NAMES):
+        row = CITY_DISTANCE_MATRIX[i]
+        neighbors[c1] = [CITY_NAMES[j] for j in np.flatnonzero(row < NEIGHBOR_DISTANCE_KM) if j != i]
     return neighbors
 
 
 CITY_NEIGHBORS = _build_city_neighbors()
+_CITY_NEIGHBOR_IDX = {c: np.array([_CITY_INDEX[n] for n in nb], dtype=np.int64)
+                      for c, nb in CITY_NEIGHBORS.items()}
+
+
+def _city_counts_from_arrays(city_idx: np.ndarray, lats: np.ndarray, lons: np.ndarray, mags: np.ndarray,
+                             timestamps: np.ndarray, window_start: float, current_time: float) -> np.ndarray:
+    """
+    Verilen iller için extract_features 'count' değeri (pencere içinde, 300 km, M≥1.0);
+    300 km içinde hiç deprem yoksa extract_features gibi penceredeki tüm M≥1.0 depremler sayılır.
+    """
+    in_window = (timestamps >= window_start) & (timestamps <= current_time) & (mags >= 1.0)
+    w_lats, w_lons = lats[in_window], lons[in_window]
+    total = int(in_window.sum())
+    if total == 0 or len(city_idx) == 0:
+        return np.zeros(len(city_idx), dtype=np.int64)
+    near = np.count_nonzero(haversine_vectorized(_CITY_LATS[city_idx][:, None], _CITY_LONS[city_idx][:, None],
+                                                 w_lats, w_lons) < 300, axis=1)
+    return np.where(near > 0, near, total).astype(np.int64)
+
+
+def _neighbor_activity_from_arrays(city_name: str, lats: np.ndarray, lons: np.ndarray, mags: np.ndarray,
+                                   timestamps: np.ndarray, window_start: float, current_time: float) -> float:
+    """Komşu illerin ortalama deprem sayısı; komşu başına extract_features çağrılmaz."""
+    idx = _CITY_NEIGHBOR_IDX.get(city_name)
+    if idx is None or len(idx) == 0:
+        return 0.0
+    counts = _city_counts_from_arrays(idx, lats, lons, mags, timestamps, window_start, current_time)
+    return float(np.mean(counts))
 
 
 def _get_neighbor_activity(earthquakes: List[Dict], city_name: str,
-                           time_window_hours: int = 168) -> float:
+                           time_window_hours: int = 168, ref_time: Optional[float] = None) -> float:
     """
     Komşu illerin ortalama aktivitesi (count).
     Depremde komşu bölge etkisi önemli.
     """
-    nb = CITY_NEIGHBORS.get(city_name, [])
-    if not nb:
+    lats, lons, mags, _, timestamps = _parse_earthquakes_to_arrays(earthquakes)
+    if len(lats) == 0:
         return 0.0
-    counts = []
-    for n in nb:
-        if n not in TURKEY_CITIES:
-            continue
-        lat, lon = TURKEY_CITIES[n]['lat'], TURKEY_CITIES[n]['lon']
-        f = extract_features(earthquakes, lat, lon, time_window_hours)
-        if f:
-            counts.append(f.get('count', 0))
-    return float(np.mean(counts)) if counts else 0.0
+    current_time = float(ref_time) if ref_time is not None else time.time()
+    valid = timestamps > 0
+    return _neighbor_activity_from_arrays(city_name, lats[valid], lons[valid], mags[valid], timestamps[valid],
+                                          current_time - time_window_hours * 3600, current_time)
 
 
 def _parse_earthquakes_to_arrays(earthquakes: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
@@ -630,12 +813,25 @@ def _parse_earthquakes_to_arrays(earthquakes: List[Dict]) -> Tuple[np.ndarray, n
     return (np.array(lats), np.array(lons), np.array(mags), np.array(depths), np.array(timestamps))
 
 
+def _magnitude_trend(mags: np.ndarray, timestamps: np.ndarray) -> float:
+    """Zaman sırasına göre ikinci yarı - ilk yarı ortalama büyüklük (en az 3 deprem)."""
+    if len(mags) < 3:
+        return 0
+    ordered = mags[np.argsort(timestamps, kind='stable')]
+    mid = len(ordered) // 2
+    return float(np.mean(ordered[mid:]) - np.mean(ordered[:mid]))
+
+
 def _extract_features_from_arrays(lats: np.ndarray, lons: np.ndarray, mags: np.ndarray,
                                   depths: np.ndarray, timestamps: np.ndarray,
                                   target_lat: float, target_lon: float,
-                                  window_start: float, current_time: float) -> Optional[Dict]:
+                                  window_start: float, current_time: float,
+                                  cluster_features: Optional[Dict] = None,
+                                  mag_effect: Optional[np.ndarray] = None) -> Optional[Dict]:
     """
     Vectorized feature extraction. neighbor_activity hariç tüm feature'lar.
+    cluster_features: önceden (global kümeleme ile) hesaplanmışsa hedef için DBSCAN çalıştırılmaz.
+    mag_effect: etas_mag_effect(mags) (tüm diziyle hizalı); verilirse ETAS büyüklük terimi tekrar hesaplanmaz.
     """
     if len(lats) == 0:
         return None
@@ -664,15 +860,12 @@ def _extract_features_from_arrays(lats: np.ndarray, lons: np.ndarray, mags: np.n
         }
     d, m, dep, ts = dists[mask], mags[mask], depths[mask], timestamps[mask]
     la, lo = lats[mask], lons[mask]
-    recent_eqs = [{'mag': float(m[i]), 'distance': float(d[i]), 'depth': float(dep[i]),
-                  'lat': float(la[i]), 'lon': float(lo[i]), 'timestamp': float(ts[i])}
-                 for i in range(len(d))]
     nearest_fault = float('inf')
     for fault in TURKEY_FAULT_LINES:
         for coord in fault['coords']:
             nearest_fault = min(nearest_fault, haversine(target_lat, target_lon, coord[0], coord[1]))
     features = {
-        'count': len(recent_eqs),
+        'count': len(d),
         'max_magnitude': float(np.max(m)),
         'mean_magnitude': float(np.mean(m)),
         'std_magnitude': float(np.std(m)) if len(m) > 1 else 0,
@@ -703,17 +896,13 @@ def _extract_features_from_arrays(lats: np.ndarray, lons: np.ndarray, mags: np.n
     features['magnitude_distance_ratio'] = features['max_magnitude'] / (features['min_distance'] + 1)
     time_window_hours = (current_time - window_start) / 3600
     features['regional_frequency'] = features['count'] / (time_window_hours / 24) if time_window_hours > 0 else 0
-    clusters = detect_seismic_clusters(recent_eqs)
-    features.update(get_cluster_features(clusters, target_lat, target_lon))
-    etas = compute_etas_features(recent_eqs, target_lat, target_lon, current_time)
-    features.update(etas)
-    if len(recent_eqs) >= 3:
-        mid = len(recent_eqs) // 2
-        first_avg = np.mean([e['mag'] for e in sorted(recent_eqs, key=lambda x: x['timestamp'])[:mid]])
-        second_avg = np.mean([e['mag'] for e in sorted(recent_eqs, key=lambda x: x['timestamp'])[mid:]])
-        features['magnitude_trend'] = float(second_avg - first_avg)
-    else:
-        features['magnitude_trend'] = 0
+    if cluster_features is None:
+        cluster_features = cluster_features_many(d[None, :], la, lo, m, cluster_neighbor_graph(la, lo),
+                                                 np.array([target_lat]), np.array([target_lon]))[0]
+    features.update(cluster_features)
+    features.update(etas_features_from_arrays(d, ts, current_time, mags=m,
+                                              mag_effect=mag_effect[mask] if mag_effect is not None else None))
+    features['magnitude_trend'] = _magnitude_trend(m, ts)
     features['neighbor_activity'] = 0.0  # Sonra doldurulacak
     return features
 
@@ -818,49 +1007,193 @@ def create_training_records_from_earthquakes(earthquakes: List[Dict],
     return records
 
 
+# Eğitim kaydı üretimi için süreç havuzu: varsayılan 1 = sıralı (web süreci: fetcher, bildirim ve Flask
+# thread'leri çalışırken havuz açılmaz); 0 = kullanılabilir CPU. Scriptler enable_parallel_training() ile açar.
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', '1'))
+# Referans başına iş çok küçük; her göreve bu kadar referans verilir (IPC azaltma)
+TRAINING_REFS_PER_TASK = 4
+
+_SHARED_EVENTS: Dict[str, Any] = {}
+
+
+def _window_cluster_features(arrays: Tuple[np.ndarray, ...], window_start: float,
+                             current_time: float) -> List[Dict]:
+    """
+    (referans, pencere) için tek komşuluk grafı: penceredeki tüm M≥1.0 depremler; 81 il için küme
+    feature'ları tek çağrıda (sıra: TURKEY_CITIES). İl başına 300 km alt kümede DBSCAN ile aynı sonuç.
+    """
+    lats, lons, mags, _, timestamps = arrays
+    in_window = (mags >= 1.0) & (timestamps >= window_start) & (timestamps <= current_time)
+    w_lats, w_lons, w_mags = lats[in_window], lons[in_window], mags[in_window]
+    graph = cluster_neighbor_graph(w_lats, w_lons)
+    if graph is None:
+        return [dict(_EMPTY_CLUSTER_FEATURES) for _ in CITY_NAMES]
+    dists = np.vstack([haversine_vectorized(la, lo, w_lats, w_lons) for la, lo in zip(_CITY_LATS, _CITY_LONS)])
+    return cluster_features_many(dists, w_lats, w_lons, w_mags, graph, _CITY_LATS, _CITY_LONS)
+
+
+def _records_for_reference(arrays: Tuple[np.ndarray, ...], current_time: float,
+                           time_windows: List[int], mag_effect: Optional[np.ndarray] = None) -> List[Dict]:
+    """Tek referans zamanı için 81 il × pencere kaydı (sıra: il, pencere)."""
+    lats, lons, mags, depths, timestamps = arrays
+    if mag_effect is None:
+        mag_effect = etas_mag_effect(mags)
+    cluster_by_window = {tw: _window_cluster_features(arrays, current_time - (tw * 3600), current_time)
+                         for tw in time_windows}
+    results = {}
+    for ci, (city_name, city_data) in enumerate(TURKEY_CITIES.items()):
+        lat, lon = city_data['lat'], city_data['lon']
+        for tw in time_windows:
+            window_start = current_time - (tw * 3600)
+            f = _extract_features_from_arrays(lats, lons, mags, depths, timestamps,
+                                             lat, lon, window_start, current_time,
+                                             cluster_features=cluster_by_window[tw][ci],
+                                             mag_effect=mag_effect)
+            if f:
+                results[(city_name, tw)] = f
+    for (city_name, tw), f in results.items():
+        nb = CITY_NEIGHBORS.get(city_name, [])
+        if nb:
+            counts = [results.get((n, tw), {}).get('count', 0) for n in nb if (n, tw) in results]
+            f['neighbor_activity'] = float(np.mean(counts)) if counts else 0.0
+    records = []
+    for (city_name, tw), features in results.items():
+        city_data = TURKEY_CITIES.get(city_name, {})
+        risk_f = results.get((city_name, 168), features)
+        risk_score = _risk_from_features(risk_f) if risk_f else 2.0
+        records.append({
+            'city': city_name, 'lat': city_data.get('lat', 0), 'lon': city_data.get('lon', 0),
+            'features': features, 'risk_score': risk_score,
+            'timestamp': current_time,
+            'time_window_hours': tw
+        })
+    return records
+
+
+def _init_shared_worker(shm_name: str, n_events: int) -> None:
+    """Havuz süreci başlangıcı: deprem dizilerini paylaşımlı bellekten (kopyasız) bağla."""
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((5, n_events), dtype=np.float64, buffer=shm.buf)
+    _SHARED_EVENTS['shm'] = shm  # referans tut: kapanırsa buffer geçersiz olur
+    _SHARED_EVENTS['arrays'] = tuple(block[i] for i in range(5))
+    _SHARED_EVENTS['mag_effect'] = etas_mag_effect(block[2])  # süreç başına bir kez
+
+
+def _records_for_reference_chunk(task: Tuple[List[float], List[int]]) -> List[Dict]:
+    refs, time_windows = task
+    arrays = _SHARED_EVENTS['arrays']
+    mag_effect = _SHARED_EVENTS['mag_effect']
+    records = []
+    for current_time in refs:
+        records.extend(_records_for_reference(arrays, current_time, time_windows, mag_effect))
+    return records
+
+
+def available_cpus() -> int:
+    """Bu sürece atanmış CPU sayısı (konteynerde host çekirdek sayısı değil)."""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:  # sched_getaffinity olmayan platformlar
+        return os.cpu_count() or 1
+
+
+def enable_parallel_training(workers: Optional[int] = None) -> int:
+    """
+    Ayrı eğitim süreçleri (scheduler.py, train_models.py) için süreç havuzunu açar:
+    TRAINING_WORKERS ortam değişkeni verilmişse o korunur, yoksa workers veya available_cpus().
+    """
+    global TRAINING_WORKERS
+    if 'TRAINING_WORKERS' not in os.environ:
+        TRAINING_WORKERS = workers or available_cpus()
+    return TRAINING_WORKERS
+
+
+def _pool_context():
+    """
+    Havuz süreçleri fork ile değil forkserver (yoksa spawn) ile başlar: çok thread'li süreci (numpy,
+    DBSCAN, arka plan thread'leri) fork etmek kilitli kalmış çocuk süreçlere yol açabilir.
+    """
+    import multiprocessing
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        ctx.set_forkserver_preload(['earthquake_features'])  # numpy / sklearn importu sunucuda bir kez
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+def _training_workers(n_refs: int) -> int:
+    workers = TRAINING_WORKERS if TRAINING_WORKERS > 0 else available_cpus()
+    return max(1, min(workers, (n_refs + TRAINING_REFS_PER_TASK - 1) // TRAINING_REFS_PER_TASK))
+
+
+def _create_training_records_parallel(arrays: Tuple[np.ndarray, ...], refs: List[float],
+                                      time_windows: List[int], workers: int) -> List[Dict]:
+    """
+    Referans zamanlarını süreç havuzuna dağıtır. Deprem dizileri bir kez paylaşımlı belleğe
+    yazılır; görevlere sadece referans zamanları gider. executor.map sırayı korur (deterministik).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    n_events = len(arrays[0])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 5 * n_events * 8))
+    try:
+        block = np.ndarray((5, n_events), dtype=np.float64, buffer=shm.buf)
+        for i, arr in enumerate(arrays):
+            block[i] = arr
+        tasks = [(refs[i:i + TRAINING_REFS_PER_TASK], time_windows)
+                 for i in range(0, len(refs), TRAINING_REFS_PER_TASK)]
+        all_records = []
+        t_start = time.time()
+        report_every = max(1, len(tasks) // 10)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                                 initializer=_init_shared_worker, initargs=(shm.name, n_events)) as executor:
+            for ti, chunk in enumerate(executor.map(_records_for_reference_chunk, tasks)):
+                all_records.extend(chunk)
+                done = min(len(refs), (ti + 1) * TRAINING_REFS_PER_TASK)
+                if (ti + 1) % report_every == 0 or done == len(refs):
+                    elapsed = time.time() - t_start
+                    print(f"[EARTHQUAKE_FEATURES] İlerleme: {done}/{len(refs)} referans | "
+                          f"{done / max(elapsed, 1e-9):.1f} ref/sn | "
+                          f"{len(all_records) / max(elapsed, 1e-9):.0f} kayıt/sn | {workers} süreç")
+        del block
+        return all_records
+    finally:
+        shm.close()
+        shm.unlink()
+
+
 def _create_training_records_batch(earthquakes: List[Dict], time_windows: List[int],
                                    reference_times: Optional[List[float]] = None) -> List[Dict]:
     """
     Vectorized batch. reference_times verilirse her biri için 405 kayıt (tarihsel genişletme).
+    Çok referansta süreç havuzu kullanılır (TRAINING_WORKERS); çıktı sırası sıralı çalışmayla aynıdır.
     """
-    lats, lons, mags, depths, timestamps = _parse_earthquakes_to_arrays(earthquakes)
-    if len(lats) == 0:
+    arrays = _parse_earthquakes_to_arrays(earthquakes)
+    if len(arrays[0]) == 0:
         return []
     refs = reference_times if reference_times else [time.time()]
-    city_list = list(TURKEY_CITIES.items())
-    all_records = []
     n_refs = len(refs)
     if n_refs > 1:
         print(f"[EARTHQUAKE_FEATURES] Tarihsel genişletme: {n_refs} referans × 405 = ~{n_refs * 405} kayıt")
+
+    workers = _training_workers(n_refs)
+    if workers > 1:
+        try:
+            return _create_training_records_parallel(arrays, refs, time_windows, workers)
+        except (OSError, ImportError, RuntimeError) as e:
+            print(f"[EARTHQUAKE_FEATURES] Süreç havuzu kullanılamadı, sıralı devam: {e}")
+
+    mag_effect = etas_mag_effect(arrays[2])  # ETAS büyüklük terimi: event başına bir kez
+    all_records = []
+    t_start = time.time()
     for ref_idx, current_time in enumerate(refs):
+        all_records.extend(_records_for_reference(arrays, current_time, time_windows, mag_effect))
         if n_refs > 5 and (ref_idx + 1) % max(1, n_refs // 5) == 0:
-            print(f"[EARTHQUAKE_FEATURES] İlerleme: {ref_idx + 1}/{n_refs} referans")
-        results = {}
-        for city_name, city_data in city_list:
-            lat, lon = city_data['lat'], city_data['lon']
-            for tw in time_windows:
-                window_start = current_time - (tw * 3600)
-                f = _extract_features_from_arrays(lats, lons, mags, depths, timestamps,
-                                                 lat, lon, window_start, current_time)
-                if f:
-                    results[(city_name, tw)] = f
-        for (city_name, tw), f in results.items():
-            nb = CITY_NEIGHBORS.get(city_name, [])
-            if nb:
-                counts = [results.get((n, tw), {}).get('count', 0) for n in nb if (n, tw) in results]
-                f['neighbor_activity'] = float(np.mean(counts)) if counts else 0.0
-        for (city_name, tw), features in results.items():
-            city_data = TURKEY_CITIES.get(city_name, {})
-            lat = city_data.get('lat', 0)
-            lon = city_data.get('lon', 0)
-            risk_f = results.get((city_name, 168), features)
-            risk_score = _risk_from_features(risk_f) if risk_f else 2.0
-            all_records.append({
-                'city': city_name, 'lat': lat, 'lon': lon,
-                'features': features, 'risk_score': risk_score,
-                'timestamp': current_time,
-                'time_window_hours': tw
-            })
+            elapsed = time.time() - t_start
+            print(f"[EARTHQUAKE_FEATURES] İlerleme: {ref_idx + 1}/{n_refs} referans | "
+                  f"{(ref_idx + 1) / max(elapsed, 1e-9):.1f} ref/sn")
     return all_records
 
 
@@ -926,7 +1259,7 @@ def create_forecast_training_records(earthquakes: List[Dict], time_window_hours:
         return []
 
     try:
-        from forecast_targets import build_binary_target, build_count_target, build_maxmag_target
+        from forecast_targets import build_targets_for_reference, prepare_target_events
     except ImportError:
         return []
 
@@ -969,6 +1302,9 @@ def create_forecast_training_records(earthquakes: List[Dict], time_window_hours:
 
     raw_eqs_with_ts.sort(key=lambda x: x["_cached_timestamp"])
     normalized_events.sort(key=lambda x: x["timestamp"])
+    target_events = prepare_target_events(normalized_events)
+    city_lats = [c["lat"] for _, c in cities_items]
+    city_lons = [c["lon"] for _, c in cities_items]
 
     records = []
     done = 0
@@ -982,8 +1318,10 @@ def create_forecast_training_records(earthquakes: List[Dict], time_window_hours:
         while past_idx < n_eq and raw_eqs_with_ts[past_idx]["_cached_timestamp"] <= ref_ts:
             past_idx += 1
         past_eqs = raw_eqs_with_ts[:past_idx]
+        # 4 hedef × tüm iller: zaman sıralı dizide ufuk dilimi + tek mesafe matrisi
+        targets = build_targets_for_reference(target_events, city_lats, city_lons, ref_ts)
 
-        for city_name, city_data in cities_items:
+        for ci, (city_name, city_data) in enumerate(cities_items):
             lat = city_data["lat"]
             lon = city_data["lon"]
             features = extract_features(
@@ -996,20 +1334,16 @@ def create_forecast_training_records(earthquakes: List[Dict], time_window_hours:
             if not features:
                 done += 1
                 continue
-            y_m4_24h = build_binary_target(normalized_events, lat, lon, ref_ts, 24, 100, 4.0)
-            y_m5_72h = build_binary_target(normalized_events, lat, lon, ref_ts, 72, 150, 5.0)
-            y_count_24h = build_count_target(normalized_events, lat, lon, ref_ts, 24, 100, 2.5)
-            y_maxmag_7d = build_maxmag_target(normalized_events, lat, lon, ref_ts, 168, 150)
             records.append({
                 "city": city_name,
                 "lat": lat,
                 "lon": lon,
                 "timestamp": ref_ts,
                 "features": features,
-                "y_m4_24h": y_m4_24h,
-                "y_m5_72h": y_m5_72h,
-                "y_count_24h": y_count_24h,
-                "y_maxmag_7d": y_maxmag_7d,
+                "y_m4_24h": targets["y_m4_24h"][ci],
+                "y_m5_72h": targets["y_m5_72h"][ci],
+                "y_count_24h": targets["y_count_24h"][ci],
+                "y_maxmag_7d": targets["y_maxmag_7d"][ci],
             })
             done += 1
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+event_snapshot.py
+Tüm endpoint'lerin ve arka plan thread'lerinin okuduğu tek, değişmez (immutable) deprem anlık görüntüsü.
+- raw: Kandilli kayıtları (legacy route'lar; '_parsed_timestamp' bir kez eklenir)
+- raw_columns: raw ile aynı sırada lat/lon/mag/depth/timestamp dizileri (koordinat yoksa NaN)
+- events: birleşik (Kandilli + USGS + AFAD + dosya), dedup'lı normalize event'ler (v2)
+- event_array: events için (M, 5) dizi (forecast.features.EVENT_COLUMNS sırası)
+- fingerprint: içerik özeti; fetcher içerik değişmediyse yeni sürüm yayınlamaz (version = veri sürümü,
+  ETag ve sonuç cache'leri buna dayanır)
+Tek arka plan fetcher'ı yeni görüntüyü kurar ve tek atamayla yayınlar; okuyucular kilit kullanmaz,
+istekler upstream fetch'i hiç beklemez (ilk görüntüden önce boş görüntü döner).
+Kayıt dict'leri paylaşılır: okuyucular değiştirmemeli.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SNAPSHOT_REFRESH_SEC = float(os.getenv('SNAPSHOT_REFRESH_SEC', '60'))
+
+_EVENT_COLUMNS = ('lat', 'lon', 'mag', 'depth', 'timestamp')
+_DATE_FORMATS = (
+    '%Y.%m.%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%d.%m.%Y %H:%M:%S',
+    '%Y.%m.%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%d.%m.%Y %H:%M:%S.%f',
+    '%Y.%m.%d',
+    '%Y-%m-%d',
+    '%d.%m.%Y',
+)
+
+_FETCHER: Dict[str, Any] = {
+    'thread': None, 'lock': threading.Lock(), 'wake': threading.Event(), 'stop': threading.Event(),
+    'listeners': [],
+}
+
+
+def parse_event_timestamp(eq: Dict) -> Optional[float]:
+    """
+    Deprem kaydından epoch saniye (tek parse yolu; legacy ve v2 aynı kuralı kullanır).
+    Sıra: _parsed_timestamp, parsed_timestamp, timestamp, created_at (ms ise saniyeye), sonra date/time.
+    """
+    if not isinstance(eq, dict):
+        return None
+    for key in ('_parsed_timestamp', 'parsed_timestamp', 'timestamp', 'created_at'):
+        value = eq.get(key)
+        if value in (None, ''):
+            continue
+        try:
+            ts = float(value)
+            if ts > 1e12:
+                ts = ts / 1000.0
+            if 0 < ts < 4102444800:
+                return ts
+        except (TypeError, ValueError):
+            pass
+
+    date_str = str(eq.get('date', '') or '').strip()
+    time_str = str(eq.get('time', '') or '').strip()
+    dt_string = f"{date_str} {time_str}".strip()
+    if not dt_string:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(dt_string, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def event_coords(eq: Dict) -> Optional[Tuple[float, float]]:
+    """(lat, lon): önce geojson [lon, lat], yoksa lat/lon(lng) alanları."""
+    geo = eq.get('geojson')
+    if geo and geo.get('coordinates'):
+        lon, lat = geo['coordinates'][:2]
+        return float(lat), float(lon)
+    lat, lon = eq.get('lat'), eq.get('lon') or eq.get('lng')
+    if lat is not None and lon is not None:
+        return float(lat), float(lon)
+    return None
+
+
+def normalize_event(eq: Dict) -> Optional[Dict]:
+    """Ham kayıt → {lat, lon, mag, depth, timestamp}; koordinat veya zaman yoksa None."""
+    coords = event_coords(eq)
+    ts = parse_event_timestamp(eq)
+    if coords is None or not ts:
+        return None
+    return {
+        'lat': coords[0],
+        'lon': coords[1],
+        'mag': float(eq.get('mag', eq.get('magnitude', 0)) or 0),
+        'depth': float(eq.get('depth', 10) or 10),
+        'timestamp': ts,
+    }
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+def build_snapshot(raw_records: List[Dict], events: List[Dict], version: int,
+                   fetched_at: Optional[float] = None) -> MappingProxyType:
+    """Ham kayıtlar ve birleşik event'lerden salt-okunur görüntü kurar (yayınlamaz)."""
+    n = len(raw_records)
+    raw_cols = {k: np.full(n, np.nan if k in ('lat', 'lon') else 0.0) for k in _EVENT_COLUMNS}
+    for i, eq in enumerate(raw_records):
+        ts = parse_event_timestamp(eq)
+        if ts:
+            eq['_parsed_timestamp'] = ts
+            raw_cols['timestamp'][i] = ts
+        coords = event_coords(eq)
+        if coords is not None:
+            raw_cols['lat'][i], raw_cols['lon'][i] = coords
+        raw_cols['mag'][i] = float(eq.get('mag', 0) or 0)
+        raw_cols['depth'][i] = float(eq.get('depth', 10) or 10)
+
+    event_array = np.array(
+        [[e['lat'], e['lon'], e['mag'], e['depth'], e['timestamp']] for e in events],
+        dtype=np.float64,
+    ).reshape(len(events), len(_EVENT_COLUMNS))
+
+    digest = hashlib.sha1()
+    for k in _EVENT_COLUMNS:
+        digest.update(raw_cols[k].tobytes())
+    digest.update(event_array.tobytes())
+    digest.update('\n'.join(str(eq.get('earthquake_id') or eq.get('eventID') or '') for eq in raw_records).encode())
+
+    return MappingProxyType({
+        'version': int(version),
+        'fingerprint': digest.hexdigest(),
+        'fetched_at': float(fetched_at if fetched_at is not None else time.time()),
+        'raw': tuple(raw_records),
+        'raw_columns': MappingProxyType({k: _readonly(v) for k, v in raw_cols.items()}),
+        'events': tuple(events),
+        'event_array': _readonly(event_array),
+    })
+
+
+# Yayınlanan görüntü; ilk fetch'ten önce boş görüntü (version 0)
+_CURRENT: Dict[str, Any] = {'snapshot': build_snapshot([], [], version=0, fetched_at=0.0)}
+
+
+def get_snapshot() -> MappingProxyType:
+    """Güncel görüntü (kilitsiz; tek referans okuması)."""
+    return _CURRENT['snapshot']
+
+
+def publish_snapshot(raw_records: List[Dict], events: List[Dict],
+                     skip_unchanged: bool = False) -> MappingProxyType:
+    """
+    Yeni görüntüyü kurar ve tek atamayla yayınlar (sadece fetcher veya testler çağırır).
+    skip_unchanged: içerik (fingerprint) aynıysa yayınlamaz, mevcut görüntüyü döner.
+    """
+    prev = get_snapshot()
+    snap = build_snapshot(raw_records, events, version=prev['version'] + 1)
+    if skip_unchanged and prev['version'] > 0 and snap['fingerprint'] == prev['fingerprint']:
+        return prev
+    _CURRENT['snapshot'] = snap
+    return snap
+
+
+def add_publish_listener(fn: Callable[[MappingProxyType], None]) -> None:
+    """Fetcher her yeni görüntü yayınladığında fn(snapshot) çağrılır (fetcher thread'inde; bir kez eklenir)."""
+    with _FETCHER['lock']:
+        if fn not in _FETCHER['listeners']:
+            _FETCHER['listeners'].append(fn)
+
+
+def _notify_listeners(snap: MappingProxyType) -> None:
+    for fn in list(_FETCHER['listeners']):
+        try:
+            fn(snap)
+        except Exception as e:
+            print(f"[SNAPSHOT] Listener hatası: {e}")
+
+
+def _fetch_loop(fetch_sources: Callable[[], Tuple[List[Dict], List[Dict]]], interval: float,
+                stop: threading.Event) -> None:
+    while not stop.is_set():
+        t0 = time.time()
+        try:
+            raw, events = fetch_sources()
+            prev = get_snapshot()
+            if raw or events or prev['version'] == 0:
+                if not raw:
+                    raw = list(prev['raw'])  # Kandilli geçici boş: legacy veri korunur
+                snap = publish_snapshot(raw, events, skip_unchanged=True)
+                if snap is prev:
+                    print(f"[SNAPSHOT] Veri değişmedi, v{snap['version']} korunuyor")
+                else:
+                    print(f"[SNAPSHOT] v{snap['version']}: {len(raw)} ham, {len(events)} event "
+                          f"({time.time() - t0:.1f} sn)")
+                    _notify_listeners(snap)
+            else:
+                # Upstream boş döndü: eski görüntü kalsın
+                print("[SNAPSHOT] Kaynaklar boş döndü, önceki görüntü korunuyor")
+        except Exception as e:
+            print(f"[SNAPSHOT] Yenileme hatası: {e}")
+        _FETCHER['wake'].wait(timeout=max(1.0, interval - (time.time() - t0)))
+        _FETCHER['wake'].clear()
+
+
+def start_snapshot_fetcher(fetch_sources: Callable[[], Tuple[List[Dict], List[Dict]]],
+                           interval: float = SNAPSHOT_REFRESH_SEC) -> bool:
+    """Arka plan fetcher'ını (bir kez) başlatır. fetch_sources() -> (ham kayıtlar, birleşik event'ler)."""
+    with _FETCHER['lock']:
+        thread = _FETCHER['thread']
+        if thread is not None and thread.is_alive():
+            return False
+        stop = threading.Event()
+        _FETCHER['stop'] = stop
+        thread = threading.Thread(target=_fetch_loop, args=(fetch_sources, interval, stop),
+                                  name='event-snapshot-fetcher', daemon=True)
+        _FETCHER['thread'] = thread
+        thread.start()
+        return True
+
+
+def request_refresh() -> None:
+    """Fetcher'ı beklemeden bir sonraki yenilemeye uyandırır (çağıran bloklanmaz)."""
+    _FETCHER['wake'].set()
+
+
+def stop_snapshot_fetcher(timeout: float = 5.0) -> None:
+    """Fetcher'ı durdurur (testler ve kapanış için); yayınlanmış görüntü kalır."""
+    with _FETCHER['lock']:
+        thread = _FETCHER['thread']
+        _FETCHER['stop'].set()
+        _FETCHER['wake'].set()
+        _FETCHER['thread'] = None
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+event_store.py
+earthquake_history için sütunlu (columnar) disk deposu.
+- Ham depremler: segment başına tipli NumPy dizisi (id, lat, lon, depth, mag, timestamp)
+  + aynı sırada orijinal kayıtlar (JSON Lines).
+- Diğer kayıtlar (şehir bazlı eğitim / forecast kayıtları): records.jsonl (append-only)
+  + records.idx (kayıt başına tek satır anahtar; duplicate ve istatistik için).
+- manifest.json: segment listesi ve sayaçlar; her yazımda atomik olarak değiştirilir.
+Ekleme O(yeni kayıt), okuma memory-map (json.load yok).
+"""
+
+import os
+import json
+import threading
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+STORE_FORMAT = 1
+MANIFEST_FILE = 'manifest.json'
+RECORDS_FILE = 'records.jsonl'
+RECORDS_INDEX_FILE = 'records.idx'
+MAX_SEGMENTS = 64          # Bu sayı aşılınca segmentler tek segmentte birleştirilir
+TRIM_SLACK_RATIO = 0.1     # max_rows + %10 aşılınca fiziksel kırpma (amortize)
+
+EVENT_ID_LEN = 64
+EVENT_DTYPE = np.dtype([
+    ('id', f'S{EVENT_ID_LEN}'),
+    ('lat', 'f8'),
+    ('lon', 'f8'),
+    ('depth', 'f8'),
+    ('mag', 'f8'),
+    ('timestamp', 'f8'),
+])
+EVENT_COLUMNS = ('lat', 'lon', 'depth', 'mag', 'timestamp')
+
+_write_lock = threading.Lock()
+# store_dir -> {'generation': manifest generation, 'columns': structured array}
+_COLUMNS_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
+def store_dir_for(filepath: str) -> str:
+    """earthquake_history.json → earthquake_history.store (aynı klasörde)."""
+    root, _ = os.path.splitext(filepath)
+    return root + '.store'
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {
+        'format': STORE_FORMAT,
+        'next_segment': 0,
+        'segments': [],
+        'events_total': 0,
+        'records_total': 0,
+        'json_import_mtime': 0,
+        'generation': 0,
+    }
+
+
+def load_manifest(store_dir: str) -> Dict[str, Any]:
+    """Manifest'i okur; yoksa boş manifest döner."""
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return _empty_manifest()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and manifest.get('format') == STORE_FORMAT:
+            return manifest
+    except Exception as e:
+        print(f"[EVENT_STORE] Manifest okunamadı: {e}")
+    return _empty_manifest()
+
+
+def _save_manifest(store_dir: str, manifest: Dict[str, Any]) -> None:
+    """Manifest'i geçici dosyaya yazıp os.replace ile atomik değiştirir."""
+    manifest['generation'] = int(manifest.get('generation', 0)) + 1
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def store_exists(store_dir: str) -> bool:
+    return os.path.exists(os.path.join(store_dir, MANIFEST_FILE))
+
+
+def event_row(eq: Dict, event_id: str) -> Optional[tuple]:
+    """Ham deprem kaydı → EVENT_DTYPE satırı. Koordinatsız kayıt için None."""
+    g = eq.get('geojson') or {}
+    coords = g.get('coordinates') or []
+    if len(coords) < 2:
+        return None
+    lon, lat = coords[0], coords[1]
+    ts = eq.get('timestamp') or eq.get('created_at') or 0
+    try:
+        ts = float(ts)
+    except (TypeError, ValueError):
+        ts = 0.0
+    if ts > 1e12:
+        ts = ts / 1000.0
+    depth = float(eq.get('depth', 10) or 10)
+    mag = float(eq.get('mag', 0) or 0)
+    eid = str(event_id).encode('utf-8')[:EVENT_ID_LEN]
+    return (eid, float(lat), float(lon), depth, mag, ts)
+
+
+def _write_segment(store_dir: str, name: str, rows: List[tuple], records: List[Dict]) -> None:
+    arr = np.array(rows, dtype=EVENT_DTYPE)
+    np.save(os.path.join(store_dir, name + '.npy'), arr)
+    with open(os.path.join(store_dir, name + '.jsonl'), 'w', encoding='utf-8') as f:
+        for rec in records:
+            f.write(_dumps(rec))
+            f.write('\n')
+
+
+def _load_segment(store_dir: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(store_dir, name + '.npy'), mmap_mode='r')
+
+
+def _iter_jsonl(path: str) -> Iterator[Dict]:
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_columns(store_dir: str, max_rows: Optional[int] = None) -> np.ndarray:
+    """
+    Tüm ham depremleri tek yapılandırılmış dizi olarak döndürür (EVENT_DTYPE).
+    Segmentler memory-map ile açılır; manifest generation değişmedikçe sonuç cache'lenir.
+    max_rows verilirse sadece son max_rows satır döner.
+    """
+    manifest = load_manifest(store_dir)
+    generation = manifest.get('generation', 0)
+    cached = _COLUMNS_CACHE.get(store_dir)
+    if cached is None or cached['generation'] != generation:
+        parts = [_load_segment(store_dir, s['name']) for s in manifest['segments'] if s['rows'] > 0]
+        if not parts:
+            columns = np.empty(0, dtype=EVENT_DTYPE)
+        elif len(parts) == 1:
+            columns = parts[0]
+        else:
+            columns = np.concatenate(parts)
+        cached = {'generation': generation, 'columns': columns}
+        _COLUMNS_CACHE[store_dir] = cached
+    columns = cached['columns']
+    if max_rows is not None and len(columns) > max_rows:
+        return columns[-max_rows:]
+    return columns
+
+
+def iter_event_records(store_dir: str, max_rows: Optional[int] = None) -> Iterator[Dict]:
+    """Ham deprem kayıtlarını (orijinal dict) ekleme sırasıyla üretir."""
+    manifest = load_manifest(store_dir)
+    skip = 0
+    if max_rows is not None and manifest['events_total'] > max_rows:
+        skip = manifest['events_total'] - max_rows
+    for seg in manifest['segments']:
+        if skip >= seg['rows']:
+            skip -= seg['rows']
+            continue
+        for i, rec in enumerate(_iter_jsonl(os.path.join(store_dir, seg['name'] + '.jsonl'))):
+            if i < skip:
+                continue
+            yield rec
+        skip = 0
+
+
+def load_records(store_dir: str, max_rows: Optional[int] = None) -> List[Dict]:
+    """Deprem dışı kayıtlar (eğitim/forecast kayıtları)."""
+    records = list(_iter_jsonl(os.path.join(store_dir, RECORDS_FILE)))
+    if max_rows is not None and len(records) > max_rows:
+        records = records[-max_rows:]
+    return records
+
+
+def append_events(store_dir: str, rows: List[tuple], records: List[Dict],
+                  max_rows: Optional[int] = None) -> int:
+    """
+    Yeni ham depremleri yeni bir segment olarak ekler (O(yeni kayıt)).
+    rows: event_row() çıktıları, records: aynı sırada orijinal kayıtlar.
+    Returns: toplam ham deprem sayısı
+    """
+    if len(rows) != len(records):
+        raise ValueError("rows ve records uzunlukları eşit olmalı")
+    with _write_lock:
+        os.makedirs(store_dir, exist_ok=True)
+        manifest = load_manifest(store_dir)
+        if rows:
+            name = f"seg_{manifest['next_segment']:06d}"
+            _write_segment(store_dir, name, rows, records)
+            manifest['segments'].append({'name': name, 'rows': len(rows)})
+            manifest['next_segment'] += 1
+            manifest['events_total'] += len(rows)
+        over_limit = (
+            max_rows is not None
+            and manifest['events_total'] > max_rows * (1 + TRIM_SLACK_RATIO)
+        )
+        old = []
+        if len(manifest['segments']) > MAX_SEGMENTS or over_limit:
+            old = _compact_events(store_dir, manifest, max_rows)
+        _save_manifest(store_dir, manifest)
+        _remove_segments(store_dir, old)
+        return manifest['events_total']
+
+
+def load_record_keys(store_dir: str, max_rows: Optional[int] = None) -> List[str]:
+    """
+    records.jsonl ile aynı sıradaki anahtar satırları (records.idx).
+    Kayıtları parse etmeden duplicate/istatistik kontrolü için kullanılır.
+    """
+    path = os.path.join(store_dir, RECORDS_INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        keys = [line.rstrip('\n') for line in f if line.strip()]
+    if max_rows is not None and len(keys) > max_rows:
+        keys = keys[-max_rows:]
+    return keys
+
+
+def append_records(store_dir: str, records: List[Dict], keys: List[str],
+                   max_rows: Optional[int] = None) -> int:
+    """
+    Deprem dışı kayıtları records.jsonl sonuna, anahtarlarını records.idx sonuna ekler.
+    Returns: toplam kayıt sayısı
+    """
+    if len(records) != len(keys):
+        raise ValueError("records ve keys uzunlukları eşit olmalı")
+    with _write_lock:
+        os.makedirs(store_dir, exist_ok=True)
+        manifest = load_manifest(store_dir)
+        if records:
+            with open(os.path.join(store_dir, RECORDS_FILE), 'a', encoding='utf-8') as f:
+                for rec in records:
+                    f.write(_dumps(rec))
+                    f.write('\n')
+            with open(os.path.join(store_dir, RECORDS_INDEX_FILE), 'a', encoding='utf-8') as f:
+                for key in keys:
+                    f.write(key)
+                    f.write('\n')
+            manifest['records_total'] += len(records)
+        if max_rows is not None and manifest['records_total'] > max_rows * (1 + TRIM_SLACK_RATIO):
+            kept = load_records(store_dir, max_rows=max_rows)
+            kept_keys = load_record_keys(store_dir, max_rows=max_rows)
+            _rewrite_records(store_dir, kept, kept_keys)
+            manifest['records_total'] = len(kept)
+        _save_manifest(store_dir, manifest)
+        return manifest['records_total']
+
+
+def _rewrite_records(store_dir: str, records: List[Dict], keys: List[str]) -> None:
+    for fname, lines in ((RECORDS_FILE, (_dumps(r) for r in records)), (RECORDS_INDEX_FILE, keys)):
+        path = os.path.join(store_dir, fname)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+                f.write('\n')
+        os.replace(tmp, path)
+
+
+def _compact_events(store_dir: str, manifest: Dict[str, Any], max_rows: Optional[int]) -> List[str]:
+    """
+    Tüm segmentleri tek segmentte birleştirir; max_rows'a göre eskileri atar.
+    Returns: manifest kaydedildikten sonra silinecek eski segment adları
+    """
+    columns = _read_all_columns(store_dir, manifest)
+    skip = 0
+    if max_rows is not None and len(columns) > max_rows:
+        skip = len(columns) - max_rows
+        columns = columns[-max_rows:]
+    old = [s['name'] for s in manifest['segments']]
+    name = f"seg_{manifest['next_segment']:06d}"
+    np.save(os.path.join(store_dir, name + '.npy'), np.ascontiguousarray(columns))
+    # Kayıtlar satır satır kopyalanır (parse edilmez): bellek segment boyutundan bağımsız
+    with open(os.path.join(store_dir, name + '.jsonl'), 'w', encoding='utf-8') as out:
+        for seg in manifest['segments']:
+            path = os.path.join(store_dir, seg['name'] + '.jsonl')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    out.write(line if line.endswith('\n') else line + '\n')
+    manifest['segments'] = [{'name': name, 'rows': len(columns)}]
+    manifest['next_segment'] += 1
+    manifest['events_total'] = len(columns)
+    print(f"[EVENT_STORE] {len(old)} segment birleştirildi → {len(columns)} deprem")
+    return old
+
+
+def _read_all_columns(store_dir: str, manifest: Dict[str, Any]) -> np.ndarray:
+    parts = [np.load(os.path.join(store_dir, s['name'] + '.npy')) for s in manifest['segments'] if s['rows'] > 0]
+    if not parts:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+
+def _remove_segments(store_dir: str, names: List[str]) -> None:
+    """
+    Manifest'ten düşmüş segment dosyalarını siler.
+    Açık memory-map varsa (Windows) silme başarısız olabilir; sonraki birleştirmede tekrar denenir.
+    """
+    for name in names:
+        for ext in ('.npy', '.jsonl'):
+            try:
+                os.remove(os.path.join(store_dir, name + ext))
+            except OSError:
+                pass
+
+
+def rewrite_store(store_dir: str, event_rows: List[tuple], event_records: List[Dict],
+                  records: List[Dict], record_keys: List[str]) -> None:
+    """Depoyu verilen içerikle baştan yazar (save_dataset)."""
+    with _write_lock:
+        os.makedirs(store_dir, exist_ok=True)
+        manifest = load_manifest(store_dir)
+        old = [s['name'] for s in manifest['segments']]
+        name = f"seg_{manifest['next_segment']:06d}"
+        _write_segment(store_dir, name, event_rows, event_records)
+        _rewrite_records(store_dir, records, record_keys)
+        manifest['segments'] = [{'name': name, 'rows': len(event_rows)}]
+        manifest['next_segment'] += 1
+        manifest['events_total'] = len(event_rows)
+        manifest['records_total'] = len(records)
+        _save_manifest(store_dir, manifest)
+        _remove_segments(store_dir, old)
+
+
+def get_json_import_mtime(store_dir: str) -> float:
+    return float(load_manifest(store_dir).get('json_import_mtime', 0) or 0)
+
+
+def set_json_import_mtime(store_dir: str, mtime: float) -> None:
+    """Eski JSON dosyasının hangi sürümünün içe aktarıldığını kaydeder."""
+    with _write_lock:
+        os.makedirs(store_dir, exist_ok=True)
+        manifest = load_manifest(store_dir)
+        manifest['json_import_mtime'] = mtime
+        _save_manifest(store_dir, manifest)
+
+
+def get_counts(store_dir: str) -> Dict[str, int]:
+    """Dosya okumadan (manifest'ten) kayıt sayıları."""
+    manifest = load_manifest(store_dir)
+    return {
+        'events': int(manifest['events_total']),
+        'records': int(manifest['records_total']),
+        'segments': len(manifest['segments']),
+    }
+
+
+def get_store_size_bytes(store_dir: str) -> int:
+    if not os.path.isdir(store_dir):
+        return 0
+    total = 0
+    for fname in os.listdir(store_dir):
+        try:
+            total += os.path.getsize(os.path.join(store_dir, fname))
+        except OSError:
+            pass
+    return total
@@ -1,5 +1,5 @@
 # forecast - ML forecast pipeline
 from forecast.features import extract_features
-from forecast.predictor import load_model, predict
+from forecast.predictor import load_model, predict, predict_many
 
-__all__ = ["extract_features", "load_model", "predict"]
+__all__ = ["extract_features", "load_model", "predict", "predict_many"]
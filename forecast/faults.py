@@ -1,10 +1,28 @@
 # forecast/faults.py - Gerçek fay geometrisi (GeoJSON/SHP); yoksa 999.0 / unknown
+# Fay geometrileri bir kez EPSG:3857'ye çevrilip STRtree'ye konur (kesin sorgu);
+# Türkiye bbox'ı üzerinde mesafe/segment rasterı fay dosyasının hash'iyle diske cache'lenir
+# (raster düğümüne denk gelen grid noktaları O(1)).
+import hashlib
 import os
 from functools import lru_cache
 
+import numpy as np
+import shapely
 from shapely.geometry import Point
 
-from config import FAULTS_GEOJSON, FAULTS_SHP
+from config import (
+    FAULTS_DIR,
+    FAULTS_GEOJSON,
+    FAULTS_SHP,
+    FAULT_RASTER_STEP,
+)
+from forecast.grid import TURKEY_BBOX
+
+# Raster tahmin ızgarasıyla aynı kutuyu kapsar (iki kopya birbirinden kaymasın)
+FAULT_RASTER_BBOX = TURKEY_BBOX
+
+_MERCATOR_R = 6378137.0  # EPSG:3857 küre yarıçapı (m)
+_NODE_TOL = 1e-9
 
 
 @lru_cache(maxsize=1)
@@ -16,18 +34,21 @@ def _load_geopandas():
         return None
 
 
+def _fault_path():
+    if os.path.exists(FAULTS_GEOJSON):
+        return FAULTS_GEOJSON
+    if os.path.exists(FAULTS_SHP):
+        return FAULTS_SHP
+    return None
+
+
 @lru_cache(maxsize=1)
 def load_fault_geometries():
     gpd = _load_geopandas()
     if gpd is None:
         return None
 
-    path = None
-    if os.path.exists(FAULTS_GEOJSON):
-        path = FAULTS_GEOJSON
-    elif os.path.exists(FAULTS_SHP):
-        path = FAULTS_SHP
-
+    path = _fault_path()
     if path is None:
         return None
 
@@ -43,25 +64,169 @@ def load_fault_geometries():
     return gdf
 
 
-def nearest_fault_distance_km(lat: float, lon: float) -> float:
+def _segment_name(row, idx: int) -> str:
+    for col in ("name", "fault_name", "segment", "segment_name", "id"):
+        if col in row.index and row[col] not in (None, ""):
+            return str(row[col])
+    return f"segment_{idx}"
+
+
+def _to_mercator(lats, lons):
+    """WGS84 → EPSG:3857 (küresel Mercator, metre)."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    x = _MERCATOR_R * np.radians(lons)
+    y = _MERCATOR_R * np.log(np.tan(np.pi / 4.0 + np.radians(lats) / 2.0))
+    return x, y
+
+
+def _fault_file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    paths = [path]
+    if path.lower().endswith(".shp"):
+        base = os.path.splitext(path)[0]
+        paths += [base + ext for ext in (".dbf", ".shx", ".prj") if os.path.exists(base + ext)]
+    for p in paths:
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _query_tree(tree, lats, lons):
+    """STRtree ile en yakın segment (eşit mesafede en küçük indeks, gdf.idxmin ile aynı)."""
+    x, y = _to_mercator(lats, lons)
+    points = shapely.points(x, y)
+    pairs, dists = tree.query_nearest(points, return_distance=True, all_matches=True)
+    order = np.lexsort((pairs[1], pairs[0]))
+    inp, seg, dists = pairs[0][order], pairs[1][order], dists[order]
+    first = np.ones(len(inp), dtype=bool)
+    first[1:] = inp[1:] != inp[:-1]
+    seg_idx = np.full(len(points), -1, dtype=np.int64)
+    dist_km = np.full(len(points), 999.0, dtype=np.float64)
+    seg_idx[inp[first]] = seg[first]
+    dist_km[inp[first]] = dists[first] / 1000.0
+    return dist_km, seg_idx
+
+
+def _raster_axes(step: float):
+    min_lat, max_lat, min_lon, max_lon = FAULT_RASTER_BBOX
+    n_lat = int(round((max_lat - min_lat) / step)) + 1
+    n_lon = int(round((max_lon - min_lon) / step)) + 1
+    return min_lat + np.arange(n_lat) * step, min_lon + np.arange(n_lon) * step
+
+
+def _build_raster(tree, step: float):
+    lat_axis, lon_axis = _raster_axes(step)
+    LAT, LON = np.meshgrid(lat_axis, lon_axis, indexing="ij")
+    dist_km, seg_idx = _query_tree(tree, LAT.ravel(), LON.ravel())
+    return dist_km.reshape(LAT.shape), seg_idx.reshape(LAT.shape).astype(np.int32)
+
+
+@lru_cache(maxsize=1)
+def load_fault_index():
+    """
+    {tree, names, raster_dist, raster_seg, step} veya fay verisi yoksa None.
+    Raster data/faults/fault_raster_<hash>_<step>.npz olarak cache'lenir.
+    """
     gdf = load_fault_geometries()
     if gdf is None:
-        return 999.0
+        return None
 
-    gpd = _load_geopandas()
-    point = gpd.GeoSeries([Point(lon, lat)], crs="EPSG:4326")
+    geoms_m = np.asarray(gdf.to_crs(epsg=3857).geometry.values, dtype=object)
+    tree = shapely.STRtree(geoms_m)
+    names = [_segment_name(gdf.iloc[i], i) for i in range(len(gdf))]
+
+    step = float(FAULT_RASTER_STEP)
+    raster_dist = raster_seg = None
+    if step > 0:
+        cache_path = os.path.join(
+            FAULTS_DIR, f"fault_raster_{_fault_file_hash(_fault_path())}_{step:g}.npz"
+        )
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as z:
+                    raster_dist, raster_seg = z["dist_km"], z["seg_idx"]
+            except Exception:
+                raster_dist = raster_seg = None
+        expected = tuple(len(a) for a in _raster_axes(step))
+        if raster_dist is None or raster_dist.shape != expected:
+            raster_dist, raster_seg = _build_raster(tree, step)
+            try:
+                np.savez(cache_path, dist_km=raster_dist, seg_idx=raster_seg)
+            except OSError:
+                pass
 
-    gdf_m = gdf.to_crs(epsg=3857)
-    point_m = point.to_crs(epsg=3857)
+    return {
+        "tree": tree,
+        "names": names,
+        "raster_dist": raster_dist,
+        "raster_seg": raster_seg,
+        "step": step,
+    }
 
-    distances = gdf_m.distance(point_m.iloc[0])
-    if distances.empty:
-        return 999.0
 
-    return float(distances.min() / 1000.0)
+def _raster_cells(index, lats, lons):
+    """Raster düğümüne tam denk gelen noktalar için (maske, satır, sütun)."""
+    n = len(lats)
+    if index["raster_dist"] is None:
+        return np.zeros(n, dtype=bool), None, None
+    min_lat, _, min_lon, _ = FAULT_RASTER_BBOX
+    step = index["step"]
+    fi = (lats - min_lat) / step
+    fj = (lons - min_lon) / step
+    i = np.rint(fi).astype(np.int64)
+    j = np.rint(fj).astype(np.int64)
+    n_lat, n_lon = index["raster_dist"].shape
+    hit = (
+        (np.abs(fi - i) < _NODE_TOL / step)
+        & (np.abs(fj - j) < _NODE_TOL / step)
+        & (i >= 0) & (i < n_lat) & (j >= 0) & (j < n_lon)
+    )
+    return hit, i, j
+
+
+def nearest_fault_info_many(lats, lons):
+    """
+    Çok nokta için (mesafe_km dizisi, segment adı listesi).
+    Raster düğümündeki noktalar rasterdan, diğerleri STRtree ile tek vektörel sorguda.
+    """
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    n = len(lats)
+    index = load_fault_index()
+    if index is None:
+        return np.full(n, 999.0), ["unknown"] * n
+
+    dist_km = np.empty(n, dtype=np.float64)
+    seg_idx = np.empty(n, dtype=np.int64)
+    hit, i, j = _raster_cells(index, lats, lons)
+    if hit.any():
+        dist_km[hit] = index["raster_dist"][i[hit], j[hit]]
+        seg_idx[hit] = index["raster_seg"][i[hit], j[hit]]
+    miss = ~hit
+    if miss.any():
+        dist_km[miss], seg_idx[miss] = _query_tree(index["tree"], lats[miss], lons[miss])
+
+    names = index["names"]
+    return dist_km, [names[s] if s >= 0 else "unknown" for s in seg_idx]
+
+
+def nearest_fault_distance_km(lat: float, lon: float) -> float:
+    dist_km, _ = nearest_fault_info_many([lat], [lon])
+    return float(dist_km[0])
 
 
 def nearest_fault_segment_info(lat: float, lon: float) -> dict:
+    dist_km, names = nearest_fault_info_many([lat], [lon])
+    return {
+        "distance_km": float(dist_km[0]),
+        "segment_name": names[0],
+    }
+
+
+def nearest_fault_segment_info_exact(lat: float, lon: float) -> dict:
+    """Eski (GeoPandas, her çağrıda to_crs) hesap; doğrulama ve karşılaştırma için."""
     gdf = load_fault_geometries()
     if gdf is None:
         return {"distance_km": 999.0, "segment_name": "unknown"}
@@ -77,18 +242,7 @@ def nearest_fault_segment_info(lat: float, lon: float) -> dict:
         return {"distance_km": 999.0, "segment_name": "unknown"}
 
     idx = distances.idxmin()
-    row = gdf.iloc[idx]
-
-    seg_name = None
-    for col in ("name", "fault_name", "segment", "segment_name", "id"):
-        if col in row.index and row[col] not in (None, ""):
-            seg_name = str(row[col])
-            break
-
-    if not seg_name:
-        seg_name = f"segment_{idx}"
-
     return {
         "distance_km": float(distances.loc[idx] / 1000.0),
-        "segment_name": seg_name,
+        "segment_name": _segment_name(gdf.iloc[idx], idx),
     }
@@ -1,7 +1,7 @@
 # forecast/features.py - Güçlü feature seti (swarm, fay, recency energy, stress proxy)
 import numpy as np
 
-from forecast.faults import nearest_fault_distance_km, nearest_fault_segment_info
+from forecast.faults import nearest_fault_info_many
 
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -15,104 +15,187 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return 2 * R * np.arcsin(np.sqrt(a))
 
 
-def extract_features(earthquakes: list, lat: float, lon: float, time_window_hours: int = 48) -> dict:
-    empty_fault = nearest_fault_segment_info(lat, lon)
-    default = {
-        "count": 0,
-        "max_mag": 0.0,
-        "mean_mag": 0.0,
-        "mag_std": 0.0,
-        "min_distance": 999.0,
-        "mean_distance": 999.0,
-        "recency_energy": 0.0,
-        "mean_depth": 10.0,
-        "recent_6h_count": 0,
-        "recent_24h_count": 0,
-        "swarm_ratio": 0.0,
-        "fault_distance": empty_fault["distance_km"],
-        "fault_proximity_score": 0.0,
-        "stress_transfer": 0.0,
-        "energy_release": 0.0,
-        "foreshock_count": 0,
-        "spatial_density": 0.0,
-        "mag_trend": 0.0,
-        "depth_variance": 0.0,
-        "nearest_fault_segment": empty_fault["segment_name"],
-    }
+FEATURE_ORDER = [
+    "count",
+    "max_mag",
+    "mean_mag",
+    "mag_std",
+    "min_distance",
+    "mean_distance",
+    "recency_energy",
+    "mean_depth",
+    "recent_6h_count",
+    "recent_24h_count",
+    "swarm_ratio",
+    "fault_distance",
+    "fault_proximity_score",
+    "stress_transfer",
+    "energy_release",
+    "foreshock_count",
+    "spatial_density",
+    "mag_trend",
+    "depth_variance",
+]
+_COL = {k: i for i, k in enumerate(FEATURE_ORDER)}
+_INT_FEATURES = ("count", "recent_6h_count", "recent_24h_count", "foreshock_count")
+
+# Normalize event dizisi sütunları: (M, 5) float64
+EVENT_COLUMNS = ("lat", "lon", "mag", "depth", "timestamp")
+
+# Nokta × event mesafe matrisi parça boyutu (eleman sayısı, ~16 MB float64)
+DISTANCE_CHUNK_ELEMENTS = 2_000_000
+
 
+def events_to_array(earthquakes) -> np.ndarray:
+    """Normalize event listesi (dict) → (M, 5) dizi: lat, lon, mag, depth, timestamp. Dizi verilirse aynen döner."""
+    if isinstance(earthquakes, np.ndarray):
+        return earthquakes
     if not earthquakes:
-        return default
-
-    now = max(e.get("timestamp", 0) or 0 for e in earthquakes)
-    recent = [
-        e for e in earthquakes
-        if (e.get("timestamp") or 0) > 0
-        and (now - (e.get("timestamp") or 0)) <= time_window_hours * 3600
-    ]
-
-    fault_info = nearest_fault_segment_info(lat, lon)
-    if not recent:
-        return {
-            **default,
-            "fault_distance": fault_info["distance_km"],
-            "fault_proximity_score": max(0.0, 1.0 - fault_info["distance_km"] / 100.0),
-            "nearest_fault_segment": fault_info["segment_name"],
-        }
-
-    mags = [float(e.get("mag", 0) or 0) for e in recent]
-    depths = [float(e.get("depth", 10) or 10) for e in recent]
-    distances = [
-        haversine_km(lat, lon, float(e.get("lat", 0)), float(e.get("lon", 0)))
-        for e in recent
-    ]
-
-    energy = 0.0
-    energy_sum = 0.0
-    for e in recent:
-        dt_hours = max((now - float(e.get("timestamp", 0) or 0)) / 3600.0, 1e-6)
-        mag = float(e.get("mag", 0) or 0)
-        ev_energy = 10 ** (1.5 * mag)
-        energy += ev_energy / (1.0 + dt_hours)
-        energy_sum += ev_energy
-
-    recent_6h = [e for e in recent if now - (e.get("timestamp") or 0) <= 6 * 3600]
-    recent_24h = [e for e in recent if now - (e.get("timestamp") or 0) <= 24 * 3600]
-    foreshock_count = sum(1 for e in recent if 2.0 <= float(e.get("mag", 0) or 0) <= 4.0)
-
-    mag_trend = float(mags[-1] - mags[0]) if len(mags) > 1 else 0.0
-    spatial_density = float(len(recent) / (time_window_hours + 1))
-    depth_variance = float(np.var(depths)) if len(depths) > 1 else 0.0
-
-    stress_score = 0.0
-    for e in recent:
-        mag = float(e.get("mag", 0) or 0)
-        dist = haversine_km(lat, lon, float(e.get("lat", 0)), float(e.get("lon", 0)))
-        if mag >= 5.0:
-            stress_score += (mag - 4.0) / (1.0 + dist)
-    stress_score = float(np.tanh(stress_score / 5.0))
-
-    fault_distance = float(fault_info["distance_km"])
-    fault_proximity_score = max(0.0, 1.0 - fault_distance / 100.0)
-
-    return {
-        "count": int(len(recent)),
-        "max_mag": float(np.max(mags)) if mags else 0.0,
-        "mean_mag": float(np.mean(mags)) if mags else 0.0,
-        "mag_std": float(np.std(mags)) if len(mags) > 1 else 0.0,
-        "min_distance": float(np.min(distances)) if distances else 999.0,
-        "mean_distance": float(np.mean(distances)) if distances else 999.0,
-        "recency_energy": float(np.log10(energy + 1.0)),
-        "mean_depth": float(np.mean(depths)) if depths else 10.0,
-        "recent_6h_count": int(len(recent_6h)),
-        "recent_24h_count": int(len(recent_24h)),
-        "swarm_ratio": float(len(recent_6h) / len(recent_24h)) if len(recent_24h) > 0 else 0.0,
-        "fault_distance": fault_distance,
-        "fault_proximity_score": fault_proximity_score,
-        "stress_transfer": stress_score,
-        "energy_release": float(np.log10(energy_sum + 1.0)),
-        "foreshock_count": int(foreshock_count),
-        "spatial_density": spatial_density,
-        "mag_trend": mag_trend,
-        "depth_variance": depth_variance,
-        "nearest_fault_segment": fault_info["segment_name"],
-    }
+        return np.empty((0, len(EVENT_COLUMNS)), dtype=np.float64)
+    return np.array(
+        [
+            [
+                float(e.get("lat", 0)),
+                float(e.get("lon", 0)),
+                float(e.get("mag", 0) or 0),
+                float(e.get("depth", 10) or 10),
+                float(e.get("timestamp", 0) or 0),
+            ]
+            for e in earthquakes
+        ],
+        dtype=np.float64,
+    )
+
+
+def haversine_matrix(lats, lons, ev_lats, ev_lons) -> np.ndarray:
+    """N nokta × M event mesafe matrisi (km); haversine_km ile aynı formül."""
+    lat1 = np.asarray(lats, dtype=np.float64)[:, None]
+    lon1 = np.asarray(lons, dtype=np.float64)[:, None]
+    lat2 = np.asarray(ev_lats, dtype=np.float64)[None, :]
+    lon2 = np.asarray(ev_lons, dtype=np.float64)[None, :]
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+
+def window_events(earthquakes, time_window_hours: int = 48):
+    """
+    Pencere içi event'ler: (r (k, 5) — event sırası korunur, now = en yeni event zamanı).
+    Event yoksa (boş dizi, None); pencere boşsa (boş dizi, now).
+    """
+    ev = events_to_array(earthquakes)
+    if len(ev) == 0:
+        return ev, None
+    ts = ev[:, 4]
+    now = float(np.max(ts))
+    recent_mask = (ts > 0) & ((now - ts) <= time_window_hours * 3600)
+    return ev[recent_mask], now
+
+
+def distance_aggregates(lats, lons, r) -> tuple:
+    """
+    Nokta başına mesafe toplamları: (min_distance, distance_sum, stress_sum) — r: (k, 5) event dizisi.
+    stress_sum: M>=5 event'ler için Σ (mag-4)/(1+D). Bellek sınırı için parça parça.
+    Toplanabilir olduklarından event eklenip çıkarıldıkça artımlı güncellenebilir.
+    """
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    n, k = len(lats), len(r)
+    min_d = np.full(n, np.inf)
+    sum_d = np.zeros(n)
+    stress = np.zeros(n)
+    if k == 0:
+        return min_d, sum_d, stress
+    big = r[:, 2] >= 5.0
+    stress_num = r[big, 2] - 4.0
+    step = max(1, DISTANCE_CHUNK_ELEMENTS // k)
+    for i in range(0, n, step):
+        sl = slice(i, min(n, i + step))
+        D = haversine_matrix(lats[sl], lons[sl], r[:, 0], r[:, 1])
+        min_d[sl] = D.min(axis=1)
+        sum_d[sl] = D.sum(axis=1)
+        if stress_num.size:
+            stress[sl] = (stress_num / (1.0 + D[:, big])).sum(axis=1)
+    return min_d, sum_d, stress
+
+
+def features_from_aggregates(r, now, time_window_hours: int, fault_distance, min_d, sum_d, stress) -> np.ndarray:
+    """
+    Pencere event'leri (global feature'lar) + nokta başına mesafe toplamlarından FEATURE_ORDER matrisi.
+    extract_features_batch ile aynı değerler (mean_distance = distance_sum / k).
+    """
+    fault_distance = np.asarray(fault_distance, dtype=np.float64)
+    n = len(fault_distance)
+    X = np.zeros((n, len(FEATURE_ORDER)), dtype=np.float64)
+    X[:, _COL["min_distance"]] = 999.0
+    X[:, _COL["mean_distance"]] = 999.0
+    X[:, _COL["mean_depth"]] = 10.0
+    X[:, _COL["fault_distance"]] = fault_distance
+    if now is None:
+        return X
+    X[:, _COL["fault_proximity_score"]] = np.maximum(0.0, 1.0 - fault_distance / 100.0)
+    k = len(r)
+    if k == 0:
+        return X
+
+    mags, depths, r_ts = r[:, 2], r[:, 3], r[:, 4]
+    age = now - r_ts
+    dt_hours = np.maximum(age / 3600.0, 1e-6)
+    ev_energy = 10 ** (1.5 * mags)
+    energy = float(np.sum(ev_energy / (1.0 + dt_hours)))
+    energy_sum = float(np.sum(ev_energy))
+    recent_6h = int(np.sum(age <= 6 * 3600))
+    recent_24h = int(np.sum(age <= 24 * 3600))
+
+    # Noktadan bağımsız (pencere içi tüm event'ler) feature'lar
+    X[:, _COL["count"]] = k
+    X[:, _COL["max_mag"]] = float(np.max(mags))
+    X[:, _COL["mean_mag"]] = float(np.mean(mags))
+    X[:, _COL["mag_std"]] = float(np.std(mags)) if k > 1 else 0.0
+    X[:, _COL["recency_energy"]] = float(np.log10(energy + 1.0))
+    X[:, _COL["mean_depth"]] = float(np.mean(depths))
+    X[:, _COL["recent_6h_count"]] = recent_6h
+    X[:, _COL["recent_24h_count"]] = recent_24h
+    X[:, _COL["swarm_ratio"]] = recent_6h / recent_24h if recent_24h > 0 else 0.0
+    X[:, _COL["energy_release"]] = float(np.log10(energy_sum + 1.0))
+    X[:, _COL["foreshock_count"]] = int(np.sum((mags >= 2.0) & (mags <= 4.0)))
+    X[:, _COL["spatial_density"]] = k / (time_window_hours + 1)
+    X[:, _COL["mag_trend"]] = float(mags[-1] - mags[0]) if k > 1 else 0.0
+    X[:, _COL["depth_variance"]] = float(np.var(depths)) if k > 1 else 0.0
+
+    # Noktaya bağlı
+    X[:, _COL["min_distance"]] = min_d
+    X[:, _COL["mean_distance"]] = sum_d / k
+    if np.any(mags >= 5.0):
+        X[:, _COL["stress_transfer"]] = np.tanh(stress / 5.0)
+    return X
+
+
+def extract_features_batch(earthquakes, lats, lons, time_window_hours: int = 48):
+    """
+    N hedef nokta için FEATURE_ORDER matrisi tek vektörel geçişte.
+    earthquakes: normalize event listesi veya events_to_array çıktısı (bir kez hazırlanıp tekrar kullanılabilir).
+    Returns: (X (N, len(FEATURE_ORDER)) float64 — predict_proba'ya hazır, nearest_fault_segment listesi)
+    """
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    fault_distance, segments = nearest_fault_info_many(lats, lons)
+    r, now = window_events(earthquakes, time_window_hours)
+    min_d, sum_d, stress = distance_aggregates(lats, lons, r)
+    X = features_from_aggregates(r, now, time_window_hours, fault_distance, min_d, sum_d, stress)
+    return X, segments
+
+
+def features_from_row(x, segment_name: str) -> dict:
+    """extract_features_batch satırı → extract_features ile aynı dict."""
+    feats = {}
+    for k, v in zip(FEATURE_ORDER, x):
+        feats[k] = int(v) if k in _INT_FEATURES else float(v)
+    feats["nearest_fault_segment"] = segment_name
+    return feats
+
+
+def extract_features(earthquakes: list, lat: float, lon: float, time_window_hours: int = 48) -> dict:
+    X, segments = extract_features_batch(earthquakes, [lat], [lon], time_window_hours=time_window_hours)
+    return features_from_row(X[0], segments[0])
@@ -1,19 +1,70 @@
 # forecast/grid.py - Türkiye grid noktaları (harita tahmin için)
-def generate_turkey_grid(step=0.5):
-    min_lat = 35.5
-    max_lat = 42.5
-    min_lon = 25.5
-    max_lon = 45.0
-    points = []
-    lat = min_lat
-    while lat <= max_lat:
-        lon = min_lon
-        while lon <= max_lon:
-            points.append({
-                "lat": round(lat, 4),
-                "lon": round(lon, 4),
-                "id": f"{round(lat, 2)}_{round(lon, 2)}",
-            })
-            lon += step
-        lat += step
-    return points
+# Koordinatlar tamsayı indeksten üretilir (min + i * step): float birikimi yok, her step'te aynı uç noktalar.
+import numpy as np
+
+# (min_lat, max_lat, min_lon, max_lon)
+TURKEY_BBOX = (35.5, 42.5, 25.5, 45.0)
+MIN_GRID_STEP = 0.05
+MAX_GRID_STEP = 5.0
+
+
+def _axis(lo, hi, step):
+    n = int(np.floor((hi - lo) / step + 1e-9)) + 1
+    return np.round(lo + np.arange(n) * step, 4)
+
+
+def grid_axes(step=0.5, bbox=TURKEY_BBOX):
+    """(lat ekseni, lon ekseni) dizileri."""
+    step = float(step)
+    if not MIN_GRID_STEP - 1e-9 <= step <= MAX_GRID_STEP:
+        raise ValueError(f"step {MIN_GRID_STEP} ile {MAX_GRID_STEP} derece arasında olmalı: {step}")
+    min_lat, max_lat, min_lon, max_lon = bbox
+    return _axis(min_lat, max_lat, step), _axis(min_lon, max_lon, step)
+
+
+def grid_coords(step=0.5, bbox=TURKEY_BBOX):
+    """Tüm grid noktaları: (lats, lons) düz diziler, enlem-öncelikli sıra (generate_turkey_grid ile aynı)."""
+    lat_axis, lon_axis = grid_axes(step, bbox)
+    lats, lons = np.meshgrid(lat_axis, lon_axis, indexing="ij")
+    return lats.ravel(), lons.ravel()
+
+
+def grid_ids(lats, lons):
+    return [f"{round(la, 2)}_{round(lo, 2)}" for la, lo in zip(np.asarray(lats).tolist(), np.asarray(lons).tolist())]
+
+
+def refine_factor(coarse_step, fine_step):
+    """İki seviye arası tamsayı oran (örn. 0.5 → 0.1: 5); oran tamsayı değilse ValueError."""
+    ratio = float(coarse_step) / float(fine_step)
+    factor = int(round(ratio))
+    if factor < 2 or abs(ratio - factor) > 1e-6:
+        raise ValueError(f"step'ler tam bölünmeli: {coarse_step} / {fine_step}")
+    return factor
+
+
+def refine_cells(lats, lons, coarse_step, fine_step, bbox=TURKEY_BBOX):
+    """
+    Kaba hücrelerin içindeki ince grid noktaları (lats, lons).
+    Kaba nokta (i, j) ince indeks (i*f, j*f)'e denk gelir; çocukları [i*f - f//2, i*f - f//2 + f) aralığıdır.
+    İnce noktalar grid_coords(fine_step) ile hizalıdır ve her biri tek kaba hücreye aittir.
+    """
+    factor = refine_factor(coarse_step, fine_step)
+    lat_axis, lon_axis = grid_axes(fine_step, bbox)
+    min_lat, _, min_lon, _ = bbox
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    offsets = np.arange(factor) - factor // 2
+    ii = (np.rint((lats - min_lat) / coarse_step).astype(np.int64) * factor)[:, None, None] + offsets[None, :, None]
+    jj = (np.rint((lons - min_lon) / coarse_step).astype(np.int64) * factor)[:, None, None] + offsets[None, None, :]
+    ii, jj = np.broadcast_arrays(ii, jj)
+    ii, jj = ii.ravel(), jj.ravel()
+    keep = (ii >= 0) & (ii < len(lat_axis)) & (jj >= 0) & (jj < len(lon_axis))
+    return lat_axis[ii[keep]], lon_axis[jj[keep]]
+
+
+def generate_turkey_grid(step=0.5, bbox=TURKEY_BBOX):
+    lats, lons = grid_coords(step, bbox)
+    return [
+        {"lat": la, "lon": lo, "id": pid}
+        for la, lo, pid in zip(lats.tolist(), lons.tolist(), grid_ids(lats, lons))
+    ]
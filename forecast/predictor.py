@@ -1,88 +1,55 @@
 # forecast/predictor.py - Hibrit tahmin (ML + ETAS-benzeri), dict döner, SHAP opsiyonel
 import os
 import pickle
+import threading
 import numpy as np
 
 from config import FORECAST_MODEL
-from forecast.features import extract_features
+from forecast.features import FEATURE_ORDER, extract_features, extract_features_batch, features_from_row
 from forecast.etas_like import etas_like_score
 from forecast.explain import explain_prediction
 
-FEATURE_ORDER = [
-    "count",
-    "max_mag",
-    "mean_mag",
-    "mag_std",
-    "min_distance",
-    "mean_distance",
-    "recency_energy",
-    "mean_depth",
-    "recent_6h_count",
-    "recent_24h_count",
-    "swarm_ratio",
-    "fault_distance",
-    "fault_proximity_score",
-    "stress_transfer",
-    "energy_release",
-    "foreshock_count",
-    "spatial_density",
-    "mag_trend",
-    "depth_variance",
-]
+# Süreç içi model cache: dosya (mtime, boyut) değişince yeniden yüklenir
+_MODEL_CACHE = {"key": None, "data": None}
+_MODEL_LOCK = threading.Lock()
 
 
 def load_model():
-    if not os.path.exists(FORECAST_MODEL):
-        return None
     try:
-        with open(FORECAST_MODEL, "rb") as f:
-            return pickle.load(f)
-    except Exception:
+        st = os.stat(FORECAST_MODEL)
+    except OSError:
+        _MODEL_CACHE["key"] = None
+        _MODEL_CACHE["data"] = None
         return None
+    key = (st.st_mtime_ns, st.st_size)
+    if _MODEL_CACHE["key"] == key:
+        return _MODEL_CACHE["data"]
+    with _MODEL_LOCK:
+        if _MODEL_CACHE["key"] != key:
+            try:
+                with open(FORECAST_MODEL, "rb") as f:
+                    data = pickle.load(f)
+            except Exception:
+                data = None
+            _MODEL_CACHE["data"] = data
+            _MODEL_CACHE["key"] = key
+        return _MODEL_CACHE["data"]
 
 
-def predict(
-    events: list,
-    lat: float,
-    lon: float,
-    time_window_hours: int = 48,
-    explain: bool = False,
-) -> dict:
-    model_data = load_model()
-    feats = extract_features(events, lat, lon, time_window_hours=time_window_hours)
-    X = np.array([[feats.get(k, 0) for k in FEATURE_ORDER]], dtype=np.float64)
+def model_version():
+    """Yüklü modelin sürüm anahtarı (mtime_ns, boyut); model yoksa None. Cache anahtarları için."""
+    load_model()
+    return _MODEL_CACHE["key"]
 
-    if not model_data or "model" not in model_data:
-        etas_prob = float(etas_like_score(feats))
-        return {
-            "probability": etas_prob,
-            "ml_probability": 0.0,
-            "etas_probability": etas_prob,
-            "features": feats,
-            "top_features": [],
-            "model_type": "no_forecast_model",
-            "fault_distance": float(feats.get("fault_distance", 999.0)),
-            "fault_proximity_score": float(feats.get("fault_proximity_score", 0.0)),
-            "stress_transfer": float(feats.get("stress_transfer", 0.0)),
-            "energy_release": float(feats.get("energy_release", 0.0)),
-            "foreshock_count": int(feats.get("foreshock_count", 0)),
-            "spatial_density": float(feats.get("spatial_density", 0.0)),
-            "mag_trend": float(feats.get("mag_trend", 0.0)),
-            "depth_variance": float(feats.get("depth_variance", 0.0)),
-            "nearest_fault_segment": feats.get("nearest_fault_segment", "unknown"),
-        }
-
-    ml_prob = float(model_data["model"].predict_proba(X)[0, 1])
-    etas_prob = float(etas_like_score(feats))
-    final_prob = 0.75 * ml_prob + 0.25 * etas_prob
-
-    result = {
-        "probability": float(final_prob),
+
+def _result(feats: dict, probability: float, ml_prob: float, etas_prob: float, model_type: str) -> dict:
+    return {
+        "probability": float(probability),
         "ml_probability": float(ml_prob),
         "etas_probability": float(etas_prob),
         "features": feats,
         "top_features": [],
-        "model_type": "forecast_hybrid_v2_faultaware",
+        "model_type": model_type,
         "fault_distance": float(feats.get("fault_distance", 999.0)),
         "fault_proximity_score": float(feats.get("fault_proximity_score", 0.0)),
         "stress_transfer": float(feats.get("stress_transfer", 0.0)),
@@ -94,12 +61,71 @@ def predict(
         "nearest_fault_segment": feats.get("nearest_fault_segment", "unknown"),
     }
 
-    if explain:
-        try:
-            result["top_features"] = explain_prediction(
-                model_data["model"], X, FEATURE_ORDER
-            )
-        except Exception:
-            result["top_features"] = []
 
-    return result
+def predict_from_features(X: np.ndarray, feats_list: list, explain: bool = False) -> list:
+    """
+    Hazır feature matrisi (N, FEATURE_ORDER) için tahmin; tek predict_proba çağrısı.
+    feats_list: her satırın feature dict'i (ETAS skoru ve yanıt alanları için).
+    """
+    model_data = load_model()
+
+    if not model_data or "model" not in model_data:
+        out = []
+        for feats in feats_list:
+            etas_prob = float(etas_like_score(feats))
+            out.append(_result(feats, etas_prob, 0.0, etas_prob, "no_forecast_model"))
+        return out
+
+    model = model_data["model"]
+    ml_probs = model.predict_proba(X)[:, 1] if len(X) else np.zeros(0)
+    out = []
+    for i, feats in enumerate(feats_list):
+        ml_prob = float(ml_probs[i])
+        etas_prob = float(etas_like_score(feats))
+        final_prob = 0.75 * ml_prob + 0.25 * etas_prob
+        result = _result(feats, final_prob, ml_prob, etas_prob, "forecast_hybrid_v2_faultaware")
+        if explain:
+            try:
+                result["top_features"] = explain_prediction(model, X[i:i + 1], FEATURE_ORDER)
+            except Exception:
+                result["top_features"] = []
+        out.append(result)
+    return out
+
+
+def predict_many(
+    events: list,
+    points: list,
+    time_window_hours: int = 48,
+    explain: bool = False,
+) -> list:
+    """
+    Çok nokta için tahmin: tek feature matrisi + tek predict_proba.
+    points: {"lat", "lon"} dict'leri veya (lat, lon) çiftleri. predict ile aynı dict'leri sırayla döner.
+    """
+    lats, lons = [], []
+    for p in points:
+        if isinstance(p, dict):
+            lats.append(float(p["lat"]))
+            lons.append(float(p["lon"]))
+        else:
+            lats.append(float(p[0]))
+            lons.append(float(p[1]))
+    X, segments = extract_features_batch(events, lats, lons, time_window_hours=time_window_hours)
+    feats_list = [features_from_row(X[i], segments[i]) for i in range(len(lats))]
+    return predict_from_features(X, feats_list, explain=explain)
+
+
+def predict(
+    events: list,
+    lat: float,
+    lon: float,
+    time_window_hours: int = 48,
+    explain: bool = False,
+    features: dict | None = None,
+) -> dict:
+    feats = features if features is not None else extract_features(
+        events, lat, lon, time_window_hours=time_window_hours
+    )
+    X = np.array([[feats.get(k, 0) for k in FEATURE_ORDER]], dtype=np.float64)
+    return predict_from_features(X, [feats], explain=explain)[0]
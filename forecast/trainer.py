@@ -13,33 +13,10 @@ if _root not in sys.path:
     sys.path.insert(0, _root)
 
 from config import FORECAST_MODEL
-from forecast.features import extract_features
+from forecast.features import FEATURE_ORDER, extract_features
 from forecast.targets import build_binary_target
 
 
-FEATURE_ORDER = [
-    "count",
-    "max_mag",
-    "mean_mag",
-    "mag_std",
-    "min_distance",
-    "mean_distance",
-    "recency_energy",
-    "mean_depth",
-    "recent_6h_count",
-    "recent_24h_count",
-    "swarm_ratio",
-    "fault_distance",
-    "fault_proximity_score",
-    "stress_transfer",
-    "energy_release",
-    "foreshock_count",
-    "spatial_density",
-    "mag_trend",
-    "depth_variance",
-]
-
-
 def _events_sorted(events: list) -> list:
     return sorted(
         [e for e in events if (e.get("timestamp") or 0) > 0],
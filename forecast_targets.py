@@ -6,6 +6,8 @@ Eğitimde gerçek forecast label üretmek için kullanılır.
 """
 import math
 
+import numpy as np
+
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """İki nokta arası mesafe (km)."""
@@ -80,3 +82,77 @@ def build_maxmag_target(
         if dist <= radius_km:
             mags.append(float(eq.get("mag", 0)))
     return max(mags) if mags else 0.0
+
+
+# create_forecast_training_records hedefleri: (anahtar, tür, ufuk saat, yarıçap km, min büyüklük)
+FORECAST_TARGETS = (
+    ("y_m4_24h", "binary", 24, 100, 4.0),
+    ("y_m5_72h", "binary", 72, 150, 5.0),
+    ("y_count_24h", "count", 24, 100, 2.5),
+    ("y_maxmag_7d", "maxmag", 168, 150, None),
+)
+
+# Vektörel mesafe yarıçapa bu kadar yakınsa haversine_km ile yeniden hesaplanır
+# (np.arcsin ile math.asin son bitte farklı olabilir; karar birebir aynı kalsın).
+_RADIUS_EPS_KM = 1e-6
+
+
+def prepare_target_events(events: list) -> dict:
+    """Normalize event listesini zaman sıralı dizilere çevirir (bir kez, tüm referanslar için)."""
+    ts = np.array([float(eq.get("timestamp", 0)) for eq in events], dtype=np.float64)
+    order = np.argsort(ts, kind="stable")
+    return {
+        "timestamp": ts[order],
+        "lat": np.array([float(eq["lat"]) for eq in events], dtype=np.float64)[order],
+        "lon": np.array([float(eq["lon"]) for eq in events], dtype=np.float64)[order],
+        "mag": np.array([float(eq.get("mag", 0)) for eq in events], dtype=np.float64)[order],
+    }
+
+
+def _within_radius(center_lats, center_lons, lats, lons, radius_km: float) -> np.ndarray:
+    """(şehir, deprem) için dist <= radius_km; sınırdaki çiftler haversine_km ile kesinleştirilir."""
+    p1 = np.radians(center_lats)[:, None]
+    p2 = np.radians(lats)[None, :]
+    dp = np.radians(lats[None, :] - center_lats[:, None])
+    dl = np.radians(lons[None, :] - center_lons[:, None])
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    dist = 2 * 6371.0 * np.arcsin(np.sqrt(a))
+    inside = dist <= radius_km
+    for ci, ei in zip(*np.nonzero(np.abs(dist - radius_km) < _RADIUS_EPS_KM)):
+        inside[ci, ei] = haversine_km(center_lats[ci], center_lons[ci], lats[ei], lons[ei]) <= radius_km
+    return inside
+
+
+def build_targets_for_reference(prepared: dict, center_lats, center_lons, ref_ts: float,
+                                targets=FORECAST_TARGETS) -> dict:
+    """
+    Bir referans zamanı için tüm şehirlerin hedefleri tek geçişte.
+    build_binary_target / build_count_target / build_maxmag_target ile birebir aynı değerler.
+    Returns: {anahtar: liste (şehir sırasıyla; binary/count int, maxmag float)}
+    """
+    center_lats = np.asarray(center_lats, dtype=np.float64)
+    center_lons = np.asarray(center_lons, dtype=np.float64)
+    ts = prepared["timestamp"]
+    lo = int(np.searchsorted(ts, ref_ts, side="right"))  # ts > ref_ts
+    max_hours = max(t[2] for t in targets)
+    hi_max = int(np.searchsorted(ts, ref_ts + max_hours * 3600, side="right"))
+    lats, lons, mags = (prepared[k][lo:hi_max] for k in ("lat", "lon", "mag"))
+
+    out = {}
+    inside_cache = {}
+    for key, kind, horizon_hours, radius_km, min_mag in targets:
+        n = int(np.searchsorted(ts, ref_ts + horizon_hours * 3600, side="right")) - lo
+        if radius_km not in inside_cache:
+            inside_cache[radius_km] = _within_radius(center_lats, center_lons, lats, lons, radius_km)
+        inside = inside_cache[radius_km][:, :n]
+        if kind == "maxmag":
+            masked = np.where(inside, mags[None, :n], -np.inf)
+            best = masked.max(axis=1) if n else np.full(len(center_lats), -np.inf)
+            out[key] = [float(m) if np.isfinite(m) else 0.0 for m in best]
+            continue
+        hits = inside & (mags[None, :n] >= min_mag)
+        if kind == "binary":
+            out[key] = [int(v) for v in hits.any(axis=1)]
+        else:
+            out[key] = [int(v) for v in hits.sum(axis=1)]
+    return out
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+live_state.py
+Canlı izleme (check_for_big_earthquakes) için şehir bazlı artımlı deprem durumu.
+- Her şehir için LIVE_RADIUS_KM içindeki depremler zaman sıralı halka tamponda (deque) tutulur.
+  300 km, extract_features'ın hedef başına seçim yarıçapıdır: bir ilin (ve komşu il sayılarının)
+  feature'ları için gereken tüm depremler ilin kendi tamponundadır.
+- Her pencere (24h/168h) için pencere içi depremler ve LIVE_COUNT_RADIUS_KM (200 km,
+  turkey_early_warning_system'in il sayısı yarıçapı) içindeki deprem sayısı tutulur;
+  süresi dolan depremler baştan düşülür.
+- update_state sadece yeni depremleri işler: O(yeni deprem × şehir) + O(şehir × pencere) süre aşımı.
+- city_events birkaç ilin pencere depremlerini extract_features formatında verir; feature'lar tüm
+  yük yerine bu küçük liste üzerinden hesaplanır (maliyet ilin aktivitesiyle ölçeklenir).
+Durum düz dict'tir; tek thread (izleme döngüsü) tarafından güncellenir.
+"""
+
+import heapq
+import math
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Iterable, Set
+
+import numpy as np
+
+from event_snapshot import parse_event_timestamp
+
+LIVE_RADIUS_KM = 300
+LIVE_COUNT_RADIUS_KM = 200
+LIVE_WINDOWS_HOURS = (24, 168)
+
+# Olay tuple alanları: (timestamp, şehre mesafe, extract_features formatında deprem dict'i)
+_TS, _DIST, _EQ = range(3)
+
+
+def _event_key(eq: Dict, ts: float, lat: float, lon: float, mag: float):
+    for key in ('earthquake_id', 'eventID', 'id'):
+        if eq.get(key):
+            return str(eq[key])
+    return f"{ts:.1f}_{lat:.4f}_{lon:.4f}_{mag:.1f}"
+
+
+def _new_window() -> Dict[str, Any]:
+    return {'events': deque(), 'near': 0}
+
+
+def _rebuild_window(buffer: deque, cutoff: float, count_radius: float) -> Dict[str, Any]:
+    w = _new_window()
+    for ev in buffer:
+        if ev[_TS] >= cutoff:
+            w['events'].append(ev)
+            w['near'] += ev[_DIST] <= count_radius
+    return w
+
+
+def _window_expire(w: Dict[str, Any], cutoff: float, count_radius: float) -> bool:
+    events = w['events']
+    expired = False
+    while events and events[0][_TS] < cutoff:
+        ev = events.popleft()
+        w['near'] -= ev[_DIST] <= count_radius
+        expired = True
+    return expired
+
+
+def new_state(cities: Dict[str, Dict[str, Any]], radius_km: float = LIVE_RADIUS_KM,
+              count_radius_km: float = LIVE_COUNT_RADIUS_KM,
+              windows_hours: Iterable[int] = LIVE_WINDOWS_HOURS) -> Dict[str, Any]:
+    """cities: {ad: {'lat', 'lon', ...}} (TURKEY_CITIES)."""
+    names = list(cities.keys())
+    windows = tuple(sorted(int(h) for h in windows_hours))
+    return {
+        'radius_km': float(radius_km),
+        'count_radius_km': float(count_radius_km),
+        'windows': windows,
+        'names': names,
+        'lats': np.array([cities[n]['lat'] for n in names], dtype=np.float64),
+        'lons': np.array([cities[n]['lon'] for n in names], dtype=np.float64),
+        'cities': {n: {'buffer': deque(), 'windows': {h: _new_window() for h in windows}} for n in names},
+        'seen': set(),
+        'seen_heap': [],
+        'now': 0.0,
+        'updates': 0,
+    }
+
+
+def _distances_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """earthquake_features.haversine ile aynı formül (R=6371)."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def update_state(state: Dict[str, Any], earthquakes: List[Dict], now: Optional[float] = None) -> Set[str]:
+    """
+    Sadece daha önce görülmemiş depremleri duruma ekler ve süresi dolanları düşer.
+    Returns: durumu değişen şehirler (yeni deprem veya pencereden çıkan deprem).
+    """
+    now = float(now) if now is not None else time.time()
+    windows = state['windows']
+    horizon = now - windows[-1] * 3600
+    radius, count_radius = state['radius_km'], state['count_radius_km']
+    dirty: Set[str] = set()
+    seen, seen_heap = state['seen'], state['seen_heap']
+
+    for eq in earthquakes or []:
+        coords = (eq.get('geojson') or {}).get('coordinates')
+        if not coords:
+            continue
+        ts = parse_event_timestamp(eq)
+        if not ts or ts < horizon:
+            continue
+        lon, lat = float(coords[0]), float(coords[1])
+        mag = float(eq.get('mag', 0) or 0)
+        key = _event_key(eq, ts, lat, lon, mag)
+        if key in seen:
+            continue
+        seen.add(key)
+        heapq.heappush(seen_heap, (ts, key))
+
+        dists = _distances_km(lat, lon, state['lats'], state['lons'])
+        depth = eq.get('depth', 10)
+        depth = float(depth) if depth not in (None, '') else 10.0
+        # Şehirler arasında paylaşılan tek kayıt (extract_features formatı)
+        record = {'earthquake_id': key, 'mag': mag, 'depth': depth, 'timestamp': ts,
+                  'geojson': {'type': 'Point', 'coordinates': [lon, lat]}, 'location': eq.get('location', '')}
+        for ci in np.flatnonzero(dists <= radius):
+            name = state['names'][ci]
+            ev = (ts, float(dists[ci]), record)
+            city = state['cities'][name]
+            buffer = city['buffer']
+            in_order = not buffer or buffer[-1][_TS] <= ts
+            if in_order:
+                buffer.append(ev)
+            else:
+                # Geç gelen (eski tarihli) deprem: tamponu sıralı tut, pencereleri yeniden kur
+                items = list(buffer)
+                pos = next(i for i in range(len(items)) if items[i][_TS] > ts)
+                items.insert(pos, ev)
+                city['buffer'] = buffer = deque(items)
+            for h in windows:
+                cutoff = now - h * 3600
+                if ts < cutoff:
+                    continue
+                if in_order:
+                    w = city['windows'][h]
+                    w['events'].append(ev)
+                    w['near'] += ev[_DIST] <= count_radius
+                else:
+                    city['windows'][h] = _rebuild_window(buffer, cutoff, count_radius)
+            dirty.add(name)
+
+    for name in state['names']:
+        city = state['cities'][name]
+        for h in windows:
+            if _window_expire(city['windows'][h], now - h * 3600, count_radius):
+                dirty.add(name)
+        buffer = city['buffer']
+        while buffer and buffer[0][_TS] < horizon:
+            buffer.popleft()
+
+    # Görülen anahtarlar en büyük pencere + 1 saat tutulur (payload tekrarlarını elemek için)
+    while seen_heap and seen_heap[0][0] < horizon - 3600:
+        seen.discard(heapq.heappop(seen_heap)[1])
+
+    state['now'] = now
+    state['updates'] += 1
+    return dirty
+
+
+def city_events(state: Dict[str, Any], city_names: Iterable[str], window_hours: int) -> List[Dict[str, Any]]:
+    """
+    Verilen şehirlerin pencere depremleri (LIVE_RADIUS_KM içi), tekrarsız ve zaman sıralı;
+    extract_features / extract_features_many'e doğrudan verilebilir.
+    """
+    h = int(window_hours)
+    seen: Set[int] = set()
+    events = []
+    for name in city_names:
+        for ev in state['cities'][name]['windows'][h]['events']:
+            if id(ev[_EQ]) not in seen:
+                seen.add(id(ev[_EQ]))
+                events.append(ev)
+    events.sort(key=lambda ev: ev[_TS])
+    return [ev[_EQ] for ev in events]
+
+
+def city_counts(state: Dict[str, Any], window_hours: Optional[int] = None) -> Dict[str, int]:
+    """Deprem olan şehirler için LIVE_COUNT_RADIUS_KM içi deprem sayısı (varsayılan: en büyük pencere)."""
+    h = int(window_hours) if window_hours is not None else state['windows'][-1]
+    counts = {}
+    for name in state['names']:
+        n = state['cities'][name]['windows'][h]['near']
+        if n > 0:
+            counts[name] = n
+    return counts
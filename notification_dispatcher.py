@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+notification_dispatcher.py
+Bildirim gönderimi: kuyruk + worker havuzu, sağlayıcı (Meta WhatsApp / Twilio) başına
+token bucket hız limiti, tek requests.Session (keep-alive havuzu), 429 / 5xx / bağlantı
+hatalarında üstel bekleme + jitter (Retry-After varsa o kullanılır) ve gönderim metrikleri.
+submit() çağıranı bekletmez: uyarı döngüsü aboneleri sadece kuyruğa yazar, gönderimi worker'lar yapar.
+Twilio mesajları REST API ile gönderilir (TWILIO_API_BASE: testlerde yerel stub).
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '8'))
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', '10000'))
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
+NOTIFY_BACKOFF_BASE = float(os.getenv('NOTIFY_BACKOFF_BASE', '1.0'))  # saniye; 2^deneme × jitter
+NOTIFY_BACKOFF_MAX = 30.0
+NOTIFY_TIMEOUT = float(os.getenv('NOTIFY_TIMEOUT', '30'))
+# Sağlayıcı -> (mesaj/sn, anlık patlama kapasitesi)
+NOTIFY_RATE_LIMITS = {
+    'meta': (float(os.getenv('NOTIFY_META_RATE', '20')), int(os.getenv('NOTIFY_META_BURST', '20'))),
+    'twilio': (float(os.getenv('NOTIFY_TWILIO_RATE', '1')), int(os.getenv('NOTIFY_TWILIO_BURST', '5'))),
+}
+TWILIO_API_BASE = os.getenv('TWILIO_API_BASE', 'https://api.twilio.com')
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# sağlayıcı -> {'session', 'bucket'}; kuyruk ve worker'lar ilk submit'te başlar
+_PROVIDERS: Dict[str, Dict[str, Any]] = {}
+_DISPATCH: Dict[str, Any] = {'lock': threading.Lock(), 'queue': None, 'workers': []}
+_METRICS: Dict[str, Any] = {
+    'lock': threading.Lock(),
+    'queue': {'queued': 0, 'delivered': 0, 'failed': 0, 'dropped': 0, 'in_flight': 0,
+              'latency_sum': 0.0, 'latency_max': 0.0},
+    'providers': {},
+}
+
+
+def _provider_metrics(provider: str) -> Dict[str, Any]:
+    stats = _METRICS['providers'].get(provider)
+    if stats is None:
+        stats = _METRICS['providers'][provider] = {
+            'requests': 0, 'ok': 0, 'errors': 0, 'retries': 0, 'throttled_sec': 0.0,
+        }
+    return stats
+
+
+def _count(provider: str, key: str, value: float = 1) -> None:
+    with _METRICS['lock']:
+        _provider_metrics(provider)[key] += value
+
+
+def _provider_entry(provider: str) -> Dict[str, Any]:
+    """Sağlayıcı başına tek Session (worker sayısı kadar bağlantı) ve token bucket."""
+    entry = _PROVIDERS.get(provider)
+    if entry is None:
+        with _DISPATCH['lock']:
+            entry = _PROVIDERS.get(provider)
+            if entry is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, NOTIFY_WORKERS))
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                rate, burst = NOTIFY_RATE_LIMITS.get(provider, (10.0, 10))
+                entry = {
+                    'session': session,
+                    'bucket': {'rate': float(rate), 'capacity': float(max(1, burst)), 'tokens': float(max(1, burst)),
+                               'updated': time.monotonic(), 'lock': threading.Lock()},
+                }
+                _PROVIDERS[provider] = entry
+    return entry
+
+
+def _acquire_token(provider: str) -> float:
+    """Token bucket: token yoksa bir sonraki token'a kadar bekler; beklenen süreyi döndürür."""
+    bucket = _provider_entry(provider)['bucket']
+    waited = 0.0
+    while True:
+        with bucket['lock']:
+            now = time.monotonic()
+            bucket['tokens'] = min(bucket['capacity'], bucket['tokens'] + (now - bucket['updated']) * bucket['rate'])
+            bucket['updated'] = now
+            if bucket['tokens'] >= 1.0:
+                bucket['tokens'] -= 1.0
+                if waited:
+                    _count(provider, 'throttled_sec', waited)
+                return waited
+            delay = (1.0 - bucket['tokens']) / bucket['rate']
+        time.sleep(delay)
+        waited += delay
+
+
+def _backoff_delay(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Retry-After (saniye) varsa o; yoksa üstel bekleme + tam jitter."""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(NOTIFY_BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return min(NOTIFY_BACKOFF_MAX, NOTIFY_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+def post(provider: str, url: str, max_retries: int = NOTIFY_MAX_RETRIES, **kwargs) -> requests.Response:
+    """
+    Sağlayıcı Session'ı ile POST: her deneme bir token harcar, 429 / 5xx / bağlantı hataları
+    tekrar denenir. Son yanıt (başarısız olsa da) döner; bağlantı hiç kurulamazsa son hata yükseltilir.
+    """
+    session = _provider_entry(provider)['session']
+    kwargs.setdefault('timeout', NOTIFY_TIMEOUT)
+    for attempt in range(max(1, max_retries)):
+        _acquire_token(provider)
+        _count(provider, 'requests')
+        try:
+            response = session.post(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= max_retries - 1:
+                _count(provider, 'errors')
+                raise
+            wait_time = _backoff_delay(attempt)
+            print(f"[NOTIFY] {provider} bağlantı hatası: {e}, {wait_time:.1f}s bekleniyor... "
+                  f"(Deneme {attempt + 1}/{max_retries})")
+            _count(provider, 'retries')
+            time.sleep(wait_time)
+            continue
+        if response.status_code in _RETRY_STATUS and attempt < max_retries - 1:
+            wait_time = _backoff_delay(attempt, response)
+            print(f"[NOTIFY] {provider} HTTP {response.status_code}, {wait_time:.1f}s bekleniyor... "
+                  f"(Deneme {attempt + 1}/{max_retries})")
+            _count(provider, 'retries')
+            response.close()
+            time.sleep(wait_time)
+            continue
+        _count(provider, 'ok' if response.status_code < 400 else 'errors')
+        return response
+
+
+def twilio_send(account_sid: str, auth_token: str, from_: str, to: str, body: str) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Twilio Messages REST çağrısı (SMS veya 'whatsapp:' önekli numaralar).
+    Returns: (başarılı mı, yanıt JSON'u + 'status_code'); hata JSON'unda 'code' ve 'message' bulunur.
+    """
+    response = post(
+        'twilio', f"{TWILIO_API_BASE}/2010-04-01/Accounts/{account_sid}/Messages.json",
+        data={'From': from_, 'To': to, 'Body': body}, auth=(account_sid, auth_token),
+    )
+    try:
+        data = response.json() if response.content else {}
+    except ValueError:
+        data = {}
+    data['status_code'] = response.status_code
+    return response.status_code in (200, 201), data
+
+
+def _worker() -> None:
+    q = _DISPATCH['queue']
+    stats = _METRICS['queue']
+    while True:
+        send, args, on_done, enqueued = q.get()
+        with _METRICS['lock']:
+            stats['in_flight'] += 1
+        try:
+            try:
+                success, error = send(*args)
+            except Exception as e:
+                success, error = False, f"Beklenmeyen hata: {e}"
+            latency = time.monotonic() - enqueued
+            with _METRICS['lock']:
+                stats['delivered' if success else 'failed'] += 1
+                stats['latency_sum'] += latency
+                stats['latency_max'] = max(stats['latency_max'], latency)
+            if on_done is not None:
+                try:
+                    on_done(success, error)
+                except Exception as e:
+                    print(f"[NOTIFY] Geri çağırma hatası: {e}")
+        finally:
+            with _METRICS['lock']:
+                stats['in_flight'] -= 1
+            q.task_done()
+
+
+def _ensure_workers() -> queue.Queue:
+    if _DISPATCH['queue'] is None:
+        with _DISPATCH['lock']:
+            if _DISPATCH['queue'] is None:
+                q = queue.Queue(maxsize=max(1, NOTIFY_QUEUE_SIZE))
+                _DISPATCH['queue'] = q
+                for i in range(max(1, NOTIFY_WORKERS)):
+                    t = threading.Thread(target=_worker, name=f"notify-{i}", daemon=True)
+                    t.start()
+                    _DISPATCH['workers'].append(t)
+    return _DISPATCH['queue']
+
+
+def submit(send: Callable[..., Tuple[bool, Optional[str]]], *args,
+           on_done: Optional[Callable[[bool, Optional[str]], None]] = None) -> bool:
+    """
+    send(*args) -> (success, error) çağrısını kuyruğa ekler; on_done(success, error) worker'da çağrılır.
+    Kuyruk doluysa mesaj düşürülür ve False döner (uyarı döngüsü bloklanmaz).
+    """
+    q = _ensure_workers()
+    try:
+        q.put_nowait((send, args, on_done, time.monotonic()))
+    except queue.Full:
+        with _METRICS['lock']:
+            _METRICS['queue']['dropped'] += 1
+        print("[NOTIFY] Bildirim kuyruğu dolu, mesaj düşürüldü")
+        return False
+    with _METRICS['lock']:
+        _METRICS['queue']['queued'] += 1
+    return True
+
+
+def wait_idle(timeout: Optional[float] = None) -> bool:
+    """Kuyruktaki tüm gönderimler bitene kadar bekler; zaman aşımında False."""
+    q = _DISPATCH['queue']
+    if q is None:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with q.all_tasks_done:
+        while q.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            q.all_tasks_done.wait(remaining)
+    return True
+
+
+def notification_metrics() -> Dict[str, Any]:
+    """Kuyruk (queued / delivered / failed / dropped / gecikme) ve sağlayıcı sayaçları."""
+    with _METRICS['lock']:
+        stats = dict(_METRICS['queue'])
+        done = stats['delivered'] + stats['failed']
+        stats['latency_avg'] = stats['latency_sum'] / done if done else 0.0
+        q = _DISPATCH['queue']
+        stats['pending'] = q.qsize() if q is not None else 0
+        stats['workers'] = len(_DISPATCH['workers'])
+        return {'queue': stats, 'providers': {p: dict(s) for p, s in _METRICS['providers'].items()}}
+
+
+def reset_notification_state() -> None:
+    """Session'ları, token bucket'ları ve sayaçları sıfırlar (testler için; worker'lar çalışmaya devam eder)."""
+    with _DISPATCH['lock']:
+        for entry in _PROVIDERS.values():
+            entry['session'].close()
+        _PROVIDERS.clear()
+    with _METRICS['lock']:
+        for k in _METRICS['queue']:
+            _METRICS['queue'][k] = 0.0 if isinstance(_METRICS['queue'][k], float) else 0
+        _METRICS['providers'].clear()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+response_encoding.py
+Harita endpoint'leri için yanıt kodlama: JSON (varsayılan), sütunlu JSON, ikili (typed-array) ve
+opsiyonel MessagePack; gzip / brotli sıkıştırma. Kodlanmış ve sıkıştırılmış gövdeler
+(ad, anahtar, format, encoding) ile cache'lenir: aynı veri için tekrar serileştirme/sıkıştırma yapılmaz.
+
+Format seçimi: ?format=json|columnar|binary|msgpack veya Accept başlığı
+(application/vnd.depremanaliz.columnar+json, application/vnd.depremanaliz.binary, application/x-msgpack).
+
+Sütunlu tablo: {"count": n, "columns": {ad: [değerler]}, "constants": {ad: değer}}
+(tüm satırlarda aynı olan alanlar bir kez yazılır, sayılar COMPACT_DECIMALS basamağa yuvarlanır).
+
+İkili format (little-endian):
+  b"DAB1" | uint32 header_len | header (UTF-8 JSON) | 8 bayta hizalı veri bölümü
+  Veri bölümü başlangıcı: align8(8 + header_len). header = {"payload": ..., "tables": [...]};
+  payload içindeki tablolar {"$table": i} ile işaretlenir. Tablo sütunu ya {"dtype", "offset"}
+  (offset veri bölümüne göre; JS: new Float32Array(buf, start + offset, count)) ya da {"values": [...]}.
+
+Koşullu GET: conditional_get ile sarılan endpoint'ler (görüntü sürümü, model sürümü, ...) özetinden
+weak ETag üretir; If-None-Match eşleşirse görünüm hiç çalışmadan 304 döner. Uzun max-age + ETag sadece
+gerçek başarılı sonuçlara ("status": "success") eklenir; boş görüntü (cacheable() False) veya hata
+payload'ları no-cache ile döner (restart sonrası boş/hata yanıtı tarayıcı ve proxy'lerde kalmaz).
+"""
+
+import os
+import gzip
+import hashlib
+import functools
+import json
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from flask import Response, make_response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RESPONSE_CACHE_ENTRIES = int(os.getenv('RESPONSE_CACHE_ENTRIES', '64'))
+# Cache-Control max-age (app.py'deki 300 sn'lik api_cache / turkey_warning_cache süreleriyle aynı)
+RESPONSE_MAX_AGE = int(os.getenv('RESPONSE_MAX_AGE', '300'))
+COMPACT_DECIMALS = 6
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+BINARY_MAGIC = b'DAB1'
+MIME_COLUMNAR = 'application/vnd.depremanaliz.columnar+json'
+MIME_BINARY = 'application/vnd.depremanaliz.binary'
+MIME_MSGPACK = 'application/x-msgpack'
+_FORMAT_MIMES = {
+    'json': 'application/json',
+    'columnar': MIME_COLUMNAR,
+    'binary': MIME_BINARY,
+    'msgpack': MIME_MSGPACK,
+}
+
+# (ad, anahtar) -> payload ; (ad, anahtar, format, encoding) -> gövde baytları
+_CACHE: Dict[str, Any] = {
+    'lock': threading.Lock(),
+    'payloads': OrderedDict(),
+    'bodies': OrderedDict(),
+    'stats': {'hits': 0, 'misses': 0, 'not_modified': 0},
+}
+
+
+def available_formats() -> Tuple[str, ...]:
+    return ('json', 'columnar', 'binary') + (('msgpack',) if msgpack is not None else ())
+
+
+def negotiate_format() -> str:
+    """?format= önceliklidir; yoksa Accept başlığı; ikisi de yoksa json."""
+    formats = available_formats()
+    fmt = (request.args.get('format') or '').strip().lower()
+    if fmt == 'compact':
+        fmt = 'columnar'
+    if fmt in formats:
+        return fmt
+    offered = [_FORMAT_MIMES[f] for f in formats]
+    best = request.accept_mimetypes.best_match(offered, default='application/json')
+    for f in formats:
+        if _FORMAT_MIMES[f] == best:
+            return f
+    return 'json'
+
+
+def negotiate_encoding() -> str:
+    offered = (['br'] if brotli is not None else []) + ['gzip', 'identity']
+    return request.accept_encodings.best_match(offered, default='identity') or 'identity'
+
+
+def _is_table(rows) -> bool:
+    return isinstance(rows, list) and all(isinstance(r, dict) for r in rows)
+
+
+def _replace_at(obj, parts: List[str], fn: Callable):
+    """'levels.*.points' gibi yoldaki değeri fn(değer) ile değiştirir; sadece yol üzerindeki kaplar kopyalanır."""
+    if not parts:
+        return fn(obj)
+    head, rest = parts[0], parts[1:]
+    if head == '*':
+        return [_replace_at(v, rest, fn) for v in obj] if isinstance(obj, list) else obj
+    if not isinstance(obj, dict) or head not in obj:
+        return obj
+    out = dict(obj)
+    out[head] = _replace_at(obj[head], rest, fn)
+    return out
+
+
+def _map_tables(payload: Dict, table_paths: Sequence[str], fn: Callable) -> Dict:
+    out = dict(payload)  # orijinal (cache'lenmiş) payload değişmez
+    for path in table_paths:
+        out = _replace_at(out, path.split('.'), lambda rows: fn(rows) if _is_table(rows) else rows)
+    return out
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_))
+
+
+def _table_columns(rows: List[Dict]):
+    """Satır listesi → [(ad, tür, değerler)], tür: 'const' | 'int' | 'float' | 'other'."""
+    names = []
+    seen = set()
+    for r in rows:
+        for k in r:
+            if k not in seen:
+                seen.add(k)
+                names.append(k)
+    out = []
+    for name in names:
+        values = [r.get(name) for r in rows]
+        first = values[0]
+        if len(values) > 1 and all(v == first for v in values) and not isinstance(first, (list, dict)):
+            out.append((name, 'const', first))
+        elif values and all(_is_number(v) for v in values):
+            arr = np.asarray(values)
+            if np.issubdtype(arr.dtype, np.integer) and np.all(np.abs(arr) < 2 ** 31):
+                out.append((name, 'int', arr.astype(np.int32)))
+            else:
+                out.append((name, 'float', arr.astype(np.float64)))
+        else:
+            out.append((name, 'other', values))
+    return out
+
+
+def columnar_table(rows: List[Dict]) -> Dict:
+    columns, constants = {}, {}
+    for name, kind, values in _table_columns(rows):
+        if kind == 'const':
+            constants[name] = values
+        elif kind == 'int':
+            columns[name] = values.tolist()
+        elif kind == 'float':
+            columns[name] = np.round(values, COMPACT_DECIMALS).tolist()
+        else:
+            columns[name] = values
+    return {'count': len(rows), 'columns': columns, 'constants': constants}
+
+
+def _columnar_payload(payload: Dict, table_paths: Sequence[str]) -> Dict:
+    out = _map_tables(payload, table_paths, columnar_table)
+    out['encoding'] = 'columnar'
+    return out
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def encode_binary(payload: Dict, table_paths: Sequence[str]) -> bytes:
+    """Tablolardaki sayısal sütunlar float32 / int32 dizileri; geri kalan her şey header JSON'da."""
+    tables = []
+
+    def take(rows):
+        tables.append(rows)
+        return {'$table': len(tables) - 1}
+
+    skeleton = _map_tables(payload, table_paths, take)
+    skeleton['encoding'] = 'binary'
+    headers, chunks = [], []
+    offset = 0
+    for rows in tables:
+        columns, constants = {}, {}
+        for name, kind, values in _table_columns(rows):
+            if kind == 'const':
+                constants[name] = values
+            elif kind in ('int', 'float'):
+                arr = np.ascontiguousarray(values, dtype='<i4' if kind == 'int' else '<f4')
+                columns[name] = {'dtype': 'int32' if kind == 'int' else 'float32', 'offset': offset}
+                data = arr.tobytes()
+                chunks.append(data + b'\0' * (_align8(len(data)) - len(data)))
+                offset += _align8(len(data))
+            else:
+                columns[name] = {'values': values}
+        headers.append({'count': len(rows), 'columns': columns, 'constants': constants})
+    header = _dumps({'payload': skeleton, 'tables': headers})
+    prefix = BINARY_MAGIC + struct.pack('<I', len(header)) + header
+    return b''.join([prefix, b'\0' * (_align8(len(prefix)) - len(prefix))] + chunks)
+
+
+def _json_default(obj):
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"JSON'a çevrilemez: {type(obj).__name__}")
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def encode_payload(payload: Dict, fmt: str, table_paths: Sequence[str]) -> bytes:
+    if fmt == 'columnar':
+        return _dumps(_columnar_payload(payload, table_paths))
+    if fmt == 'binary':
+        return encode_binary(payload, table_paths)
+    if fmt == 'msgpack':
+        return msgpack.packb(_columnar_payload(payload, table_paths), use_bin_type=True, default=_json_default)
+    return _dumps(payload)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return body
+
+
+def _remember(store: OrderedDict, key, value) -> None:
+    store[key] = value
+    store.move_to_end(key)
+    while len(store) > RESPONSE_CACHE_ENTRIES:
+        store.popitem(last=False)
+
+
+def _cached_body(name: str, key: Optional[Hashable], build: Callable[[], Dict],
+                 fmt: str, encoding: str, table_paths: Sequence[str]) -> Tuple[bytes, str, Any]:
+    """(gövde, uygulanan encoding, payload 'status'). key None ise cache kullanılmaz."""
+    body_key = (name, key, fmt, encoding)
+    if key is not None:
+        with _CACHE['lock']:
+            hit = _CACHE['bodies'].get(body_key)
+            if hit is not None:
+                _CACHE['bodies'].move_to_end(body_key)
+                _CACHE['stats']['hits'] += 1
+                return hit
+            payload = _CACHE['payloads'].get((name, key))
+            _CACHE['stats']['misses'] += 1
+    else:
+        payload = None
+    if payload is None:
+        payload = build()
+    body = encode_payload(payload, fmt, table_paths)
+    applied = encoding if encoding != 'identity' and len(body) >= COMPRESS_MIN_BYTES else 'identity'
+    entry = (compress_body(body, applied), applied, payload.get('status') if isinstance(payload, dict) else None)
+    if key is not None:
+        with _CACHE['lock']:
+            _remember(_CACHE['payloads'], (name, key), payload)
+            _remember(_CACHE['bodies'], body_key, entry)
+    return entry
+
+
+def encoded_response(name: str, key: Optional[Hashable], build: Callable[[], Dict],
+                     table_paths: Sequence[str] = ('points',), status: int = 200) -> Response:
+    """
+    build() payload'ını istenen format ve encoding ile yanıtlar.
+    key: payload'ı belirleyen değerler (örn. görüntü + model sürümü); aynı anahtarda build() tekrar çağrılmaz.
+    """
+    fmt = negotiate_format()
+    encoding = negotiate_encoding()
+    body, applied, payload_status = _cached_body(name, key, build, fmt, encoding, table_paths)
+    resp = Response(body, status=status, mimetype=_FORMAT_MIMES[fmt])
+    resp.payload_status = payload_status  # conditional_get: gövde çözülmeden başarı kontrolü
+    if applied != 'identity':
+        resp.headers['Content-Encoding'] = applied
+    resp.headers['Vary'] = 'Accept, Accept-Encoding'
+    return resp
+
+
+def make_etag(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+
+def _cache_headers(resp: Response, etag: str, max_age: int) -> Response:
+    resp.set_etag(etag, weak=True)
+    resp.headers['Cache-Control'] = f'public, max-age={int(max_age)}'
+    return resp
+
+
+def _no_cache_headers(resp: Response) -> Response:
+    resp.headers.pop('ETag', None)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+def _payload_ok(resp: Response) -> bool:
+    """Payload "status" alanı 'success' mı (encoded_response işareti, yoksa düz JSON gövde)."""
+    status = getattr(resp, 'payload_status', None)
+    if status is None and resp.is_json and not resp.content_encoding:
+        data = resp.get_json(silent=True)
+        status = data.get('status') if isinstance(data, dict) else None
+    return status == 'success'
+
+
+def conditional_get(etag_parts: Callable[[], Tuple], max_age: Any = RESPONSE_MAX_AGE,
+                    cacheable: Optional[Callable[[], bool]] = None):
+    """
+    Route dekoratörü: ETag = etag_parts() özeti (yanıtı belirleyen sürümler; format müzakeresi varsa o da).
+    If-None-Match eşleşirse 304 (görünüm çağrılmaz); başarılı 200 yanıtlara ETag + Cache-Control eklenir.
+    max_age: saniye veya saniye döndüren fonksiyon.
+    cacheable: False dönerse (örn. ilk fetch'ten önceki boş görüntü) 304 verilmez, yanıt no-cache olur;
+    "status" alanı 'success' olmayan yanıtlar da no-cache ve ETag'siz döner.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if cacheable is not None and not cacheable():
+                return _no_cache_headers(make_response(view(*args, **kwargs)))
+            etag = make_etag(request.full_path, *etag_parts())
+            age = max_age() if callable(max_age) else max_age
+            if request.if_none_match.contains_weak(etag):
+                resp = Response(status=304)
+                resp.headers['Vary'] = 'Accept, Accept-Encoding'
+                with _CACHE['lock']:
+                    _CACHE['stats']['not_modified'] += 1
+                return _cache_headers(resp, etag, age)
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code == 200 and _payload_ok(resp):
+                _cache_headers(resp, etag, age)
+            else:
+                _no_cache_headers(resp)
+            return resp
+        return wrapper
+    return decorator
+
+
+def response_cache_stats() -> Dict[str, int]:
+    with _CACHE['lock']:
+        out = dict(_CACHE['stats'])
+        out['bodies'] = len(_CACHE['bodies'])
+        out['payloads'] = len(_CACHE['payloads'])
+    return out
+
+
+def clear_response_cache() -> None:
+    with _CACHE['lock']:
+        _CACHE['payloads'].clear()
+        _CACHE['bodies'].clear()
+        for k in _CACHE['stats']:
+            _CACHE['stats'][k] = 0
@@ -1,10 +1,18 @@
 # routes/forecast_routes.py - Forecast harita + grid API (explain, ETAS, çok şehir)
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 
-from services.data_service import load_events
-from services.forecast_service import forecast_city
-from services.anomaly_service import anomaly_score
-from services.grid_forecast_service import forecast_grid
+from forecast.grid import grid_axes, refine_factor
+from forecast.predictor import model_version
+from response_encoding import conditional_get, encoded_response, negotiate_format, response_cache_stats
+from services.data_service import current_snapshot
+from services.forecast_service import forecast_cities
+from services.anomaly_service import anomaly_score_from_features
+from services.grid_forecast_service import (
+    GRID_REFINE_THRESHOLD,
+    cached_forecast_grid,
+    forecast_grid_pyramid,
+    grid_cache_stats,
+)
 
 forecast_bp = Blueprint("forecast", __name__)
 
@@ -27,59 +35,116 @@ CITIES = {
 }
 
 
+def _forecast_map_payload(events):
+    preds = forecast_cities(events, CITIES, explain=True)
+    points = []
+    for name, city in CITIES.items():
+        pred = preds[name]
+        ano = anomaly_score_from_features(pred["features"])
+        risk_score = pred["risk_score"]
+        risk_level = "Yüksek" if risk_score >= 5.5 else "Orta" if risk_score >= 3.5 else "Düşük"
+        points.append({
+            "city": name,
+            "lat": city["lat"],
+            "lon": city["lon"],
+            "risk_score": risk_score,
+            "probability": pred["probability"],
+            "ml_probability": pred["ml_probability"],
+            "etas_probability": pred["etas_probability"],
+            "risk_level": risk_level,
+            "anomaly_score": round(ano, 2),
+            "anomaly_detected": ano > 0.5,
+            "top_features": pred.get("top_features", []),
+            "model_type": pred.get("model_type", "forecast_hybrid_v2_faultaware"),
+            "fault_distance": pred.get("fault_distance", 999.0),
+            "fault_proximity_score": pred.get("fault_proximity_score", 0.0),
+            "stress_transfer": pred.get("stress_transfer", 0.0),
+            "energy_release": pred.get("energy_release", 0.0),
+            "foreshock_count": pred.get("foreshock_count", 0),
+            "spatial_density": pred.get("spatial_density", 0.0),
+            "mag_trend": pred.get("mag_trend", 0.0),
+            "depth_variance": pred.get("depth_variance", 0.0),
+            "nearest_fault_segment": pred.get("nearest_fault_segment", "unknown"),
+        })
+    return {
+        "status": "success",
+        "model_type": "forecast_hybrid_v1",
+        "analysis_window": "past_48h",
+        "points": points,
+    }
+
+
+def _etag_parts():
+    return current_snapshot()["version"], model_version(), negotiate_format()
+
+
+def _snapshot_ready():
+    return current_snapshot()["version"] > 0
+
+
 @forecast_bp.route("/api/v2/forecast-map", methods=["GET"])
+@conditional_get(_etag_parts, cacheable=_snapshot_ready)
 def forecast_map_v2():
+    """?format=columnar|binary veya Accept ile kompakt yanıt; gövdeler (görüntü, model) sürümüyle cache'lenir."""
     try:
-        events = load_events()
-        points = []
-        for name, city in CITIES.items():
-            pred = forecast_city(events, city, explain=True)
-            ano = anomaly_score(events, city["lat"], city["lon"])
-            risk_score = pred["risk_score"]
-            risk_level = "Yüksek" if risk_score >= 5.5 else "Orta" if risk_score >= 3.5 else "Düşük"
-            points.append({
-                "city": name,
-                "lat": city["lat"],
-                "lon": city["lon"],
-                "risk_score": risk_score,
-                "probability": pred["probability"],
-                "ml_probability": pred["ml_probability"],
-                "etas_probability": pred["etas_probability"],
-                "risk_level": risk_level,
-                "anomaly_score": round(ano, 2),
-                "anomaly_detected": ano > 0.5,
-                "top_features": pred.get("top_features", []),
-                "model_type": pred.get("model_type", "forecast_hybrid_v2_faultaware"),
-                "fault_distance": pred.get("fault_distance", 999.0),
-                "fault_proximity_score": pred.get("fault_proximity_score", 0.0),
-                "stress_transfer": pred.get("stress_transfer", 0.0),
-                "energy_release": pred.get("energy_release", 0.0),
-                "foreshock_count": pred.get("foreshock_count", 0),
-                "spatial_density": pred.get("spatial_density", 0.0),
-                "mag_trend": pred.get("mag_trend", 0.0),
-                "depth_variance": pred.get("depth_variance", 0.0),
-                "nearest_fault_segment": pred.get("nearest_fault_segment", "unknown"),
-            })
-        return jsonify({
-            "status": "success",
-            "model_type": "forecast_hybrid_v1",
-            "analysis_window": "past_48h",
-            "points": points,
-        })
+        snap = current_snapshot()
+        return encoded_response("forecast-map-v2", (snap["version"], model_version()),
+                                lambda: _forecast_map_payload(snap["event_array"]))
     except Exception as e:
         return jsonify({"status": "error", "message": str(e), "points": []}), 500
 
 
 @forecast_bp.route("/api/v2/forecast-grid", methods=["GET"])
+@conditional_get(_etag_parts, cacheable=_snapshot_ready)
 def forecast_grid_v2():
+    """
+    ?step=0.25 → tek çözünürlük (varsayılan 0.5, en az 0.05).
+    ?levels=0.5,0.1,0.05&threshold=0.3 → piramit: ince seviyeler sadece eşiği aşan hücrelerde.
+    """
     try:
-        events = load_events()
-        points = forecast_grid(events, step=0.5)
-        return jsonify({
-            "status": "success",
-            "model_type": "forecast_hybrid_v2_faultaware",
-            "grid_step": 0.5,
-            "points": points,
-        })
+        levels_arg = request.args.get("levels")
+        if levels_arg:
+            steps = [float(s) for s in levels_arg.split(",") if s.strip()]
+            threshold = float(request.args.get("threshold", GRID_REFINE_THRESHOLD))
+            if not steps:
+                raise ValueError("levels boş")
+            for s in steps:
+                grid_axes(s)
+            for coarse, fine in zip(steps, steps[1:]):
+                refine_factor(coarse, fine)
+        else:
+            steps = [float(request.args.get("step", 0.5))]
+            grid_axes(steps[0])
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Geçersiz grid parametresi: {e}", "points": []}), 400
+    try:
+        snap = current_snapshot()
+        if levels_arg:
+            def build():
+                levels = forecast_grid_pyramid(steps, threshold=threshold, snapshot=snap)
+                return {
+                    "status": "success",
+                    "model_type": "forecast_hybrid_v2_faultaware",
+                    "grid_step": steps[0],
+                    "refine_threshold": threshold,
+                    "points": levels[0]["points"],
+                    "levels": levels,
+                }
+            key = (snap["version"], model_version(), tuple(steps), threshold)
+        else:
+            def build():
+                return {
+                    "status": "success",
+                    "model_type": "forecast_hybrid_v2_faultaware",
+                    "grid_step": steps[0],
+                    "points": cached_forecast_grid(step=steps[0], snapshot=snap),
+                }
+            key = (snap["version"], model_version(), steps[0])
+        return encoded_response("forecast-grid-v2", key, build, table_paths=("points", "levels.*.points"))
     except Exception as e:
         return jsonify({"status": "error", "message": str(e), "points": []}), 500
+
+
+@forecast_bp.route("/api/v2/forecast-grid/cache-stats", methods=["GET"])
+def forecast_grid_cache_stats():
+    return jsonify({"status": "success", "cache": grid_cache_stats(), "responses": response_cache_stats()})
@@ -1,9 +1,9 @@
 # routes/metrics_routes.py - Forecast model metrikleri API (feature_order, metrics)
 import os
-import pickle
 from flask import Blueprint, jsonify
 
 from config import FORECAST_MODEL
+from forecast.predictor import load_model
 
 metrics_bp = Blueprint("metrics", __name__)
 
@@ -16,8 +16,7 @@ def forecast_metrics_v2():
                 "status": "no_model",
                 "message": "Forecast modeli bulunamadı.",
             })
-        with open(FORECAST_MODEL, "rb") as f:
-            data = pickle.load(f)
+        data = load_model() or {}
         return jsonify({
             "status": "success",
             "trained_at": data.get("trained_at"),
@@ -14,17 +14,19 @@ from datetime import datetime
 # Proje modülleri
 from data_collector import (
     fetch_live_data, fetch_archive_data, fetch_all_multi_source,
-    fetch_archive_full, generate_synthetic_data
+    iter_archive_full, generate_synthetic_data
 )
 from dataset_manager import (
-    load_dataset, add_earthquakes, add_training_records,
-    get_training_records, DEFAULT_DATASET_FILE
+    add_earthquakes, add_training_records, ingest_earthquakes, load_recent_earthquakes,
+    get_training_records, get_dataset_stats, sync_db_from_store, DEFAULT_DATASET_FILE
 )
 from train_models import train_all
 
 # Zamanlama sabitleri (saniye)
 DATA_COLLECTION_INTERVAL = 30 * 60   # 30 dakika
 MODEL_TRAINING_INTERVAL = 24 * 60 * 60  # 24 saat (1 gün)
+# Tam arşiv sonrası eğitim kaydı üretiminde kullanılan en yeni deprem sayısı (bellek sınırı)
+ARCHIVE_TRAINING_EVENTS = int(os.getenv('ARCHIVE_TRAINING_EVENTS', '50000'))
 
 
 def _run_data_collection():
@@ -35,16 +37,20 @@ def _run_data_collection():
     print(f"[SCHEDULER] Veri toplama başlatıldı: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
+        # DB sonradan açıldıysa depodaki depremleri bir kez DB'ye aktar (okumalar indeksli DB'den)
+        sync_db_from_store(DEFAULT_DATASET_FILE)
+
         # 1. Veri yoksa veya azsa tam arşiv çek; yoksa multi-source
-        data = load_dataset(DEFAULT_DATASET_FILE)
-        raw_count = sum(1 for r in data if r.get('geojson') and r['geojson'].get('coordinates'))
+        raw_count = get_dataset_stats(DEFAULT_DATASET_FILE)['earthquake_raw']
         if raw_count < 500:
             print("[SCHEDULER] Veri az - tam arşiv çekiliyor (USGS + Kandilli)...")
-            all_eq = fetch_archive_full()
+            # Akış halinde içe aktar (tüm arşiv bellekte tutulmaz)
+            ingest_earthquakes(iter_archive_full(), source='multi')
+            all_eq = load_recent_earthquakes(limit=ARCHIVE_TRAINING_EVENTS)
         else:
             all_eq = fetch_all_multi_source()
-        if all_eq:
-            add_earthquakes(all_eq, source='multi')
+            if all_eq:
+                add_earthquakes(all_eq, source='multi')
         
         # 2. Şehir bazlı eğitim verisi (earthquake_features - app'ten bağımsız)
         from earthquake_features import create_training_records_from_earthquakes
@@ -143,6 +149,9 @@ def _model_exists() -> bool:
 
 
 if __name__ == "__main__":
+    # Ayrı süreç: eğitim kaydı üretiminde süreç havuzu (TRAINING_WORKERS yoksa atanmış CPU sayısı)
+    from earthquake_features import enable_parallel_training
+    enable_parallel_training()
     # İlk çalıştırmada veri topla
     print("İlk veri toplama başlatılıyor...")
     _run_data_collection()
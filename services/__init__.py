@@ -1,5 +1,5 @@
 # services - İş mantığı katmanı
-from services.data_service import load_events
-from services.forecast_service import forecast_city
+from services.data_service import load_events, load_event_array
+from services.forecast_service import forecast_city, forecast_cities
 
-__all__ = ["load_events", "forecast_city"]
+__all__ = ["load_events", "load_event_array", "forecast_city", "forecast_cities"]
@@ -4,6 +4,10 @@ from forecast.features import extract_features
 
 def anomaly_score(events: list, lat: float, lon: float, time_window_hours: int = 48) -> float:
     feats = extract_features(events, lat, lon, time_window_hours=time_window_hours)
+    return anomaly_score_from_features(feats)
+
+
+def anomaly_score_from_features(feats: dict) -> float:
     if not feats or feats.get("count", 0) == 0:
         return 0.0
     score = 0.0
@@ -1,67 +1,28 @@
-# services/data_service.py - Veri fusion (Kandilli + USGS + AFAD + dosya), dedup, cache, kalite filtresi
-import json
-import time
-from datetime import datetime
+# services/data_service.py - Veri fusion (Kandilli + USGS + AFAD + dosya), dedup, kalite filtresi;
+# sonuç event_snapshot üzerinden tek arka plan fetcher'ı ile yayınlanır
+import threading
 
 import requests
 
+import event_snapshot
+from event_snapshot import normalize_event as _normalize_event
 from config import (
     KANDILLI_API,
+    KANDILLI_ARCHIVE_API,
+    KANDILLI_ARCHIVE_LIMIT,
+    KANDILLI_TIMEOUT,
     USGS_API,
     AFAD_API,
     EARTHQUAKE_HISTORY_FILE,
 )
 
-_EVENTS_CACHE = {
-    "data": None,
-    "timestamp": 0.0,
-    "ttl": 300.0,
+# Dosyadan normalize event'ler (depo değişmedikçe tekrar dict üretilmez)
+_FILE_EVENTS_CACHE = {
+    "key": None,
+    "data": [],
 }
 
 
-def _parse_timestamp(eq: dict) -> float:
-    for key in ("timestamp", "created_at", "_parsed_timestamp"):
-        v = eq.get(key)
-        if v is None:
-            continue
-        try:
-            t = float(v)
-            if t > 1e12:
-                t = t / 1000.0
-            return t
-        except (TypeError, ValueError):
-            pass
-    date_str = eq.get("date") or ""
-    time_str = eq.get("time") or ""
-    if date_str:
-        s = f"{date_str} {time_str}".strip()
-        for fmt in ("%Y.%m.%d %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M:%S", "%Y.%m.%d", "%Y-%m-%d"):
-            try:
-                return datetime.strptime(s, fmt).timestamp()
-            except Exception:
-                continue
-    return 0.0
-
-
-def _normalize_event(eq: dict) -> dict | None:
-    coords = None
-    if eq.get("geojson") and eq["geojson"].get("coordinates"):
-        coords = eq["geojson"]["coordinates"]
-    if not coords:
-        lat, lon = eq.get("lat"), eq.get("lon") or eq.get("lng")
-        if lat is not None and lon is not None:
-            coords = [float(lon), float(lat)]
-    if not coords:
-        return None
-    lon, lat = float(coords[0]), float(coords[1])
-    mag = float(eq.get("mag", eq.get("magnitude", 0)) or 0)
-    depth = float(eq.get("depth", 10) or 10)
-    ts = _parse_timestamp(eq)
-    if ts <= 0:
-        return None
-    return {"lat": lat, "lon": lon, "mag": mag, "depth": depth, "timestamp": ts}
-
-
 def _normalize_usgs_feature(feature: dict) -> dict | None:
     try:
         props = feature.get("properties", {})
@@ -108,18 +69,59 @@ def _dedup_events(events: list) -> list:
     return out
 
 
-def load_events_from_kandilli(timeout: int = 30) -> list:
+def _fetch_kandilli_url(url: str, timeout: int) -> list:
     try:
-        r = requests.get(KANDILLI_API, timeout=timeout)
+        r = requests.get(url, timeout=timeout, headers={
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Accept": "application/json",
+        })
         r.raise_for_status()
         data = r.json()
     except Exception:
         return []
     items = data.get("result", data.get("data", [])) if isinstance(data, dict) else data
-    if not isinstance(items, list):
-        return []
+    return items if isinstance(items, list) else []
+
+
+def load_kandilli_raw(timeout: int = KANDILLI_TIMEOUT) -> list:
+    """Kandilli Live + Archive paralel; earthquake_id ile dedup, yeniden eskiye sıralı ham kayıtlar."""
+    results = {}
+
+    def fetch(name, url):
+        results[name] = _fetch_kandilli_url(url, timeout)
+
+    threads = [
+        threading.Thread(target=fetch, args=("live", KANDILLI_API)),
+        threading.Thread(target=fetch, args=("archive", f"{KANDILLI_ARCHIVE_API}?limit={KANDILLI_ARCHIVE_LIMIT}")),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    live_data = results.get("live") or []
+    archive_data = results.get("archive") or []
+
+    seen_ids = set()
+    merged = []
+    for eq in live_data + archive_data:
+        eid = eq.get("earthquake_id") or eq.get("eventID")
+        if not eid and eq.get("geojson", {}).get("coordinates"):
+            coords = eq["geojson"]["coordinates"]
+            ts = eq.get("created_at") or eq.get("timestamp") or 0
+            eid = f"{coords[0]}_{coords[1]}_{ts}"
+        if eid and eid in seen_ids:
+            continue
+        if eid:
+            seen_ids.add(eid)
+        merged.append(eq)
+    merged.sort(key=lambda x: float(x.get("created_at") or x.get("timestamp") or 0), reverse=True)
+    print(f"[API] Live: {len(live_data)}, Archive: {len(archive_data)}, Birleşik: {len(merged)} deprem")
+    return merged
+
+
+def load_events_from_kandilli(timeout: int = 30) -> list:
     events = []
-    for eq in items:
+    for eq in _fetch_kandilli_url(KANDILLI_API, timeout):
         e = _normalize_event(eq)
         if e:
             events.append(e)
@@ -161,42 +163,71 @@ def load_events_from_afad(timeout: int = 30) -> list:
 
 
 def load_events_from_file(filepath: str | None = None) -> list:
+    from dataset_manager import load_event_columns
+
     path = filepath or EARTHQUAKE_HISTORY_FILE
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        cols = load_event_columns(path)
     except Exception:
         return []
-    if not isinstance(data, list):
-        return []
-    events = []
-    for item in data:
-        e = _normalize_event(item)
-        if e:
-            events.append(e)
+    key = (path, len(cols), float(cols["timestamp"][0]), float(cols["timestamp"][-1])) if len(cols) else (path, 0)
+    if _FILE_EVENTS_CACHE["key"] == key:
+        return _FILE_EVENTS_CACHE["data"]
+    valid = cols["timestamp"] > 0
+    events = [
+        {"lat": la, "lon": lo, "mag": m, "depth": d, "timestamp": t}
+        for la, lo, m, d, t in zip(
+            cols["lat"][valid].tolist(),
+            cols["lon"][valid].tolist(),
+            cols["mag"][valid].tolist(),
+            cols["depth"][valid].tolist(),
+            cols["timestamp"][valid].tolist(),
+        )
+    ]
+    _FILE_EVENTS_CACHE["key"] = key
+    _FILE_EVENTS_CACHE["data"] = events
     return events
 
 
-def load_events(use_api: bool = True, use_file_fallback: bool = True) -> list:
-    now = time.time()
-    if (
-        _EVENTS_CACHE["data"] is not None
-        and (now - _EVENTS_CACHE["timestamp"]) < _EVENTS_CACHE["ttl"]
-    ):
-        return _EVENTS_CACHE["data"]
-
+def _fuse_events(raw_kandilli: list | None, use_api: bool = True, use_file_fallback: bool = True) -> list:
     events = []
     if use_api:
-        events.extend(load_events_from_kandilli())
+        for eq in raw_kandilli if raw_kandilli is not None else _fetch_kandilli_url(KANDILLI_API, 30):
+            e = _normalize_event(eq)
+            if e:
+                events.append(e)
         events.extend(load_events_from_usgs())
         events.extend(load_events_from_afad())
     if use_file_fallback:
         events.extend(load_events_from_file())
+    return _dedup_events(_quality_filter(events, min_mag=1.5))
 
-    final_events = _dedup_events(_quality_filter(events, min_mag=1.5))
-    _EVENTS_CACHE["data"] = final_events
-    _EVENTS_CACHE["timestamp"] = now
-    return final_events
+
+def fetch_snapshot_sources() -> tuple:
+    """Arka plan fetcher'ı için tek upstream geçişi: (Kandilli ham kayıtlar, birleşik event'ler)."""
+    raw = load_kandilli_raw()
+    return raw, _fuse_events(raw)
+
+
+def current_snapshot():
+    """Yayınlanmış event görüntüsü; fetcher çalışmıyorsa başlatır (beklemeden döner)."""
+    event_snapshot.start_snapshot_fetcher(fetch_snapshot_sources)
+    return event_snapshot.get_snapshot()
+
+
+def load_events(use_api: bool = True, use_file_fallback: bool = True) -> list:
+    """
+    Birleşik event listesi. Varsayılan: paylaşılan görüntüden (upstream beklenmez).
+    Kaynak seçimi değiştirilirse senkron birleştirme yapılır (script kullanımı).
+    """
+    if use_api and use_file_fallback:
+        return list(current_snapshot()["events"])
+    return _fuse_events(None, use_api=use_api, use_file_fallback=use_file_fallback)
+
+
+def load_event_array():
+    """Görüntünün (M, 5) event dizisi (forecast.features.events_to_array formatı, salt-okunur)."""
+    return current_snapshot()["event_array"]
 
 
 def load_events_from_api(timeout: int = 30) -> list:
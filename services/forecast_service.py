@@ -1,11 +1,22 @@
 # services/forecast_service.py - Şehir bazlı forecast (predictor dict kullanır)
-from forecast.predictor import predict
+from forecast.predictor import predict, predict_many
 
 
-def forecast_city(events: list, city: dict, explain: bool = False) -> dict:
+def forecast_city(events: list, city: dict, explain: bool = False, features: dict | None = None) -> dict:
     lat = city["lat"]
     lon = city["lon"]
-    pred = predict(events, lat, lon, explain=explain)
+    pred = predict(events, lat, lon, explain=explain, features=features)
+    return _city_result(pred)
+
+
+def forecast_cities(events: list, cities: dict, explain: bool = False) -> dict:
+    """Tüm şehirler tek batch'te (tek feature matrisi + tek predict_proba). {isim: forecast_city çıktısı}"""
+    names = list(cities)
+    preds = predict_many(events, [cities[n] for n in names], explain=explain)
+    return {name: _city_result(pred) for name, pred in zip(names, preds)}
+
+
+def _city_result(pred: dict) -> dict:
     prob = pred["probability"]
     risk = min(10.0, max(0.0, prob * 10.0))
     return {
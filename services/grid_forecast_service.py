@@ -1,18 +1,54 @@
-# services/grid_forecast_service.py - Grid bazlı tahmin (Türkiye grid)
-from forecast.grid import generate_turkey_grid
-from forecast.predictor import predict
+# services/grid_forecast_service.py - Grid bazlı tahmin (Türkiye grid) + sonuç cache'i
+# Cache anahtarı (görüntü sürümü, model sürümü, step). Görüntü değişince noktaya bağlı mesafe
+# toplamları sadece pencereye giren/çıkan event'ler için güncellenir (N x Δk mesafe, N x k değil).
+# Pencere-global feature'lar (count, max_mag, enerji...) her hücreyi etkilediğinden tahmin tüm
+# hücreler için yeniden yapılır; pencere hiç değişmediyse önceki sonuç aynen kullanılır.
+# Piramit: kaba seviyede eşiği aşan hücreler bir sonraki (ince) step'te yeniden hesaplanır.
+import os
+import threading
+from collections import Counter
 
+import numpy as np
 
-def forecast_grid(events, step=0.5):
-    grid = generate_turkey_grid(step=step)
+import event_snapshot
+from forecast.faults import nearest_fault_info_many
+from forecast.features import (
+    distance_aggregates,
+    extract_features_batch,
+    features_from_aggregates,
+    features_from_row,
+    window_events,
+)
+from forecast.grid import grid_coords, grid_ids, refine_cells
+from forecast.predictor import model_version, predict_from_features
+from services.data_service import current_snapshot
+
+GRID_TIME_WINDOW_HOURS = 48
+# Artımlı güncellemede float birikimini sınırlamak için bu kadar güncellemede bir tam hesap
+GRID_FULL_REBUILD_EVERY = int(os.getenv("GRID_FULL_REBUILD_EVERY", "50"))
+# Yeni görüntü yayınlanınca önceden hesaplanan step'ler
+GRID_WARM_STEPS = tuple(float(s) for s in os.getenv("GRID_WARM_STEPS", "0.5").split(",") if s.strip())
+GRID_REFINE_THRESHOLD = float(os.getenv("GRID_REFINE_THRESHOLD", "0.3"))
+GRID_PYRAMID_CACHE_SIZE = 8
+
+# step -> durum (grid, pencere event'leri, mesafe toplamları, son sonuç)
+_GRID_CACHE = {
+    "lock": threading.Lock(),
+    "states": {},
+    "pyramids": {},
+    "stats": {"hits": 0, "misses": 0, "full": 0, "incremental": 0, "unchanged": 0,
+              "pyramid_hits": 0, "pyramid_misses": 0},
+}
+
+
+def _grid_points(ids, lats, lons, preds):
     results = []
-    for p in grid:
-        pred = predict(events, p["lat"], p["lon"], explain=False)
+    for pid, lat, lon, pred in zip(ids, lats.tolist(), lons.tolist(), preds):
         prob = pred["probability"]
         results.append({
-            "id": p["id"],
-            "lat": p["lat"],
-            "lon": p["lon"],
+            "id": pid,
+            "lat": lat,
+            "lon": lon,
             "probability": float(prob),
             "ml_probability": float(pred.get("ml_probability", prob)),
             "etas_probability": float(pred.get("etas_probability", 0.0)),
@@ -24,3 +60,170 @@ def forecast_grid(events, step=0.5):
             "nearest_fault_segment": pred.get("nearest_fault_segment", "unknown"),
         })
     return results
+
+
+def _forecast_points(events, lats, lons):
+    X, segments = extract_features_batch(events, lats, lons, time_window_hours=GRID_TIME_WINDOW_HOURS)
+    feats_list = [features_from_row(X[i], segments[i]) for i in range(len(X))]
+    preds = predict_from_features(X, feats_list, explain=False)
+    return _grid_points(grid_ids(lats, lons), lats, lons, preds)
+
+
+def forecast_grid(events, step=0.5):
+    lats, lons = grid_coords(step)
+    return _forecast_points(events, lats, lons)
+
+
+def _new_state(step):
+    lats, lons = grid_coords(step)
+    fault_distance, segments = nearest_fault_info_many(lats, lons)
+    return {
+        "ids": grid_ids(lats, lons), "lats": lats, "lons": lons,
+        "fault_distance": fault_distance, "segments": segments,
+        "window": None, "aggregates": None, "updates": 0,
+        "key": None, "points": None,
+    }
+
+
+def _update_aggregates(state, r):
+    """Pencere event'leri r için mesafe toplamlarını günceller; 'full' / 'incremental' / 'unchanged' döner."""
+    lats, lons = state["lats"], state["lons"]
+    window = Counter(map(tuple, r.tolist()))
+    old = state["window"]
+    if old is not None and old == window:
+        return "unchanged"
+    added = removed = None
+    if old is not None and state["updates"] < GRID_FULL_REBUILD_EVERY:
+        added, removed = window - old, old - window
+        if sum(added.values()) + sum(removed.values()) >= len(r):
+            added = removed = None  # değişim pencereden büyük: tam hesap daha ucuz
+    state["window"] = window
+
+    if added is None:
+        state["aggregates"] = distance_aggregates(lats, lons, r)
+        state["updates"] = 0
+        return "full"
+
+    min_d, sum_d, stress = (a.copy() for a in state["aggregates"])
+    if removed:
+        rem = np.array(list(removed.elements()), dtype=np.float64)
+        r_min, r_sum, r_stress = distance_aggregates(lats, lons, rem)
+        sum_d -= r_sum
+        stress -= r_stress
+        # Minimumu pencereden çıkan event olan hücreler: yeni pencereye karşı yeniden
+        stale = r_min <= min_d
+        if np.any(stale):
+            min_d[stale] = distance_aggregates(lats[stale], lons[stale], r)[0]
+    if added:
+        add = np.array(list(added.elements()), dtype=np.float64)
+        a_min, a_sum, a_stress = distance_aggregates(lats, lons, add)
+        sum_d += a_sum
+        stress += a_stress
+        np.minimum(min_d, a_min, out=min_d)
+    state["aggregates"] = (min_d, sum_d, stress)
+    state["updates"] += 1
+    return "incremental"
+
+
+def _compute(state, event_array):
+    r, now = window_events(event_array, GRID_TIME_WINDOW_HOURS)
+    mode = _update_aggregates(state, r)
+    if mode == "unchanged" and state["points"] is not None:
+        return mode, state["points"]
+    min_d, sum_d, stress = state["aggregates"]
+    X = features_from_aggregates(r, now, GRID_TIME_WINDOW_HOURS, state["fault_distance"], min_d, sum_d, stress)
+    feats_list = [features_from_row(X[i], state["segments"][i]) for i in range(len(X))]
+    preds = predict_from_features(X, feats_list, explain=False)
+    return mode, _grid_points(state["ids"], state["lats"], state["lons"], preds)
+
+
+def cached_forecast_grid(step=0.5, snapshot=None):
+    """
+    Güncel görüntü için grid tahmini; aynı (görüntü, model, step) için hesaplanmış sonuç anında döner.
+    Sonuç listesi paylaşılır: çağıranlar değiştirmemeli.
+    """
+    snap = snapshot if snapshot is not None else current_snapshot()
+    step = float(step)
+    key = (snap["version"], model_version(), step)
+    stats = _GRID_CACHE["stats"]
+    state = _GRID_CACHE["states"].get(step)
+    if state is not None and state["key"] == key:
+        with _GRID_CACHE["lock"]:
+            stats["hits"] += 1
+        return state["points"]
+
+    with _GRID_CACHE["lock"]:
+        state = _GRID_CACHE["states"].get(step)
+        if state is not None and state["key"] == key:
+            stats["hits"] += 1  # başka istek az önce hesapladı
+            return state["points"]
+        stats["misses"] += 1
+        if state is None:
+            state = _GRID_CACHE["states"][step] = _new_state(step)
+        elif state["key"] is not None and state["key"][1] != key[1]:
+            state["points"] = None  # model değişti: toplamlar geçerli, tahminler değil
+        mode, points = _compute(state, snap["event_array"])
+        stats[mode] += 1
+        state["points"] = points
+        state["key"] = key
+        return points
+
+
+def forecast_grid_pyramid(steps=(0.5, 0.1), threshold=GRID_REFINE_THRESHOLD, snapshot=None):
+    """
+    Kabadan inceye seviyeler: ilk seviye tüm grid (cached_forecast_grid), sonrakiler sadece bir önceki
+    seviyede probability >= threshold olan hücrelerin içindeki ince noktalar.
+    steps azalan ve ardışık oranları tamsayı olmalı (örn. 0.5, 0.1, 0.05).
+    Returns: [{"step", "refined_from", "points"}, ...]
+    """
+    snap = snapshot if snapshot is not None else current_snapshot()
+    steps = tuple(float(s) for s in steps)
+    threshold = float(threshold)
+    key = (snap["version"], model_version(), steps, threshold)
+    pyramids = _GRID_CACHE["pyramids"]
+    levels = pyramids.get(key)
+    if levels is not None:
+        with _GRID_CACHE["lock"]:
+            _GRID_CACHE["stats"]["pyramid_hits"] += 1
+        return levels
+
+    coarse = cached_forecast_grid(steps[0], snapshot=snap)
+    levels = [{"step": steps[0], "refined_from": None, "points": coarse}]
+    parent = coarse
+    for prev_step, step in zip(steps, steps[1:]):
+        hot = [p for p in parent if p["probability"] >= threshold]
+        lats, lons = refine_cells([p["lat"] for p in hot], [p["lon"] for p in hot], prev_step, step)
+        parent = _forecast_points(snap["event_array"], lats, lons) if len(lats) else []
+        levels.append({"step": step, "refined_from": len(hot), "points": parent})
+
+    with _GRID_CACHE["lock"]:
+        _GRID_CACHE["stats"]["pyramid_misses"] += 1
+        if len(pyramids) >= GRID_PYRAMID_CACHE_SIZE:
+            pyramids.pop(next(iter(pyramids)))
+        pyramids[key] = levels
+    return levels
+
+
+def grid_cache_stats():
+    """Cache sayaçları: hits, misses ve miss'lerin full / incremental / unchanged dağılımı."""
+    with _GRID_CACHE["lock"]:
+        out = dict(_GRID_CACHE["stats"])
+        out["steps"] = sorted(_GRID_CACHE["states"])
+    return out
+
+
+def clear_grid_cache():
+    """Tüm durumları ve sayaçları sıfırlar (testler için)."""
+    with _GRID_CACHE["lock"]:
+        _GRID_CACHE["states"].clear()
+        _GRID_CACHE["pyramids"].clear()
+        for k in _GRID_CACHE["stats"]:
+            _GRID_CACHE["stats"][k] = 0
+
+
+def _warm_on_publish(snap):
+    for step in GRID_WARM_STEPS:
+        cached_forecast_grid(step, snapshot=snap)
+
+
+event_snapshot.add_publish_listener(_warm_on_publish)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+subscriber_index.py
+Bildirim aboneleri için bellek içi, artımlı güncellenen uzamsal indeks.
+- Her abonenin en yakın ili kayıt anında bir kez hesaplanır (il -> numara kümesi).
+- Konumlar enlem/boylam ızgarasında (SUBSCRIBER_CELL_DEG hücreleri) tutulur; "epicentere R km içindeki
+  aboneler" sorgusu sadece daireyi kapsayan hücrelerdeki adaylara vektörel haversine uygular.
+- Koordinatlar slot dizilerinde (numpy) tutulur; silinen slotlar yeniden kullanılır.
+check_for_big_earthquakes her olayda user_alerts.json'u okuyup tüm aboneleri dolaşmak yerine bu
+indeksi sorgular; /api/set-alert ve /api/istanbul-alert indeksi doğrudan günceller.
+Tüm işlemler indeks kilidi altında yapılır (Flask istekleri + izleme thread'i).
+"""
+
+import math
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+SUBSCRIBER_CELL_DEG = 0.5
+KM_PER_DEG = 111.0  # haversine R=6371 → 1° ≈ 111.19 km; 111.0 hücre erişimini biraz geniş tutar
+FLAG_KEYS = ('istanbul_alert',)
+
+
+def new_index(cities: Dict[str, Dict[str, Any]], cell_deg: float = SUBSCRIBER_CELL_DEG) -> Dict[str, Any]:
+    """cities: {ad: {'lat', 'lon', ...}} (TURKEY_CITIES)."""
+    names = list(cities.keys())
+    return {
+        'lock': threading.RLock(),
+        'cell_deg': float(cell_deg),
+        'city_names': names,
+        'city_lats': np.array([cities[n]['lat'] for n in names], dtype=np.float64),
+        'city_lons': np.array([cities[n]['lon'] for n in names], dtype=np.float64),
+        'lats': np.zeros(0, dtype=np.float64),
+        'lons': np.zeros(0, dtype=np.float64),
+        'rlats': np.zeros(0, dtype=np.float64),   # radyan ve cos(enlem): sorguda tekrar hesaplanmaz
+        'rlons': np.zeros(0, dtype=np.float64),
+        'coslats': np.zeros(0, dtype=np.float64),
+        'numbers': np.empty(0, dtype=object),  # slot -> numara (boş slot: None)
+        'size': 0,          # kullanılan slot sayısı
+        'free': [],         # yeniden kullanılacak slotlar
+        'slot': {},         # numara -> slot
+        'records': {},      # numara -> kayıt dict'i (user_alerts değeri)
+        'cell_of': {},      # numara -> (lat hücre, lon hücre)
+        'grid': {},         # (lat hücre, lon hücre) -> slot kümesi
+        'cell_arrays': {},  # hücre -> slot dizisi (sorgu cache'i; hücre değişince silinir)
+        'city_of': {},      # numara -> en yakın il
+        'cities': {},       # il -> numara kümesi
+        'flags': {k: set() for k in FLAG_KEYS},
+    }
+
+
+def _distances_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """earthquake_features.haversine ile aynı formül (R=6371)."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def nearest_city(index: Dict[str, Any], lat: float, lon: float) -> Tuple[Optional[str], float]:
+    """find_nearest_city ile aynı sonuç (eşitlikte ilk il)."""
+    if not index['city_names']:
+        return None, float('inf')
+    d = _distances_km(lat, lon, index['city_lats'], index['city_lons'])
+    i = int(np.argmin(d))
+    return index['city_names'][i], float(d[i])
+
+
+def _nearest_cities(index: Dict[str, Any], lats: np.ndarray, lons: np.ndarray, chunk: int = 4096) -> List[str]:
+    """Toplu en yakın il: il × abone mesafe matrisi parçalar halinde (nearest_city ile aynı formül)."""
+    names = index['city_names']
+    out = []
+    for s in range(0, len(lats), chunk):
+        lat2, lon2 = np.radians(lats[s:s + chunk])[None, :], np.radians(lons[s:s + chunk])[None, :]
+        lat1, lon1 = np.radians(index['city_lats'])[:, None], np.radians(index['city_lons'])[:, None]
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        d = 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        out.extend(names[i] for i in np.argmin(d, axis=0).tolist())
+    return out
+
+
+def _cell(index: Dict[str, Any], lat: float, lon: float) -> Tuple[int, int]:
+    c = index['cell_deg']
+    return int(math.floor(lat / c)), int(math.floor(lon / c))
+
+
+def _alloc_slot(index: Dict[str, Any]) -> int:
+    if index['free']:
+        return index['free'].pop()
+    slot = index['size']
+    if slot >= len(index['lats']):
+        capacity = max(64, 2 * len(index['lats']))
+        for key in ('lats', 'lons', 'rlats', 'rlons', 'coslats', 'numbers'):
+            grown = np.zeros(capacity, dtype=np.float64) if key != 'numbers' else np.empty(capacity, dtype=object)
+            grown[:slot] = index[key][:slot]
+            index[key] = grown
+    index['size'] = slot + 1
+    return slot
+
+
+def _detach(index: Dict[str, Any], number: str) -> Optional[int]:
+    slot = index['slot'].get(number)
+    if slot is None:
+        return None
+    cell = index['cell_of'].pop(number)
+    members = index['grid'][cell]
+    members.discard(slot)
+    index['cell_arrays'].pop(cell, None)
+    if not members:
+        del index['grid'][cell]
+    city = index['city_of'].pop(number)
+    members = index['cities'][city]
+    members.discard(number)
+    if not members:
+        del index['cities'][city]
+    for numbers in index['flags'].values():
+        numbers.discard(number)
+    return slot
+
+
+def _place(index: Dict[str, Any], number: str, record: Dict[str, Any], lat: float, lon: float,
+           city: Optional[str]) -> None:
+    slot = _detach(index, number)
+    if slot is None:
+        slot = _alloc_slot(index)
+        index['slot'][number] = slot
+        index['numbers'][slot] = number
+    index['lats'][slot] = lat
+    index['lons'][slot] = lon
+    index['rlats'][slot] = rlat = np.radians(lat)
+    index['rlons'][slot] = np.radians(lon)
+    index['coslats'][slot] = np.cos(rlat)
+    index['records'][number] = record
+    cell = _cell(index, lat, lon)
+    index['cell_of'][number] = cell
+    index['grid'].setdefault(cell, set()).add(slot)
+    index['cell_arrays'].pop(cell, None)
+    index['city_of'][number] = city
+    index['cities'].setdefault(city, set()).add(number)
+    for key, numbers in index['flags'].items():
+        if record.get(key):
+            numbers.add(number)
+
+
+def upsert(index: Dict[str, Any], number: str, record: Dict[str, Any]) -> Optional[str]:
+    """Aboneyi ekler / günceller (konum değiştiyse hücre ve il yeniden hesaplanır). En yakın ili döndürür."""
+    lat, lon = float(record['lat']), float(record['lon'])
+    city, _ = nearest_city(index, lat, lon)
+    with index['lock']:
+        _place(index, number, record, lat, lon, city)
+    return city
+
+
+def remove(index: Dict[str, Any], number: str) -> bool:
+    with index['lock']:
+        slot = _detach(index, number)
+        if slot is None:
+            return False
+        del index['slot'][number]
+        del index['records'][number]
+        index['numbers'][slot] = None
+        index['free'].append(slot)
+        return True
+
+
+def sync(index: Dict[str, Any], records: Dict[str, Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    İndeksi verilen kayıtlara eşitler: sadece yeni / konumu veya işaretleri değişen aboneler güncellenir,
+    kayıtlarda olmayanlar silinir. Returns: (güncellenen, silinen).
+    """
+    removed = 0
+    pending, lats, lons = [], [], []
+    with index['lock']:
+        for number in [n for n in index['records'] if n not in records]:
+            removed += remove(index, number)
+        for number, record in records.items():
+            old = index['records'].get(number)
+            if (old is None or old.get('lat') != record.get('lat') or old.get('lon') != record.get('lon')
+                    or any(bool(old.get(k)) != bool(record.get(k)) for k in FLAG_KEYS)):
+                try:
+                    lat, lon = float(record['lat']), float(record['lon'])
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"[SUBSCRIBERS] Geçersiz kayıt atlandı ({number}): {e}")
+                    continue
+                pending.append((number, record))
+                lats.append(lat)
+                lons.append(lon)
+            else:
+                index['records'][number] = record
+        if pending:
+            cities = _nearest_cities(index, np.array(lats), np.array(lons))
+            for (number, record), lat, lon, city in zip(pending, lats, lons, cities):
+                _place(index, number, record, lat, lon, city)
+    return len(pending), removed
+
+
+def build_index(cities: Dict[str, Dict[str, Any]], records: Dict[str, Dict[str, Any]],
+                cell_deg: float = SUBSCRIBER_CELL_DEG) -> Dict[str, Any]:
+    index = new_index(cities, cell_deg)
+    sync(index, records)
+    return index
+
+
+def _cell_slots(index: Dict[str, Any], cell: Tuple[int, int]) -> np.ndarray:
+    arr = index['cell_arrays'].get(cell)
+    if arr is None:
+        members = index['grid'][cell]
+        arr = index['cell_arrays'][cell] = np.fromiter(members, dtype=np.int64, count=len(members))
+    return arr
+
+
+def within_radius(index: Dict[str, Any], lat: float, lon: float,
+                  radius_km: float) -> Tuple[List[str], np.ndarray]:
+    """Merkeze radius_km'den (kesin) yakın aboneler: (numaralar, mesafeler km). Kayıt için record()."""
+    c = index['cell_deg']
+    reach_lat = radius_km / KM_PER_DEG
+    phi = math.radians(min(abs(lat) + reach_lat, 89.0))
+    reach_lon = min(180.0, reach_lat / math.cos(phi))
+    i0, i1 = int(math.floor((lat - reach_lat) / c)), int(math.floor((lat + reach_lat) / c))
+    j0, j1 = int(math.floor((lon - reach_lon) / c)), int(math.floor((lon + reach_lon) / c))
+    with index['lock']:
+        grid = index['grid']
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(grid):
+            cells = [k for k in grid if i0 <= k[0] <= i1 and j0 <= k[1] <= j1]
+        else:
+            cells = [k for k in ((i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)) if k in grid]
+        if not cells:
+            return [], np.zeros(0, dtype=np.float64)
+        slots = np.concatenate([_cell_slots(index, k) for k in cells])
+        # Ucuz ön eleme: haversine 'a' terimi eşik altında olanlar (sınırda pay bırakılır), kesin mesafe
+        # sadece bunlar için earthquake_features.haversine ile aynı formülle hesaplanır.
+        lat1, lon1 = math.radians(lat), math.radians(lon)
+        rlats, coslats = index['rlats'][slots], index['coslats'][slots]
+        a = np.sin((rlats - lat1) / 2) ** 2 + math.cos(lat1) * coslats * np.sin((index['rlons'][slots] - lon1) / 2) ** 2
+        a_max = math.sin(min(math.pi / 2, radius_km / (2 * 6371))) ** 2 * (1 + 1e-9)
+        near = np.flatnonzero(a <= a_max)
+        a = a[near]
+        d = 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        hit = d < radius_km
+        return index['numbers'][slots[near[hit]]].tolist(), d[hit]
+
+
+def record(index: Dict[str, Any], number: str) -> Optional[Dict[str, Any]]:
+    with index['lock']:
+        return index['records'].get(number)
+
+
+def in_city(index: Dict[str, Any], city_name: str, flag: Optional[str] = None) -> List[str]:
+    """En yakın ili city_name olan aboneler (flag verilirse o işarete sahip aboneler de). Kayıt için record()."""
+    with index['lock']:
+        numbers = index['cities'].get(city_name, ())
+        if flag:
+            return list(index['flags'].get(flag, set()).union(numbers))
+        return list(numbers)
+
+
+def index_stats(index: Dict[str, Any]) -> Dict[str, Any]:
+    with index['lock']:
+        return {
+            'subscribers': len(index['slot']),
+            'cells': len(index['grid']),
+            'cities': len(index['cities']),
+            'flags': {k: len(v) for k, v in index['flags'].items()},
+        }
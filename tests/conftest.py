@@ -0,0 +1,75 @@
+# tests/conftest.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import db_store
+
+
+@pytest.fixture(autouse=True)
+def _isolated_sqlite(tmp_path, monkeypatch):
+    """dataset_manager DB'ye de yazar: testler depo klasöründeki SQLite dosyasına dokunmasın."""
+    monkeypatch.setattr(db_store, "SQLITE_PATH", str(tmp_path / "earthquakes.sqlite3"))
+    yield
+    db_store.close_pool()
+
+
+@pytest.fixture
+def http_stub():
+    """
+    Yerel keep-alive HTTP stub sunucusu fabrikası: http_stub(route, delay) -> state.
+    route(state, method, path, raw_body) -> (status, body) veya (status, body, headers).
+    state: active/peak (eşzamanlı istek), hits (path başına), connections (istemci soketleri), base (URL).
+    """
+    servers = []
+
+    def start(route, delay=0.0):
+        state = {"active": 0, "peak": 0, "hits": {}, "connections": set(), "lock": threading.Lock()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self, method):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                with state["lock"]:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                    state["hits"][self.path] = state["hits"].get(self.path, 0) + 1
+                    state["connections"].add(self.client_address)
+                try:
+                    time.sleep(delay)
+                    status, body, *rest = route(state, method, self.path, raw)
+                    payload = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    for k, v in (rest[0] if rest else {}).items():
+                        self.send_header(k, v)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with state["lock"]:
+                        state["active"] -= 1
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        state["base"] = f"http://127.0.0.1:{server.server_address[1]}"
+        return state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,76 @@
+# tests/test_data_collector.py
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import data_collector as dc
+
+
+def _usgs_feature(eid, ts_ms):
+    return {
+        "type": "Feature", "id": eid,
+        "geometry": {"coordinates": [29.0, 40.0, 8.0]},
+        "properties": {"mag": 3.2, "time": ts_ms},
+    }
+
+
+def _collector_route(state, method, path, raw):
+    parts = urlsplit(path)
+    if parts.path == "/flaky" and state["hits"][path] == 1:
+        return 503, {}
+    if parts.path == "/missing":
+        return 404, {}
+    if parts.path == "/usgs":
+        start = parse_qs(parts.query)["starttime"][0]
+        return 200, {"features": [_usgs_feature(f"us_{start}", 1_700_000_000_000)]}
+    return 200, {"result": [{"path": parts.path}]}
+
+
+@pytest.fixture
+def stub_server(http_stub, monkeypatch):
+    monkeypatch.setattr(dc, "FETCH_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(dc, "FETCH_HOST_CONCURRENCY", 3)
+    monkeypatch.setattr(dc, "_HOSTS", {})
+    return http_stub(_collector_route, delay=0.05)
+
+
+def test_retry_and_non_retryable_status(stub_server):
+    base = stub_server["base"]
+    assert dc.fetch_from_api(f"{base}/flaky", max_retries=3) == [{"path": "/flaky"}]
+    assert stub_server["hits"]["/flaky"] == 2
+    assert dc.fetch_json_url(f"{base}/missing", max_retries=3) is None
+    assert stub_server["hits"]["/missing"] == 1  # 4xx tekrar denenmez
+
+
+def test_fetch_many_bounded_per_host_and_ordered(stub_server):
+    base = stub_server["base"]
+    urls = [f"{base}/item{i}" for i in range(12)]
+    results = dc.fetch_json_many(urls, workers=8)
+    assert [r["result"][0]["path"] for r in results] == [f"/item{i}" for i in range(12)]
+    assert 1 < stub_server["peak"] <= 3
+    # Keep-alive: 12 istek host havuzundaki en fazla 3 bağlantıdan geçer
+    assert len(stub_server["connections"]) <= 3
+
+
+def test_usgs_archive_full_parallel_in_year_order(stub_server, monkeypatch):
+    monkeypatch.setattr(dc, "USGS_BASE", f"{stub_server['base']}/usgs?format=geojson")
+    events = dc.fetch_usgs_archive_full(years_back=9)
+    assert len(events) == 9
+    starts = [e["earthquake_id"][3:] for e in events]
+    assert starts == sorted(starts, reverse=True)  # en yeni yıl önce (seri sürümle aynı sıra)
+    assert stub_server["peak"] > 1  # yıllar paralel çekilir (süre yerine eşzamanlılık ölçülür)
+
+
+def test_parse_json_body_incremental_and_fallback(monkeypatch):
+    import io
+
+    doc = {"type": "FeatureCollection", "features": [_usgs_feature("a", 1_700_000_000_000)], "count": 1}
+    body = json.dumps(doc).encode()
+    monkeypatch.setattr(dc, "HAS_IJSON", False)
+    assert dc._parse_json_body(io.BytesIO(body)) == doc
+    pytest.importorskip("ijson")
+    monkeypatch.setattr(dc, "HAS_IJSON", True)
+    assert dc._parse_json_body(io.BytesIO(body)) == doc
+    with pytest.raises(ValueError):
+        dc._parse_json_body(io.BytesIO(body[:-5]))
@@ -0,0 +1,157 @@
+# tests/test_dataset_manager.py - Sütunlu depo üzerinde dataset_manager
+import json
+
+import db_store
+import dataset_manager
+from dataset_manager import (
+    add_earthquakes,
+    add_training_records,
+    get_dataset_stats,
+    load_dataset,
+    load_event_columns,
+    load_recent_earthquakes,
+    sync_db_from_store,
+)
+
+
+def _eq(eid, lat, lon, mag, ts):
+    return {
+        "earthquake_id": eid,
+        "mag": mag,
+        "depth": 7.0,
+        "geojson": {"type": "Point", "coordinates": [lon, lat]},
+        "timestamp": ts,
+    }
+
+
+def test_add_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / "history.json")
+    added, total = add_earthquakes([_eq("a", 40.0, 29.0, 3.1, 1000.0)], path)
+    assert (added, total) == (1, 1)
+    # ID duplicate ve 5 km / 10 sn içindeki kopya eklenmez
+    added, _ = add_earthquakes([
+        _eq("a", 40.0, 29.0, 3.1, 1000.0),
+        _eq("b", 40.03, 29.02, 3.2, 1010.0),
+        _eq("c", 38.0, 27.0, 4.0, 5000.0),
+    ], path)
+    assert added == 1
+
+    cols = load_event_columns(path)
+    assert cols["mag"].tolist() == [3.1, 4.0]
+    assert cols["timestamp"].tolist() == [1000.0, 5000.0]
+
+    data = load_dataset(path)
+    assert [d["earthquake_id"] for d in data] == ["a", "c"]
+    assert data[0]["geojson"]["coordinates"] == [29.0, 40.0]
+
+
+def test_training_records_and_stats(tmp_path):
+    path = str(tmp_path / "history.json")
+    add_earthquakes([_eq("a", 40.0, 29.0, 3.1, 1000.0)], path)
+    rec = {"city": "Bursa", "lat": 40.18, "lon": 29.07, "timestamp": 1000.0,
+           "features": {"count": 1}, "risk_score": 2.0}
+    assert add_training_records([rec], path)[0] == 1
+    assert add_training_records([dict(rec)], path)[0] == 0
+    stats = get_dataset_stats(path)
+    assert stats["earthquake_raw"] == 1
+    assert stats["training_records"] == 1
+    assert stats["total_records"] == 2
+
+
+def test_legacy_json_is_imported(tmp_path):
+    path = tmp_path / "history.json"
+    path.write_text(json.dumps([
+        _eq("x", 39.0, 30.0, 2.5, 2000.0),
+        {"city": "Ankara", "lat": 39.9, "lon": 32.8, "timestamp": 5.0,
+         "features": {}, "risk_score": 1.0},
+    ]), encoding="utf-8")
+    data = load_dataset(str(path))
+    assert len(data) == 2
+    # İkinci açılışta tekrar içe aktarılmaz
+    assert len(load_dataset(str(path))) == 2
+
+
+def test_segments_are_compacted_and_trimmed(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.json")
+    monkeypatch.setattr(dataset_manager, "MAX_RECORDS", 5)
+    for i in range(8):
+        add_earthquakes([_eq(f"e{i}", 36.0 + i, 30.0, 3.0, 1000.0 + i * 3600)], path)
+    cols = load_event_columns(path)
+    assert len(cols) == 5
+    assert cols["lat"].tolist() == [39.0, 40.0, 41.0, 42.0, 43.0]
+    assert [d["earthquake_id"] for d in load_dataset(path)] == [f"e{i}" for i in range(3, 8)]
+
+
+def test_streaming_ingest_matches_add_earthquakes(tmp_path):
+    eqs = [_eq(f"g{i}", 36.0 + (i % 40) * 0.2, 27.0 + (i // 40) * 0.5, 3.0, 1000.0 + i * 600) for i in range(300)]
+    eqs.append(dict(eqs[5]))  # partiler arası ID kopyası
+    eqs.append(_eq("other_src", 36.0 + 0.01, 27.0, 3.1, 1000.0 + 10))  # g0'ın başka kaynaktan kopyası
+
+    list_path = str(tmp_path / "list.json")
+    stream_path = str(tmp_path / "stream.json")
+    add_earthquakes(eqs, list_path, source="multi")
+    added, total = dataset_manager.ingest_earthquakes((eq for eq in eqs), stream_path,
+                                                      source="multi", batch_size=40)
+
+    want = [r["earthquake_id"] for r in load_dataset(list_path)]
+    got = [r["earthquake_id"] for r in load_dataset(stream_path)]
+    assert got == want == [f"g{i}" for i in range(300)]
+    assert added == total == 300
+
+
+def _brute_force_dedup(earthquakes):
+    unique = []
+    for eq in earthquakes:
+        if not any(dataset_manager._is_same_event(eq, u) for u in unique):
+            unique.append(eq)
+    return unique
+
+
+def test_bucketed_dedup_matches_pairwise():
+    import random
+
+    rng = random.Random(7)
+    eqs = []
+    for i in range(400):
+        lat = 40.0 + rng.uniform(-0.3, 0.3)
+        lon = 29.0 + rng.uniform(-0.3, 0.3)
+        eqs.append(_eq(f"r{i}", lat, lon, round(rng.uniform(2.0, 2.6), 1), 1000.0 + rng.uniform(0, 600)))
+    got = dataset_manager.deduplicate_earthquakes(eqs)
+    want = _brute_force_dedup(eqs)
+    assert [e["earthquake_id"] for e in got] == [e["earthquake_id"] for e in want]
+
+
+def test_store_index_matches_pairwise(tmp_path):
+    import random
+
+    rng = random.Random(11)
+    path = str(tmp_path / "history.json")
+    stored = [_eq(f"s{i}", 41.5 + rng.uniform(-0.5, 0.5), 35.0 + rng.uniform(-0.5, 0.5),
+                  3.0, 1000.0 + i * 30) for i in range(300)]
+    dataset_manager.save_dataset(stored, path)
+    incoming = [_eq(f"q{i}", 41.5 + rng.uniform(-0.5, 0.5), 35.0 + rng.uniform(-0.5, 0.5),
+                    round(rng.uniform(2.9, 3.1), 2), 1000.0 + rng.uniform(0, 9000)) for i in range(300)]
+    got = dataset_manager.find_spatiotemporal_duplicates(incoming, path)
+    want = [dataset_manager.is_duplicate_spatiotemporal(q, stored) for q in incoming]
+    assert got == want
+    assert any(want)
+
+
+def test_recent_earthquakes_read_from_db_once_it_covers_store(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.json")
+    eqs = [_eq(f"e{i}", 36.0 + i * 0.3, 27.0 + i * 0.4, 2.0 + i * 0.1, 1000.0 + i * 50) for i in range(20)]
+    monkeypatch.setattr(db_store, "DB_BACKEND", "none")  # DB sonradan açılır
+    add_earthquakes(eqs[:15], path)
+    monkeypatch.setattr(db_store, "DB_BACKEND", None)
+    monkeypatch.setattr(db_store, "DATABASE_URL", None)
+    add_earthquakes(eqs[15:], path)  # yeni depremler SQLite'a da yazılır
+
+    queries = []
+    query = db_store.query_events_db
+    monkeypatch.setattr(db_store, "query_events_db", lambda **kw: queries.append(kw) or query(**kw))
+    from_store = load_recent_earthquakes(path, limit=8)
+    assert queries == []  # DB depoyu kapsamıyor: depodan okunur
+    assert sync_db_from_store(path) == 15 and sync_db_from_store(path) == 0
+    from_db = load_recent_earthquakes(path, limit=8)
+    assert queries == [{"limit": 8}]
+    assert from_db == [{k: v for k, v in eq.items() if k != "earthquake_id"} for eq in from_store]
@@ -0,0 +1,124 @@
+# tests/test_db_store.py - PostgreSQL toplu yazım
+# Postgres testleri TEST_DATABASE_URL ile çalışır, örn.:
+#   docker run --rm -e POSTGRES_PASSWORD=pg -p 5432:5432 postgres:16
+#   TEST_DATABASE_URL=postgresql://postgres:pg@localhost:5432/postgres pytest tests/test_db_store.py
+import csv
+import os
+
+import pytest
+
+import db_store
+
+
+def _eq(eid, lat, lon, mag, ts, source="usgs"):
+    return {
+        "earthquake_id": eid, "mag": mag, "depth": 7.0, "source": source,
+        "geojson": {"type": "Point", "coordinates": [lon, lat]}, "timestamp": ts,
+    }
+
+
+def test_copy_buffer_roundtrip():
+    rows = db_store._event_rows([
+        _eq("a", 40.0, 29.0, 3.1, 1_700_000_000_123, source='kandilli,"afad"'),
+        {"mag": 2.0},  # koordinatsız: atlanır
+        _eq("b", 38.1234567, 27.0, 2.2, 1_700_000_000.5),
+    ])
+    assert [r[6] for r in rows] == ["a", "b"]
+    parsed = list(csv.reader(db_store._copy_buffer(rows)))
+    assert parsed[0][5] == 'kandilli,"afad"'
+    assert [float(v) for v in parsed[1][:5]] == list(rows[1][:5])
+    assert float(parsed[0][0]) == 1_700_000_000.123
+
+
+def test_sqlite_backend_is_default_and_queryable(monkeypatch):
+    monkeypatch.setattr(db_store, "DATABASE_URL", None)
+    monkeypatch.setattr(db_store, "DB_BACKEND", "none")
+    assert db_store.get_backend() == "none" and not db_store.is_db_available()
+    monkeypatch.setattr(db_store, "DB_BACKEND", None)
+    assert db_store.get_backend() == "sqlite" and db_store.is_db_available()
+    batch = [_eq(f"e{i}", 40.0 + i * 0.5, 29.0, 2.0 + i * 0.5, 1_000.0 + i * 100) for i in range(6)]
+    assert db_store.add_earthquakes_db(batch + batch[:2]) == (6, 6)
+    statements = []
+    with db_store._sqlite_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.set_trace_callback(statements.append)
+    assert db_store.add_earthquakes_db(batch[4:] + [_eq("new", 41.0, 29.5, 4.0, 5_000.0)]) == (1, 7)
+    assert not any("COUNT(*)" in sql for sql in statements)  # toplam yazım başına sayılmaz
+    with db_store._sqlite_connection() as conn:
+        conn.set_trace_callback(None)
+    assert [r["earthquake_id"] for r in db_store.get_raw_earthquakes_db(limit=2)] == ["new", "e5"]
+    cols = db_store.query_events_db(center=(41.0, 29.0), radius_km=100, start_ts=1_150.0, min_mag=2.5)
+    assert cols["timestamp"].tolist() == [1_200.0, 1_300.0, 5_000.0]
+    arr = db_store.query_event_array_db(bbox=(39.0, 41.2, 28.0, 30.0), limit=2)
+    assert arr[:, 4].tolist() == [1_200.0, 5_000.0] and arr.shape == (2, 5)
+
+
+def test_radius_limit_applies_after_exact_filter(monkeypatch):
+    monkeypatch.setattr(db_store, "DATABASE_URL", None)
+    monkeypatch.setattr(db_store, "DB_BACKEND", "sqlite")
+    # Dairenin içinde eski 6 deprem; bbox köşesinde (daire dışı) daha yeni 30 deprem
+    inside = [_eq(f"in{i}", 41.0 + i * 0.01, 29.0, 3.0, 1_000.0 + i) for i in range(6)]
+    corner = [_eq(f"c{i}", 42.75, 31.3, 3.0, 2_000.0 + i) for i in range(30)]
+    db_store.add_earthquakes_db(inside + corner)
+    lat_min, lat_max, lon_min, lon_max = db_store._radius_bbox(41.0, 29.0, 200)
+    assert lat_min <= 42.75 <= lat_max and lon_min <= 31.3 <= lon_max
+    cols = db_store.query_events_db(center=(41.0, 29.0), radius_km=200, limit=4)
+    assert cols["timestamp"].tolist() == [1_002.0, 1_003.0, 1_004.0, 1_005.0]
+    cols = db_store.query_events_db(center=(41.0, 29.0), radius_km=200, limit=50)
+    assert len(cols["lat"]) == 6
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL yok")
+    pytest.importorskip("psycopg2")
+    monkeypatch.setattr(db_store, "DATABASE_URL", url)
+    db_store.close_pool()
+    with db_store._connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS earthquakes")
+    yield
+    db_store.close_pool()
+
+
+def test_bulk_insert_counts_only_new_rows(pg, monkeypatch):
+    monkeypatch.setattr(db_store, "DB_COPY_CHUNK", 7)
+    batch = [_eq(f"e{i}", 40.0 + i * 0.01, 29.0, 3.0, 1_700_000_000 + i) for i in range(20)]
+    added, total = db_store.add_earthquakes_db(batch)
+    assert added == 20 and total >= 20
+    added, _ = db_store.add_earthquakes_db(batch[15:] + [_eq("new", 39.0, 30.0, 4.0, 1_700_000_100)] * 2)
+    assert added == 1
+    rows = db_store.get_raw_earthquakes_db(limit=100)
+    assert len(rows) == 21 and rows[0]["earthquake_id"] == "new"
+    # Havuz: bağlantılar geri verilir, tekrar çağrılar yeni bağlantı açmaz
+    assert len(db_store._POOL["pool"]._used) == 0
+
+
+def test_query_builder_and_radius_filter():
+    sql, params = db_store._build_event_query((36.0, 42.0, 26.0, 45.0), 100.0, 200.0, 3.0, limit=50)
+    assert "timestamp >= %s" in sql and "lat BETWEEN %s AND %s" in sql and "mag >= %s" in sql
+    assert sql.endswith("ORDER BY timestamp") and "LIMIT %s" in sql
+    assert params == [100.0, 200.0, 36.0, 42.0, 26.0, 45.0, 3.0, 50]
+
+    bbox = db_store._radius_bbox(41.0, 29.0, 200)
+    # (42.5, 30.8): bbox köşesinde ama ~223 km → kesin süzgeçte elenir
+    rows = [(1.0, 41.0, 29.0, 5.0, 3.0), (2.0, 42.5, 30.8, 5.0, 3.0), (3.0, 41.0, 31.0, 5.0, 4.0)]
+    assert all(bbox[0] <= r[1] <= bbox[1] and bbox[2] <= r[2] <= bbox[3] for r in rows)
+    cols = db_store._rows_to_columns(rows, center=(41.0, 29.0), radius_km=200)
+    assert cols["timestamp"].tolist() == [1.0, 3.0]
+    assert cols["mag"].flags["C_CONTIGUOUS"]
+
+
+def test_filtered_query_returns_columns(pg):
+    db_store.add_earthquakes_db([
+        _eq("near_old", 41.0, 29.0, 3.0, 1_000.0),
+        _eq("near_new", 41.1, 29.1, 4.0, 9_000.0),
+        _eq("near_small", 41.0, 29.2, 1.5, 9_500.0),
+        _eq("far", 38.0, 38.0, 5.0, 9_000.0),
+    ])
+    cols = db_store.query_events_db(center=(41.0, 29.0), radius_km=200, start_ts=5_000.0, min_mag=2.0)
+    assert cols["timestamp"].tolist() == [9_000.0] and cols["mag"].tolist() == [4.0]
+    arr = db_store.query_event_array_db(bbox=(36.0, 42.0, 26.0, 45.0), limit=2)
+    assert arr.shape == (2, 5) and arr[:, 4].tolist() == [9_000.0, 9_500.0]  # en yeni 2, zaman sırasıyla
@@ -0,0 +1,67 @@
+# tests/test_event_snapshot.py
+import time
+
+import numpy as np
+import pytest
+
+import event_snapshot
+
+
+def _kandilli(eid, lat, lon, mag, created_at):
+    return {
+        "earthquake_id": eid, "mag": mag, "depth": 7.0, "created_at": created_at,
+        "date": "2024.01.01 00:00:00", "geojson": {"coordinates": [lon, lat]},
+    }
+
+
+def test_snapshot_is_readonly_and_parsed_once():
+    raw = [_kandilli("a", 40.0, 29.0, 3.1, 1_700_000_000), _kandilli("b", 38.0, 27.0, 2.0, 1_700_000_600_000)]
+    events = [event_snapshot.normalize_event(eq) for eq in raw]
+    snap = event_snapshot.build_snapshot(raw, events, version=3)
+
+    assert snap["version"] == 3
+    assert [eq["_parsed_timestamp"] for eq in snap["raw"]] == [1_700_000_000.0, 1_700_000_600.0]
+    assert snap["raw_columns"]["lat"].tolist() == [40.0, 38.0]
+    assert snap["event_array"].shape == (2, 5)
+    assert snap["event_array"][1].tolist() == [38.0, 27.0, 2.0, 7.0, 1_700_000_600.0]
+    with pytest.raises(ValueError):
+        snap["event_array"][0, 0] = 1.0
+    with pytest.raises(TypeError):
+        snap["version"] = 4
+
+
+def test_fetcher_publishes_without_blocking_readers(monkeypatch):
+    monkeypatch.setitem(event_snapshot._CURRENT, "snapshot", event_snapshot.build_snapshot([], [], 0, 0.0))
+    event_snapshot.stop_snapshot_fetcher()
+    calls = []
+
+    def fetch_sources():
+        calls.append(time.time())
+        time.sleep(0.2)  # yavaş upstream
+        raw = [_kandilli(f"e{len(calls)}", 40.0, 29.0, 3.0, 1_700_000_000 + len(calls))]
+        return raw, [event_snapshot.normalize_event(eq) for eq in raw]
+
+    t0 = time.time()
+    assert event_snapshot.start_snapshot_fetcher(fetch_sources, interval=0.05)
+    first = event_snapshot.get_snapshot()
+    assert time.time() - t0 < 0.1 and first["version"] == 0 and first["raw"] == ()
+
+    deadline = time.time() + 5
+    while event_snapshot.get_snapshot()["version"] < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    snap = event_snapshot.get_snapshot()
+    assert snap["version"] >= 2
+    assert len(snap["events"]) == 1 and np.all(snap["event_array"][:, 4] > 0)
+    assert not event_snapshot.start_snapshot_fetcher(fetch_sources)
+    event_snapshot.stop_snapshot_fetcher()
+
+
+def test_unchanged_content_keeps_version(monkeypatch):
+    monkeypatch.setitem(event_snapshot._CURRENT, "snapshot", event_snapshot.build_snapshot([], [], 0, 0.0))
+    raw = [_kandilli("a", 40.0, 29.0, 3.1, 1_700_000_000)]
+    events = [event_snapshot.normalize_event(eq) for eq in raw]
+    first = event_snapshot.publish_snapshot(raw, events, skip_unchanged=True)
+    again = [_kandilli("a", 40.0, 29.0, 3.1, 1_700_000_000)]
+    assert event_snapshot.publish_snapshot(again, events, skip_unchanged=True) is first
+    revised = [_kandilli("a", 40.0, 29.0, 3.4, 1_700_000_000)]  # büyüklük revizyonu
+    assert event_snapshot.publish_snapshot(revised, events, skip_unchanged=True)["version"] == first["version"] + 1
@@ -0,0 +1,68 @@
+# tests/test_faults.py
+import json
+
+import pytest
+
+import forecast.faults as faults
+
+
+@pytest.fixture
+def fault_file(tmp_path, monkeypatch):
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"name": "KAF"},
+                "geometry": {"type": "LineString", "coordinates": [[27.0, 40.7], [31.0, 40.8], [36.0, 40.3]]},
+            },
+            {
+                "type": "Feature",
+                "properties": {"name": "DAF"},
+                "geometry": {"type": "LineString", "coordinates": [[36.0, 36.5], [38.5, 38.0], [40.5, 39.2]]},
+            },
+        ],
+    }
+    path = tmp_path / "turkey_faults.geojson"
+    path.write_text(json.dumps(geojson))
+    monkeypatch.setattr(faults, "FAULTS_DIR", str(tmp_path))
+    monkeypatch.setattr(faults, "FAULTS_GEOJSON", str(path))
+    monkeypatch.setattr(faults, "FAULTS_SHP", str(tmp_path / "missing.shp"))
+    monkeypatch.setattr(faults, "FAULT_RASTER_STEP", 0.25)
+    faults.load_fault_geometries.cache_clear()
+    faults.load_fault_index.cache_clear()
+    yield tmp_path
+    faults.load_fault_geometries.cache_clear()
+    faults.load_fault_index.cache_clear()
+
+
+def test_index_matches_exact(fault_file):
+    # Raster düğümleri (grid noktaları) ve düğüm dışı noktalar
+    points = [(40.75, 29.0), (38.0, 38.5), (37.0, 27.25), (39.13, 33.71), (41.9, 44.2), (36.2, 35.9)]
+    for lat, lon in points:
+        got = faults.nearest_fault_segment_info(lat, lon)
+        exact = faults.nearest_fault_segment_info_exact(lat, lon)
+        assert got["segment_name"] == exact["segment_name"]
+        assert got["distance_km"] == pytest.approx(exact["distance_km"], rel=1e-6, abs=1e-6)
+
+    assert list(fault_file.glob("fault_raster_*.npz"))
+
+
+def test_raster_reloaded_from_disk(fault_file):
+    lats, lons = [40.75, 38.0], [29.0, 38.5]
+    before, names_before = faults.nearest_fault_info_many(lats, lons)
+    faults.load_fault_index.cache_clear()
+    after, names_after = faults.nearest_fault_info_many(lats, lons)
+    assert names_before == names_after
+    assert list(before) == list(after)
+
+
+def test_no_fault_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(faults, "FAULTS_GEOJSON", str(tmp_path / "none.geojson"))
+    monkeypatch.setattr(faults, "FAULTS_SHP", str(tmp_path / "none.shp"))
+    faults.load_fault_geometries.cache_clear()
+    faults.load_fault_index.cache_clear()
+    dist, names = faults.nearest_fault_info_many([40.0], [29.0])
+    assert float(dist[0]) == 999.0 and names == ["unknown"]
+    faults.load_fault_geometries.cache_clear()
+    faults.load_fault_index.cache_clear()
@@ -1,5 +1,49 @@
 # tests/test_features.py
-from forecast.features import extract_features
+import random
+
+import numpy as np
+import pytest
+
+from forecast.faults import nearest_fault_segment_info
+from forecast.features import extract_features, haversine_km
+
+
+def _features_reference(earthquakes, lat, lon, time_window_hours=48):
+    """Vektörleştirme öncesi tek nokta döngüsü (dondurulmuş kopya): batch motoru buna göre doğrulanır."""
+    fault_info = nearest_fault_segment_info(lat, lon)
+    now = max(e.get("timestamp", 0) or 0 for e in earthquakes)
+    recent = [e for e in earthquakes
+              if (e.get("timestamp") or 0) > 0 and (now - (e.get("timestamp") or 0)) <= time_window_hours * 3600]
+    fault_distance = float(fault_info["distance_km"])
+    out = {"fault_distance": fault_distance, "fault_proximity_score": max(0.0, 1.0 - fault_distance / 100.0),
+           "nearest_fault_segment": fault_info["segment_name"]}
+    if not recent:
+        return out
+    mags = [float(e.get("mag", 0) or 0) for e in recent]
+    depths = [float(e.get("depth", 10) or 10) for e in recent]
+    distances = [haversine_km(lat, lon, float(e.get("lat", 0)), float(e.get("lon", 0))) for e in recent]
+    energy = energy_sum = stress = 0.0
+    for e, mag, dist in zip(recent, mags, distances):
+        dt_hours = max((now - float(e.get("timestamp", 0) or 0)) / 3600.0, 1e-6)
+        energy += 10 ** (1.5 * mag) / (1.0 + dt_hours)
+        energy_sum += 10 ** (1.5 * mag)
+        if mag >= 5.0:
+            stress += (mag - 4.0) / (1.0 + dist)
+    n6 = sum(1 for e in recent if now - (e.get("timestamp") or 0) <= 6 * 3600)
+    n24 = sum(1 for e in recent if now - (e.get("timestamp") or 0) <= 24 * 3600)
+    out.update({
+        "count": len(recent), "max_mag": float(np.max(mags)), "mean_mag": float(np.mean(mags)),
+        "mag_std": float(np.std(mags)) if len(mags) > 1 else 0.0,
+        "min_distance": float(np.min(distances)), "mean_distance": float(np.mean(distances)),
+        "recency_energy": float(np.log10(energy + 1.0)), "mean_depth": float(np.mean(depths)),
+        "recent_6h_count": n6, "recent_24h_count": n24, "swarm_ratio": n6 / n24 if n24 else 0.0,
+        "stress_transfer": float(np.tanh(stress / 5.0)), "energy_release": float(np.log10(energy_sum + 1.0)),
+        "foreshock_count": sum(1 for m in mags if 2.0 <= m <= 4.0),
+        "spatial_density": len(recent) / (time_window_hours + 1),
+        "mag_trend": float(mags[-1] - mags[0]) if len(mags) > 1 else 0.0,
+        "depth_variance": float(np.var(depths)) if len(depths) > 1 else 0.0,
+    })
+    return out
 
 
 def test_feature_vector():
@@ -16,3 +60,42 @@ def test_feature_vector():
     assert "fault_distance" in f
     assert f["count"] == 1
     assert f["max_mag"] == 4.5
+
+
+def test_batch_matches_single_point():
+    from forecast.features import FEATURE_ORDER, extract_features_batch
+
+    events = [
+        {"lat": 40.0, "lon": 29.0, "mag": 4.5, "depth": 8.0, "timestamp": 1000.0},
+        {"lat": 38.5, "lon": 27.1, "mag": 5.2, "depth": 12.0, "timestamp": 4600.0},
+        {"lat": 39.9, "lon": 32.8, "mag": 2.1, "depth": 5.0, "timestamp": 90000.0},
+    ]
+    points = [(40.0, 29.0), (38.4, 27.1), (37.0, 35.3)]
+    X, segments = extract_features_batch(events, [p[0] for p in points], [p[1] for p in points])
+    assert X.shape == (3, len(FEATURE_ORDER))
+    for row, seg, (lat, lon) in zip(X, segments, points):
+        f = extract_features(events, lat, lon)
+        assert seg == f["nearest_fault_segment"]
+        for k, v in zip(FEATURE_ORDER, row):
+            assert abs(f[k] - v) < 1e-9
+
+
+def test_batch_matches_scalar_reference():
+    from forecast.features import FEATURE_ORDER, extract_features_batch
+
+    rng = random.Random(11)
+    t0 = 1_700_000_000.0
+    events = [
+        {"lat": rng.uniform(36.0, 42.0), "lon": rng.uniform(26.0, 44.0), "mag": round(rng.uniform(1.0, 6.5), 1),
+         "depth": rng.choice([0, 5.0, 12.0, 35.0]), "timestamp": t0 + rng.uniform(-72 * 3600, 0)}
+        for _ in range(300)
+    ]
+    points = [(rng.uniform(36.0, 42.0), rng.uniform(26.0, 44.0)) for _ in range(80)]
+    X, segments = extract_features_batch(events, [p[0] for p in points], [p[1] for p in points])
+    for row, seg, (lat, lon) in zip(X, segments, points):
+        ref = _features_reference(events, lat, lon)
+        single = extract_features(events, lat, lon)
+        assert seg == single["nearest_fault_segment"] == ref["nearest_fault_segment"]
+        for k, v in zip(FEATURE_ORDER, row):
+            assert v == pytest.approx(ref[k], rel=1e-9, abs=1e-9), k
+            assert single[k] == pytest.approx(ref[k], rel=1e-9, abs=1e-9), k
@@ -21,3 +21,47 @@ def test_forecast_map_v2_json(client):
     assert data is not None
     assert "status" in data
     assert "points" in data
+
+
+def test_forecast_map_v2_conditional_get(client, monkeypatch):
+    import event_snapshot
+    import routes.forecast_routes as forecast_routes
+
+    monkeypatch.setattr(forecast_routes, "current_snapshot", event_snapshot.get_snapshot)
+    monkeypatch.setitem(event_snapshot._CURRENT, "snapshot", event_snapshot.build_snapshot([], [], 0, 0.0))
+    r = client.get("/api/v2/forecast-map")
+    assert r.headers["Cache-Control"] == "no-cache" and "ETag" not in r.headers  # ilk fetch öncesi
+
+    monkeypatch.setitem(event_snapshot._CURRENT, "snapshot", event_snapshot.build_snapshot([], [], 1, 0.0))
+    r = client.get("/api/v2/forecast-map")
+    etag = r.headers.get("ETag")
+    assert etag and "max-age=" in r.headers["Cache-Control"]
+    r = client.get("/api/v2/forecast-map", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+
+def test_turkey_early_warning_not_cached_on_empty_snapshot(client, monkeypatch):
+    import time
+
+    import app as app_module
+    import event_snapshot
+
+    monkeypatch.setattr(app_module, "current_snapshot", event_snapshot.get_snapshot)
+    monkeypatch.setattr(app_module, "turkey_warning_cache",
+                        {"data": None, "timestamp": 0, "cache_duration": 300, "version": None})
+    monkeypatch.setitem(event_snapshot._CURRENT, "snapshot", event_snapshot.build_snapshot([], [], 0, 0.0))
+
+    r = client.get("/api/turkey-early-warning")
+    empty_etag = r.headers.get("ETag")
+    assert r.get_json()["cities_with_warnings"] == 0
+    assert app_module.turkey_warning_cache["data"] is None  # v0 sonucu saklanmaz
+
+    now = time.time()
+    raw = [{"earthquake_id": f"e{i}", "mag": 2.0 + (i % 4) * 0.5, "depth": 8.0, "created_at": now - i * 900,
+            "geojson": {"coordinates": [29.0 + (i % 5) * 0.05, 40.8 + (i % 3) * 0.05]}} for i in range(40)]
+    event_snapshot.publish_snapshot(raw, [event_snapshot.normalize_event(eq) for eq in raw])
+
+    r = client.get("/api/turkey-early-warning")
+    assert r.headers.get("ETag") != empty_etag
+    assert r.get_json()["warnings"]["İstanbul"]["recent_earthquakes"] == 40
+    assert app_module.turkey_warning_cache["version"] == event_snapshot.get_snapshot()["version"]
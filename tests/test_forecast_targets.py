@@ -0,0 +1,50 @@
+# tests/test_forecast_targets.py
+import random
+
+from forecast_targets import (
+    FORECAST_TARGETS,
+    build_binary_target,
+    build_count_target,
+    build_maxmag_target,
+    build_targets_for_reference,
+    prepare_target_events,
+)
+
+CENTERS = [(41.0082, 28.9784), (38.4237, 27.1428), (38.3552, 38.3095), (39.9334, 32.8597)]
+
+
+def test_vectorized_targets_match_scalar():
+    rng = random.Random(11)
+    t0 = 1_700_000_000.0
+    events = []
+    for _ in range(1500):
+        lat, lon = rng.choice(CENTERS)
+        events.append({
+            "lat": lat + rng.uniform(-2.0, 2.0),
+            "lon": lon + rng.uniform(-2.5, 2.5),
+            "mag": round(rng.uniform(1.0, 6.0), 1),
+            "depth": 10.0,
+            "timestamp": t0 + rng.uniform(0, 30 * 86400),
+        })
+    # Tam ufuk sınırında deprem (ts == ref + 24h dahil, ts == ref hariç)
+    ref_edge = t0 + 10 * 86400
+    events.append({"lat": 41.0, "lon": 29.0, "mag": 4.5, "depth": 5.0, "timestamp": ref_edge + 24 * 3600})
+    events.append({"lat": 41.0, "lon": 29.0, "mag": 5.5, "depth": 5.0, "timestamp": ref_edge})
+    events.sort(key=lambda e: e["timestamp"])
+
+    prepared = prepare_target_events(events)
+    lats = [c[0] for c in CENTERS]
+    lons = [c[1] for c in CENTERS]
+    refs = [t0 + d * 86400 for d in range(0, 31, 3)] + [ref_edge]
+    for ref in refs:
+        got = build_targets_for_reference(prepared, lats, lons, ref)
+        assert set(got) == {t[0] for t in FORECAST_TARGETS}
+        for ci, (lat, lon) in enumerate(CENTERS):
+            expected = {
+                "y_m4_24h": build_binary_target(events, lat, lon, ref, 24, 100, 4.0),
+                "y_m5_72h": build_binary_target(events, lat, lon, ref, 72, 150, 5.0),
+                "y_count_24h": build_count_target(events, lat, lon, ref, 24, 100, 2.5),
+                "y_maxmag_7d": build_maxmag_target(events, lat, lon, ref, 168, 150),
+            }
+            for key, value in expected.items():
+                assert got[key][ci] == value and type(got[key][ci]) is type(value), (ref, ci, key)
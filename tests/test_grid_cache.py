@@ -0,0 +1,79 @@
+# tests/test_grid_cache.py - Grid tahmin cache'i ve artımlı güncelleme
+import numpy as np
+import pytest
+
+import event_snapshot
+from forecast.grid import grid_coords, refine_cells
+from services import grid_forecast_service as gfs
+
+T0 = 1_700_000_000.0
+
+
+def _ev(lat, lon, mag, ts):
+    return {"lat": lat, "lon": lon, "mag": mag, "depth": 9.0, "timestamp": ts}
+
+
+def _snap(events, version):
+    return event_snapshot.build_snapshot([], events, version=version)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    gfs.clear_grid_cache()
+    yield
+    gfs.clear_grid_cache()
+
+
+def _assert_same(points, expected):
+    assert [p["id"] for p in points] == [p["id"] for p in expected]
+    for key in ("probability", "etas_probability", "stress_transfer"):
+        np.testing.assert_allclose([p[key] for p in points], [p[key] for p in expected], rtol=1e-9, atol=1e-12)
+
+
+def test_cache_hits_and_incremental_matches_full():
+    base = [_ev(38.0 + 0.1 * i, 27.0 + 0.3 * i, 2.0 + 0.2 * i, T0 + 3600 * i) for i in range(12)]
+    base.append(_ev(37.2, 37.0, 5.6, T0 + 3600 * 12))
+    snap1 = _snap(base, 1)
+    first = gfs.cached_forecast_grid(1.0, snapshot=snap1)
+    assert gfs.cached_forecast_grid(1.0, snapshot=snap1) is first
+    _assert_same(first, gfs.forecast_grid(snap1["event_array"], step=1.0))
+
+    # 30 saat sonra: yeni event'ler girer, en eskiler 48 saatlik pencereden çıkar
+    newer = base + [_ev(40.8, 29.9, 4.1, T0 + 3600 * 50), _ev(39.0, 42.0, 5.2, T0 + 3600 * 52)]
+    snap2 = _snap(newer, 2)
+    second = gfs.cached_forecast_grid(1.0, snapshot=snap2)
+    _assert_same(second, gfs.forecast_grid(snap2["event_array"], step=1.0))
+
+    # Sürüm değişti ama pencere aynı: önceki sonuç kullanılır
+    assert gfs.cached_forecast_grid(1.0, snapshot=_snap(newer, 3)) is second
+
+    stats = gfs.grid_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+    assert (stats["full"], stats["incremental"], stats["unchanged"]) == (1, 1, 1)
+    assert stats["steps"] == [1.0]
+
+
+def test_grid_coords_exact_and_pyramid_refines_hot_cells():
+    lats, lons = grid_coords(0.1)
+    assert len(lats) == 71 * 196 and lats[-1] == 42.5 and lons[-1] == 45.0  # float birikimi yok
+
+    # Tüm kaba hücreler inceltilirse ince grid'in tamamı elde edilir
+    cl, co = grid_coords(0.5)
+    fl, fo = refine_cells(cl, co, 0.5, 0.1)
+    assert sorted(zip(fl.tolist(), fo.tolist())) == sorted(zip(lats.tolist(), lons.tolist()))
+    with pytest.raises(ValueError):
+        refine_cells(cl, co, 0.5, 0.3)
+
+    events = [_ev(38.0, 38.0, 6.2, T0), _ev(38.05, 38.1, 4.0, T0 + 600)]
+    snap = _snap(events, 1)
+    coarse = gfs.cached_forecast_grid(0.5, snapshot=snap)
+    threshold = sorted(p["probability"] for p in coarse)[-5]  # en riskli ~5 hücre
+    levels = gfs.forecast_grid_pyramid((0.5, 0.1), threshold=threshold, snapshot=snap)
+    assert levels[0]["points"] is coarse
+    hot = levels[1]["refined_from"]
+    assert 5 <= hot < len(coarse) and len(levels[1]["points"]) <= hot * 25
+    fine_full = {p["id"]: p["probability"] for p in gfs.forecast_grid(snap["event_array"], step=0.1)}
+    for p in levels[1]["points"]:
+        assert p["probability"] == pytest.approx(fine_full[p["id"]])
+    assert gfs.forecast_grid_pyramid((0.5, 0.1), threshold=threshold, snapshot=snap) is levels
+    assert gfs.grid_cache_stats()["pyramid_hits"] == 1
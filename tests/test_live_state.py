@@ -0,0 +1,113 @@
+# tests/test_live_state.py
+import math
+import random
+
+import pytest
+
+import live_state
+
+CITIES = {
+    "İstanbul": {"lat": 41.0082, "lon": 28.9784},
+    "İzmir": {"lat": 38.4237, "lon": 27.1428},
+    "Malatya": {"lat": 38.3552, "lon": 38.3095},
+}
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _reference(events, city, window_hours, now):
+    """Baştan hesap: pencere içinde, 300 km tampon ve 200 km sayı yarıçapındaki depremler."""
+    c = CITIES[city]
+    ids, near = [], 0
+    for e in events:
+        d = _haversine(c["lat"], c["lon"], e["geojson"]["coordinates"][1], e["geojson"]["coordinates"][0])
+        if d <= live_state.LIVE_RADIUS_KM and now - window_hours * 3600 <= e["timestamp"]:
+            ids.append((e["timestamp"], e["earthquake_id"]))
+            near += d <= live_state.LIVE_COUNT_RADIUS_KM
+    return [i for _, i in sorted(ids)], near
+
+
+def _event(i, ts, rng):
+    city = rng.choice(list(CITIES.values()))
+    return {
+        "earthquake_id": f"eq{i}",
+        "mag": round(rng.uniform(1.0, 6.2), 1),
+        "depth": round(rng.uniform(2.0, 40.0), 1),
+        "timestamp": ts,
+        "geojson": {"coordinates": [city["lon"] + rng.uniform(-2, 2), city["lat"] + rng.uniform(-1.5, 1.5)]},
+    }
+
+
+def test_incremental_matches_recompute():
+    rng = random.Random(7)
+    state = live_state.new_state(CITIES)
+    t0 = 1_700_000_000.0
+    events = []
+    now = t0
+    for poll in range(40):
+        now += rng.choice([30, 60, 1800, 3 * 3600])
+        new = [_event(len(events) + k, now - rng.uniform(0, 600), rng) for k in range(rng.randint(0, 6))]
+        if poll % 7 == 3:
+            new.append(_event(f"late{poll}", now - 20 * 3600, rng))  # geç gelen deprem
+        events.extend(new)
+        # Payload tekrarları: son depremler her yoklamada yeniden gelir
+        live_state.update_state(state, events[-30:], now=now)
+
+        for h in live_state.LIVE_WINDOWS_HOURS:
+            counts = live_state.city_counts(state, h)
+            for city in CITIES:
+                ids, near = _reference(events, city, h, now)
+                assert [e["earthquake_id"] for e in live_state.city_events(state, [city], h)] == ids, (city, h)
+                assert counts.get(city, 0) == near, (city, h)
+
+
+def test_dirty_cities_and_dedup():
+    state = live_state.new_state(CITIES)
+    now = 1_700_000_000.0
+    eq = {"earthquake_id": "a", "mag": 3.0, "depth": 5.0, "timestamp": now - 60,
+          "geojson": {"coordinates": [29.0, 40.9]}}
+    assert live_state.update_state(state, [eq], now=now) == {"İstanbul"}
+    assert live_state.update_state(state, [eq], now=now + 30) == set()
+    assert live_state.city_counts(state) == {"İstanbul": 1}
+    assert live_state.city_events(state, ["İstanbul", "İstanbul"], 24) == [
+        {"earthquake_id": "a", "mag": 3.0, "depth": 5.0, "timestamp": now - 60,
+         "geojson": {"type": "Point", "coordinates": [29.0, 40.9]}, "location": ""}]
+    # 24 saatlik pencereden çıkış şehri değişmiş sayar
+    assert live_state.update_state(state, [eq], now=now + 86400) == {"İstanbul"}
+    assert live_state.city_counts(state, 24) == {}
+    assert live_state.city_counts(state, 168) == {"İstanbul": 1}
+
+
+def test_live_warnings_match_full_payload(monkeypatch):
+    import time
+    import app
+
+    rng = random.Random(21)
+    now = 1_700_000_000.0
+    cities = list(app.TURKEY_CITIES.values())
+    eqs = []
+    for i in range(1500):  # yükün çoğu 7 günden eski arşiv
+        c = cities[i % 5] if i % 4 == 0 else rng.choice(cities)
+        eqs.append({
+            "earthquake_id": f"eq{i}", "mag": round(rng.uniform(1.0, 5.4), 1), "depth": rng.choice([5.0, 12.0, 40.0]),
+            "timestamp": now - rng.uniform(0, 30 * 86400),
+            "geojson": {"coordinates": [c["lon"] + rng.gauss(0, 0.5), c["lat"] + rng.gauss(0, 0.5)]},
+        })
+    monkeypatch.setattr(time, "time", lambda: now)
+    state = live_state.new_state(app.TURKEY_CITIES)
+    live_state.update_state(state, eqs, now=now)
+
+    full = app.turkey_early_warning_system(eqs)
+    live = app.turkey_early_warning_system(eqs, live=state)
+    assert list(live) == list(full)  # aynı il sıralaması (son 7 gün, 200 km)
+    active = [c for c, w in full.items() if "features" in w]
+    assert len(active) > 20
+    for city in active:
+        assert live[city]["alert_level"] == full[city]["alert_level"], city
+        assert live[city]["recent_earthquakes"] == full[city]["recent_earthquakes"], city
+        for key, value in full[city]["features"].items():
+            assert live[city]["features"][key] == pytest.approx(value, rel=1e-9, abs=1e-9), (city, key)
@@ -1,7 +1,27 @@
 # tests/test_model_loading.py
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+import forecast.predictor as predictor
+from forecast.etas_like import etas_like_score
+from forecast.features import FEATURE_ORDER, extract_features
 from forecast.predictor import load_model, predict
 
 
+def _predict_reference(model_data, events, lat, lon):
+    """Toplu çıkarım öncesi tek nokta tahmini (dondurulmuş kopya): nokta başına predict_proba."""
+    feats = extract_features(events, lat, lon, time_window_hours=48)
+    X = np.array([[feats.get(k, 0) for k in FEATURE_ORDER]], dtype=np.float64)
+    etas_prob = float(etas_like_score(feats))
+    if not model_data or "model" not in model_data:
+        return etas_prob, "no_forecast_model"
+    ml_prob = float(model_data["model"].predict_proba(X)[0, 1])
+    return 0.75 * ml_prob + 0.25 * etas_prob, "forecast_hybrid_v2_faultaware"
+
+
 def test_load_model_returns_none_or_dict():
     m = load_model()
     assert m is None or isinstance(m, dict)
@@ -15,3 +35,48 @@ def test_predict_returns_dict():
     assert 0.0 <= p["probability"] <= 1.0
     assert "model_type" in p
     assert "features" in p
+
+
+def test_predict_many_matches_predict():
+    from forecast.predictor import predict_many
+
+    events = [
+        {"lat": 40.0, "lon": 29.0, "mag": 3.0, "timestamp": 1000.0},
+        {"lat": 38.4, "lon": 27.1, "mag": 5.1, "timestamp": 5000.0},
+    ]
+    points = [{"lat": 40.0, "lon": 29.0}, (38.4, 27.1), {"lat": 37.0, "lon": 35.3}]
+    many = predict_many(events, points)
+    assert len(many) == 3
+    for p, got in zip(points, many):
+        lat, lon = (p["lat"], p["lon"]) if isinstance(p, dict) else p
+        want = predict(events, lat, lon)
+        assert got["model_type"] == want["model_type"]
+        assert abs(got["probability"] - want["probability"]) < 1e-9
+        assert got["nearest_fault_segment"] == want["nearest_fault_segment"]
+
+
+def test_predict_many_matches_per_point_reference(tmp_path, monkeypatch):
+    from sklearn.linear_model import LogisticRegression
+
+    from forecast.predictor import predict_many
+
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(200, len(FEATURE_ORDER))) * 5 + 2
+    y = (X[:, 1] + X[:, 6] > 5).astype(int)
+    model_data = {"model": LogisticRegression(max_iter=500).fit(X, y)}
+    path = tmp_path / "forecast_latest.pkl"
+    path.write_bytes(pickle.dumps(model_data))
+
+    r = random.Random(4)
+    events = [{"lat": r.uniform(36, 42), "lon": r.uniform(26, 44), "mag": round(r.uniform(1.5, 6.0), 1),
+               "depth": 10.0, "timestamp": 1_700_000_000.0 - r.uniform(0, 60 * 3600)} for _ in range(150)]
+    points = [(r.uniform(36, 42), r.uniform(26, 44)) for _ in range(40)]
+
+    for model_path, expected in ((str(path), model_data), (str(tmp_path / "missing.pkl"), None)):
+        monkeypatch.setattr(predictor, "FORECAST_MODEL", model_path)
+        many = predict_many(events, points)
+        for (lat, lon), got in zip(points, many):
+            prob, model_type = _predict_reference(expected, events, lat, lon)
+            assert got["model_type"] == model_type
+            assert got["probability"] == pytest.approx(prob, rel=1e-9, abs=1e-12)
+            assert predict(events, lat, lon)["probability"] == pytest.approx(prob, rel=1e-9, abs=1e-12)
@@ -0,0 +1,79 @@
+# tests/test_notification_dispatcher.py - Bildirim kuyruğu, hız limiti, bağlantı yeniden kullanımı (yerel stub)
+import json
+from urllib.parse import parse_qs
+
+import pytest
+
+import notification_dispatcher as nd
+
+
+def _provider_route(state, method, path, raw):
+    if path == "/meta":
+        to = json.loads(raw)["to"]
+        with state["lock"]:
+            state["attempts"][to] = state["attempts"].get(to, 0) + 1
+            attempts = state["attempts"][to]
+        if to == "905550000000":
+            return 400, {"error": {"message": "Re-engagement message", "code": 131047}}
+        if to.endswith("7") and attempts == 1:  # ilk denemede hız limiti
+            return 429, {"error": {"message": "rate", "code": 130429}}, {"Retry-After": "0"}
+        return 200, {"messages": [{"id": f"wamid.{to}"}]}
+    # Twilio Messages.json
+    form = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+    with state["lock"]:
+        state["twilio"].append(form)
+        sid = f"SM{len(state['twilio'])}"
+    return 201, {"sid": sid, "to": form["To"]}
+
+
+@pytest.fixture
+def stub_server(http_stub, monkeypatch):
+    state = http_stub(_provider_route, delay=0.02)
+    state.update(attempts={}, twilio=[])
+    monkeypatch.setattr(nd, "NOTIFY_WORKERS", 4)
+    monkeypatch.setattr(nd, "NOTIFY_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(nd, "NOTIFY_RATE_LIMITS", {"meta": (100.0, 5), "twilio": (100.0, 5)})
+    monkeypatch.setattr(nd, "TWILIO_API_BASE", state["base"])
+    nd.reset_notification_state()
+    yield state
+    nd.wait_idle(5)
+    nd.reset_notification_state()
+
+
+def test_queue_workers_rate_limit_retry_and_reuse(stub_server):
+    url = f"{stub_server['base']}/meta"
+    results = {}
+
+    def send(number):
+        response = nd.post("meta", url, json={"to": number})
+        return response.status_code == 200, None if response.status_code == 200 else response.status_code
+
+    numbers = [f"90532{i:07d}" for i in range(30)]
+    for number in numbers:
+        assert nd.submit(send, number, on_done=lambda ok, err, n=number: results.__setitem__(n, ok))
+    assert nd.wait_idle(10)
+
+    assert results == {n: True for n in numbers}
+    assert 1 < stub_server["peak"] <= 4
+    assert len(stub_server["connections"]) <= 4  # keep-alive: worker sayısı kadar bağlantı
+    metrics = nd.notification_metrics()
+    assert metrics["queue"]["delivered"] == 30 and metrics["queue"]["failed"] == 0
+    assert metrics["providers"]["meta"]["retries"] == 3 and metrics["providers"]["meta"]["requests"] == 33
+
+
+def test_app_meta_session_fallback_to_twilio_sms(stub_server, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "USE_META_WHATSAPP", True)
+    monkeypatch.setattr(app, "META_WHATSAPP_API_URL", f"{stub_server['base']}/meta")
+    monkeypatch.setattr(app, "TWILIO_ACCOUNT_SID", "AC123")
+    monkeypatch.setattr(app, "TWILIO_AUTH_TOKEN", "secret")
+    monkeypatch.setattr(app, "TWILIO_WHATSAPP_NUMBER", "whatsapp:+15550001111")
+
+    done = []
+    nd.submit(app.send_whatsapp_notification, "+905550000000", "deneme", on_done=lambda ok, err: done.append(ok))
+    assert app.send_whatsapp_notification("+905551234567", "merhaba") == (True, None)
+    assert nd.wait_idle(5)
+    assert done == [True]
+    assert stub_server["twilio"] == [{"From": "+15550001111", "To": "+905550000000", "Body": "deneme"}]
+    assert nd.notification_metrics()["providers"]["twilio"]["ok"] == 1
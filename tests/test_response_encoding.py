@@ -0,0 +1,141 @@
+# tests/test_response_encoding.py - Kompakt / ikili yanıt kodlama ve sıkıştırılmış gövde cache'i
+import gzip
+import json
+import struct
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import response_encoding as re_
+
+
+def _payload():
+    points = [
+        {"id": f"p{i}", "lat": 36.0 + i * 0.5, "lon": 27.0 + i, "probability": 0.1234567 * i,
+         "count": i, "model_type": "forecast_hybrid_v2_faultaware"}
+        for i in range(60)
+    ]
+    return {"status": "success", "grid_step": 0.5, "points": points,
+            "levels": [{"step": 0.5, "points": points[:3]}]}
+
+
+@pytest.fixture
+def client():
+    re_.clear_response_cache()
+    calls = []
+    app = Flask(__name__)
+
+    @app.route("/grid")
+    def grid():
+        def build():
+            calls.append(1)
+            return _payload()
+        return re_.encoded_response("grid", ("v1",), build, table_paths=("points", "levels.*.points"))
+
+    with app.test_client() as c:
+        c.calls = calls
+        yield c
+    re_.clear_response_cache()
+
+
+def _decode_binary(body):
+    assert body[:4] == re_.BINARY_MAGIC
+    (header_len,) = struct.unpack("<I", body[4:8])
+    header = json.loads(body[8:8 + header_len])
+    start = (8 + header_len + 7) & ~7
+    tables = []
+    for t in header["tables"]:
+        cols = dict(t["constants"])
+        for name, col in t["columns"].items():
+            if "values" in col:
+                cols[name] = col["values"]
+            else:
+                dtype = np.float32 if col["dtype"] == "float32" else np.int32
+                cols[name] = np.frombuffer(body, dtype=dtype, count=t["count"], offset=start + col["offset"])
+        tables.append(cols)
+    return header["payload"], tables
+
+
+def test_formats_roundtrip_and_cached_gzip(client):
+    expected = _payload()
+    r = client.get("/grid")
+    assert r.mimetype == "application/json" and r.get_json() == expected
+
+    r = client.get("/grid?format=columnar")
+    data = json.loads(r.data)
+    table = data["points"]
+    assert table["count"] == 60 and table["constants"] == {"model_type": "forecast_hybrid_v2_faultaware"}
+    assert table["columns"]["probability"][7] == round(0.1234567 * 7, 6)
+    assert table["columns"]["id"][59] == "p59" and data["levels"][0]["points"]["count"] == 3
+
+    r = client.get("/grid", headers={"Accept": re_.MIME_BINARY})
+    payload, tables = _decode_binary(r.data)
+    assert payload["points"] == {"$table": 0} and payload["levels"][0]["points"] == {"$table": 1}
+    np.testing.assert_allclose(tables[0]["lat"], [p["lat"] for p in expected["points"]], rtol=1e-6)
+    assert tables[0]["count"].tolist() == list(range(60)) and tables[1]["id"] == ["p0", "p1", "p2"]
+
+    for _ in range(2):
+        r = client.get("/grid?format=columnar", headers={"Accept-Encoding": "gzip, deflate"})
+        assert r.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in r.headers["Vary"]
+        assert json.loads(gzip.decompress(r.data)) == data
+    assert len(client.calls) == 1  # payload anahtar başına bir kez kurulur
+    stats = re_.response_cache_stats()
+    assert stats["hits"] == 1 and stats["bodies"] == 4
+    assert len(json.dumps(data)) < len(json.dumps(expected)) / 2
+
+
+def test_conditional_get_returns_304_before_view():
+    calls = []
+    state = {"version": 1}
+    app = Flask(__name__)
+
+    @app.route("/risk")
+    @re_.conditional_get(lambda: (state["version"],), max_age=lambda: 300)
+    def risk():
+        calls.append(1)
+        return {"status": "success", "version": state["version"]}
+
+    with app.test_client() as c:
+        r = c.get("/risk")
+        etag = r.headers["ETag"]
+        assert r.status_code == 200 and r.headers["Cache-Control"] == "public, max-age=300"
+        r = c.get("/risk", headers={"If-None-Match": etag})
+        assert r.status_code == 304 and r.data == b"" and r.headers["ETag"] == etag
+        assert len(calls) == 1
+        state["version"] = 2
+        r = c.get("/risk", headers={"If-None-Match": etag})
+        assert r.status_code == 200 and r.get_json()["version"] == 2 and r.headers["ETag"] != etag
+
+
+def test_empty_snapshot_and_error_payloads_are_not_cached():
+    state = {"version": 0, "status": "success"}
+    app = Flask(__name__)
+
+    @app.route("/risk")
+    @re_.conditional_get(lambda: (state["version"],), max_age=lambda: 300,
+                         cacheable=lambda: state["version"] > 0)
+    def risk():
+        return {"status": state["status"], "version": state["version"]}
+
+    @app.route("/grid")
+    @re_.conditional_get(lambda: (state["version"],), max_age=lambda: 300)
+    def grid():
+        return re_.encoded_response("grid-status", (state["version"], state["status"]),
+                                    lambda: {"status": state["status"], "points": []})
+
+    with app.test_client() as c:
+        r = c.get("/risk")
+        assert r.headers["Cache-Control"] == "no-cache" and "ETag" not in r.headers
+        etag = re_.make_etag("/risk?", 0)
+        assert c.get("/risk", headers={"If-None-Match": f'W/"{etag}"'}).status_code == 200  # v0: 304 yok
+
+        state.update(version=1, status="error")
+        for path in ("/risk", "/grid", "/grid?format=binary"):
+            r = c.get(path, headers={"Accept-Encoding": "gzip"})
+            assert r.headers["Cache-Control"] == "no-cache" and "ETag" not in r.headers, path
+
+        state["status"] = "success"
+        for path in ("/risk", "/grid"):
+            r = c.get(path)
+            assert r.headers["Cache-Control"] == "public, max-age=300" and "ETag" in r.headers, path
@@ -0,0 +1,77 @@
+# tests/test_subscriber_index.py - Abone uzamsal indeksi: tarama ile aynı sonuç + set-alert artımlı güncelleme
+import json
+import os
+import random
+
+import pytest
+
+import subscriber_index as si
+from earthquake_features import haversine
+
+
+@pytest.fixture
+def app_module():
+    import app
+    return app
+
+
+def test_index_matches_scan(app_module):
+    rng = random.Random(7)
+    records = {f"+90{i:010d}": {"lat": rng.uniform(35.5, 42.5), "lon": rng.uniform(25.5, 45.0),
+                                 "istanbul_alert": i % 40 == 0} for i in range(3000)}
+    index = si.build_index(app_module.TURKEY_CITIES, records)
+
+    for lat, lon in [(38.4, 27.1), (41.0, 29.0), (38.5, 43.4), (36.0, 36.0), (45.0, 30.0)]:
+        numbers, distances = si.within_radius(index, lat, lon, 150)
+        expected = {n: haversine(r["lat"], r["lon"], lat, lon) for n, r in records.items()
+                    if haversine(r["lat"], r["lon"], lat, lon) < 150}
+        assert sorted(numbers) == sorted(expected)
+        for n, d in zip(numbers, distances.tolist()):
+            assert d == pytest.approx(expected[n], abs=1e-9)
+
+    for number, r in list(records.items())[:500]:
+        assert index["city_of"][number] == app_module.find_nearest_city(r["lat"], r["lon"])[0]
+    istanbul = set(si.in_city(index, "İstanbul", flag="istanbul_alert"))
+    assert istanbul == {n for n, r in records.items()
+                        if r["istanbul_alert"] or app_module.find_nearest_city(r["lat"], r["lon"])[0] == "İstanbul"}
+
+    # Artımlı güncelleme: taşıma, silme, dosyayla eşitleme
+    moved = next(iter(records))
+    assert si.upsert(index, moved, {"lat": 38.49, "lon": 43.41}) == "Van"
+    assert moved in si.within_radius(index, 38.5, 43.4, 5)[0]
+    assert moved in si.in_city(index, "Van")
+    assert si.remove(index, moved) and moved not in si.within_radius(index, 38.5, 43.4, 5)[0]
+    records.pop("+900000000001")
+    assert si.sync(index, records) == (1, 1)  # taşınan kayıt geri eklenir, silinen düşer
+    assert si.index_stats(index)["subscribers"] == len(records)
+
+
+def test_set_alert_updates_index_without_reload(app_module, tmp_path, monkeypatch):
+    app = app_module
+    path = tmp_path / "user_alerts.json"
+    monkeypatch.setattr(app, "USER_DATA_FILE", str(path))
+    monkeypatch.setattr(app, "user_alerts", {})
+    monkeypatch.setattr(app, "subscribers", si.new_index(app.TURKEY_CITIES))
+    monkeypatch.setattr(app, "send_whatsapp_notification", lambda *a, **k: (True, None))
+    app.app.config["TESTING"] = True
+
+    with app.app.test_client() as c:
+        r = c.post("/api/set-alert", json={"lat": 38.42, "lon": 27.14, "number": "+905321112233"})
+        assert r.status_code == 200
+        r = c.post("/api/istanbul-alert", json={"number": "+905324445566"})
+        assert r.status_code == 200
+
+    assert si.within_radius(app.subscribers, 38.4, 27.1, 150)[0] == ["+905321112233"]
+    assert set(si.in_city(app.subscribers, "İstanbul", flag="istanbul_alert")) == {"+905324445566"}
+    assert not app.refresh_subscribers_if_changed()  # kendi kaydımız: dosya tekrar okunmaz
+
+    # Dışarıdan (başka worker) değişen dosya bir sonraki döngüde eşitlenir
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data.pop("+905321112233")
+    data["+905327778899"] = {"lat": 38.49, "lon": 43.41}
+    path.write_text(json.dumps(data), encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert app.refresh_subscribers_if_changed()
+    assert si.within_radius(app.subscribers, 38.4, 27.1, 150)[0] == []
+    assert si.in_city(app.subscribers, "Van") == ["+905327778899"]
@@ -0,0 +1,116 @@
+# tests/test_training_records.py
+import random
+
+import numpy as np
+import pytest
+
+import earthquake_features as ef
+
+
+def _events(n, t0, seed=3):
+    rng = random.Random(seed)
+    cities = list(ef.TURKEY_CITIES.values())
+    out = []
+    for i in range(n):
+        c = rng.choice(cities)
+        out.append({
+            "mag": round(rng.uniform(1.0, 5.5), 1),
+            "depth": round(rng.uniform(2.0, 30.0), 1),
+            "timestamp": t0 + rng.uniform(0, 20 * 86400),
+            "geojson": {"coordinates": [c["lon"] + rng.uniform(-0.5, 0.5), c["lat"] + rng.uniform(-0.5, 0.5)]},
+        })
+    return out
+
+
+def test_parallel_records_match_sequential(monkeypatch):
+    t0 = 1_700_000_000.0
+    eqs = _events(300, t0)
+    refs = [t0 + d * 86400 for d in range(3, 8)]
+    windows = [24, 168]
+
+    monkeypatch.setattr(ef, "TRAINING_WORKERS", 1)
+    sequential = ef._create_training_records_batch(eqs, windows, reference_times=refs)
+    monkeypatch.setattr(ef, "TRAINING_WORKERS", 2)
+    parallel = ef._create_training_records_batch(eqs, windows, reference_times=refs)
+
+    assert len(sequential) == len(refs) * len(ef.TURKEY_CITIES) * len(windows)
+    assert parallel == sequential
+
+
+def test_training_pool_is_opt_in_and_not_forked(monkeypatch):
+    monkeypatch.delenv("TRAINING_WORKERS", raising=False)
+    monkeypatch.setattr(ef, "TRAINING_WORKERS", 1)
+    assert ef._training_workers(1000) == 1  # varsayılan (web süreci): sıralı
+    assert ef.enable_parallel_training() == ef.available_cpus()
+    assert ef._training_workers(1000) == min(ef.available_cpus(), 250)
+    monkeypatch.setenv("TRAINING_WORKERS", "1")
+    monkeypatch.setattr(ef, "TRAINING_WORKERS", 1)
+    assert ef.enable_parallel_training(8) == 1  # ortam değişkeni korunur
+    assert ef._pool_context().get_start_method() in ("forkserver", "spawn")
+
+
+def test_global_clusters_match_per_city_dbscan():
+    t0 = 1_700_000_000.0
+    rng = random.Random(11)
+    eqs = _events(1500, t0)
+    for city in ("İzmir", "Malatya", "Van"):  # yoğun sekanslar (300 km sınırını kesen zincirler dahil)
+        c = ef.TURKEY_CITIES[city]
+        for _ in range(60):
+            eqs.append({"mag": 2.5, "depth": 7.0, "timestamp": t0 + 15 * 86400 + rng.uniform(0, 3600),
+                        "geojson": {"coordinates": [c["lon"] + rng.gauss(1.5, 0.3), c["lat"] + rng.gauss(0, 0.1)]}})
+    arrays = ef._parse_earthquakes_to_arrays(eqs)
+    lats, lons, mags, depths, ts = arrays
+    current, window_start = t0 + 16 * 86400, t0 + 16 * 86400 - 168 * 3600
+    shared = ef._window_cluster_features(arrays, window_start, current)
+    assert any(f["cluster_count"] > 1 for f in shared)
+    for i, c in enumerate(ef.TURKEY_CITIES.values()):
+        d = ef.haversine_vectorized(c["lat"], c["lon"], lats, lons)
+        sel = (d < 300) & (mags >= 1.0) & (ts >= window_start) & (ts <= current)
+        recent = [{"lat": la, "lon": lo, "mag": m} for la, lo, m in zip(lats[sel], lons[sel], mags[sel])]
+        per_city = ef.get_cluster_features(ef.detect_seismic_clusters(recent), c["lat"], c["lon"])
+        for key, value in shared[i].items():
+            assert value == pytest.approx(per_city[key], rel=1e-9), key
+
+
+def _etas_reference(recent, reference_time):
+    # Eski event başına döngü
+    influences = []
+    for e in recent:
+        dt_hours = max(0, reference_time - e["timestamp"]) / 3600.0
+        influences.append(np.exp(ef.ETAS_ALPHA * (e["mag"] - ef.ETAS_M0))
+                          * (1.0 / ((dt_hours + ef.ETAS_C) ** ef.ETAS_P)) * (1.0 / (e["distance"] + 1.0)))
+    return sum(influences), max(influences), len(influences)
+
+
+def test_etas_array_kernel_matches_event_loop():
+    t0 = 1_700_000_000.0
+    eqs = _events(400, t0)
+    lats, lons, mags, _, ts = ef._parse_earthquakes_to_arrays(eqs)
+    current = t0 + 12 * 86400
+    targets = list(ef.TURKEY_CITIES.values())[:10]
+    dists = np.vstack([ef.haversine_vectorized(c["lat"], c["lon"], lats, lons) for c in targets])
+    mask = (dists < 300) & (ts <= current)
+    mag_effect = ef.etas_mag_effect(mags)
+    matrix = ef.etas_features_matrix(dists, ts, current, mask=mask, mag_effect=mag_effect)
+    for i in range(len(targets)):
+        recent = [{"mag": m, "distance": d, "timestamp": t}
+                  for m, d, t in zip(mags[mask[i]], dists[i][mask[i]], ts[mask[i]])]
+        score, peak, count = _etas_reference(recent, current)
+        single = ef.compute_etas_features(recent, 0.0, 0.0, current)
+        assert single["etas_score"] == pytest.approx(score, rel=1e-12)
+        assert single["etas_max_influence"] == pytest.approx(peak, rel=1e-12)
+        assert matrix["etas_score"][i] == pytest.approx(score, rel=1e-12)
+        assert matrix["etas_max_influence"][i] == pytest.approx(peak, rel=1e-12)
+        assert matrix["etas_event_count"][i] == count == single["etas_event_count"]
+
+    # Canlı yol: aynı snapshot anahtarı için diziler ve büyüklük terimi bir kez hesaplanır;
+    # anahtarsız çağrı (uçları aynı, ortası farklı liste) önbelleği kullanmaz
+    assert ef.event_arrays(list(eqs), ("snapshot", 1)) is ef.event_arrays(eqs, ("snapshot", 1))
+    changed = list(eqs)
+    changed[len(eqs) // 2] = dict(changed[len(eqs) // 2], mag=9.9)
+    assert ef.event_arrays(changed)["mag"].max() == 9.9
+    assert ef.event_arrays(eqs, ("snapshot", 2))["mag"].max() < 9.9
+    f = ef.extract_features(eqs, targets[0]["lat"], targets[0]["lon"], 168, ref_time=current)
+    sel = mask[0] & (ts >= current - 168 * 3600) & (mags >= 1.0)
+    recent = [{"mag": m, "distance": d, "timestamp": t} for m, d, t in zip(mags[sel], dists[0][sel], ts[sel])]
+    assert f["etas_score"] == pytest.approx(_etas_reference(recent, current)[0], rel=1e-12)
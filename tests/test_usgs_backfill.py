@@ -0,0 +1,88 @@
+# tests/test_usgs_backfill.py - Devam ettirilebilir USGS backfill
+from datetime import date
+
+import collect_large_dataset as cld
+from dataset_manager import load_event_columns
+
+
+def _fake_usgs(calls, fail_years=(), dense_year=None, today=None):
+    """Her yıl 2 deprem; dense_year'da her gün 1 deprem (LIMIT sınırını tetikler). today: sonrası henüz yok."""
+
+    def fetch(start, end, bbox):
+        calls.append((start, end, bbox))
+        d0, d1 = date.fromisoformat(start), date.fromisoformat(end)
+        if d0.year in fail_years:
+            return None
+        if d0.year == dense_year:
+            days = range(d0.toordinal(), d1.toordinal())
+        else:
+            days = [d0.toordinal() + k for k in (10, 100) if d0.toordinal() + k < d1.toordinal()]
+        if today is not None:
+            days = [o for o in days if o < today.toordinal()]
+        out = []
+        for o in days:
+            ts = float((o - date(1970, 1, 1).toordinal()) * 86400 + 3600)
+            eid = f"us{o}"
+            out.append({
+                "earthquake_id": eid, "eventID": eid, "mag": 3.0, "depth": 10.0,
+                "geojson": {"type": "Point", "coordinates": [30.0 + (o % 50) * 0.2, 38.0 + (o % 20) * 0.2]},
+                "timestamp": ts, "created_at": ts, "source": "usgs",
+            })
+        return out
+
+    return fetch
+
+
+def test_backfill_resumes_and_splits(tmp_path, monkeypatch):
+    monkeypatch.setattr(cld, "REQUEST_INTERVAL_SEC", 0)
+    monkeypatch.setattr(cld, "LIMIT_PER_YEAR", 40)
+    backfill_dir = str(tmp_path / "backfill")
+
+    calls = []
+    monkeypatch.setattr(cld, "fetch_usgs_chunk", _fake_usgs(calls, fail_years=(2002,), dense_year=2001))
+    stats = cld.backfill_usgs(2000, 2003, backfill_dir=backfill_dir)
+    assert stats["failed"] == 1 and stats["split"] > 0
+    manifest = cld.load_backfill_manifest(backfill_dir)
+    assert all(info["count"] < 40 for info in manifest["chunks"].values())
+    dense_days = sum(info["count"] for key, info in manifest["chunks"].items() if key.startswith("2001"))
+    assert dense_days == 365  # bölünen yıl eksiksiz
+
+    # İkinci çalıştırma: sadece başarısız yıl çekilir
+    calls.clear()
+    monkeypatch.setattr(cld, "fetch_usgs_chunk", _fake_usgs(calls, dense_year=2001))
+    stats = cld.backfill_usgs(2000, 2003, backfill_dir=backfill_dir)
+    assert [c[0] for c in calls] == ["2002-01-01"]
+    assert stats["fetched"] == 1 and stats["failed"] == 0
+
+    # Birleştirme segment segment; tekrar çalıştırma yeni kayıt eklemez
+    history = str(tmp_path / "history.json")
+    cld.collect_and_save(True, 2000, 2003, backfill_dir=backfill_dir, dataset_file=history)
+    n = len(load_event_columns(history))
+    assert n == 2 + 365 + 2 + 2
+    calls.clear()
+    cld.collect_and_save(True, 2000, 2003, backfill_dir=backfill_dir, dataset_file=history)
+    assert calls == [] and len(load_event_columns(history)) == n
+
+
+def test_current_year_chunk_is_refetched_until_closed(tmp_path, monkeypatch):
+    monkeypatch.setattr(cld, "REQUEST_INTERVAL_SEC", 0)
+    backfill_dir = str(tmp_path / "backfill")
+    history = str(tmp_path / "history.json")
+    calls = []
+
+    def run(today):
+        calls.clear()
+        monkeypatch.setattr(cld, "_today", lambda: today)
+        monkeypatch.setattr(cld, "fetch_usgs_chunk", _fake_usgs(calls, today=today))
+        cld.collect_and_save(True, 2025, 2026, backfill_dir=backfill_dir, dataset_file=history)
+        return [c[0] for c in calls], len(load_event_columns(history))
+
+    # Yılın ilk günlerinde 2026'nın 10. günündeki deprem henüz yok
+    assert run(date(2026, 1, 5)) == (["2025-01-01", "2026-01-01"], 2)
+    info = cld.load_backfill_manifest(backfill_dir)["chunks"]["2026-01-01_2027-01-01_34_43_25_45"]
+    assert info["fetched_until"] == "2026-01-05"
+    # Açık parça yeniden çekilir ve yeni depremler birleştirilir; kapanmış yıl atlanır
+    assert run(date(2026, 6, 1)) == (["2026-01-01"], 4)
+    # Bitişten sonraki ilk çalıştırma parçayı kapatır, sonrakiler hiç istek atmaz
+    assert run(date(2027, 1, 2)) == (["2026-01-01"], 4)
+    assert run(date(2027, 2, 1)) == ([], 4)
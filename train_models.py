@@ -635,6 +635,9 @@ def train_forecast_models_from_earthquakes(earthquakes: List[Dict]) -> Dict:
 
 
 if __name__ == "__main__":
+    # Ayrı süreç: eğitim kaydı üretiminde süreç havuzu (TRAINING_WORKERS yoksa atanmış CPU sayısı)
+    from earthquake_features import enable_parallel_training
+    enable_parallel_training()
     if len(sys.argv) > 1 and sys.argv[1] == "--architectures":
         train_and_compare_architectures()
     elif len(sys.argv) > 1 and sys.argv[1] == "--forecast":